@@ -2,11 +2,12 @@
 
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Callable
 
 if (TYPE_CHECKING):
 
-    from standard_tools import structure as _structure, bytecontainer as _bytecontainer
+    from standard_tools import structure as _structure, bytecontainer as _bytecontainer, top_counter as _top_counter
 
     Structure = _structure('Structure', '')
     ByteContainer = _bytecontainer('ByteContainer', '')
+    TopCounter = _top_counter(capacity=int, ignore=Callable[[str], bool])
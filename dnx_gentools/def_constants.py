@@ -114,6 +114,9 @@ WAN_IN: int = 10  # used for limiting certain internal functions from applying t
 LAN_IN: int = 11  # used for management access traffic matching
 DMZ_IN: int = 12  # used for management access traffic matching
 
+# must match FW_MAX_WORKERS in cfirewall.h
+CFIREWALL_MAX_QUEUES: int = 16
+
 # ============================
 # LOCAL SOCKET DEFINITIONS
 # ============================
@@ -127,6 +130,7 @@ CONTROL_SOCKET: tuple[str, int] = ('127.0.0.1', 6969)
 # DATABASE_SOCKET: tuple[str, int] = ('127.0.0.1', 6970)
 # CONTROL_SOCKET:  str = f'{HOME_DIR}/dnx_profile/control.sock'
 DATABASE_SOCKET: str = f'{HOME_DIR}/dnx_routines/database/ddb.sock'
+CFIREWALL_SOCKET: str = f'{HOME_DIR}/dnx_secmods/cfirewall/cfirewall.sock'
 
 # ================================
 # DNS PROXY DEFS (CONSIDER MOVING)
@@ -134,11 +138,27 @@ DATABASE_SOCKET: str = f'{HOME_DIR}/dnx_routines/database/ddb.sock'
 CONNECT_TIMEOUT: int = 2
 RELAY_TIMEOUT:   int = 30
 
-MAX_A_RECORD_COUNT: int = 3
+TLS_POOL_SIZE:  int = 3
+TLS_RECV_SIZE:  int = 16384
+
+QUERY_TIMEOUT: int = 3
+QUERY_RETRIES: int = 1
+
 MINIMUM_TTL: int = 300
 DEFAULT_TTL: int = 300
 
 TOP_DOMAIN_COUNT: int = 20
+DNS_CACHE_MAX_ENTRIES: int = 25000
+DNS_CACHE_MAX_BYTES:   int = 16777216
+NEGATIVE_TTL: int = 300
+SERVFAIL_TTL: int = 30
+STALE_TTL:     int = 30
+STALE_MAX_AGE: int = ONE_DAY
+PREFETCH_PERCENT: int = 10
+PREFETCH_HITS:    int = 2
+# wait before requesting another refresh of a record if the previous refresh was not answered
+REFRESH_WAIT: int = QUERY_TIMEOUT * (QUERY_RETRIES + 1)
+DNS_CACHE_SNAPSHOT: str = f'{HOME_DIR}/dnx_profile/data/dns_cache.snapshot'
 HEARTBEAT_FAIL_LIMIT: int = 3
 KEEP_ALIVE_DOMAIN: str = 'dnxfirewall.com'
 
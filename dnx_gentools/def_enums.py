@@ -71,6 +71,10 @@ class DNS(_IntEnum):
     QUERY     = 0
     RESPONSE  = 1
     KEEPALIVE = 69
+    # dns response codes
+    NO_ERROR = 0
+    SERVFAIL = 2
+    NXDOMAIN = 3
     # dns record types
     LOCAL = 0
     ROOT  = 0
@@ -154,17 +158,18 @@ class DHCP(_IntEnum):
     # option type
     END = 255
 
+# nl socket idx. firewall workers use FIREWALL + worker id. (see NL_NAT_IDX in cfirewall.h)
 class QueueType(_IntEnum):
     FIREWALL = 0
-    NAT      = 1
+    NAT      = 16
 
 # QUEUE NUMBERS
 class Queue(_IntEnum):
     IP_PROXY  = 1
     DNS_PROXY = 2
     IPS_IDS   = 3
-    CFIREWALL = 69
-    CNAT      = 70
+    CFIREWALL = 69  # through 84 when balanced across multiple workers
+    CNAT      = 85
 
 class DNS_CAT(_IntEnum):
     NONE = 0
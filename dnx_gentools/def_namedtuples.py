@@ -107,10 +107,19 @@ class QNAME_RECORD(_NamedTuple):
     expire:  int
     ttl:     int
     records: list[RESOURCE_RECORD]
+    # negative records hold the soa record (if any) of the authority section
+    rcode:    int = 0
+    negative: bool = False
 
 class QNAME_RECORD_UPDATE(_NamedTuple):
     ttl:     int
     records: list[RESOURCE_RECORD]
+    rcode:    int = 0
+    negative: bool = False
+    # seconds since the records were cached
+    elapsed:  int = 0
+    # expired records served while being refreshed
+    stale:    bool = False
 
 class DNS_SIGNATURES(_NamedTuple):
     en_dns:  set[_DNS_CAT]
@@ -172,12 +181,14 @@ class IPS_EVENT_LOG(_NamedTuple):
 class GEOLOCATION_LOG(_NamedTuple):
     '''GENERAL GEOLOCATION LOG TUPLE.
 
+    connection counts for a country and direction summarized over the cfirewall flush interval.
     provides properties to convert integer values to std string form.
-            (cty_name, dir_name, act_name)
+            (cty_name, dir_name)
     '''
     country:   int
     direction: int
-    action:    int
+    allowed:   int
+    blocked:   int
 
     @property
     def cty_name(self) -> str:
@@ -187,10 +198,6 @@ class GEOLOCATION_LOG(_NamedTuple):
     def dir_name(self) -> str:
         return _DIR(self.direction).name.lower()
 
-    @property
-    def act_name(self) -> str:
-        return 'allowed' if self.action == 1 else 'blocked'
-
 
 class INF_EVENT_LOG(_NamedTuple):
     client_mac: str
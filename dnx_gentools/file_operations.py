@@ -14,7 +14,7 @@ from functools import wraps
 from secrets import token_urlsafe
 
 from dnx_gentools.def_typing import *
-from dnx_gentools.def_constants import HOME_DIR, ROOT, USER, GROUP, RUN_FOREVER, fast_sleep
+from dnx_gentools.def_constants import HOME_DIR, ROOT, USER, GROUP, RUN_FOREVER, CFIREWALL_MAX_QUEUES, fast_sleep
 from dnx_gentools.def_namedtuples import Item
 from dnx_gentools.def_enums import DNS_CAT, DATA
 from dnx_gentools.def_exceptions import ConfigurationError, ControlError
@@ -34,7 +34,7 @@ __all__ = (
     'load_data', 'write_data',
     'append_to_file', 'tail_file', 'change_file_owner',
     'json_to_yaml',
-    'load_tlds', 'load_keywords', 'load_top_domains_filter',
+    'load_tlds', 'load_keywords', 'load_top_domains_filter', 'load_cfirewall_queue_count',
     'calculate_file_hash',
     'cfg_read_poller', 'cfg_write_poller', 'Watcher',
 
@@ -193,6 +193,15 @@ def load_top_domains_filter() -> list[str]:
     with open(f'{HOME_DIR}/dnx_profile/signatures/domain_lists/valid_top.domains', 'r') as tdf:
         return [s.strip() for s in tdf.readlines() if s.strip() and '#' not in s]
 
+def load_cfirewall_queue_count() -> int:
+    '''return the configured cfirewall queue count, clamped to the supported range.
+
+    cfirewall starts one worker per queue and iptables balances across the same range, so both must use this value.
+    '''
+    system: ConfigChain = load_configuration('system', cfg_type='global')
+
+    return max(1, min(system.get('cfirewall->queue_count', 1), CFIREWALL_MAX_QUEUES))
+
 def calculate_file_hash(file_to_hash: str, *, path: str = 'dnx_profile', folder: str = 'data') -> str:
     '''returns the sha256 secure hash of passed in file.
     '''
@@ -2,15 +2,20 @@
 
 from __future__ import annotations
 
+import os
+
 from socket import inet_aton
 from struct import Struct
 from collections import defaultdict
+from hashlib import blake2b
 
 from dnx_gentools.def_typing import *
-from dnx_gentools.def_constants import HOME_DIR, MSB, LSB, UINT32_MAX, RFC1918
+from dnx_gentools.def_constants import HOME_DIR, MSB, LSB, RFC1918
 from dnx_gentools.def_enums import GEO, REP, DNS_CAT
 from dnx_gentools.file_operations import load_configuration
 
+from dnx_iptools.hash_trie import HashTrie_Value, HashTrie_Range, PrefixTrie_Range
+
 # ===============
 # TYPING IMPORTS
 # ===============
@@ -18,11 +23,17 @@ if (TYPE_CHECKING):
     from dnx_routines.logging import LogHandler_T
 
 __all__ = (
-    'generate_domain', 'generate_reputation', 'generate_geolocation',
+    'generate_domain', 'generate_reputation', 'generate_geolocation', 'generate_geolocation_ranges',
+    'compile_domain', 'compile_reputation', 'compile_geolocation',
+    'reload_signatures',
 )
 
+SIGNATURE_DIR: str = f'{HOME_DIR}/dnx_profile/signatures'
+SIGNATURE_IMAGES: str = f'{SIGNATURE_DIR}/compiled'
+
 cidr_to_host_count: dict[str, int] = {f'{i}': 2**x for i, x in enumerate(reversed(range(31)), 2)}
 ip_unpack: Callable[[bytes], tuple] = Struct('>L').unpack
+_hash_key_unpack: Callable[[bytes], tuple[int, int]] = Struct('<2Q').unpack
 
 def _combine_domain(log: LogHandler_T) -> list[str]:
     proxy_settings: ConfigChain = load_configuration('profiles/profile_1', cfg_type='security/dns')
@@ -33,7 +44,7 @@ def _combine_domain(log: LogHandler_T) -> list[str]:
     # iterating over the list of categories + DoH to load signature sets.
     for cat in [*default_cats, 'dns-over-https']:
         try:
-            file = open(f'{HOME_DIR}/dnx_profile/signatures/domain_lists/{cat}.domains')
+            file = open(f'{SIGNATURE_DIR}/domain_lists/{cat}.domains')
         except FileNotFoundError:
             log.alert(f'[missing] signature file: {cat} domains.')
         else:
@@ -53,7 +64,7 @@ def _combine_domain(log: LogHandler_T) -> list[str]:
 
     return domain_signatures
 
-def generate_domain(log: LogHandler_T) -> list[list[int, int]]:
+def generate_domain(log: LogHandler_T, domain_hash: Callable[[str], int]) -> list[list[int, int]]:
     # getting all enabled signatures
     domain_signatures: list = _combine_domain(log)
 
@@ -69,8 +80,8 @@ def generate_domain(log: LogHandler_T) -> list[list[int, int]]:
 
         sig: list = signature.strip().split(maxsplit=1)
         try:
-            # converting the hash to an unsigned 32 bit int to normalize for dnx tries
-            hhash = hash(sig[0]) & UINT32_MAX
+            # keyed hash of the trie the signatures will be loaded into. (unsigned 32 bit int)
+            hhash = domain_hash(sig[0])
             cat = int(DNS_CAT[sig[1]])
         except Exception as E:
             log.warning(f'bad signature detected | {E} | {sig}')
@@ -88,7 +99,7 @@ def _combine_reputation(log: LogHandler_T) -> list[str]:
     ip_rep_signatures: list = []
     for cat in proxy_settings.get_list('reputation'):
         try:
-            with open(f'{HOME_DIR}/dnx_profile/signatures/ip_lists/{cat}.ips', 'r') as file:
+            with open(f'{SIGNATURE_DIR}/ip_lists/{cat}.ips', 'r') as file:
                 ip_rep_signatures.extend([x.lower() for x in file.read().splitlines() if x and '#' not in x])
         except FileNotFoundError:
             log.alert(f'[reputation] signature file missing: {cat}')
@@ -129,21 +140,22 @@ def _combine_geolocation(log: LogHandler_T) -> list[str]:
     # signature folder are good to load in.
     for country in geo_settings:
         try:
-            with open(f'{HOME_DIR}/dnx_profile/signatures/geo_lists/{country}.geo', 'r') as file:
+            with open(f'{SIGNATURE_DIR}/geo_lists/{country}.geo', 'r') as file:
                 ip_geo_signatures.extend([x for x in file.read().splitlines() if x and '#' not in x])
         except FileNotFoundError:
             log.alert(f'[geolocation] signature file missing: {country}')
 
     return ip_geo_signatures
 
-def generate_geolocation(log: LogHandler_T) -> list[list[int, list[int, int, int]]]:
+def generate_geolocation(
+        log: LogHandler_T, signatures: Optional[list[str]] = None) -> list[list[int, list[int, int, int]]]:
     '''
     Convert standard signatures into a compressed integer format. This will completely replace file operations function
     since we are no longer generating a combined file and will do the merge and convert in memory before returning
     compressed structure.
     '''
     # getting all enabled signatures
-    ip_geo_signatures: list = _combine_geolocation(log)
+    ip_geo_signatures: list = _combine_geolocation(log) if signatures is None else signatures
 
     converted_list: list = []
     cvl_append = converted_list.append
@@ -198,6 +210,74 @@ def generate_geolocation(log: LogHandler_T) -> list[list[int, list[int, int, int
 
     return nets
 
+def generate_geolocation_ranges(log: LogHandler_T, signatures: Optional[list[str]] = None) -> list[list[int, int, int]]:
+    '''
+    Convert standard signatures into a sorted list of non overlapping [start, end, country] ranges for the prefix trie.
+    Overlapping networks resolve to the country of the most specific network.
+    '''
+    ip_geo_signatures: list = _combine_geolocation(log) if signatures is None else signatures
+
+    geo_ranges: list = []
+    gr_append = geo_ranges.append
+
+    for signature in ip_geo_signatures:
+
+        try:
+            net, cat = signature.split()
+
+            subnet: list = net.split('/')
+            net_id:  int = ip_unpack(inet_aton(subnet[0]))[0]
+            h_count: int = cidr_to_host_count[subnet[1]]
+
+            country = int(GEO[cat.upper()])
+        except Exception as E:
+            log.warning(f'invalid signature: {signature}, {E}')
+
+        else:
+            gr_append((net_id, net_id + h_count - 1, country))
+
+    del ip_geo_signatures
+
+    return _flatten_ranges(geo_ranges)
+
+def _flatten_ranges(ranges: list, /) -> list[list]:
+    flat_ranges, enclosing, cursor = [], [], 0
+
+    def add_range(start: int, end: int, value: int) -> None:
+        if (start > end):
+            return
+
+        # merging contiguous ranges if within the same country
+        if (flat_ranges and flat_ranges[-1][1] + 1 == start and flat_ranges[-1][2] == value):
+            flat_ranges[-1][1] = end
+
+        else:
+            flat_ranges.append([start, end, value])
+
+    # enclosing networks sort before the networks inside them. the enclosing value is added up to the start of each
+    # inner network and resumes after it ends.
+    for start, end, value in sorted(ranges, key=lambda r: (r[0], -r[1])):
+
+        while (enclosing and enclosing[-1][0] < start):
+            outer_end, outer_value = enclosing.pop()
+
+            add_range(cursor, outer_end, outer_value)
+            cursor = max(cursor, outer_end + 1)
+
+        if (enclosing):
+            add_range(cursor, start - 1, enclosing[-1][1])
+
+        enclosing.append((end, value))
+        cursor = start
+
+    while (enclosing):
+        outer_end, outer_value = enclosing.pop()
+
+        add_range(cursor, outer_end, outer_value)
+        cursor = max(cursor, outer_end + 1)
+
+    return flat_ranges
+
 def _merge_geo_ranges(ls: list, /) -> list[list]:
     merged_item, merged_containers, l = [], [], object()
     for l in ls:
@@ -229,3 +309,133 @@ def _merge_geo_ranges(ls: list, /) -> list[list]:
         merged_containers.append(merged_item)
 
     return merged_containers
+
+# ====================
+# PRECOMPILED IMAGES
+# ====================
+# the signature lists are compiled to a binary image of the trie structure that is mapped read-only by the modules
+# using it. an image is only recompiled if its signature sources have changed, so startup does not reparse the lists
+# and every process mapping the same image shares its memory.
+def compile_domain(log: LogHandler_T) -> str:
+    '''return the path of the domain signature image, compiling it first if it is missing or out of date.
+
+    the hash key is kept across recompiles so keys hashed with a previous image remain valid.
+    '''
+    image_path = f'{SIGNATURE_IMAGES}/domain.trie'
+
+    proxy_settings: ConfigChain = load_configuration('profiles/profile_1', cfg_type='security/dns')
+
+    categories: list = [*proxy_settings.get_list('categories->built-in'), 'dns-over-https']
+    source_id: int = _source_id(
+        [f'{SIGNATURE_DIR}/domain_lists/{cat}.domains' for cat in categories],
+        categories, proxy_settings.get_list('categories->custom'),
+        load_configuration('whitelist', cfg_type='global').get_list('pre_proxy'),
+        load_configuration('blacklist', cfg_type='global').get_list('pre_proxy')
+    )
+
+    image_info = HashTrie_Value.image_info(image_path)
+    if (image_info and image_info[0] == source_id):
+        return image_path
+
+    trie = HashTrie_Value()
+    trie.set_hash_key(*(image_info[1:] if image_info else _hash_key_unpack(os.urandom(16))))
+
+    domain_signatures = generate_domain(log, trie.py_hash)
+    trie.generate_structure(domain_signatures, len(domain_signatures))
+
+    _write_image(trie, image_path, source_id)
+
+    log.notice(f'[compiled] domain signature image: {len(domain_signatures)} signatures.')
+
+    return image_path
+
+def compile_reputation(log: LogHandler_T) -> str:
+    '''return the path of the ip reputation signature image, compiling it first if it is missing or out of date.
+    '''
+    image_path = f'{SIGNATURE_IMAGES}/reputation.trie'
+
+    categories: list = load_configuration('profiles/profile_1', cfg_type='security/ip').get_list('reputation')
+    source_id: int = _source_id([f'{SIGNATURE_DIR}/ip_lists/{cat}.ips' for cat in categories], categories)
+
+    image_info = HashTrie_Value.image_info(image_path)
+    if (image_info and image_info[0] == source_id):
+        return image_path
+
+    reputation_signatures = generate_reputation(log)
+
+    trie = HashTrie_Value()
+    trie.generate_structure(reputation_signatures, len(reputation_signatures))
+
+    _write_image(trie, image_path, source_id)
+
+    log.notice(f'[compiled] reputation signature image: {len(reputation_signatures)} signatures.')
+
+    return image_path
+
+def compile_geolocation(log: LogHandler_T) -> str:
+    '''return the path of the geolocation signature image, compiling it first if it is missing or out of date.
+    '''
+    image_path = f'{SIGNATURE_IMAGES}/geolocation.trie'
+
+    countries: list = load_configuration('profiles/profile_1', cfg_type='security/ip').get_list('geolocation')
+    countries.append(RFC1918[0])
+
+    source_id: int = _source_id([f'{SIGNATURE_DIR}/geo_lists/{country}.geo' for country in countries], countries)
+
+    image_info = PrefixTrie_Range.image_info(image_path)
+    if (image_info and image_info[0] == source_id):
+        return image_path
+
+    geo_ranges = generate_geolocation_ranges(log)
+
+    trie = PrefixTrie_Range()
+    trie.generate_structure(geo_ranges, len(geo_ranges))
+
+    _write_image(trie, image_path, source_id)
+
+    log.notice(f'[compiled] geolocation signature image: {len(geo_ranges)} ranges.')
+
+    return image_path
+
+def reload_signatures(trie: Union[HashTrie_Value, HashTrie_Range, PrefixTrie_Range], image_path: str) -> bool:
+    '''swap the image at image_path into trie if it was compiled from different sources than the active structure.
+
+    lookups are not blocked while swapping. returns True if the trie was reloaded.
+    '''
+    image_info = trie.image_info(image_path)
+    if (not image_info or image_info[0] == trie.source_id):
+        return False
+
+    try:
+        trie.load_image(image_path)
+    except (OSError, ValueError):
+        return False
+
+    return True
+
+def _source_id(files: list[str], *settings: Any) -> int:
+    '''return a 64-bit fingerprint of the settings and the modification state of the signature files.
+    '''
+    fingerprint = blake2b(repr(settings).encode(), digest_size=8)
+
+    for file in files:
+        try:
+            stat = os.stat(file)
+        except FileNotFoundError:
+            fingerprint.update(f'{file} missing'.encode())
+        else:
+            fingerprint.update(f'{file} {stat.st_mtime_ns} {stat.st_size}'.encode())
+
+    return int.from_bytes(fingerprint.digest(), 'little')
+
+def _write_image(
+        trie: Union[HashTrie_Value, HashTrie_Range, PrefixTrie_Range], image_path: str, source_id: int) -> None:
+    os.makedirs(SIGNATURE_IMAGES, exist_ok=True)
+
+    # the image is replaced instead of rewritten in place. processes mapping the previous image keep its pages until
+    # they unmap it.
+    temp_path = f'{image_path}.{os.getpid()}'
+
+    trie.write_image(temp_path, source_id)
+    os.chmod(temp_path, 0o644)
+    os.replace(temp_path, image_path)
@@ -18,10 +18,12 @@ from dnx_gentools.def_constants import RUN_FOREVER, MSEC, fast_time, fast_sleep,
 if (TYPE_CHECKING):
     from dnx_routines.logging import LogHandler_T
 
+    from dnx_gentools import TopCounter
+
 __all__ = (
     'looper', 'dynamic_looper',
     'ConfigurationMixinBase', 'Initialize',
-    'dnx_queue',
+    'dnx_queue', 'top_counter',
     'bytecontainer', 'structure',
     'classproperty'
 )
@@ -315,6 +317,142 @@ def dnx_queue(log: LogHandler_T, name: str = None) -> Callable[[...], Any]:
 
     return decorator
 
+# count-min sketch width of each top counter shard. each of the 4 rows is indexed by 16 bits of the key hash.
+SKETCH_WIDTH: int = 4096
+# ignored keys remembered per shard before the set is cleared
+IGNORED_MAX: int = 4096
+
+def top_counter(*, capacity: int, ignore: Callable[[str], bool]) -> TopCounter:
+    '''approximate heavy hitter counter for keys counted by many threads.
+
+    each counting thread is given its own shard (count-min sketch and top candidates) on first use, so counts are
+    updated without a shared lock. most_common() merges the shards by summing the sketch estimates of each candidate.
+
+    ignore is called for a key only when its count would make it a candidate. ignored keys are remembered by the shard,
+    so further counts of the key are a set lookup.
+
+        counter = top_counter(capacity=80, ignore=lambda key: 'cdn' in key)
+        counter.count('example.com')
+        counter.most_common(20)
+    '''
+    mask: int = SKETCH_WIDTH - 1
+    row_1: int = SKETCH_WIDTH
+    row_2: int = SKETCH_WIDTH * 2
+    row_3: int = SKETCH_WIDTH * 3
+
+    _hash = hash
+    _len = len
+    _min = min
+
+    class _Shard:
+
+        __slots__ = (
+            'generation', 'sketch', 'candidates', 'floor', 'ignored'
+        )
+
+        def __init__(self, generation: int):
+            self.reset(generation)
+
+        def reset(self, generation: int) -> None:
+            self.generation: int = generation
+
+            self.sketch: list[int] = [0] * (SKETCH_WIDTH * 4)
+            self.candidates: dict[str, int] = {}
+            # lowest candidate count once the candidates are full
+            self.floor: int = 0
+            self.ignored: set[str] = set()
+
+        def estimate(self, key_hash: int) -> int:
+            sketch = self.sketch
+
+            return _min(
+                sketch[key_hash & mask], sketch[row_1 + (key_hash >> 16 & mask)],
+                sketch[row_2 + (key_hash >> 32 & mask)], sketch[row_3 + (key_hash >> 48 & mask)]
+            )
+
+    class _TopCounter:
+
+        __slots__ = (
+            '_local', '_shards', '_generation'
+        )
+
+        def __init__(self):
+            self._local = threading.local()
+            self._shards: list[_Shard] = []
+
+            # shards from a previous generation are reset by their thread on the next count
+            self._generation: int = 0
+
+        def count(self, key: str) -> None:
+            try:
+                shard: _Shard = self._local.shard
+            except AttributeError:
+                shard = self._local.shard = _Shard(self._generation)
+
+                self._shards.append(shard)
+
+            if (shard.generation != self._generation):
+                shard.reset(self._generation)
+
+            key_hash: int = _hash(key)
+
+            sketch = shard.sketch
+            sketch[key_hash & mask] += 1
+            sketch[row_1 + (key_hash >> 16 & mask)] += 1
+            sketch[row_2 + (key_hash >> 32 & mask)] += 1
+            sketch[row_3 + (key_hash >> 48 & mask)] += 1
+
+            candidates: dict[str, int] = shard.candidates
+            if (key in candidates):
+                candidates[key] += 1
+
+                return
+
+            estimate: int = shard.estimate(key_hash)
+            if (_len(candidates) >= capacity and estimate <= shard.floor or key in shard.ignored):
+                return
+
+            if (ignore(key)):
+                if (_len(shard.ignored) >= IGNORED_MAX):
+                    shard.ignored.clear()
+
+                shard.ignored.add(key)
+
+                return
+
+            candidates[key] = estimate
+            if (_len(candidates) > capacity):
+                del candidates[_min(candidates, key=candidates.get)]
+
+                shard.floor = _min(candidates.values())
+
+        def most_common(self, count: int) -> list[tuple[str, int]]:
+            '''return the (key, estimated count) of the most counted keys across all threads.
+            '''
+            shards: list[_Shard] = [shard for shard in self._shards if shard.generation == self._generation]
+
+            keys: set[str] = set()
+            for shard in shards:
+                keys.update(list(shard.candidates))
+
+            totals: list[tuple[str, int]] = []
+            for key in keys:
+                key_hash: int = _hash(key)
+
+                totals.append((key, sum([shard.estimate(key_hash) for shard in shards])))
+
+            totals.sort(key=lambda total: total[1], reverse=True)
+
+            return totals[:count]
+
+        def clear(self) -> None:
+            self._generation += 1
+
+    if (TYPE_CHECKING):
+        return _TopCounter
+
+    return _TopCounter()
+
 def structure(obj_name: str, fields: Union[list, str]) -> Structure:
     '''named tuple like class factory for storing int values of raw byte sections with named fields.
 
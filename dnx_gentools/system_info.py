@@ -11,11 +11,9 @@ from datetime import datetime, timedelta
 from subprocess import run, CalledProcessError, DEVNULL
 
 from dnx_gentools.def_typing import *
-from dnx_gentools.def_constants import HOME_DIR, fast_time, str_join, NO_DELAY, ONE_HOUR
+from dnx_gentools.def_constants import HOME_DIR, str_join, ONE_HOUR
 from dnx_gentools.file_operations import load_configuration, load_data
 
-from dnx_iptools.cprotocol_tools import iptoi
-
 __all__ = (
     'Interface', 'System', 'Services'
 )
@@ -225,36 +223,6 @@ class System:
 #        print(backups)
         return backups
 
-    @staticmethod
-    def ips_passively_blocked(*, table: str = 'raw', block_length: int = NO_DELAY) -> list[tuple[int, int]]:
-        '''return list of currently blocked hosts in the specific iptables table.
-
-        the default table is 'raw'.
-
-        if block_length is defined, only hosts that have reached point of expiration will be returned.
-        block_length should be an integer value of the number of seconds that represent the time to expire.
-
-            blocked_hosts = System.ips_passivley_blocked(block_length=100)
-        '''
-        current_time = fast_time()
-
-        # ACCEPT all -- 8.8.8.8(src) 0.0.0.0/0(dst) /* 123456 */L
-        host_list = []
-        output = util_shell(f'sudo iptables -t {table} -nL IPS').stdout.splitlines()
-        for line in output[2:]:
-            line = line.split()
-
-            blocked_host, timestamp = iptoi(line[3]), int(line[6])
-
-            # check whether the host rule has reach point of expiration. if not, loop will continue. for NO_DELAY
-            # this condition will eval to False immediately, which marks rule for deletion.
-            if (timestamp + block_length > current_time):
-                continue
-
-            host_list.append((blocked_host, timestamp))
-
-        return host_list
-
     @staticmethod
     def nat_rules(*, nat_type: str = 'DSTNAT') -> list[tuple[int, dict]]:
         nat_rules = []
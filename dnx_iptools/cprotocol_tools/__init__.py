@@ -1,3 +1,4 @@
 #!/usr/bin/env python3
 
 from dnx_iptools.cprotocol_tools.cprotocol_tools import btoia, iptoi, itoip, calc_checksum, default_route
+from dnx_iptools.cprotocol_tools.cprotocol_tools import dns_name_end, parse_dns_name, parse_dns_question, parse_dns_record
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+
+'''parse rate benchmark of the dns question codec against the python name parser and suffix enumeration.
+
+queries are read from a pcap capture (ethernet/ipv4, udp port 53) if a path is given, otherwise they are built from the
+domain signature lists with random subdomains.
+
+    python3 -m dnx_iptools.cprotocol_tools.benchmark [pcap path] [rounds]
+'''
+
+from __future__ import annotations
+
+import os
+import sys
+import random
+
+from struct import Struct
+from time import perf_counter_ns
+
+from dnx_gentools.def_typing import *
+from dnx_gentools.def_constants import console_log
+from dnx_gentools.signature_operations import SIGNATURE_DIR
+
+from dnx_iptools.def_structs import dns_header_pack, double_short_unpack
+from dnx_iptools.protocol_tools import parse_query_name, domain_stob
+from dnx_iptools.hash_trie import HashTrie_Value
+from dnx_iptools.cprotocol_tools import parse_dns_question
+
+QUERY_COUNT: int = 200000
+ROUNDS: int = 5
+
+_pcap_header_unpack: Callable[[bytes, int], tuple] = Struct('<IHHiIII').unpack_from
+_pcap_record_unpack: Callable[[bytes, int], tuple] = Struct('<IIII').unpack_from
+_port_unpack: Callable[[bytes, int], tuple] = Struct('!2H').unpack_from
+
+def load_captured_queries(path: str) -> list[bytes]:
+    '''return the dns payload of each udp query to port 53 in the capture.
+    '''
+    with open(path, 'rb') as capture:
+        data = capture.read()
+
+    magic = _pcap_header_unpack(data, 0)[0]
+    if (magic != 0xa1b2c3d4):
+        raise ValueError('only little endian, microsecond pcap captures are supported.')
+
+    queries: list = []
+    offset = 24
+    while (offset + 16 <= len(data)):
+        cap_len = _pcap_record_unpack(data, offset)[2]
+        frame = data[offset + 16:offset + 16 + cap_len]
+        offset += 16 + cap_len
+
+        # ethernet ipv4 > udp
+        if (frame[12:14] != b'\x08\x00' or frame[23] != 17):
+            continue
+
+        udp = 14 + (frame[14] & 15) * 4
+        if (_port_unpack(frame, udp)[1] != 53):
+            continue
+
+        queries.append(frame[udp + 8:])
+
+    return queries
+
+def build_queries(query_count: int) -> list[bytes]:
+    domain_dir = f'{SIGNATURE_DIR}/domain_lists'
+
+    domains: list = []
+    for file_name in sorted(os.listdir(domain_dir)):
+
+        if (not file_name.endswith('.domains')):
+            continue
+
+        with open(f'{domain_dir}/{file_name}', 'r') as file:
+            domains.extend([x.split()[0] for x in file.read().splitlines() if x and '#' not in x])
+
+    queries: list = []
+    for i in range(query_count):
+
+        domain = random.choice(domains)
+        if (i % 2):
+            domain = f'{random.choice(["www", "api", "cdn", "mail"])}.{domain}'
+
+        queries.append(dns_header_pack(i & 65535, 256, 1, 0, 0, 0) + domain_stob(domain) + b'\x00\x01\x00\x01')
+
+    return queries
+
+def python_parse(dns_query: memoryview, domain_hash: Callable[[str], int]) -> tuple:
+    '''parse and suffix enumeration previously used by the dns proxy.
+    '''
+    offset, qname, local_domain = parse_query_name(dns_query)
+    qtype, qclass = double_short_unpack(dns_query[offset:])
+
+    rs = qname.split('.')
+
+    return offset + 4, qname, local_domain, qtype, qclass, [
+        domain_hash('.'.join(rs[i:])) for i in range(-2, -len(rs)-1, -1)
+    ]
+
+def run(pcap_path: Optional[str], rounds: int) -> None:
+    queries = load_captured_queries(pcap_path) if pcap_path else build_queries(QUERY_COUNT)
+    if (not queries):
+        console_log('no dns queries found.')
+
+        return
+
+    payloads = [memoryview(query)[12:] for query in queries]
+
+    trie = HashTrie_Value()
+    trie.set_hash_key(random.getrandbits(64), random.getrandbits(64))
+
+    domain_hash = trie.py_hash
+    hash_key = trie.hash_key
+
+    start = perf_counter_ns()
+    for _ in range(rounds):
+        python_results = [python_parse(payload, domain_hash) for payload in payloads]
+
+    python_ns = (perf_counter_ns() - start) / (len(payloads) * rounds)
+
+    start = perf_counter_ns()
+    for _ in range(rounds):
+        codec_results = [parse_dns_question(payload, hash_key) for payload in payloads]
+
+    codec_ns = (perf_counter_ns() - start) / (len(payloads) * rounds)
+
+    mismatches = sum([
+        python_result[:5] != codec_result[:5] or python_result[5] != codec_result[5].tolist()
+        for python_result, codec_result in zip(python_results, codec_results)
+    ])
+
+    console_log(f'queries={len(payloads)} source={pcap_path or "domain signatures"} rounds={rounds}')
+    console_log(f'parse_query_name     {python_ns:8.2f} ns/query  {1e3 / python_ns:8.3f} M queries/s')
+    console_log(f'parse_dns_question   {codec_ns:8.2f} ns/query  {1e3 / codec_ns:8.3f} M queries/s')
+    console_log(f'mismatches={mismatches}')
+
+
+if __name__ == '__main__':
+    run(
+        sys.argv[1] if len(sys.argv) > 1 else None,
+        int(sys.argv[2]) if len(sys.argv) > 2 else ROUNDS
+    )
@@ -1,4 +1,5 @@
-from typing import ByteString
+from array import array
+from typing import ByteString, Optional
 
 def default_route() -> int:
     '''return default route of the system.
@@ -31,3 +32,30 @@ def calc_checksum(data: ByteString) -> bytes:
     return will be a 2-byte length bytestring.
     '''
     ...
+def dns_name_end(data: ByteString, offset: int = 0) -> int:
+    '''return the offset following the dns name at offset.
+
+    data is the dns payload following the header. raises ValueError if the name is malformed or a compression pointer
+    does not point to an earlier name.
+    '''
+    ...
+def parse_dns_name(data: ByteString, offset: int = 0) -> tuple[int, str, bool]:
+    '''return the offset following the dns name at offset, the dotted name, and whether it is a single label.
+
+    data is the dns payload following the header. raises ValueError if the name is malformed.
+    '''
+    ...
+def parse_dns_question(
+        data: ByteString, hash_key: Optional[tuple[int, int]] = None) -> tuple[int, str, bool, int, int, Optional[array]]:
+    '''parse the question record at the start of data in a single pass.
+
+    returns the question length, qname, whether it is a single label, qtype, qclass, and if hash_key is set, the trie
+    keys of each name suffix from the second level domain to the fqdn as array('I').
+    '''
+    ...
+def parse_dns_record(data: ByteString, offset: int) -> tuple[int, int, int]:
+    '''return the record type, offset following the record name, and offset following the record at offset.
+
+    raises ValueError if the record is malformed or truncated.
+    '''
+    ...
@@ -1,11 +1,25 @@
 #!/usr/bin/env Cython
 
 from libc.stdio cimport snprintf
-from libc.stdint cimport uint8_t, uint32_t, uint_fast16_t
+from libc.string cimport memcpy
+from libc.stdint cimport uint8_t, uint16_t, uint32_t, uint64_t, uint_fast16_t
+
+from cpython cimport array
+import array
+
+from dnx_iptools.hash_trie.hash_trie cimport domain_key
 
 cdef uint8_t  UINT8_MAX  = 0b11111111
 cdef uint16_t UINT16_MAX = 0b1111111111111111
 
+DEF DNS_HEADER_LEN = 12
+DEF DNS_MAX_NAME   = 255
+DEF DNS_MAX_LABELS = 127
+DEF DNS_LABEL_PTR  = 0b11000000
+DEF DNS_PTR_MASK   = 0b0011111111111111
+
+cdef array.array U32_TEMPLATE = array.array('I')
+
 # TODO: make a biptoi for bytestring to integer conversion
 
 # ==============
@@ -90,3 +104,161 @@ cpdef bytes calc_checksum(const uint8_t[:] data):
     ubytes[1] = csum & UINT8_MAX
 
     return ubytes
+
+# ==============
+# DNS CODEC
+# ==============
+# names are parsed from the dns payload following the header, so compression pointers are offset by the header length.
+# a pointer must target a position before the start of the label sequence containing it. each jump moves backwards,
+# so malformed or looping pointers are rejected instead of followed.
+cdef struct DNSName:
+    uint8_t     text[DNS_MAX_NAME + 1]          # dotted name, no trailing dot
+    size_t      text_len
+    uint8_t     label_starts[DNS_MAX_LABELS]    # offset of each label in text
+    size_t      label_count
+    size_t      end                             # offset following the name in the payload
+
+cdef int parse_name(const uint8_t *data, size_t data_len, size_t offset, DNSName *name, bint with_text) nogil:
+    '''parse the name at offset into name. returns -1 if the name is malformed.
+
+    label text is only copied if with_text is set.
+    '''
+    cdef:
+        size_t      idx = offset
+        size_t      ptr_limit = offset
+        size_t      ptr
+        uint8_t     label_len
+        bint        has_ptr = False
+
+    name.text_len = 0
+    name.label_count = 0
+
+    while True:
+        if (idx >= data_len):
+            return -1
+
+        label_len = data[idx]
+
+        # root/ null terminated
+        if (label_len == 0):
+            if (not has_ptr):
+                name.end = idx + 1
+
+            return 0
+
+        # std label
+        elif (label_len < 64):
+            if (idx + 1 + label_len > data_len):
+                return -1
+
+            if (with_text):
+                if (name.label_count == DNS_MAX_LABELS or name.text_len + label_len + 1 > DNS_MAX_NAME):
+                    return -1
+
+                if (name.label_count):
+                    name.text[name.text_len] = 46  # .
+                    name.text_len += 1
+
+                name.label_starts[name.label_count] = name.text_len
+
+                memcpy(name.text + name.text_len, data + idx + 1, label_len)
+                name.text_len += label_len
+
+            name.label_count += 1
+            idx += label_len + 1
+
+        # label ptr
+        elif (label_len >= DNS_LABEL_PTR):
+            if (idx + 1 >= data_len):
+                return -1
+
+            ptr = (label_len << 8 | data[idx + 1]) & DNS_PTR_MASK
+            if (ptr < DNS_HEADER_LEN or ptr - DNS_HEADER_LEN >= ptr_limit):
+                return -1
+
+            # the name ends at the first pointer
+            if (not has_ptr):
+                name.end = idx + 2
+                has_ptr = True
+
+            idx = ptr_limit = ptr - DNS_HEADER_LEN
+
+        else:
+            return -1
+
+cpdef size_t dns_name_end(const uint8_t[::1] data, size_t offset=0) except 0:
+
+    cdef DNSName name
+
+    if (parse_name(&data[0] if data.shape[0] else NULL, data.shape[0], offset, &name, False) != 0):
+        raise ValueError('invalid name found in dns record.')
+
+    return name.end
+
+cpdef tuple parse_dns_name(const uint8_t[::1] data, size_t offset=0):
+
+    cdef DNSName name
+
+    if (parse_name(&data[0] if data.shape[0] else NULL, data.shape[0], offset, &name, True) != 0):
+        raise ValueError('invalid name found in dns record.')
+
+    return name.end, name.text[:name.text_len].decode('utf-8'), name.label_count == 1
+
+cpdef tuple parse_dns_question(const uint8_t[::1] data, tuple hash_key=None):
+
+    cdef:
+        DNSName         name
+        size_t          i, end
+        uint64_t        k0, k1
+        const uint8_t  *question = &data[0] if data.shape[0] else NULL
+
+        array.array     suffix_hashes = None
+        uint32_t       *hashes
+
+    if (parse_name(question, data.shape[0], 0, &name, True) != 0):
+        raise ValueError('invalid name found in dns question.')
+
+    end = name.end + 4
+    if (end > <size_t>data.shape[0]):
+        raise ValueError('truncated dns question.')
+
+    # tld > fqdn. the tld alone is not hashed.
+    if (hash_key is not None):
+        k0, k1 = hash_key
+
+        suffix_hashes = array.clone(U32_TEMPLATE, name.label_count - 1 if name.label_count > 1 else 0, zero=False)
+        hashes = suffix_hashes.data.as_uints
+
+        for i in range(1, name.label_count):
+            hashes[i - 1] = domain_key(
+                name.text + name.label_starts[name.label_count - 1 - i],
+                name.text_len - name.label_starts[name.label_count - 1 - i], k0, k1
+            )
+
+    return (
+        end, name.text[:name.text_len].decode('utf-8'), name.label_count == 1,
+        question[name.end] << 8 | question[name.end + 1], question[name.end + 2] << 8 | question[name.end + 3],
+        suffix_hashes
+    )
+
+cpdef tuple parse_dns_record(const uint8_t[::1] data, size_t offset):
+
+    cdef:
+        DNSName         name
+        size_t          rdata_len, end
+        const uint8_t  *record = &data[0] if data.shape[0] else NULL
+
+    if (parse_name(record, data.shape[0], offset, &name, False) != 0):
+        raise ValueError('invalid name found in dns record.')
+
+    # type, class, ttl, data length
+    if (name.end + 10 > <size_t>data.shape[0]):
+        raise ValueError('truncated dns record.')
+
+    rdata_len = record[name.end + 8] << 8 | record[name.end + 9]
+
+    end = name.end + 10 + rdata_len
+    if (end > <size_t>data.shape[0]):
+        raise ValueError('truncated dns record.')
+
+    return record[name.end] << 8 | record[name.end + 1], name.end, end
@@ -1,3 +1,3 @@
 #!/usr/bin/env python3
 
-from dnx_iptools.hash_trie.hash_trie import HashTrie_Range, HashTrie_Value
+from dnx_iptools.hash_trie.hash_trie import HashTrie_Range, HashTrie_Value, PrefixTrie_Range, KeywordTrie
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+
+'''lookup benchmarks of the signature structures.
+
+    geolocation: HashTrie_Range against PrefixTrie_Range over the full geolocation dataset. every signature file in the
+        geo_lists folder is loaded, regardless of the configured countries.
+    keyword: KeywordTrie against the per keyword substring test previously used by the dns proxy.
+    batch: HashTrie_Value per key searches against batched searches of the same keys.
+
+    python3 -m dnx_iptools.hash_trie.benchmark geolocation [host count] [rounds]
+    python3 -m dnx_iptools.hash_trie.benchmark keyword [keyword count] [query count]
+    python3 -m dnx_iptools.hash_trie.benchmark batch [signature count] [batch size] [key count]
+'''
+
+from __future__ import annotations
+
+import os
+import sys
+import random
+import string
+
+from array import array
+from itertools import chain
+from time import perf_counter_ns
+from types import SimpleNamespace
+
+from dnx_gentools.def_typing import *
+from dnx_gentools.def_constants import MSB, LSB, console_log
+from dnx_gentools.signature_operations import SIGNATURE_DIR, generate_geolocation, generate_geolocation_ranges
+
+from dnx_iptools.hash_trie.hash_trie import HashTrie_Range, HashTrie_Value, PrefixTrie_Range, KeywordTrie
+from dnx_iptools.hash_trie.hash_trie import lookup_benchmark
+
+HOST_COUNT: int = 1000000
+ROUNDS: int = 5
+
+KEYWORD_COUNT: int = 10000
+QUERY_COUNT: int = 20000
+
+SIGNATURE_COUNT: int = 500000
+BATCH_SIZE: int = 4
+KEY_COUNT: int = 1000000
+
+# ====================
+# GEOLOCATION
+# ====================
+def load_geo_signatures() -> list[str]:
+    geo_dir = f'{SIGNATURE_DIR}/geo_lists'
+
+    signatures: list = []
+    for file_name in sorted(os.listdir(geo_dir)):
+
+        if (not file_name.endswith('.geo')):
+            continue
+
+        with open(f'{geo_dir}/{file_name}', 'r') as file:
+            signatures.extend([x for x in file.read().splitlines() if x and '#' not in x])
+
+    return signatures
+
+def sample_hosts(geo_ranges: list, host_count: int) -> array:
+    '''half of the hosts are drawn from within the signature ranges and half from the full address space.
+    '''
+    hosts = array('I')
+    for _ in range(host_count // 2):
+        start, end, _ = random.choice(geo_ranges)
+
+        hosts.append(random.randint(start, end))
+        hosts.append(random.getrandbits(32))
+
+    random.shuffle(hosts)
+
+    return hosts
+
+def run_geolocation(host_count: int = HOST_COUNT, rounds: int = ROUNDS) -> None:
+    log = SimpleNamespace(warning=console_log, alert=console_log)
+
+    geo_signatures = load_geo_signatures()
+
+    geo_bins = generate_geolocation(log, geo_signatures)
+    hash_trie = HashTrie_Range()
+    hash_trie.generate_structure(geo_bins, len(geo_bins))
+
+    geo_ranges = generate_geolocation_ranges(log, geo_signatures)
+    prefix_trie = PrefixTrie_Range()
+    prefix_trie.generate_structure(geo_ranges, len(geo_ranges))
+
+    hosts = sample_hosts(geo_ranges, host_count)
+
+    hash_ns, prefix_ns, mismatches = lookup_benchmark(hash_trie, prefix_trie, hosts, MSB, LSB, rounds)
+
+    console_log(f'signatures={len(geo_signatures)} hash_bins={len(geo_bins)} prefix_ranges={len(geo_ranges)}')
+    console_log(f'lookups={len(hosts) * rounds}')
+    console_log(f'HashTrie_Range    {hash_ns:8.2f} ns/lookup')
+    console_log(f'PrefixTrie_Range  {prefix_ns:8.2f} ns/lookup')
+    console_log(f'mismatches={mismatches}')
+
+# ====================
+# KEYWORD
+# ====================
+def random_label(min_len: int, max_len: int) -> str:
+    return ''.join(random.choices(string.ascii_lowercase + string.digits, k=random.randint(min_len, max_len)))
+
+def sample_queries(keywords: list, query_count: int) -> list[str]:
+    '''1 in 10 queries contain a keyword.
+    '''
+    queries: list = []
+    for i in range(query_count):
+
+        host = random_label(3, 12)
+        if (i % 10 == 0):
+            host += random.choice(keywords)[0]
+
+        queries.append(f'{host}.{random_label(4, 10)}.com')
+
+    return queries
+
+def run_keyword(keyword_count: int = KEYWORD_COUNT, query_count: int = QUERY_COUNT) -> None:
+    keywords = [(random_label(4, 10), i % 20) for i in range(keyword_count)]
+    queries = sample_queries(keywords, query_count)
+
+    start = perf_counter_ns()
+    keyword_trie = KeywordTrie()
+    keyword_trie.generate_structure(keywords, len(keywords))
+    build_ms = (perf_counter_ns() - start) / 1e6
+
+    trie_search = keyword_trie.py_search
+
+    start = perf_counter_ns()
+    trie_results = [trie_search(query) for query in queries]
+    trie_ns = (perf_counter_ns() - start) / len(queries)
+
+    start = perf_counter_ns()
+    list_results = []
+    for query in queries:
+        keyword_match = [(kwd, cat) for kwd, cat in keywords if kwd in query]
+        list_results.append(keyword_match[0][1] if keyword_match else None)
+
+    list_ns = (perf_counter_ns() - start) / len(queries)
+
+    mismatches = sum([trie_result != list_result for trie_result, list_result in zip(trie_results, list_results)])
+
+    console_log(f'keywords={keyword_count} queries={query_count} build={build_ms:.2f} ms')
+    console_log(f'substring list  {list_ns:12.2f} ns/query')
+    console_log(f'KeywordTrie     {trie_ns:12.2f} ns/query')
+    console_log(f'mismatches={mismatches}')
+
+# ====================
+# BATCH
+# ====================
+def run_batch(signature_count: int = SIGNATURE_COUNT, batch_size: int = BATCH_SIZE, key_count: int = KEY_COUNT) -> None:
+    '''the default batch size matches the label suffixes of a typical query name.
+    '''
+    signatures = {random.getrandbits(32): random.randint(1, 255) for _ in range(signature_count)}
+    signature_keys = list(signatures)
+
+    value_trie = HashTrie_Value()
+    value_trie.generate_structure([[key, value] for key, value in signatures.items()], len(signatures))
+
+    # half of the keys are signatures
+    keys = array('I', [
+        random.choice(signature_keys) if i % 2 else random.getrandbits(32) for i in range(key_count)
+    ])
+    batches = [keys[i:i + batch_size] for i in range(0, key_count, batch_size)]
+
+    search = value_trie.py_search
+    search_batch = value_trie.py_search_batch
+
+    start = perf_counter_ns()
+    key_results = [search(key) for batch in batches for key in batch]
+    key_ns = (perf_counter_ns() - start) / key_count
+
+    start = perf_counter_ns()
+    batch_results = [search_batch(batch) for batch in batches]
+    batch_ns = (perf_counter_ns() - start) / key_count
+
+    mismatches = sum([
+        key_result != batch_result for key_result, batch_result in zip(key_results, chain(*batch_results))
+    ])
+
+    console_log(f'signatures={len(signatures)} keys={key_count} batch_size={batch_size}')
+    console_log(f'py_search        {key_ns:8.2f} ns/key  {1e3 / key_ns:8.2f} M keys/s')
+    console_log(f'py_search_batch  {batch_ns:8.2f} ns/key  {1e3 / batch_ns:8.2f} M keys/s')
+    console_log(f'mismatches={mismatches}')
+
+
+BENCHMARKS: dict[str, Callable[..., None]] = {
+    'geolocation': run_geolocation,
+    'keyword': run_keyword,
+    'batch': run_batch
+}
+
+if __name__ == '__main__':
+    if (len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS):
+        console_log(f'usage: benchmark {{{"|".join(BENCHMARKS)}}} [args]')
+
+        sys.exit(1)
+
+    BENCHMARKS[sys.argv[1]](*[int(arg) for arg in sys.argv[2:]])
@@ -1,18 +1,54 @@
 #!/usr/bin/env Cython
 
-from libc.stdint cimport uint8_t, uint16_t, uint32_t
+from libc.stdint cimport uint8_t, uint16_t, uint32_t, uint64_t
 
 
-cdef struct TrieMap_R:
-    size_t      len
-    TrieRange  *ranges
+# ================================================
+# PRECOMPILED IMAGE
+# ================================================
+# [header][bucket offsets (max_width + 1)][entries (entry_count)]
+# the image is in host byte order. entries start on an 8 byte boundary.
+cdef struct TrieImageHeader:
+    char        magic[8]
+    uint16_t    version
+    uint16_t    trie_type
+    uint32_t    entry_size
+    uint64_t    hash_k0
+    uint64_t    hash_k1
+    uint64_t    source_id       # fingerprint of the signature sources the image was compiled from
+    uint32_t    max_width
+    uint32_t    entry_count
+    uint64_t    buckets_offset
+    uint64_t    entries_offset
+
+# backing memory of a trie. map_len is 0 if the structure was generated in process.
+cdef struct TrieImage:
+    void       *map_base
+    size_t      map_len
 
+cdef uint64_t keyed_hash(const uint8_t *data, size_t data_len, uint64_t k0, uint64_t k1) noexcept nogil
+# 32-bit trie key of a domain name, folded from the keyed hash
+cdef uint32_t domain_key(const uint8_t *data, size_t data_len, uint64_t k0, uint64_t k1) noexcept nogil
+
+
+# the entries of bucket n are entries[buckets[n]:buckets[n+1]]
 cdef struct TrieRange:
     uint32_t    key
     uint32_t    netid
     uint32_t    bcast
     uint8_t     country
 
+# a complete structure. lookups use the structure that was active when they started, so a replacement can be swapped
+# in under live lookups. readers is only modified while holding the GIL.
+cdef struct TrieMap_R:
+    uint32_t   *buckets
+    TrieRange  *ranges
+    uint32_t    max_width
+    uint32_t    entry_count
+    uint64_t    source_id
+    TrieImage   image
+    size_t      readers
+
 # cdef public class HashTrie_Range [object HashTrie_Range, type HashTrie_Range_T]
 #
 # ctypedef public uint8_t (*htr_search_t)(HashTrie_Range, uint32_t, uint32_t)
@@ -20,28 +56,76 @@ cdef struct TrieRange:
 cdef class HashTrie_Range:  # [object HashTrie_Range, type HashTrie_Range_T]:
     cdef:
         TrieMap_R      *TRIE_MAP
-        uint32_t        max_width
         # htr_search_t    lookup # will be set as search method ptr
 
     cdef  uint8_t search(s, uint32_t trie_key, uint32_t host_id) nogil
-    cdef  uint32_t hash_key(s, uint32_t trie_key) nogil
     cpdef void generate_structure(s, list py_trie, size_t py_trie_len)
+    cdef  void swap_structure(s, TrieMap_R *trie_map)
 
 
-cdef struct TrieMap_V:
-    size_t      len
-    TrieValue  *values
-
 cdef struct TrieValue:
     uint32_t    key
     uint32_t    value
 
+cdef struct TrieMap_V:
+    uint32_t   *buckets
+    TrieValue  *values
+    uint32_t    max_width
+    uint32_t    entry_count
+    uint64_t    hash_k0
+    uint64_t    hash_k1
+    uint64_t    source_id
+    TrieImage   image
+    size_t      readers
+
 
 cdef class HashTrie_Value:  # [object HashTrie_Value, type HashTrie_Value_T]:
     cdef:
         TrieMap_V  *TRIE_MAP
-        uint32_t    max_width
+        uint64_t    hash_k0
+        uint64_t    hash_k1
 
     cdef  public uint32_t search(s, uint32_t trie_key) nogil
-    cdef  uint32_t hash_key(s, uint32_t trie_key) nogil
     cpdef void generate_structure(s, list py_trie, size_t py_trie_len)
+    cdef  void swap_structure(s, TrieMap_V *trie_map)
+
+
+# leaf pushed multibit trie with 16-8-8 strides. the root resolves the first 16 bits and each chunk the next 8. an entry
+# is either a value or PREFIX_NODE | chunk index, and identical chunks are stored once.
+# [header][root (65536)][chunks (chunk_count * 256)]
+cdef struct TrieMap_P:
+    uint32_t   *root
+    uint32_t   *chunks
+    uint32_t    chunk_count
+    uint64_t    source_id
+    TrieImage   image
+    size_t      readers
+
+cdef class PrefixTrie_Range:
+    cdef:
+        TrieMap_P  *TRIE_MAP
+
+    cdef  uint32_t search(s, uint32_t host) nogil
+    cpdef void generate_structure(s, list py_ranges, size_t py_ranges_len)
+    cdef  void swap_structure(s, TrieMap_P *trie_map)
+
+
+# aho-corasick automaton as a dense dfa. bytes are reduced to the classes present in the keywords (0 for all others),
+# so each state has class_count transitions. outputs[state] is the list index + 1 of the first keyword ending at
+# the state or any of its suffix states, or 0.
+cdef struct TrieMap_K:
+    uint32_t   *transitions
+    uint32_t   *outputs
+    uint8_t     classes[256]
+    uint32_t    class_count
+    uint32_t    state_count
+    size_t      readers
+
+cdef class KeywordTrie:
+    cdef:
+        TrieMap_K  *TRIE_MAP
+        list        VALUES
+
+    cdef  uint32_t search(s, const uint8_t *data, size_t data_len) nogil
+    cpdef void generate_structure(s, list py_keywords, size_t py_keywords_len)
+    cdef  void swap_structure(s, TrieMap_K *trie_map, list values)
@@ -1,3 +1,6 @@
+from array import array
+from typing import Optional, Any
+
 class HashTrie_Range:
     def py_search(self, host: tuple[int, int]) -> int:
         '''C function wrapper to search the trie using a calculated hash.
@@ -5,11 +8,36 @@ class HashTrie_Range:
         releases GIL prior to the call to search.
         '''
         ...
+    def py_search_batch(self, trie_keys: array, host_ids: array) -> array:
+        '''search the trie for each (trie_key, host_id) pair of the array('I') buffers and return the results as
+        array('B').
+
+        the GIL is released once for the whole batch.
+        '''
+        ...
+    @property
+    def source_id(self) -> int:
+        '''fingerprint of the signature sources of the active image. 0 if the structure was generated in process.
+        '''
+        ...
     def generate_structure(self, py_trie: list, py_trie_len: int) -> None: ...
+    def load_image(self, path: str) -> None:
+        '''map a precompiled image as the trie structure, replacing the active structure.
+
+        raises OSError if the image cannot be mapped or ValueError if it is not a valid range image. the active
+        structure is not changed on error.
+        '''
+        ...
+    def write_image(self, path: str, source_id: int) -> None: ...
+    @staticmethod
+    def image_info(path: str) -> Optional[tuple[int, int, int]]:
+        '''return the (source_id, hash_k0, hash_k1) of a valid range image at path or None.
+        '''
+        ...
     def search(self, trie_key: int, host_id: int) -> int:
         '''Search the trie using a calculated hash.
 
-        C function and not accessible from python.
+        C function and not accessible from python. the caller must hold the GIL.
         '''
         ...
 
@@ -20,10 +48,113 @@ class HashTrie_Value:
         releases GIL prior to the call to search.
         '''
         ...
+    def py_search_batch(self, trie_keys: array) -> array:
+        '''search the trie for each key of the array('I') buffer and return the results as array('I').
+
+        the GIL is released once for the whole batch.
+        '''
+        ...
+    def py_hash(self, key: str) -> int:
+        '''return the 32-bit trie key of a string using the keyed hash of the trie.
+        '''
+        ...
+    def set_hash_key(self, k0: int, k1: int) -> None: ...
+    @property
+    def hash_key(self) -> tuple[int, int]:
+        '''the (k0, k1) key used by py_hash.
+        '''
+        ...
+    @property
+    def source_id(self) -> int:
+        '''fingerprint of the signature sources of the active image. 0 if the structure was generated in process.
+        '''
+        ...
     def generate_structure(self, py_trie: list, py_trie_len: int) -> None: ...
+    def load_image(self, path: str) -> None:
+        '''map a precompiled image as the trie structure, replacing the active structure and hash key.
+
+        raises OSError if the image cannot be mapped or ValueError if it is not a valid value image. the active
+        structure is not changed on error.
+        '''
+        ...
+    def write_image(self, path: str, source_id: int) -> None: ...
+    @staticmethod
+    def image_info(path: str) -> Optional[tuple[int, int, int]]:
+        '''return the (source_id, hash_k0, hash_k1) of a valid value image at path or None.
+        '''
+        ...
     def search(self, trie_key: int) -> int:
         '''Search the trie using a calculated hash.
 
-        C function and not accessible from python.
+        C function and not accessible from python. the caller must hold the GIL.
         '''
         ...
+
+class PrefixTrie_Range:
+    def py_search(self, host: int) -> int:
+        '''C function wrapper to search the trie for the most specific range containing host.
+
+        releases GIL prior to the call to search.
+        '''
+        ...
+    def py_search_batch(self, hosts: array) -> array:
+        '''search the trie for each host of the array('I') buffer and return the results as array('I').
+
+        the GIL is released once for the whole batch.
+        '''
+        ...
+    @property
+    def source_id(self) -> int:
+        '''fingerprint of the signature sources of the active image. 0 if the structure was generated in process.
+        '''
+        ...
+    def generate_structure(self, py_ranges: list[tuple[int, int, int]], py_ranges_len: int) -> None:
+        '''py_ranges is a sorted list of non overlapping (start, end, value) ranges with inclusive ends.
+        '''
+        ...
+    def load_image(self, path: str) -> None:
+        '''map a precompiled image as the trie structure, replacing the active structure.
+
+        raises OSError if the image cannot be mapped or ValueError if it is not a valid prefix image. the active
+        structure is not changed on error.
+        '''
+        ...
+    def write_image(self, path: str, source_id: int) -> None: ...
+    @staticmethod
+    def image_info(path: str) -> Optional[tuple[int, int, int]]:
+        '''return the (source_id, hash_k0, hash_k1) of a valid prefix image at path or None.
+        '''
+        ...
+    def search(self, host: int) -> int:
+        '''Search the trie for the most specific range containing host.
+
+        C function and not accessible from python. the caller must hold the GIL.
+        '''
+        ...
+
+class KeywordTrie:
+    def py_search(self, text: str) -> Any:
+        '''C function wrapper to search text for the keywords in the trie.
+
+        returns the value of the first keyword in list order contained in text or None. releases GIL prior to the call
+        to search.
+        '''
+        ...
+    def generate_structure(self, py_keywords: list[tuple[str, Any]], py_keywords_len: int) -> None:
+        '''py_keywords is a list of (keyword, value) pairs. keywords are matched case-sensitively.
+        '''
+        ...
+    def search(self, data: bytes, data_len: int) -> int:
+        '''Search the trie for the first keyword contained in data.
+
+        C function and not accessible from python. the caller must hold the GIL.
+        '''
+        ...
+
+def lookup_benchmark(
+        hash_trie: HashTrie_Range, prefix_trie: PrefixTrie_Range, hosts: memoryview, msb: int, lsb: int, rounds: int = 1
+) -> tuple[float, float, int]:
+    '''search every host in each structure and return the ns per lookup of each and the number of hosts where the
+    results differ.
+    '''
+    ...
@@ -1,18 +1,431 @@
 #!/usr/bin/env Cython
 
-from libc.stdlib cimport malloc, calloc, realloc
-from libc.stdint cimport uint8_t, uint16_t, uint32_t
+from libc.stdlib cimport malloc, calloc, realloc, free
+from libc.string cimport memcpy, memcmp, memset, strerror
+from libc.errno cimport errno
+from libc.stdint cimport uint8_t, uint16_t, uint32_t, uint64_t
+
+from posix.fcntl cimport open as c_open, O_RDONLY
+from posix.unistd cimport close, usleep
+from posix.stat cimport struct_stat, fstat
+from posix.mman cimport mmap, munmap, PROT_READ, MAP_SHARED, MAP_FAILED
+from posix.time cimport clock_gettime, timespec, CLOCK_MONOTONIC
+
+from cpython cimport array
+import array
 
 DEF EMPTY_CONTAINER = 0
 DEF NO_MATCH = 0
 
 DEF HTR_MAX_WIDTH_MULTIPLIER = 2
 
+# microseconds between checks for remaining readers of a replaced structure
+DEF SWAP_WAIT = 100
+
+# precompiled image format. the version must be incremented on any change to the header or entry layout.
+DEF IMAGE_VERSION = 1
+DEF IMAGE_VALUE  = 1
+DEF IMAGE_RANGE  = 2
+DEF IMAGE_PREFIX = 3
+
+# prefix trie strides are 16-8-8. an entry with PREFIX_NODE set holds the index of the chunk resolving the next 8 bits.
+# an enum so the masks are C constants in the nogil lookup, DEF values past the int range are not.
+cdef enum:
+    PREFIX_NODE  = 0x80000000
+    PREFIX_INDEX = 0x7fffffff
+
+DEF PREFIX_ROOT_LEN  = 65536
+DEF PREFIX_CHUNK_LEN = 256
+
+cdef const char *IMAGE_MAGIC = b'DNXTRIE'  # 8 bytes with the terminator
+
+# result buffer templates for batch searches
+cdef array.array U8_TEMPLATE  = array.array('B')
+cdef array.array U32_TEMPLATE = array.array('I')
+
+# ================================================
+# STABLE KEYED HASH
+# ================================================
+# SipHash-2-4. unlike the builtin hash, the result only depends on the data and key so string keys hashed by the
+# signature compiler match the keys hashed by the proxies in any process.
+cdef inline uint64_t rotl(uint64_t x, int b) nogil:
+    return (x << b) | (x >> (64 - b))
+
+cdef inline void sip_round(uint64_t *v) noexcept nogil:
+    v[0] += v[1]
+    v[1] = rotl(v[1], 13)
+    v[1] ^= v[0]
+    v[0] = rotl(v[0], 32)
+    v[2] += v[3]
+    v[3] = rotl(v[3], 16)
+    v[3] ^= v[2]
+    v[0] += v[3]
+    v[3] = rotl(v[3], 21)
+    v[3] ^= v[0]
+    v[2] += v[1]
+    v[1] = rotl(v[1], 17)
+    v[1] ^= v[2]
+    v[2] = rotl(v[2], 32)
+
+cdef uint64_t keyed_hash(const uint8_t *data, size_t data_len, uint64_t k0, uint64_t k1) noexcept nogil:
+    cdef:
+        uint64_t    v[4]
+        uint64_t    m
+        size_t      i, xi
+        size_t      tail = data_len & ~(<size_t>7)
+
+    # SipHash initialization constants. ULL suffixed so they stay C literals in the nogil hash.
+    v[0] = k0 ^ 0x736f6d6570736575ULL
+    v[1] = k1 ^ 0x646f72616e646f6dULL
+    v[2] = k0 ^ 0x6c7967656e657261ULL
+    v[3] = k1 ^ 0x7465646279746573ULL
+
+    for i in range(0, tail, 8):
+        m = 0
+        for xi in range(8):
+            m |= <uint64_t>data[i + xi] << (8 * xi)
+
+        v[3] ^= m
+        sip_round(v)
+        sip_round(v)
+        v[0] ^= m
+
+    # remaining bytes are packed with the length in the top byte
+    m = <uint64_t>data_len << 56
+    for xi in range(data_len - tail):
+        m |= <uint64_t>data[tail + xi] << (8 * xi)
+
+    v[3] ^= m
+    sip_round(v)
+    sip_round(v)
+    v[0] ^= m
+
+    v[2] ^= 0xff
+    sip_round(v)
+    sip_round(v)
+    sip_round(v)
+    sip_round(v)
+
+    return v[0] ^ v[1] ^ v[2] ^ v[3]
+
+cdef uint32_t domain_key(const uint8_t *data, size_t data_len, uint64_t k0, uint64_t k1) noexcept nogil:
+    cdef uint64_t hash_val = keyed_hash(data, data_len, k0, k1)
+
+    return <uint32_t>(hash_val ^ (hash_val >> 32))
+
+# ================================================
+# PRECOMPILED IMAGE
+# ================================================
+cdef bint image_valid(void *base, size_t size, uint16_t trie_type, uint32_t entry_size) nogil:
+    cdef:
+        TrieImageHeader    *header = <TrieImageHeader*>base
+        uint32_t           *buckets
+        uint32_t           *entries
+        size_t              i
+
+    if (memcmp(header.magic, IMAGE_MAGIC, 8) != 0):
+        return False
+
+    if (header.version != IMAGE_VERSION or header.trie_type != trie_type or header.entry_size != entry_size):
+        return False
+
+    if (header.buckets_offset != sizeof(TrieImageHeader) or header.entries_offset % 8):
+        return False
+
+    if (header.entries_offset + <uint64_t>header.entry_count * entry_size > size):
+        return False
+
+    # searches trust the bucket offsets and node indexes so they are checked once here instead of on every lookup
+    if (trie_type == IMAGE_PREFIX):
+        if (header.max_width >= PREFIX_NODE):
+            return False
+
+        if (header.entry_count != PREFIX_ROOT_LEN + <uint64_t>header.max_width * PREFIX_CHUNK_LEN):
+            return False
+
+        entries = <uint32_t*>(<char*>base + header.entries_offset)
+        for i in range(header.entry_count):
+            if (entries[i] & PREFIX_NODE and entries[i] & PREFIX_INDEX >= header.max_width):
+                return False
+
+        return True
+
+    if (header.max_width == 0):
+        return False
+
+    if (header.buckets_offset + (<uint64_t>header.max_width + 1) * sizeof(uint32_t) > header.entries_offset):
+        return False
+
+    buckets = <uint32_t*>(<char*>base + header.buckets_offset)
+    if (buckets[0] != 0 or buckets[header.max_width] != header.entry_count):
+        return False
+
+    for i in range(header.max_width):
+        if (buckets[i] > buckets[i + 1]):
+            return False
+
+    return True
+
+cdef int map_image(str path, uint16_t trie_type, uint32_t entry_size, TrieImage *image) except -1:
+    '''maps the image at path read-only and validates its layout.
+
+    the mapping is shared and backed by the file, so every process loading the same image uses the same pages.
+    '''
+    cdef:
+        bytes           fpath = path.encode('utf-8')
+        int             fd
+        struct_stat     st
+        void           *base
+
+    fd = c_open(fpath, O_RDONLY)
+    if (fd < 0):
+        raise OSError(errno, strerror(errno).decode(), path)
+
+    if (fstat(fd, &st) < 0):
+        close(fd)
+        raise OSError(errno, strerror(errno).decode(), path)
+
+    if (<size_t>st.st_size < sizeof(TrieImageHeader)):
+        close(fd)
+        raise ValueError(f'invalid trie image {path}')
+
+    base = mmap(NULL, st.st_size, PROT_READ, MAP_SHARED, fd, 0)
+    close(fd)
+
+    if (base == MAP_FAILED):
+        raise OSError(errno, strerror(errno).decode(), path)
+
+    if not image_valid(base, st.st_size, trie_type, entry_size):
+        munmap(base, st.st_size)
+        raise ValueError(f'invalid trie image {path}')
+
+    image.map_base = base
+    image.map_len  = st.st_size
+
+    return 0
+
+cdef object read_image_info(str path, uint16_t trie_type, uint32_t entry_size):
+    cdef:
+        TrieImage           image
+        TrieImageHeader    *header
+
+    try:
+        map_image(path, trie_type, entry_size, &image)
+    except (OSError, ValueError):
+        return None
+
+    header = <TrieImageHeader*>image.map_base
+    info = (header.source_id, header.hash_k0, header.hash_k1)
+
+    munmap(image.map_base, image.map_len)
+
+    return info
+
+cdef bytes image_bytes(
+        uint16_t trie_type, uint32_t entry_size, uint64_t k0, uint64_t k1, uint64_t source_id, uint32_t max_width,
+        void *buckets, size_t buckets_len, void *entries, uint32_t entry_count):
+
+    cdef TrieImageHeader header
+
+    memset(&header, 0, sizeof(TrieImageHeader))
+    memcpy(header.magic, IMAGE_MAGIC, 8)
+
+    header.version     = IMAGE_VERSION
+    header.trie_type   = trie_type
+    header.entry_size  = entry_size
+    header.hash_k0     = k0
+    header.hash_k1     = k1
+    header.source_id   = source_id
+    header.max_width   = max_width
+    header.entry_count = entry_count
+
+    header.buckets_offset = sizeof(TrieImageHeader)
+    header.entries_offset = (header.buckets_offset + buckets_len + 7) & ~(<uint64_t>7)
+
+    return b''.join([
+        (<char*>&header)[:sizeof(TrieImageHeader)],
+        (<char*>buckets)[:buckets_len] if buckets_len else b'',
+        bytes(header.entries_offset - header.buckets_offset - buckets_len),
+        (<char*>entries)[:<size_t>entry_count * entry_size]
+    ])
+
+# ================================================
+# TRIE STRUCTURES
+# ================================================
+# buckets are stored as offsets into a single entry array. this allows the structure to be generated with 2 passes
+# and no per bucket allocations, and to be used directly from a mapped image.
+cdef inline uint32_t bucket_index(uint32_t max_width, uint32_t trie_key) nogil:
+    return trie_key % max_width
+
+cdef uint8_t range_search(TrieMap_R *trie_map, uint32_t trie_key, uint32_t host_id) nogil:
+
+    cdef:
+        uint32_t    i
+        uint32_t    trie_key_hash
+
+    # not initialized
+    if (trie_map.max_width == EMPTY_CONTAINER):
+        return NO_MATCH
+
+    trie_key_hash = bucket_index(trie_map.max_width, trie_key)
+
+    for i in range(trie_map.buckets[trie_key_hash], trie_map.buckets[trie_key_hash + 1]):
+
+        # this is needed because collisions are possible by design.
+        # matching the original key will guarantee the correct range is being evaluated.
+        if (trie_map.ranges[i].key != trie_key):
+            continue
+
+        if (trie_map.ranges[i].netid <= host_id <= trie_map.ranges[i].bcast):
+            return trie_map.ranges[i].country
+
+    # iteration completed with no l2 match
+    return NO_MATCH
+
+cdef uint32_t value_search(TrieMap_V *trie_map, uint32_t trie_key) nogil:
+
+    cdef:
+        uint32_t    i
+        uint32_t    trie_key_hash
+
+    # not initialized
+    if (trie_map.max_width == EMPTY_CONTAINER):
+        return NO_MATCH
+
+    trie_key_hash = bucket_index(trie_map.max_width, trie_key)
+
+    for i in range(trie_map.buckets[trie_key_hash], trie_map.buckets[trie_key_hash + 1]):
+
+        # this is needed because collisions are possible by design.
+        # matching the original key will guarantee the correct value is returned.
+        if (trie_map.values[i].key == trie_key):
+
+            return trie_map.values[i].value
+
+    # iteration completed with no l2 match
+    return NO_MATCH
+
+# mapped structures are unmapped and generated structures are freed. the map itself is always freed.
+cdef void range_free(TrieMap_R *trie_map) noexcept nogil:
+    if (trie_map.image.map_len):
+        munmap(trie_map.image.map_base, trie_map.image.map_len)
+    else:
+        free(trie_map.buckets)
+        free(trie_map.ranges)
+
+    free(trie_map)
+
+cdef void value_free(TrieMap_V *trie_map) noexcept nogil:
+    if (trie_map.image.map_len):
+        munmap(trie_map.image.map_base, trie_map.image.map_len)
+    else:
+        free(trie_map.buckets)
+        free(trie_map.values)
+
+    free(trie_map)
+
+# lookups are at most 3 dependent reads regardless of how many ranges are loaded.
+cdef uint32_t prefix_search(TrieMap_P *trie_map, uint32_t host) nogil:
+
+    cdef uint32_t entry
+
+    # not initialized
+    if (trie_map.root == NULL):
+        return NO_MATCH
+
+    entry = trie_map.root[host >> 16]
+    if (entry & PREFIX_NODE):
+
+        entry = trie_map.chunks[(entry & PREFIX_INDEX) * PREFIX_CHUNK_LEN + (host >> 8 & 255)]
+        if (entry & PREFIX_NODE):
+
+            entry = trie_map.chunks[(entry & PREFIX_INDEX) * PREFIX_CHUNK_LEN + (host & 255)]
+
+    return entry
+
+cdef void prefix_free(TrieMap_P *trie_map) noexcept nogil:
+    if (trie_map.image.map_len):
+        munmap(trie_map.image.map_base, trie_map.image.map_len)
+    else:
+        free(trie_map.root)
+
+    free(trie_map)
+
+# ranges are sorted and non overlapping. blocks are visited in ascending order, so the cursor only moves forward and
+# each range is passed once per level it is split at.
+cdef struct PrefixBuild:
+    uint32_t   *starts
+    uint32_t   *ends
+    uint32_t   *values
+    size_t      len
+    size_t      cursor
+    uint32_t   *chunks
+    uint32_t    chunk_count
+    uint32_t    chunk_cap
+
+cdef uint32_t prefix_block(PrefixBuild *pb, uint64_t base, int bits, dict chunk_ids) except? PREFIX_INDEX:
+    cdef:
+        uint64_t    last = base + (<uint64_t>1 << bits) - 1
+        size_t      c
+        uint32_t    chunk[PREFIX_CHUNK_LEN]
+        uint32_t   *chunks
+        bytes       chunk_key
+        size_t      i
+
+    while (pb.cursor < pb.len and pb.ends[pb.cursor] < base):
+        pb.cursor += 1
+
+    c = pb.cursor
+
+    # no range intersects the block
+    if (c == pb.len or pb.starts[c] > last):
+        return NO_MATCH
+
+    # a single range covers the block
+    if (pb.starts[c] <= base and pb.ends[c] >= last):
+        return pb.values[c]
+
+    for i in range(PREFIX_CHUNK_LEN):
+        chunk[i] = prefix_block(pb, base + (i << (bits - 8)), bits - 8, chunk_ids)
+
+    chunk_key = (<char*>chunk)[:sizeof(chunk)]
+
+    chunk_id = chunk_ids.get(chunk_key)
+    if (chunk_id is not None):
+        return PREFIX_NODE | <uint32_t>chunk_id
+
+    if (pb.chunk_count == pb.chunk_cap):
+        chunks = <uint32_t*>realloc(pb.chunks, <size_t>pb.chunk_cap * 2 * sizeof(chunk))
+        if (chunks == NULL):
+            raise MemoryError
+
+        pb.chunks = chunks
+        pb.chunk_cap *= 2
+
+    memcpy(pb.chunks + <size_t>pb.chunk_count * PREFIX_CHUNK_LEN, chunk, sizeof(chunk))
+
+    chunk_ids[chunk_key] = pb.chunk_count
+    pb.chunk_count += 1
+
+    return PREFIX_NODE | (pb.chunk_count - 1)
+
 # ================================================
 # C EXTENSIONS - converted from python tuples
 # ================================================
+# the active structure is replaced by generate_structure or load_image without blocking lookups. py_search holds a
+# reader reference on the structure it started with, and the previous structure is freed once the last of those
+# returns.
 cdef class HashTrie_Range:
 
+    def __cinit__(s):
+        s.TRIE_MAP = <TrieMap_R*>calloc(1, sizeof(TrieMap_R))
+        if (s.TRIE_MAP == NULL):
+            raise MemoryError
+
+    def __dealloc__(s):
+        if (s.TRIE_MAP != NULL):
+            range_free(s.TRIE_MAP)
+
     def py_search(s, tuple host):
         cdef:
             uint8_t search_result
@@ -20,37 +433,58 @@ cdef class HashTrie_Range:
             uint32_t trie_key = <uint32_t>host[0]
             uint32_t host_id  = <uint32_t>host[1]
 
+            TrieMap_R  *trie_map = s.TRIE_MAP
+
+        trie_map.readers += 1
+
         with nogil:
-            search_result = s.search(trie_key, host_id)
+            search_result = range_search(trie_map, trie_key, host_id)
+
+        trie_map.readers -= 1
 
         return search_result
 
-    cdef uint8_t search(s, uint32_t trie_key, uint32_t host_id) nogil:
+    def py_search_batch(s, const uint32_t[::1] trie_keys, const uint32_t[::1] host_ids):
+        '''search the trie for each (trie_key, host_id) pair and return the results as array('B').
 
+        the GIL is released once for the whole batch.
+        '''
         cdef:
-            size_t      i
+            size_t          i
+            size_t          key_count = trie_keys.shape[0]
+            array.array     search_results
+            uint8_t        *results
 
-            TrieMap_R  *trie_value = &s.TRIE_MAP[s.hash_key(trie_key)]
+            TrieMap_R      *trie_map = s.TRIE_MAP
 
-        # no l1 match
-        if (trie_value.len == EMPTY_CONTAINER):
-            return NO_MATCH
+        if (host_ids.shape[0] != key_count):
+            raise ValueError('trie_keys and host_ids must be the same length.')
 
-        for i in range(trie_value.len):
+        search_results = array.clone(U8_TEMPLATE, key_count, zero=False)
+        results = search_results.data.as_uchars
 
-            # this is needed because collisions are possible by design.
-            # matching the original key will guarantee the correct range is being evaluated.
-            if (trie_value.ranges[i].key != trie_key):
-                continue
+        trie_map.readers += 1
 
-            if (trie_value.ranges[i].netid <= host_id <= trie_value.ranges[i].bcast):
-                return trie_value.ranges[i].country
+        with nogil:
+            for i in range(key_count):
+                results[i] = range_search(trie_map, trie_keys[i], host_ids[i])
 
-        # iteration completed with no l2 match
-        return NO_MATCH
+        trie_map.readers -= 1
+
+        return search_results
+
+    cdef uint8_t search(s, uint32_t trie_key, uint32_t host_id) nogil:
+        '''search the active structure.
 
-    cdef inline uint32_t hash_key(s, uint32_t trie_key) nogil:
-        return trie_key % (s.max_width - 1)
+        the caller must hold the GIL since a concurrent swap could free the structure.
+        '''
+        return range_search(s.TRIE_MAP, trie_key, host_id)
+
+    @property
+    def source_id(s):
+        '''fingerprint of the signature sources of the active image. 0 if the structure was generated in process.
+        '''
+        return s.TRIE_MAP.source_id
 
     cpdef void generate_structure(s, list py_trie, size_t py_trie_len):
 
@@ -60,122 +494,819 @@ cdef class HashTrie_Range:
         cdef:
             size_t      i, xi
 
-            TrieMap_R  *trie_map_container
+            TrieMap_R  *trie_map
             TrieRange  *trie_multival
 
             uint32_t    trie_key
             uint32_t    trie_key_hash
             list        trie_vals
             size_t      num_values
+            uint32_t   *cursors
+
+        trie_map = <TrieMap_R*>calloc(1, sizeof(TrieMap_R))
+        if (trie_map == NULL):
+            raise MemoryError
 
         # TODO: test the multiplier for max_width (current is 2, try 1.3)
-        s.max_width = <uint32_t>py_trie_len * HTR_MAX_WIDTH_MULTIPLIER
-        s.TRIE_MAP  = <TrieMap_R*>calloc(s.max_width, sizeof(TrieMap_R))
+        trie_map.max_width = <uint32_t>py_trie_len * HTR_MAX_WIDTH_MULTIPLIER
+        if (trie_map.max_width == 0):
+            trie_map.max_width = 1
+
+        trie_map.buckets = <uint32_t*>calloc(trie_map.max_width + 1, sizeof(uint32_t))
+        if (trie_map.buckets == NULL):
+            range_free(trie_map)
+            raise MemoryError
 
+        # 1. counting the entries of each bucket
         for i in range(py_trie_len):
+            num_values = <size_t>len(py_trie[i][1])
+
+            trie_map.buckets[bucket_index(trie_map.max_width, <uint32_t>py_trie[i][0]) + 1] += num_values
+            trie_map.entry_count += num_values
+
+        # 2. converting the counts to bucket start offsets
+        for i in range(1, trie_map.max_width + 1):
+            trie_map.buckets[i] += trie_map.buckets[i - 1]
 
-            trie_key   = <uint32_t>py_trie[i][0]
-            trie_vals  = py_trie[i][1]
-            num_values = <size_t>len(trie_vals)
+        # calloc so the padding bytes are deterministic when written to an image
+        trie_map.ranges = <TrieRange*>calloc(trie_map.entry_count + 1, sizeof(TrieRange))
+        cursors = <uint32_t*>malloc(trie_map.max_width * sizeof(uint32_t))
+        if (trie_map.ranges == NULL or cursors == NULL):
+            free(cursors)
+            range_free(trie_map)
+            raise MemoryError
 
-            trie_key_hash = s.hash_key(trie_key)
-            trie_map_container = &s.TRIE_MAP[trie_key_hash] ### FIXME: WTF IS THIS>>>???
+        memcpy(cursors, trie_map.buckets, trie_map.max_width * sizeof(uint32_t))
 
-            # first time on index so allocating memory for the number of current multi-vals this iteration
-            if (trie_map_container.len == 0):
-                trie_map_container.ranges = <TrieRange*>malloc(sizeof(TrieRange) * num_values)
+        # 3. placing the ranges within their bucket
+        for i in range(py_trie_len):
+
+            trie_key  = <uint32_t>py_trie[i][0]
+            trie_vals = py_trie[i][1]
 
-            # at least 1 multi-val is present, so reallocating memory to include new multi-vals
-            else:
-                trie_map_container.ranges = <TrieRange*>realloc(
-                    trie_map_container.ranges, sizeof(TrieRange) * (trie_map_container.len + num_values)
-                )
+            trie_key_hash = bucket_index(trie_map.max_width, trie_key)
 
             # define struct members for each range in py_l2
-            for xi in range(num_values):
-                trie_multival = &trie_map_container.ranges[trie_map_container.len + xi]
+            for xi in range(<size_t>len(trie_vals)):
+                trie_multival = &trie_map.ranges[cursors[trie_key_hash]]
 
                 trie_multival.key     = trie_key
-                trie_multival.netid   = <uint32_t>py_trie[i][1][xi][0]
-                trie_multival.bcast   = <uint32_t>py_trie[i][1][xi][1]
-                trie_multival.country =  <uint8_t>py_trie[i][1][xi][2]
+                trie_multival.netid   = <uint32_t>trie_vals[xi][0]
+                trie_multival.bcast   = <uint32_t>trie_vals[xi][1]
+                trie_multival.country =  <uint8_t>trie_vals[xi][2]
+
+                cursors[trie_key_hash] += 1
+
+        free(cursors)
+
+        s.swap_structure(trie_map)
+
+    def load_image(s, str path):
+        '''map a precompiled image as the trie structure, replacing the active structure.
+
+        raises OSError if the image cannot be mapped or ValueError if it is not a valid range image. the active
+        structure is not changed on error.
+        '''
+        cdef:
+            TrieMap_R          *trie_map = <TrieMap_R*>calloc(1, sizeof(TrieMap_R))
+            TrieImageHeader    *header
+
+        if (trie_map == NULL):
+            raise MemoryError
+
+        try:
+            map_image(path, IMAGE_RANGE, sizeof(TrieRange), &trie_map.image)
+        except:
+            free(trie_map)
+            raise
+
+        header = <TrieImageHeader*>trie_map.image.map_base
+
+        trie_map.buckets = <uint32_t*>(<char*>trie_map.image.map_base + header.buckets_offset)
+        trie_map.ranges  = <TrieRange*>(<char*>trie_map.image.map_base + header.entries_offset)
+
+        trie_map.max_width   = header.max_width
+        trie_map.entry_count = header.entry_count
+        trie_map.source_id   = header.source_id
+
+        s.swap_structure(trie_map)
+
+    cdef void swap_structure(s, TrieMap_R *trie_map):
+        cdef TrieMap_R *old_map = s.TRIE_MAP
+
+        s.TRIE_MAP = trie_map
+
+        # lookups that loaded the previous structure release the GIL while searching
+        while (old_map.readers):
+            with nogil:
+                usleep(SWAP_WAIT)
+
+        range_free(old_map)
+
+    def write_image(s, str path, uint64_t source_id):
+        '''write the active structure to path as a precompiled image.
+        '''
+        cdef:
+            TrieMap_R  *trie_map = s.TRIE_MAP
+            bytes       image
+
+        if (trie_map.max_width == EMPTY_CONTAINER):
+            raise ValueError('trie structure has not been initialized.')
 
-            trie_map_container.len += num_values
+        image = image_bytes(
+            IMAGE_RANGE, sizeof(TrieRange), 0, 0, source_id, trie_map.max_width,
+            trie_map.buckets, (<size_t>trie_map.max_width + 1) * sizeof(uint32_t), trie_map.ranges, trie_map.entry_count
+        )
+
+        with open(path, 'wb') as image_file:
+            image_file.write(image)
+
+    @staticmethod
+    def image_info(str path):
+        '''return the (source_id, hash_k0, hash_k1) of a valid range image at path or None.
+        '''
+        return read_image_info(path, IMAGE_RANGE, sizeof(TrieRange))
 
 
 cdef class HashTrie_Value:
 
+    def __cinit__(s):
+        s.TRIE_MAP = <TrieMap_V*>calloc(1, sizeof(TrieMap_V))
+        if (s.TRIE_MAP == NULL):
+            raise MemoryError
+
+    def __dealloc__(s):
+        if (s.TRIE_MAP != NULL):
+            value_free(s.TRIE_MAP)
+
     def py_search(s, uint32_t trie_key):
         cdef:
             uint32_t search_result
 
+            TrieMap_V  *trie_map = s.TRIE_MAP
+
+        trie_map.readers += 1
+
         with nogil:
-            search_result = s.search(trie_key)
+            search_result = value_search(trie_map, trie_key)
+
+        trie_map.readers -= 1
 
         return search_result
 
-    cdef uint32_t search(s, uint32_t trie_key) nogil:
+    def py_hash(s, str key):
+        '''return the 32-bit trie key of a string using the keyed hash of the trie.
+        '''
+        cdef bytes data = key.encode('utf-8')
+
+        return domain_key(<const uint8_t*><char*>data, len(data), s.hash_k0, s.hash_k1)
+
+    def set_hash_key(s, uint64_t k0, uint64_t k1):
+        '''set the key used by py_hash. a loaded image sets the key it was compiled with.
+        '''
+        s.hash_k0 = k0
+        s.hash_k1 = k1
+
+    @property
+    def hash_key(s):
+        '''the (k0, k1) key used by py_hash.
+        '''
+        return s.hash_k0, s.hash_k1
 
+    def py_search_batch(s, const uint32_t[::1] trie_keys):
+        '''search the trie for each key and return the results as array('I').
+
+        the GIL is released once for the whole batch.
+        '''
         cdef:
-            size_t      i
+            size_t          i
+            size_t          key_count = trie_keys.shape[0]
+            array.array     search_results = array.clone(U32_TEMPLATE, key_count, zero=False)
+            uint32_t       *results = search_results.data.as_uints
 
-            TrieMap_V  *trie_container = &s.TRIE_MAP[s.hash_key(trie_key)]
+            TrieMap_V      *trie_map = s.TRIE_MAP
 
-        # no l1 match
-        if (trie_container.len == EMPTY_CONTAINER):
-            return NO_MATCH
+        trie_map.readers += 1
 
-        for i in range(trie_container.len):
+        with nogil:
+            for i in range(key_count):
+                results[i] = value_search(trie_map, trie_keys[i])
 
-            # this is needed because collisions are possible by design.
-            # matching the original key will guarantee the correct value is returned.
-            if (trie_container.values[i].key == trie_key):
+        trie_map.readers -= 1
 
-                return trie_container.values[i].value
+        return search_results
 
-        # iteration completed with no l2 match
-        return NO_MATCH
+    cdef uint32_t search(s, uint32_t trie_key) nogil:
+        '''search the active structure.
 
-    cdef inline uint32_t hash_key(s, uint32_t trie_key) nogil:
-        return trie_key % (s.max_width - 1)
+        the caller must hold the GIL since a concurrent swap could free the structure.
+        '''
+        return value_search(s.TRIE_MAP, trie_key)
+
+    @property
+    def source_id(s):
+        '''fingerprint of the signature sources of the active image. 0 if the structure was generated in process.
+        '''
+        return s.TRIE_MAP.source_id
 
     cpdef void generate_structure(s, list py_trie, size_t py_trie_len):
 
         cdef:
             size_t      i
 
-            TrieMap_V  *trie_map_container
+            TrieMap_V  *trie_map
             TrieValue  *trie_multival
 
             uint32_t    trie_key
             uint32_t    trie_key_hash
-            uint32_t    trie_val
+            uint32_t   *cursors
+
+        trie_map = <TrieMap_V*>calloc(1, sizeof(TrieMap_V))
+        if (trie_map == NULL):
+            raise MemoryError
 
         # max_width will be ~130% of the size of py_trie
-        s.max_width = <uint32_t>py_trie_len + (py_trie_len / 3)
-        s.TRIE_MAP  = <TrieMap_V*>calloc(s.max_width, sizeof(TrieMap_V))
+        trie_map.max_width = <uint32_t>(py_trie_len + (py_trie_len / 3))
+        if (trie_map.max_width == 0):
+            trie_map.max_width = 1
+
+        trie_map.entry_count = <uint32_t>py_trie_len
+        trie_map.hash_k0 = s.hash_k0
+        trie_map.hash_k1 = s.hash_k1
 
+        trie_map.buckets = <uint32_t*>calloc(trie_map.max_width + 1, sizeof(uint32_t))
+        if (trie_map.buckets == NULL):
+            value_free(trie_map)
+            raise MemoryError
+
+        # 1. counting the entries of each bucket
         for i in range(py_trie_len):
+            trie_map.buckets[bucket_index(trie_map.max_width, <uint32_t>py_trie[i][0]) + 1] += 1
 
-            trie_key = <uint32_t>py_trie[i][0]
-            trie_val = <uint32_t>py_trie[i][1]
+        # 2. converting the counts to bucket start offsets
+        for i in range(1, trie_map.max_width + 1):
+            trie_map.buckets[i] += trie_map.buckets[i - 1]
 
-            trie_key_hash = s.hash_key(trie_key)
-            trie_map_container = &s.TRIE_MAP[trie_key_hash]
+        trie_map.values = <TrieValue*>calloc(trie_map.entry_count + 1, sizeof(TrieValue))
+        cursors = <uint32_t*>malloc(trie_map.max_width * sizeof(uint32_t))
+        if (trie_map.values == NULL or cursors == NULL):
+            free(cursors)
+            value_free(trie_map)
+            raise MemoryError
 
-            # first time on index so allocating memory for the number of current multi-vals this iteration
-            if (trie_map_container.len == 0):
-                trie_map_container.values = <TrieValue*>malloc(sizeof(TrieValue))
+        memcpy(cursors, trie_map.buckets, trie_map.max_width * sizeof(uint32_t))
 
-            # at least 1 multi-val is present, so reallocating memory to include new multi-vals
-            else:
-                trie_map_container.values = <TrieValue*>realloc(
-                    trie_map_container.values, sizeof(TrieValue) * (trie_map_container.len + 1)
-                )
+        # 3. placing the values within their bucket
+        for i in range(py_trie_len):
+
+            trie_key = <uint32_t>py_trie[i][0]
+            trie_key_hash = bucket_index(trie_map.max_width, trie_key)
 
-            trie_multival = &trie_map_container.values[trie_map_container.len]
+            trie_multival = &trie_map.values[cursors[trie_key_hash]]
 
             trie_multival.key   = trie_key
-            trie_multival.value = trie_val
+            trie_multival.value = <uint32_t>py_trie[i][1]
+
+            cursors[trie_key_hash] += 1
+
+        free(cursors)
+
+        s.swap_structure(trie_map)
+
+    def load_image(s, str path):
+        '''map a precompiled image as the trie structure, replacing the active structure and hash key.
+
+        raises OSError if the image cannot be mapped or ValueError if it is not a valid value image. the active
+        structure is not changed on error.
+        '''
+        cdef:
+            TrieMap_V          *trie_map = <TrieMap_V*>calloc(1, sizeof(TrieMap_V))
+            TrieImageHeader    *header
+
+        if (trie_map == NULL):
+            raise MemoryError
+
+        try:
+            map_image(path, IMAGE_VALUE, sizeof(TrieValue), &trie_map.image)
+        except:
+            free(trie_map)
+            raise
+
+        header = <TrieImageHeader*>trie_map.image.map_base
+
+        trie_map.buckets = <uint32_t*>(<char*>trie_map.image.map_base + header.buckets_offset)
+        trie_map.values  = <TrieValue*>(<char*>trie_map.image.map_base + header.entries_offset)
+
+        trie_map.max_width   = header.max_width
+        trie_map.entry_count = header.entry_count
+        trie_map.hash_k0     = header.hash_k0
+        trie_map.hash_k1     = header.hash_k1
+        trie_map.source_id   = header.source_id
+
+        s.hash_k0 = header.hash_k0
+        s.hash_k1 = header.hash_k1
+
+        s.swap_structure(trie_map)
+
+    cdef void swap_structure(s, TrieMap_V *trie_map):
+        cdef TrieMap_V *old_map = s.TRIE_MAP
+
+        s.TRIE_MAP = trie_map
+
+        # lookups that loaded the previous structure release the GIL while searching
+        while (old_map.readers):
+            with nogil:
+                usleep(SWAP_WAIT)
+
+        value_free(old_map)
+
+    def write_image(s, str path, uint64_t source_id):
+        '''write the active structure and its hash key to path as a precompiled image.
+        '''
+        cdef:
+            TrieMap_V  *trie_map = s.TRIE_MAP
+            bytes       image
+
+        if (trie_map.max_width == EMPTY_CONTAINER):
+            raise ValueError('trie structure has not been initialized.')
+
+        image = image_bytes(
+            IMAGE_VALUE, sizeof(TrieValue), trie_map.hash_k0, trie_map.hash_k1, source_id, trie_map.max_width,
+            trie_map.buckets, (<size_t>trie_map.max_width + 1) * sizeof(uint32_t), trie_map.values, trie_map.entry_count
+        )
+
+        with open(path, 'wb') as image_file:
+            image_file.write(image)
+
+    @staticmethod
+    def image_info(str path):
+        '''return the (source_id, hash_k0, hash_k1) of a valid value image at path or None.
+        '''
+        return read_image_info(path, IMAGE_VALUE, sizeof(TrieValue))
+
+
+cdef class PrefixTrie_Range:
+    '''longest prefix match structure for ip ranges.
+
+    lookups take the full host address and return the value of the most specific range containing it.
+    '''
+    def __cinit__(s):
+        s.TRIE_MAP = <TrieMap_P*>calloc(1, sizeof(TrieMap_P))
+        if (s.TRIE_MAP == NULL):
+            raise MemoryError
+
+    def __dealloc__(s):
+        if (s.TRIE_MAP != NULL):
+            prefix_free(s.TRIE_MAP)
+
+    def py_search(s, uint32_t host):
+        cdef:
+            uint32_t search_result
+
+            TrieMap_P  *trie_map = s.TRIE_MAP
+
+        trie_map.readers += 1
+
+        with nogil:
+            search_result = prefix_search(trie_map, host)
+
+        trie_map.readers -= 1
+
+        return search_result
+
+    def py_search_batch(s, const uint32_t[::1] hosts):
+        '''search the trie for each host and return the results as array('I').
+
+        the GIL is released once for the whole batch.
+        '''
+        cdef:
+            size_t          i
+            size_t          host_count = hosts.shape[0]
+            array.array     search_results = array.clone(U32_TEMPLATE, host_count, zero=False)
+            uint32_t       *results = search_results.data.as_uints
+
+            TrieMap_P      *trie_map = s.TRIE_MAP
+
+        trie_map.readers += 1
+
+        with nogil:
+            for i in range(host_count):
+                results[i] = prefix_search(trie_map, hosts[i])
+
+        trie_map.readers -= 1
+
+        return search_results
+
+    cdef uint32_t search(s, uint32_t host) nogil:
+        '''search the active structure.
+
+        the caller must hold the GIL since a concurrent swap could free the structure.
+        '''
+        return prefix_search(s.TRIE_MAP, host)
+
+    @property
+    def source_id(s):
+        '''fingerprint of the signature sources of the active image. 0 if the structure was generated in process.
+        '''
+        return s.TRIE_MAP.source_id
+
+    cpdef void generate_structure(s, list py_ranges, size_t py_ranges_len):
+        '''py_ranges is a sorted list of non overlapping (start, end, value) ranges with inclusive ends.
+
+        overlapping prefixes must be resolved by the caller so the most specific value is the one in the list.
+        '''
+        cdef:
+            PrefixBuild     pb
+            TrieMap_P      *trie_map
+            uint32_t       *structure
+            dict            chunk_ids = {}
+            size_t          i
+
+        memset(&pb, 0, sizeof(PrefixBuild))
+
+        pb.len = py_ranges_len
+        pb.starts = <uint32_t*>malloc(sizeof(uint32_t) * (py_ranges_len + 1))
+        pb.ends   = <uint32_t*>malloc(sizeof(uint32_t) * (py_ranges_len + 1))
+        pb.values = <uint32_t*>malloc(sizeof(uint32_t) * (py_ranges_len + 1))
+
+        pb.chunk_cap = 1024
+        pb.chunks = <uint32_t*>malloc(sizeof(uint32_t) * PREFIX_CHUNK_LEN * pb.chunk_cap)
+
+        structure = <uint32_t*>malloc(sizeof(uint32_t) * PREFIX_ROOT_LEN)
+        trie_map  = <TrieMap_P*>calloc(1, sizeof(TrieMap_P))
+
+        try:
+            if (not pb.starts or not pb.ends or not pb.values or not pb.chunks or not structure or not trie_map):
+                raise MemoryError
+
+            for i in range(py_ranges_len):
+                pb.starts[i] = <uint32_t>py_ranges[i][0]
+                pb.ends[i]   = <uint32_t>py_ranges[i][1]
+                pb.values[i] = <uint32_t>py_ranges[i][2]
+
+                if (pb.values[i] & PREFIX_NODE):
+                    raise ValueError(f'range value {pb.values[i]} exceeds {PREFIX_INDEX}.')
+
+                if (pb.starts[i] > pb.ends[i] or (i and pb.starts[i] <= pb.ends[i - 1])):
+                    raise ValueError('ranges must be sorted and non overlapping.')
+
+            for i in range(PREFIX_ROOT_LEN):
+                structure[i] = prefix_block(&pb, <uint64_t>i << 16, 16, chunk_ids)
+
+            # root and chunks are stored contiguously, matching the image layout
+            trie_map.root = <uint32_t*>realloc(
+                structure, sizeof(uint32_t) * (PREFIX_ROOT_LEN + <size_t>pb.chunk_count * PREFIX_CHUNK_LEN)
+            )
+            if (trie_map.root == NULL):
+                raise MemoryError
+
+        except:
+            free(structure)
+            free(trie_map)
+            free(pb.chunks)
+            raise
+
+        finally:
+            free(pb.starts)
+            free(pb.ends)
+            free(pb.values)
+
+        trie_map.chunks = trie_map.root + PREFIX_ROOT_LEN
+        trie_map.chunk_count = pb.chunk_count
+
+        memcpy(trie_map.chunks, pb.chunks, sizeof(uint32_t) * PREFIX_CHUNK_LEN * <size_t>pb.chunk_count)
+        free(pb.chunks)
+
+        s.swap_structure(trie_map)
+
+    def load_image(s, str path):
+        '''map a precompiled image as the trie structure, replacing the active structure.
+
+        raises OSError if the image cannot be mapped or ValueError if it is not a valid prefix image. the active
+        structure is not changed on error.
+        '''
+        cdef:
+            TrieMap_P          *trie_map = <TrieMap_P*>calloc(1, sizeof(TrieMap_P))
+            TrieImageHeader    *header
+
+        if (trie_map == NULL):
+            raise MemoryError
+
+        try:
+            map_image(path, IMAGE_PREFIX, sizeof(uint32_t), &trie_map.image)
+        except:
+            free(trie_map)
+            raise
+
+        header = <TrieImageHeader*>trie_map.image.map_base
+
+        trie_map.root   = <uint32_t*>(<char*>trie_map.image.map_base + header.entries_offset)
+        trie_map.chunks = trie_map.root + PREFIX_ROOT_LEN
+
+        trie_map.chunk_count = header.max_width
+        trie_map.source_id   = header.source_id
+
+        s.swap_structure(trie_map)
+
+    cdef void swap_structure(s, TrieMap_P *trie_map):
+        cdef TrieMap_P *old_map = s.TRIE_MAP
+
+        s.TRIE_MAP = trie_map
+
+        # lookups that loaded the previous structure release the GIL while searching
+        while (old_map.readers):
+            with nogil:
+                usleep(SWAP_WAIT)
+
+        prefix_free(old_map)
+
+    def write_image(s, str path, uint64_t source_id):
+        '''write the active structure to path as a precompiled image.
+        '''
+        cdef:
+            TrieMap_P  *trie_map = s.TRIE_MAP
+            bytes       image
+
+        if (trie_map.root == NULL):
+            raise ValueError('trie structure has not been initialized.')
+
+        image = image_bytes(
+            IMAGE_PREFIX, sizeof(uint32_t), 0, 0, source_id, trie_map.chunk_count,
+            NULL, 0, trie_map.root, PREFIX_ROOT_LEN + trie_map.chunk_count * PREFIX_CHUNK_LEN
+        )
+
+        with open(path, 'wb') as image_file:
+            image_file.write(image)
+
+    @staticmethod
+    def image_info(str path):
+        '''return the (source_id, hash_k0, hash_k1) of a valid prefix image at path or None.
+        '''
+        return read_image_info(path, IMAGE_PREFIX, sizeof(uint32_t))
+
+
+cdef uint32_t keyword_search(TrieMap_K *trie_map, const uint8_t *data, size_t data_len) nogil:
+
+    cdef:
+        size_t      i
+        uint32_t    state = 0
+        uint32_t    output
+        uint32_t    first_match = NO_MATCH
+
+    # not initialized
+    if (trie_map.transitions == NULL):
+        return NO_MATCH
+
+    # a later position can still match a keyword earlier in the list, so the full name is scanned unless the first
+    # keyword has already matched.
+    for i in range(data_len):
+        state = trie_map.transitions[state * trie_map.class_count + trie_map.classes[data[i]]]
+
+        output = trie_map.outputs[state]
+        if (output and (first_match == NO_MATCH or output < first_match)):
+            first_match = output
+
+            if (first_match == 1):
+                break
+
+    return first_match
+
+cdef void keyword_free(TrieMap_K *trie_map) noexcept nogil:
+    free(trie_map.transitions)
+    free(trie_map.outputs)
+    free(trie_map)
+
+
+cdef class KeywordTrie:
+    '''multi-pattern substring matcher for keyword signatures.
+
+    a search scans the data once, independent of the number of keywords, and returns the value of the first keyword
+    in list order that is contained in the data.
+    '''
+    def __cinit__(s):
+        s.TRIE_MAP = <TrieMap_K*>calloc(1, sizeof(TrieMap_K))
+        if (s.TRIE_MAP == NULL):
+            raise MemoryError
+
+        s.VALUES = []
+
+    def __dealloc__(s):
+        if (s.TRIE_MAP != NULL):
+            keyword_free(s.TRIE_MAP)
+
+    def py_search(s, str text):
+        cdef:
+            uint32_t search_result
+
+            bytes       data = text.encode('utf-8')
+            size_t      data_len = len(data)
+
+            # taken while holding the gil. data keeps the buffer alive through the search.
+            const uint8_t *buf = data
+
+            TrieMap_K  *trie_map = s.TRIE_MAP
+            list        values = s.VALUES
+
+        trie_map.readers += 1
+
+        with nogil:
+            search_result = keyword_search(trie_map, buf, data_len)
+
+        trie_map.readers -= 1
+
+        if (search_result == NO_MATCH):
+            return None
+
+        return values[search_result - 1]
+
+    cdef uint32_t search(s, const uint8_t *data, size_t data_len) nogil:
+        '''search the active structure. returns the list index + 1 of the matched keyword or 0.
+
+        the caller must hold the GIL since a concurrent swap could free the structure.
+        '''
+        return keyword_search(s.TRIE_MAP, data, data_len)
+
+    cpdef void generate_structure(s, list py_keywords, size_t py_keywords_len):
+        '''py_keywords is a list of (keyword, value) pairs. keywords are matched case-sensitively.
+        '''
+        cdef:
+            TrieMap_K  *trie_map
+            list        keywords = []
+            list        values = []
+
+            bytes       keyword
+            size_t      i, k, max_states = 1
+            uint32_t    c, state, next_state, fail_state
+            uint32_t    class_count = 1
+
+            uint32_t   *transitions
+            uint32_t   *outputs
+            uint32_t   *fail = NULL
+            uint32_t   *queue = NULL
+            size_t      queue_head = 0, queue_tail = 0
+
+        for i in range(py_keywords_len):
+            keyword = py_keywords[i][0].encode('utf-8')
+            if (not keyword):
+                continue
+
+            keywords.append(keyword)
+            values.append(py_keywords[i][1])
+
+            max_states += len(keyword)
+
+        trie_map = <TrieMap_K*>calloc(1, sizeof(TrieMap_K))
+        if (trie_map == NULL):
+            raise MemoryError
+
+        # 1. byte classes. bytes not present in any keyword share class 0 and always lead back to the root.
+        for keyword in keywords:
+            for c in keyword:
+                if (trie_map.classes[c] == 0):
+                    trie_map.classes[c] = class_count
+                    class_count += 1
+
+        trie_map.class_count = class_count
+        trie_map.transitions = <uint32_t*>calloc(max_states * class_count, sizeof(uint32_t))
+        trie_map.outputs = <uint32_t*>calloc(max_states, sizeof(uint32_t))
+
+        fail  = <uint32_t*>calloc(max_states, sizeof(uint32_t))
+        queue = <uint32_t*>malloc(max_states * sizeof(uint32_t))
+
+        try:
+            if (not trie_map.transitions or not trie_map.outputs or not fail or not queue):
+                raise MemoryError
+
+            transitions = trie_map.transitions
+            outputs = trie_map.outputs
+
+            # 2. keyword trie. the root is never a child, so a 0 transition means no edge until step 3.
+            trie_map.state_count = 1
+            for k, keyword in enumerate(keywords):
+
+                state = 0
+                for c in keyword:
+                    next_state = transitions[state * class_count + trie_map.classes[c]]
+                    if (next_state == 0):
+                        next_state = trie_map.state_count
+                        trie_map.state_count += 1
+
+                        transitions[state * class_count + trie_map.classes[c]] = next_state
+
+                    state = next_state
+
+                if (outputs[state] == NO_MATCH):
+                    outputs[state] = k + 1
+
+            # 3. suffix links in breadth first order. missing edges are replaced with the transition of the suffix
+            # state, which is complete since it is shallower, and outputs inherit the first keyword of the suffix.
+            for c in range(class_count):
+                next_state = transitions[c]
+                if (next_state):
+                    queue[queue_tail] = next_state
+                    queue_tail += 1
+
+            while (queue_head < queue_tail):
+                state = queue[queue_head]
+                queue_head += 1
+
+                for c in range(class_count):
+                    next_state = transitions[state * class_count + c]
+                    fail_state = transitions[fail[state] * class_count + c]
+
+                    if (next_state == 0):
+                        transitions[state * class_count + c] = fail_state
+                        continue
+
+                    fail[next_state] = fail_state
+                    if (outputs[fail_state] and (outputs[next_state] == NO_MATCH
+                                                 or outputs[fail_state] < outputs[next_state])):
+                        outputs[next_state] = outputs[fail_state]
+
+                    queue[queue_tail] = next_state
+                    queue_tail += 1
+
+        except:
+            keyword_free(trie_map)
+            raise
+
+        finally:
+            free(fail)
+            free(queue)
+
+        s.swap_structure(trie_map, values)
+
+    cdef void swap_structure(s, TrieMap_K *trie_map, list values):
+        cdef TrieMap_K *old_map = s.TRIE_MAP
+
+        s.TRIE_MAP = trie_map
+        s.VALUES = values
+
+        # lookups that loaded the previous structure release the GIL while searching
+        while (old_map.readers):
+            with nogil:
+                usleep(SWAP_WAIT)
+
+        keyword_free(old_map)
+
+
+# ================================================
+# BENCHMARK
+# ================================================
+cdef inline uint64_t monotonic_ns() nogil:
+    cdef timespec ts
+
+    clock_gettime(CLOCK_MONOTONIC, &ts)
+
+    return <uint64_t>ts.tv_sec * 1000000000 + ts.tv_nsec
+
+def lookup_benchmark(HashTrie_Range hash_trie, PrefixTrie_Range prefix_trie, uint32_t[::1] hosts,
+        uint32_t msb, uint32_t lsb, size_t rounds=1):
+    '''search every host in each structure and return the ns per lookup of each and the number of hosts where the
+    results differ.
+
+    hash_trie is searched with the (host & msb, host & lsb) key it was generated with.
+    '''
+    cdef:
+        size_t      i, r
+        size_t      hosts_len = hosts.shape[0]
+        uint64_t    start, hash_ns, prefix_ns
+        uint64_t    hash_sum = 0, prefix_sum = 0
+        size_t      mismatches = 0
+
+        TrieMap_R  *hash_map = hash_trie.TRIE_MAP
+        TrieMap_P  *prefix_map = prefix_trie.TRIE_MAP
+
+    if (hosts_len == 0 or rounds == 0):
+        raise ValueError('at least one host and round is required.')
+
+    hash_map.readers += 1
+    prefix_map.readers += 1
+
+    with nogil:
+        start = monotonic_ns()
+        for r in range(rounds):
+            for i in range(hosts_len):
+                hash_sum += range_search(hash_map, hosts[i] & msb, hosts[i] & lsb)
+
+        hash_ns = monotonic_ns() - start
+
+        start = monotonic_ns()
+        for r in range(rounds):
+            for i in range(hosts_len):
+                prefix_sum += prefix_search(prefix_map, hosts[i])
+
+        prefix_ns = monotonic_ns() - start
+
+        for i in range(hosts_len):
+            if (range_search(hash_map, hosts[i] & msb, hosts[i] & lsb) != prefix_search(prefix_map, hosts[i])):
+                mismatches += 1
+
+    hash_map.readers -= 1
+    prefix_map.readers -= 1
+
+    # the sums keep the timed loops from being optimized out
+    if (hash_sum != prefix_sum and mismatches == 0):
+        raise RuntimeError('lookup results changed during the benchmark.')
 
-            trie_map_container.len += 1
+    return hash_ns / <double>(hosts_len * rounds), prefix_ns / <double>(hosts_len * rounds), mismatches
@@ -7,12 +7,7 @@ import fcntl
 from dnx_gentools.def_typing import *
 from dnx_gentools.def_constants import *
 from dnx_gentools.def_enums import Queue, CFG
-from dnx_gentools.file_operations import load_configuration
-
-try:
-    from dnx_iptools.cprotocol_tools import itoip
-except ImportError:
-    pass
+from dnx_gentools.file_operations import load_configuration, load_cfirewall_queue_count
 
 __all__ = (
     'IPTablesManager'
@@ -77,15 +72,31 @@ class _Defaults:
         cfirewall operates as a basic ip/protocol filter and as a security module inspection pre-preprocessor.
 
         standard conntrack permit/allow control is left to IPTables for now.
+
+        if more than one cfirewall queue is configured, packets are balanced across the queue range by the cpu that
+        received them so each queue worker keeps its flows cache local.
+
+        the queue range is only checked (-C) before being applied, so a rule from a previous queue count can remain
+        until the rules are reloaded. --queue-bypass accepts packets sent to a queue without a worker instead of
+        dropping them.
         '''
+        queue_count: int = load_cfirewall_queue_count()
+        if (queue_count == 1):
+            nfqueue = f'NFQUEUE --queue-num {Queue.CFIREWALL} --queue-bypass'
+        else:
+            nfqueue = (
+                f'NFQUEUE --queue-balance {Queue.CFIREWALL}:{Queue.CFIREWALL + queue_count - 1} '
+                f'--queue-bypass --queue-cpu-fanout'
+            )
+
         # FORWARD
         # NOTE: cfirewall must mark connections with connmark to offload the connection to the kernel, otherwise all
         # packets of the connection must be processed/handled by cfirewall.
         ipt_shell('FORWARD -m connmark --mark 1 -m conntrack --ctstate RELATED,ESTABLISHED -j ACCEPT', action='-I')
 
-        ipt_shell(f'FORWARD -p tcp  -j NFQUEUE --queue-num {Queue.CFIREWALL}')
-        ipt_shell(f'FORWARD -p udp  -j NFQUEUE --queue-num {Queue.CFIREWALL}')
-        ipt_shell(f'FORWARD -p icmp -j NFQUEUE --queue-num {Queue.CFIREWALL}')
+        ipt_shell(f'FORWARD -p tcp  -j {nfqueue}')
+        ipt_shell(f'FORWARD -p udp  -j {nfqueue}')
+        ipt_shell(f'FORWARD -p icmp -j {nfqueue}')
 
         # INPUT
         # NOTE: letting iptables control return traffic for DNX sourced traffic
@@ -95,9 +106,9 @@ class _Defaults:
         # NOTE: control sock is AF_INET, so we need this rule
         ipt_shell('INPUT -s 127.0.0.0/24 -d 127.0.0.0/24 -j ACCEPT')
 
-        ipt_shell(f'INPUT -p tcp  -j NFQUEUE --queue-num {Queue.CFIREWALL}')
-        ipt_shell(f'INPUT -p udp  -j NFQUEUE --queue-num {Queue.CFIREWALL}')
-        ipt_shell(f'INPUT -p icmp -j NFQUEUE --queue-num {Queue.CFIREWALL}')
+        ipt_shell(f'INPUT -p tcp  -j {nfqueue}')
+        ipt_shell(f'INPUT -p udp  -j {nfqueue}')
+        ipt_shell(f'INPUT -p icmp -j {nfqueue}')
 
     def prefilter_set(self) -> None:
         # filtering out broadcast packets to the wan.
@@ -236,9 +247,6 @@ class IPTablesManager:
     def delete_nat(self, rule: config) -> None:
         shell(f'sudo iptables -t nat -D {rule.nat_type} {rule.position}', check=True)
 
-    def remove_passive_block(self, host: int, timestamp: int) -> None:
-        shell(f'sudo iptables -t raw -D IPS -s {itoip(host)} -j DROP -m comment --comment {timestamp}', check=True)
-
     @staticmethod
     # this allows forwarding through system, required for SNAT/MASQUERADE to work.
     def network_forwarding() -> None:
@@ -258,24 +266,6 @@ class IPTablesManager:
         '''
         shell(f'sudo iptables -t {table} -F {chain}')
 
-    @staticmethod
-    def proxy_add_rule(ip_address: int, timestamp: int, *, table: str, chain: str) -> None:
-        '''inject an iptable rule into the passed in table and chain.
-
-        the ip_address argument will be blocked as a source and timestamp will be set as a comment.
-        '''
-        comment = f'-m comment --comment {timestamp}'
-
-        shell(f'sudo iptables -t {table} -A {chain} -s {itoip(ip_address)} -j DROP {comment}')
-
-    @staticmethod
-    def proxy_del_rule(ip_address: str, timestamp: int, *, table: str, chain: str) -> None:
-        '''remove an iptable rule from the passed in table and chain.
-        '''
-        comment = f'-m comment --comment {timestamp}'
-
-        shell(f'sudo iptables -t {table} -D {chain} -s {ip_address} -j DROP {comment}')
-
     @staticmethod
     def update_dns_over_https() -> None:
         with open(f'{HOME_DIR}/dnx_profile/signatures/ip_lists/dns-over-https.ips') as ips_to_block:
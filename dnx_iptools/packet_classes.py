@@ -243,8 +243,8 @@ class ProtoRelay:
             self._fallback_relay_add = fallback_relay.add
 
     @classmethod
-    def run(cls, dns_server: DNSServer_T, *, fallback_relay: Optional[Callable] = None):
-        '''starts the protocol relay.
+    def run(cls, dns_server: DNSServer_T, *, fallback_relay: Optional[Callable] = None) -> ProtoRelay:
+        '''starts the protocol relay and returns the relay instance.
 
         DNSServer object is the class handling client side requests which we can call back to and fallback is a
         secondary relay that can get forwarded a request post failure. initialize will be called to run any subclass
@@ -255,6 +255,8 @@ class ProtoRelay:
         Thread(target=self._fail_detection).start()
         Thread(target=self.relay).start()
 
+        return self
+
     def relay(self):
         '''the main relay process for handling the relay queue. will block and run forever.
         '''
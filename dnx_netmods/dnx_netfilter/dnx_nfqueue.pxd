@@ -1,6 +1,6 @@
 #!/usr/bin/env Cython
 
-from libc.stdint cimport uint8_t, uint16_t, uint32_t, int32_t
+from libc.stdint cimport uint8_t, uint16_t, uint32_t, uint64_t, int32_t
 from libc.stdint cimport uint_fast8_t, uint_fast16_t
 
 cdef extern from "<errno.h>":
@@ -8,16 +8,30 @@ cdef extern from "<errno.h>":
 
     # dummy defines from asm-generic/errno.h:
     cdef enum:
+        EAGAIN  = 11   # Try again
         ENOBUFS = 105  # No buffer space available
 
 cdef extern from "sys/socket.h":
+    struct sockaddr:
+        pass
+
     ssize_t recv(int __fd, void *__buf, size_t __n, int __flags) nogil
+    ssize_t sendto(int __fd, const void *__buf, size_t __n, int __flags, const sockaddr *__addr, size_t __addr_len) nogil
     int MSG_DONTWAIT
+    int AF_NETLINK
+    int AF_UNSPEC
 
 cdef extern from "time.h" nogil:
     ctypedef long time_t
     time_t time(time_t*)
 
+    struct timespec:
+        time_t tv_sec
+        long   tv_nsec
+
+    int clock_gettime(int clk_id, timespec *tp)
+    int CLOCK_MONOTONIC
+
     struct timeval:
         time_t tv_sec
         time_t tv_usec
@@ -41,12 +55,34 @@ cdef extern from "netinet/in.h":
     uint32_t htonl (uint32_t __hostlong) nogil
     uint16_t htons (uint16_t __hostshort) nogil
 
+cdef extern from "linux/netlink.h":
+    struct nlmsghdr:
+        uint32_t nlmsg_len
+        uint16_t nlmsg_type
+        uint16_t nlmsg_flags
+        uint32_t nlmsg_seq
+        uint32_t nlmsg_pid
+
+    struct nlattr:
+        uint16_t nla_len
+        uint16_t nla_type
+
+    struct sockaddr_nl:
+        uint16_t nl_family
+        uint32_t nl_pid
+        uint32_t nl_groups
+
+    int NLM_F_REQUEST
+
 cdef extern from "libnfnetlink/linux_nfnetlink.h":
     struct nfgenmsg:
         uint8_t  nfgen_family
         uint8_t  version
         uint16_t res_id
 
+    int NFNETLINK_V0
+    int NFNL_SUBSYS_QUEUE
+
 cdef extern from "libnfnetlink/libnfnetlink.h":
     struct nfnl_handle:
         pass
@@ -59,11 +95,22 @@ cdef extern from "libnetfilter_queue/linux_nfnetlink_queue.h":
         NFQNL_COPY_META
         NFQNL_COPY_PACKET
 
+    enum nfqnl_msg_types:
+        NFQNL_MSG_VERDICT
+
+    enum nfqnl_attr_type:
+        NFQA_VERDICT_HDR
+        NFQA_MARK
+
     struct nfqnl_msg_packet_hdr:
         uint32_t packet_id
         uint16_t hw_protocol
         uint8_t  hook
 
+    struct nfqnl_msg_verdict_hdr:
+        uint32_t verdict
+        uint32_t id
+
 cdef extern from "libnetfilter_queue/libnetfilter_queue.h":
     struct nfq_handle:
         # 	struct nfnl_handle *nfnlh;
@@ -174,7 +221,41 @@ cdef enum:
 ctypedef char pkt_buf
 ctypedef unsigned char upkt_buf
 
+# ================================== #
+# VERDICT BATCHING
+# ================================== #
+# verdicts are written directly as netlink messages and sent together. the mark attribute is only included when set,
+# otherwise the kernel would clear the existing packet mark.
+cdef struct VerdictMsg:
+    nlmsghdr    nlh
+    nfgenmsg    nfg
+    nlattr      vhdr_attr
+    nfqnl_msg_verdict_hdr vhdr
+    nlattr      mark_attr
+    uint32_t    mark
+
+cdef enum:
+    VERDICT_BATCH_MAX  = 32
+    VERDICT_BATCH_USEC = 500
+    VERDICT_BATCH_SIZE = VERDICT_BATCH_MAX * 40  # sizeof(VerdictMsg)
+
+cdef struct VerdictBatch:
+    pthread_mutex_t lock
+    int         fd
+    uint16_t    queue
+    bint        idle      # recv thread is blocked so verdicts are sent immediately
+    uint32_t    count
+    size_t      len
+    uint64_t    started   # usec timestamp of the oldest pending verdict
+
+    # stats
+    uint64_t    verdicts
+    uint64_t    sends
+
+    char        buf[VERDICT_BATCH_SIZE]
+
 cdef struct PacketData:
+    VerdictBatch *batch
     nfq_q_handle *nfq_qh
     nfq_data     *nfq_d
     uint32_t      id
@@ -205,4 +286,6 @@ cdef class NetfilterQueue:
         nfq_handle   *nfq_h   # NFQueue library
         nfq_q_handle *nfq_qh  # Specific processing queue
 
+        VerdictBatch verdicts
+
         object proxy_callback
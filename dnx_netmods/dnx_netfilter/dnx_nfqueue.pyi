@@ -30,4 +30,5 @@ class NetfilterQueue:
     def nf_run(self) -> NoReturn: ...
     def nf_set(self, queue_num: int) -> int: ...
     def set_proxy_callback(self, func_ref: NFQCallback) -> None: ...
+    def verdict_stats(self) -> tuple[int, int]: ...
     def nf_break(self) -> None: ...
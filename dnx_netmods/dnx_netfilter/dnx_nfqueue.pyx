@@ -4,7 +4,7 @@ cimport cython
 
 from libc.stdlib cimport calloc, free
 from libc.stdio cimport printf
-from libc.stdint cimport uint8_t, uint16_t, uint32_t, uint_fast16_t, int32_t
+from libc.stdint cimport uint8_t, uint16_t, uint32_t, uint64_t, uint_fast16_t, int32_t
 
 DEF Py_OK  = 0
 DEF Py_ERR = 1
@@ -27,6 +27,81 @@ cdef pthread_mutex_t NFQlock
 
 pthread_mutex_init(&NFQlock, NULL)
 
+cdef sockaddr_nl NL_KERNEL
+NL_KERNEL.nl_family = AF_NETLINK
+
+# ================================== #
+# VERDICT BATCHING
+# ================================== #
+# verdicts are coalesced and sent with a single syscall. the batch is flushed when it is full, when the oldest verdict
+# has been held for VERDICT_BATCH_USEC, or when the recv loop has no more packets waiting. while the recv thread is
+# blocked, verdicts (from proxy threads) are sent immediately so they are never held while the queue is idle.
+# ---------------------------------- #
+cdef inline uint64_t monotonic_usec() nogil:
+    cdef timespec ts
+
+    clock_gettime(CLOCK_MONOTONIC, &ts)
+
+    return <uint64_t>ts.tv_sec * 1000000 + ts.tv_nsec // 1000
+
+# batch lock must be held
+cdef int verdict_flush(VerdictBatch *vb) nogil:
+
+    cdef ssize_t ret
+
+    if (vb.count == 0):
+        return Py_OK
+
+    ret = sendto(vb.fd, vb.buf, vb.len, 0, <sockaddr*>&NL_KERNEL, sizeof(sockaddr_nl))
+
+    vb.sends += 1
+    vb.count = 0
+    vb.len = 0
+
+    return Py_OK if ret >= 0 else Py_ERR
+
+cdef void verdict_enqueue(VerdictBatch *vb, uint32_t pktid, uint32_t verdict, uint32_t mark) nogil:
+
+    cdef:
+        VerdictMsg *msg
+        uint64_t    now = monotonic_usec()
+
+    pthread_mutex_lock(&vb.lock)
+
+    msg = <VerdictMsg*>&vb.buf[vb.len]
+
+    msg.nlh.nlmsg_len   = sizeof(VerdictMsg) if mark else sizeof(VerdictMsg) - sizeof(nlattr) - sizeof(uint32_t)
+    msg.nlh.nlmsg_type  = (NFNL_SUBSYS_QUEUE << 8) | NFQNL_MSG_VERDICT
+    msg.nlh.nlmsg_flags = NLM_F_REQUEST
+    msg.nlh.nlmsg_seq   = 0
+    msg.nlh.nlmsg_pid   = 0
+
+    msg.nfg.nfgen_family = AF_UNSPEC
+    msg.nfg.version      = NFNETLINK_V0
+    msg.nfg.res_id       = htons(vb.queue)
+
+    msg.vhdr_attr.nla_len  = sizeof(nlattr) + sizeof(nfqnl_msg_verdict_hdr)
+    msg.vhdr_attr.nla_type = NFQA_VERDICT_HDR
+    msg.vhdr.verdict = htonl(verdict)
+    msg.vhdr.id      = htonl(pktid)
+
+    if (mark):
+        msg.mark_attr.nla_len  = sizeof(nlattr) + sizeof(uint32_t)
+        msg.mark_attr.nla_type = NFQA_MARK
+        msg.mark = htonl(mark)
+
+    if (vb.count == 0):
+        vb.started = now
+
+    vb.len += msg.nlh.nlmsg_len
+    vb.count += 1
+    vb.verdicts += 1
+
+    if (vb.idle or vb.count >= VERDICT_BATCH_MAX or now - vb.started >= VERDICT_BATCH_USEC):
+        verdict_flush(vb)
+
+    pthread_mutex_unlock(&vb.lock)
+
 # ============================================
 # NFQUEUE CALLBACK - PARSE > FORWARD - NO GIL
 # ============================================
@@ -61,6 +136,8 @@ cdef inline int32_t nfqueue_forward(PacketData *dnx_nfqhdr, void *q_manager) wit
         NetfilterQueue nfqueue = <NetfilterQueue>q_manager
         CPacket cpacket
 
+    dnx_nfqhdr.batch = &nfqueue.verdicts
+
     # skipping call to __init__
     cpacket = CPacket.__new__(CPacket)
     cpacket.set_nfqhdr(dnx_nfqhdr)
@@ -73,16 +150,38 @@ cdef inline int32_t nfqueue_forward(PacketData *dnx_nfqhdr, void *q_manager) wit
 # NFQUEUE RECV LOOP - NO GIL
 # ============================================
 # RECV > NFQ_HANDLE > NFQ_CALLBACK > PARSE > PROXY CALLBACK
-cdef void process_traffic(nfq_handle *nfq_h) nogil:
+cdef void process_traffic(nfq_handle *nfq_h, VerdictBatch *vb) nogil:
 
     cdef:
         pkt_buf pkt_buffer[NFQ_BUF_SIZE]
         int32_t fd = nfq_fd(nfq_h)
 
         ssize_t data_len
+        bint    idle
 
     while True:
-        data_len = recv(fd, pkt_buffer, NFQ_BUF_SIZE, 0)
+        # only block once every pending verdict has been sent
+        pthread_mutex_lock(&vb.lock)
+        idle = vb.idle = (vb.count == 0)
+        pthread_mutex_unlock(&vb.lock)
+
+        if (idle):
+            data_len = recv(fd, pkt_buffer, NFQ_BUF_SIZE, 0)
+
+            pthread_mutex_lock(&vb.lock)
+            vb.idle = 0
+            pthread_mutex_unlock(&vb.lock)
+
+        else:
+            data_len = recv(fd, pkt_buffer, NFQ_BUF_SIZE, MSG_DONTWAIT)
+
+            # socket drained
+            if (data_len < 0 and errno == EAGAIN):
+                pthread_mutex_lock(&vb.lock)
+                verdict_flush(vb)
+                pthread_mutex_unlock(&vb.lock)
+
+                continue
 
         if (data_len > 0):
             # ===================================
@@ -296,37 +395,16 @@ cdef class CPacket:
         pass
 
     cdef void _set_verdict(s, uint32_t verdict) nogil:
-        '''Call appropriate set_verdict function on packet.
+        '''Queue the verdict for the packet. the batch lock serializes verdicts issued from multiple threads.
+
+        the packet payload is not returned to the kernel since CPacket does not modify packet data.
         '''
         if (s.has_verdict):
             printf('[C/warning] Verdict already issued for this packet.')
 
             return
 
-        # ===================================
-        # LOCKING ACCESS TO NetfilterQueue
-        # prevents nfq packet handler from processing a packet while setting a verdict of another packet.
-        # pthread_mutex_lock(&NFQlock)
-        # -------------------------
-        # NetfilterQueue Processor
-        # -------------------------
-        if (s.dnx_nfqhdr.mark):
-            nfq_set_verdict2(
-                s.dnx_nfqhdr.nfq_qh, s.dnx_nfqhdr.id,
-                verdict, s.dnx_nfqhdr.mark,
-                s.dnx_nfqhdr.len, s.dnx_nfqhdr.data
-            )
-
-        else:
-            nfq_set_verdict(
-                s.dnx_nfqhdr.nfq_qh, s.dnx_nfqhdr.id,
-                verdict,
-                s.dnx_nfqhdr.len, s.dnx_nfqhdr.data
-            )
-
-        # pthread_mutex_unlock(&NFQlock)
-        # UNLOCKING ACCESS TO NetfilterQueue
-        # ===================================
+        verdict_enqueue(s.dnx_nfqhdr.batch, s.dnx_nfqhdr.id, verdict, s.dnx_nfqhdr.mark)
 
         s.has_verdict = 1
 
@@ -340,7 +418,7 @@ cdef class NetfilterQueue:
         user callback.
         '''
         with nogil:
-            process_traffic(s.nfq_h)
+            process_traffic(s.nfq_h, &s.verdicts)
 
     def nf_set(s, uint_fast16_t queue_num):
         # ======================
@@ -367,8 +445,25 @@ cdef class NetfilterQueue:
         nfq_set_queue_maxlen(s.nfq_qh, DEFAULT_MAX_QUEUELEN)
         nfnl_rcvbufsiz(nfq_nfnlh(s.nfq_h), SOCK_RCV_SIZE)
 
+        pthread_mutex_init(&s.verdicts.lock, NULL)
+        s.verdicts.fd = nfq_fd(s.nfq_h)
+        s.verdicts.queue = queue_num
+        s.verdicts.idle = 1
+
         return Py_OK
 
+    def verdict_stats(s):
+        '''Return the number of verdicts issued and the number of sends used to deliver them.
+        '''
+        cdef (uint64_t, uint64_t) stats
+
+        with nogil:
+            pthread_mutex_lock(&s.verdicts.lock)
+            stats = (s.verdicts.verdicts, s.verdicts.sends)
+            pthread_mutex_unlock(&s.verdicts.lock)
+
+        return stats
+
     def set_proxy_callback(s, object func_ref):
         '''Set required reference which will be called after packet data is parsed into C structs.
         '''
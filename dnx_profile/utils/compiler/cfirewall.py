@@ -27,8 +27,8 @@ os.chdir(f'{HOME_DIR}/dnx_secmods/cfirewall')
 
 SOURCES = [
     f'{HOME_DIR}/dnx_ctools/inet_tools.c', f'{HOME_DIR}/dnx_ctools/std_tools.c',
-    'src/cfirewall.c', 'src/dnx_nfq.c', 'src/conntrack.c', 'src/firewall.c', 'src/match.c',  # 'src/nat.c',
-    'src/traffic_log.c', 'fw_main/fw_main.pyx'
+    'src/cfirewall.c', 'src/dnx_nfq.c', 'src/conntrack.c', 'src/firewall.c', 'src/match.c', 'src/classifier.c',  # 'src/nat.c',
+    'src/traffic_log.c', 'src/blocklist.c', 'src/quota.c', 'fw_main/fw_main.pyx'
 ]
 
 cmd = {'build_ext': build_ext}
@@ -45,14 +45,22 @@ ext = Extension(
     libraries=['mnl', 'netfilter_queue', 'netfilter_conntrack']
 )
 
-INCLUDE_PATHS = [f'{os.getcwd()}/fw_main']
+# control api socket. fw_main cimports this module, so it is built as its own extension in the fw_api package.
+api_ext = Extension('fw_api.fw_api', sources=['fw_api/fw_api.pyx'])
+
+INCLUDE_PATHS = [f'{os.getcwd()}/fw_main', os.getcwd()]
 
 setup(
     name='cfirewall', cmdclass=cmd,
-    ext_modules=cythonize(ext, include_path=INCLUDE_PATHS, compiler_directives=DIRECTIVES)
+    ext_modules=cythonize([api_ext, ext], include_path=INCLUDE_PATHS, compiler_directives=DIRECTIVES)
 )
 
 try:
     shutil.move(glob.glob('fw_main.*.so')[0], 'fw_main/fw_main.so')
 except:
     pass
+
+try:
+    shutil.move(glob.glob('fw_api/fw_api.*.so')[0], 'fw_api/fw_api.so')
+except:
+    pass
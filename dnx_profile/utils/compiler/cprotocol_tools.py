@@ -23,5 +23,6 @@ ext = Extension(
 
 setup(
     name='cprotocol-tools', cmdclass=cmd,
-    ext_modules=cythonize(ext, compiler_directives=DIRECTIVES)
+    # hash_trie.pxd is cimported for the domain name keys
+    ext_modules=cythonize(ext, include_path=[HOME_DIR], compiler_directives=DIRECTIVES)
 )
@@ -98,7 +98,11 @@ def receive_requests(queue_for_db: Callable[[tuple[str, str, str]], None]) -> No
         Log.debug(f'tuple reference retrieved: name->{name}, log_tuple->{log_tuple}')
 
         try:
-            log_entry = log_tuple(*data['log'])
+            # summarized messages carry a list of entries that are written as a single job
+            if ('logs' in data):
+                log_entry = [log_tuple(*log) for log in data['logs']]
+            else:
+                log_entry = log_tuple(*data['log'])
         except:
             Log.critical(f'routine lookup failure -> ({name})')
 
@@ -130,20 +130,22 @@ def infected_event(cur: Cursor, timestamp: int, log: INF_EVENT_LOG) -> bool:
 
 @db.register('geolocation', routine_type='write')
 # first arg is timestamp. this can likely go away with new DB API.
-def geo_record(cur: Cursor, _, log: GEOLOCATION_LOG) -> bool:
+# cfirewall sends summarized counts on an interval so all entries of the flush are applied together.
+def geo_record(cur: Cursor, _, logs: list[GEOLOCATION_LOG]) -> bool:
     month = ','.join(_System.date()[:2])
 
-    cur.execute(f'select * from geolocation where month=? and country=?', (month, log.cty_name))
+    entries = [(month, log.cty_name, log.dir_name, log.allowed, log.blocked) for log in logs]
 
-    existing_record = cur.fetchone()
-    # if it's the first time a country has been seen in the current month, it will be initialized with zeroes
-    if (not existing_record):
-        cur.execute(f'insert into geolocation values (?, ?, ?, ?, ?)', (month, log.cty_name, log.dir_name, 0, 0))
+    # if it's the first time a country/direction has been seen in the current month, it will be initialized with zeroes
+    cur.executemany(
+        f'insert into geolocation select ?, ?, ?, 0, 0 where not exists '
+        f'(select 1 from geolocation where month=?1 and country=?2 and direction=?3)',
+        [entry[:3] for entry in entries]
+    )
 
-    # incremented count of the specific action specified in the log. (eg. blocked, allowed)
-    cur.execute(
-        f'update geolocation set {log.act_name}={log.act_name}+1 where month=? and country=? and direction=?',
-        (month, log.cty_name, log.dir_name)
+    cur.executemany(
+        f'update geolocation set allowed=allowed+?4, blocked=blocked+?5 where month=?1 and country=?2 and direction=?3',
+        entries
     )
 
     return True
@@ -13,6 +13,7 @@ def print_help():
     print('vv, verbose2          print near excessive amounts of debug messages to the terminal')
     print('fw                    enables fw module specific output to terminal (use with v or vv)')
     print('nat                   enables nat module specific output to terminal (use with v or vv)')
+    print('bench                 measure inspection (per worker count) and verdict (per batch size) throughput then exit')
 
 
 if INITIALIZE_MODULE(LOG_NAME):
@@ -21,13 +22,13 @@ if INITIALIZE_MODULE(LOG_NAME):
     from threading import Thread
     from dataclasses import dataclass
 
-    from dnx_gentools.def_constants import MSB, LSB
+    from dnx_gentools.def_constants import CFIREWALL_SOCKET
     from dnx_gentools.def_enums import Queue, QueueType
-    from dnx_gentools.signature_operations import generate_geolocation
+    from dnx_gentools.file_operations import load_configuration, load_cfirewall_queue_count
 
     from dnx_routines.logging.log_client import Log
 
-    from fw_main import CFirewall, initialize_geolocation
+    from fw_main import CFirewall
     from fw_automate import FirewallAutomate
 
 
@@ -44,6 +45,8 @@ if INITIALIZE_MODULE(LOG_NAME):
         fw:  int = 0
         nat: int = 0
 
+        bench: int = 0
+
         @property
         def help_set(self):
             return self.h or self.help
@@ -78,29 +81,41 @@ if INITIALIZE_MODULE(LOG_NAME):
     Log.run(name=LOG_NAME)
 
 def run():
-    # ===============
-    # GEOLOCATION
-    # ===============
-    # generating py_trie for geolocation signatures, cfirewall will initialize the extension natively
-    geo_trie = generate_geolocation(Log)
+    system = load_configuration('system', cfg_type='global')
 
-    initialize_geolocation(geo_trie, MSB, LSB)
+    # iptables balances across the same queue range. (see IPTablesManager cfirewall_hook)
+    queue_count = load_cfirewall_queue_count()
 
     dnx_threads = []
     # ===============
-    # FIREWALL QUEUE
+    # FIREWALL QUEUES
     # ===============
-    dnxfirewall = CFirewall()
+    # one worker per queue, each pinned to the cpu the kernel fans that queue's packets out from.
+    # NOTE: rule and zone tables are shared by all workers so any instance can be used for control.
+    for idx in range(queue_count):
+        dnxfirewall = CFirewall()
+
+        # NOTE: bypass tells the process to invoke rule action (DROP or ACCEPT) without forwarding to security modules.
+        dnxfirewall.set_options(args.verbose_set, args.verbose2_set, args.fw_set, args.nat_set)
+        dnxfirewall.set_log_overflow(system.get('cfirewall->log_overflow', 'drop'))
+
+        error = dnxfirewall.nf_set(QueueType.FIREWALL + idx, Queue.CFIREWALL + idx, idx)
+        if (error):
+            Log.error(f'failed to set nl socket options for queue {Queue.CFIREWALL + idx}')
+            hardout()
 
-    # NOTE: bypass tells the process to invoke rule action (DROP or ACCEPT) without forwarding to security modules.
-    dnxfirewall.set_options(args.verbose_set, args.verbose2_set, args.fw_set, args.nat_set)
+        dnx_threads.append(Thread(target=dnxfirewall.nf_run))
 
-    error = dnxfirewall.nf_set(QueueType.FIREWALL, Queue.CFIREWALL)
+    # ===============
+    # CONTROL API
+    # ===============
+    # rule stats and inspection latency are queried by the webui over a local socket.
+    error = dnxfirewall.api_set(CFIREWALL_SOCKET)
     if (error):
-        Log.error(f'failed to set nl socket options for queue {Queue.CFIREWALL}')
-        hardout()
+        Log.error('failed to open the control api socket. rule stats will not be available.')
 
-    dnx_threads.append(Thread(target=dnxfirewall.nf_run))
+    else:
+        dnx_threads.append(Thread(target=dnxfirewall.api_run))
 
     # ===============
     # NAT QUEUE
@@ -118,6 +133,7 @@ def run():
 
     # initializing python processes for detecting configuration changes to zone or firewall rule sets and also handles
     # necessary calls into Cython via cfirewall reference for making the actual config change.
+    # the geolocation signature image is mapped here as well and is swapped while running if its signatures change.
     # these will run in Python threads with a potential calling into Cython.
     # these functions should be explicitly identified since they will require the gil to be acquired on the Cython side
     # or else the Python interpreter will crash.
@@ -130,6 +146,16 @@ def run():
     if (args.verbose2_set):
         fw_rule_monitor.print_active_rules()
 
+    if (args.bench):
+        for worker_count, pps in CFirewall.benchmark(queue_count, 1_000_000):
+            print(f'<[ BENCHMARK ]> workers={worker_count} pps={pps:,.0f} per_worker={pps / worker_count:,.0f}')
+
+        # every verdict should be answered with a packet not found ack. fewer did not reach the queue lookup.
+        for batch_size, sends, errors, vps in CFirewall.verdict_benchmark(1_000_000):
+            print(f'<[ BENCHMARK ]> verdict_batch={batch_size} sendto={sends:,} enoent={errors:,} vps={vps:,.0f}')
+
+        hardout()
+
     # this is running in pure C. the GIL is released before running the low-level system operations and will never
     # reacquire the gil.
     for t in dnx_threads:
@@ -1 +1 @@
-from fw_api.fw_api cimport api_open, api_recv, process_api
+from fw_api.fw_api cimport api_open, api_recv, api_send, process_api, dnxfwmsg, api_handler
@@ -1,6 +1,6 @@
 #!/usr/bin/env Cython
 
-from libc.stdint cimport uint8_t, uint32_t
+from libc.stdint cimport uint8_t, uint16_t, uint32_t
 
 cdef extern from "time.h":
     ctypedef    long time_t
@@ -53,6 +53,8 @@ cdef extern from "<sys/socket.h>":
     ssize_t  recv(int __fd, void *__buf, size_t __n, int __flags) nogil
     ssize_t  recvmsg(int socket, msghdr *message, int flags) nogil
     ssize_t  send(int socket, const void *message, size_t length, int flags) nogil
+    ssize_t  sendto(int socket, const void *message, size_t length, int flags,
+                    const sockaddr *dest_addr, socklen_t dest_len) nogil
     ssize_t  sendmsg(int socket, const msghdr *message, int flags) nogil
 
     cmsghdr *CMSG_FIRSTHDR(msghdr *mhdr) nogil
@@ -64,12 +66,14 @@ cdef extern from "<sys/socket.h>":
 
     enum: SOL_SOCKET
     enum: SO_PASSCRED
+    enum: SO_SNDBUFFORCE
     enum: SCM_CREDENTIALS
+    enum: MSG_TRUNC
 
 cdef extern from "<sys/un.h>":
     struct sockaddr_un:
-        sa_family_t   sun_family  # Address family
-        char         *sun_path    # Socket pathname
+        sa_family_t   sun_family     # Address family
+        char          sun_path[108]  # Socket pathname
 
 # ========
 # EXPORTS
@@ -81,9 +85,17 @@ cdef struct fwattacker:
 cdef struct dnxfwmsg:
     uint8_t     control
     uint8_t     id
-    uint8_t     len
+    uint16_t    len
     uint8_t    *data
 
-cdef void process_api(int fd)
+    # sender address. replies are sent here.
+    sockaddr_un addr
+    socklen_t   addr_len
+
+# returns the reply to send to the caller or None
+ctypedef object (*api_handler)(dnxfwmsg *dfm)
+
+cdef void process_api(int fd, api_handler handler)
 cdef int api_open(char* sock_path)
-cdef size_t api_recv(int fd, dnxfwmsg *dfm) # process_api wraps this and is recommended to use
\ No newline at end of file
+cdef ssize_t api_recv(int fd, dnxfwmsg *dfm) nogil # process_api wraps this and is recommended to use
+cdef int api_send(int fd, dnxfwmsg *dfm, const uint8_t *data, size_t dlen) nogil
\ No newline at end of file
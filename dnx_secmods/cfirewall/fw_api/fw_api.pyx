@@ -10,10 +10,13 @@
 # =========
 # 1. RULE_UPDATE
 # 2. ATTACKER
+# 3. RULE_STATS
+# 4. QUOTAS
 
 from libc.stdio cimport printf
-from libc.string cimport memcpy, memset
-from posix.unistd cimport close
+from libc.string cimport memcpy, memset, strncpy
+from posix.unistd cimport close, unlink, chown
+from posix.stat cimport chmod
 
 # ======================
 # SOCKET AUTHENTICATION
@@ -22,8 +25,9 @@ DEF AUTH_UNAME = 'dnx'.encode('utf-8')
 
 cdef passwd *user = getpwnam(<char*>AUTH_UNAME)
 
-UID = user.pw_uid
-GID = user.pw_gid
+# c types so the receive loop can run without the gil
+cdef uint32_t UID = user.pw_uid
+cdef uint32_t GID = user.pw_gid
 # ======================
 
 DEF OK  = 0
@@ -33,21 +37,47 @@ DEF Py_OK  = 0
 DEF Py_ERR = 1
 
 DEF FW_MSG_MAX_SIZE = 132
+DEF FW_MSG_HDR_SIZE = 2
 
+DEF FW_MSG_CMSG_SIZE = 64  # >= CMSG_SPACE(sizeof(ucred))
 
-cdef void process_api(int fd):
+# replies contain per rule data so they can be much larger than requests. root is not bound by wmem_max.
+DEF FW_REPLY_SNDBUF = 1048576
 
+# receive buffers. process_api is only run by a single thread.
+cdef uint8_t api_buf[FW_MSG_MAX_SIZE]
+cdef uint8_t api_cbuf[FW_MSG_CMSG_SIZE]
+
+
+cdef void process_api(int fd, api_handler handler):
+    '''receive, authenticate, and dispatch control messages. this will run forever.
+
+    the gil is released while waiting for a message. the handler is called with the gil held and its return value, if
+    not None, is sent back to the caller.
+    '''
     cdef:
-        size_t    dlen
+        ssize_t   dlen
         dnxfwmsg  dmsg
+        bytes     reply
 
-    dlen = api_recv(fd, &dmsg)
-    if (dlen == ERR):
-        # dis real bad, but shouldnt happen now because the thread would crash first
-        return
+    while True:
+        with nogil:
+            dlen = api_recv(fd, &dmsg)
+
+        if (dlen == ERR):
+            # dis real bad, but shouldnt happen now because the thread would crash first
+            return
 
-    # handle_packet
-    # handle_routine > // make routine file and move ips block list set there.
+        # a failed request must not take down the api
+        try:
+            reply = handler(&dmsg)
+        except Exception:
+            continue
+
+        if (reply is None):
+            continue
+
+        api_send(fd, &dmsg, <uint8_t*><char*>reply, len(reply))
 
 cdef int api_open(char* sock_path):
 
@@ -55,16 +85,23 @@ cdef int api_open(char* sock_path):
         int     sd, ret
 
         int     opt_val = 1
-        sockaddr_un addr = [AF_UNIX, sock_path]
+        int     sndbuf  = FW_REPLY_SNDBUF
+        sockaddr_un addr
 
-    # addr.sun_family = AF_UNIX
-    # addr.sun_path   = sock_path
+    memset(&addr, 0, sizeof(sockaddr_un))
+
+    addr.sun_family = AF_UNIX
+    strncpy(addr.sun_path, sock_path, sizeof(addr.sun_path) - 1)
 
     sd = socket(AF_UNIX, SOCK_DGRAM, 0)
     if (sd == ERR):
         return ERR
 
     setsockopt(sd, SOL_SOCKET, SO_PASSCRED, <void*>&opt_val, sizeof(opt_val))
+    setsockopt(sd, SOL_SOCKET, SO_SNDBUFFORCE, <void*>&sndbuf, sizeof(sndbuf))
+
+    # a socket file left over from a previous run would fail the bind
+    unlink(sock_path)
 
     ret = bind(sd, <sockaddr*>&addr, sizeof(sockaddr_un))
     if (ret == ERR):
@@ -72,12 +109,17 @@ cdef int api_open(char* sock_path):
 
         return ERR
 
+    # the service runs as root, but callers run as the dnx user.
+    chown(sock_path, UID, GID)
+    chmod(sock_path, 0o660)
+
     return sd
 
-cdef size_t api_recv(int fd, dnxfwmsg *dfm):
+cdef ssize_t api_recv(int fd, dnxfwmsg *dfm) nogil:
 
     cdef:
         msghdr      msg
+        iovec       iov
         cmsghdr    *cmsg
         ucred       auth
 
@@ -87,11 +129,26 @@ cdef size_t api_recv(int fd, dnxfwmsg *dfm):
     # RECEIVE LOOP
     # -------------
     # loop will return to caller on successfully authenticated and parsed message.
-    # ERR is returned if the loop breaks without returning (currently not possible)
+    # ERR is returned if the socket fails.
     while True:
+        memset(&msg, 0, sizeof(msghdr))
+
+        iov.iov_base = <void*>api_buf
+        iov.iov_len  = FW_MSG_MAX_SIZE
+
+        msg.msg_name       = <void*>&dfm.addr
+        msg.msg_namelen    = sizeof(sockaddr_un)
+        msg.msg_iov        = &iov
+        msg.msg_iovlen     = 1
+        msg.msg_control    = <void*>api_cbuf
+        msg.msg_controllen = FW_MSG_CMSG_SIZE
+
         dlen = recvmsg(fd, &msg, 0)
+        if (dlen == ERR):
+            return ERR
 
-        if (dlen >= FW_MSG_MAX_SIZE):
+        # oversized messages are truncated by the kernel and are discarded
+        if (dlen < FW_MSG_HDR_SIZE or msg.msg_flags & MSG_TRUNC):
             continue
 
         cmsg = CMSG_FIRSTHDR(&msg)
@@ -99,8 +156,8 @@ cdef size_t api_recv(int fd, dnxfwmsg *dfm):
             continue
 
         # TODO: see if dnx auth header will always be first. if not adjust accordingly.
-        if (cmsg.cmsg_type != SCM_CREDENTIALS):
-            printf(<char*>'CONTINUE - not scm_creds')
+        if (cmsg.cmsg_level != SOL_SOCKET or cmsg.cmsg_type != SCM_CREDENTIALS):
+            printf(<char*>'CONTINUE - not scm_creds\n')
             continue
 
         memcpy(&auth, CMSG_DATA(cmsg), sizeof(ucred))
@@ -117,11 +174,13 @@ cdef size_t api_recv(int fd, dnxfwmsg *dfm):
         # ----------------------
         # DEFINE CALLERS STRUCT
         # ----------------------
-        dfm.control = (<uint8_t*>msg.msg_iov.iov_base)[0]
-        dfm.id      = (<uint8_t*>msg.msg_iov.iov_base)[1]
-        dfm.data    = <uint8_t*>(<uint8_t*>msg.msg_iov.iov_base)[2]
+        dfm.control  = api_buf[0]
+        dfm.id       = api_buf[1]
+        dfm.data     = &api_buf[FW_MSG_HDR_SIZE]
+        dfm.len      = <uint16_t>(dlen - FW_MSG_HDR_SIZE)
+        dfm.addr_len = msg.msg_namelen
 
-        return msg.msg_iov.iov_len - 2
+        return dfm.len
 
         # shouldn't need additional headers as long as CREDS are in first header.
         # while True:
@@ -129,4 +188,15 @@ cdef size_t api_recv(int fd, dnxfwmsg *dfm):
         #     if (cmsg == NULL):
         #         continue
 
-    return ERR
\ No newline at end of file
+    return ERR
+
+cdef int api_send(int fd, dnxfwmsg *dfm, const uint8_t *data, size_t dlen) nogil:
+
+    # unbound senders do not have an address, so they cannot receive a reply.
+    if (dfm.addr_len <= sizeof(sa_family_t)):
+        return ERR
+
+    if (sendto(fd, <void*>data, dlen, 0, <sockaddr*>&dfm.addr, dfm.addr_len) == ERR):
+        return ERR
+
+    return OK
@@ -1,17 +0,0 @@
-#!/usr/bin/env Cython
-
-cdef extern from "pthread.h" nogil:
-    ctypedef struct pthread_mutex_t:
-        pass
-
-    int pthread_mutex_init(pthread_mutex_t*, void*)
-    int pthread_mutex_lock(pthread_mutex_t*)
-    int pthread_mutex_trylock(pthread_mutex_t*)
-    int pthread_mutex_unlock(pthread_mutex_t*)
-    int pthread_mutex_destroy(pthread_mutex_t*)
-
-cdef extern from "netinet/in.h":
-    uint32_t ntohl (uint32_t __netlong) nogil
-    uint16_t ntohs (uint16_t __netshort) nogil
-    uint32_t htonl (uint32_t __hostlong) nogil
-    uint16_t htons (uint16_t __hostshort) nogil
\ No newline at end of file
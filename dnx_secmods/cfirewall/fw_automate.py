@@ -7,12 +7,18 @@ import threading
 from array import array
 
 from dnx_gentools.def_typing import *
-from dnx_gentools.def_constants import ppt
-from dnx_gentools.standard_tools import Initialize
+from dnx_gentools.def_constants import ppt, ONE_HOUR, ONE_MIN, LAN_IN
+from dnx_gentools.standard_tools import looper, Initialize
 from dnx_gentools.file_operations import cfg_read_poller, load_configuration
+from dnx_gentools.signature_operations import compile_geolocation
+
+from dnx_iptools.cprotocol_tools import iptoi
+from dnx_iptools.hash_trie import PrefixTrie_Range
 
 from dnx_routines.logging.log_client import Log
 
+from fw_main import initialize_geolocation
+
 # ===============
 # TYPING IMPORTS
 # ===============
@@ -33,7 +39,12 @@ class FirewallAutomate:
 
         'BEFORE', 'MAIN', 'AFTER',
 
-        'PRE_ROUTE', 'POST_ROUTE'
+        'PRE_ROUTE', 'POST_ROUTE',
+
+        # quota sources
+        '_quotas', '_restriction', '_ip_whitelist', '_quota_lock',
+
+        '_geo_source'
     )
 
     def __init__(self, log: LogHandler_T, /, *, cfirewall: CFirewall):
@@ -50,6 +61,14 @@ class FirewallAutomate:
         self.PRE_ROUTE:  dict = {}
         self.POST_ROUTE: dict = {}
 
+        self._quotas:       dict = {}
+        self._restriction:  dict = {}
+        self._ip_whitelist: list = []
+        self._quota_lock = threading.Lock()
+
+        # signature source fingerprint of the active geolocation image
+        self._geo_source: int = 0
+
         # reference to extension CFirewall, which handles nfqueue and initial packet rcv. # we will use this
         # reference to modify rules objects which will be internally accessed by the inspection function callbacks
         self.cfirewall: CFirewall = cfirewall
@@ -73,8 +92,33 @@ class FirewallAutomate:
         threading.Thread(target=self._monitor_system_rules).start()
         threading.Thread(target=self._monitor_standard_rules).start()
         threading.Thread(target=self._monitor_nat_rules).start()
+        threading.Thread(target=self._monitor_quotas).start()
+        threading.Thread(target=self._monitor_time_restriction).start()
+        threading.Thread(target=self._monitor_ip_whitelist).start()
+        threading.Thread(target=self._monitor_geolocation).start()
 
-        self._initialize.wait_for_threads(count=4)
+        self._initialize.wait_for_threads(count=8)
+
+    @looper(ONE_MIN)
+    def _monitor_geolocation(self) -> None:
+        '''Compiles the geolocation signature image if its sources have changed and maps it into cfirewall.
+
+        cfirewall swaps the new trie in without pausing inspection and unmaps the previous one once it is unused.
+        '''
+        image_path: str = compile_geolocation(Log)
+
+        image_info = PrefixTrie_Range.image_info(image_path)
+        if (image_info and image_info[0] != self._geo_source):
+
+            error: int = initialize_geolocation(image_path)
+            if (error):
+                Log.error('Geolocation signature image could not be mapped in CFirewall.')
+            else:
+                Log.notice('Geolocation signatures updated successfully.')
+
+                self._geo_source = image_info[0]
+
+        self._initialize.done()
 
     @cfg_read_poller('zone', ext='firewall', filepath='dnx_profile/iptables')
     # zone int values are arbitrary / randomly selected on zone creation.
@@ -198,3 +242,79 @@ class FirewallAutomate:
                 Log.notice(f'NAT rule group ({rule_group}) updated successfully.')
 
         self._initialize.done()
+
+    @cfg_read_poller('quota', ext='firewall', filepath='dnx_profile/iptables')
+    def _monitor_quotas(self, loaded_quotas: ConfigChain) -> None:
+        '''Monitors the quota file for changes and loads updates to cfirewall.
+
+        host -> {"window": [start, length], "bytes": int, "conns": int, "period": int}
+        zone -> same as host, keyed by zone id
+        window start is seconds after local midnight and length is in seconds. a limit of 0 is unlimited.
+        '''
+        self._quotas = loaded_quotas.get_dict()
+
+        self._push_quotas()
+
+        self._initialize.done()
+
+    @cfg_read_poller('global', cfg_type='security/ip')
+    def _monitor_time_restriction(self, proxy_settings: ConfigChain) -> None:
+        '''Monitors the lan time restriction settings, which are enforced as a time window on the lan zone quota.
+        '''
+        self._restriction = proxy_settings.get_dict('time_restriction')
+
+        self._push_quotas()
+
+        self._initialize.done()
+
+    @cfg_read_poller('whitelist', cfg_type='global')
+    def _monitor_ip_whitelist(self, whitelist: ConfigChain) -> None:
+        '''Monitors the ip whitelist. whitelisted hosts are exempt from the lan time restriction.
+        '''
+        self._ip_whitelist = [ip for ip, wl_info in whitelist.get_items('ip_bypass') if wl_info['type'] == 'ip']
+
+        self._push_quotas()
+
+        self._initialize.done()
+
+    def _push_quotas(self) -> None:
+        '''converts the quota sources to cfirewall format and publishes them as the active quota table.
+
+        quota counters are kept by cfirewall and are not affected by rule pushes.
+        '''
+        quotas: list[list[int]] = []
+
+        with self._quota_lock:
+            for quota_type, section in [(1, 'HOST'), (2, 'ZONE')]:
+                for key, quota in self._quotas.get(section, {}).items():
+
+                    key = iptoi(key) if quota_type == 1 else int(key)
+                    quotas.append([
+                        quota_type, key, *quota.get('window', [0, 0]),
+                        quota.get('bytes', 0), quota.get('conns', 0), quota.get('period', 0)
+                    ])
+
+            if (self._restriction.get('enabled')):
+                hour, minutes = [int(t) for t in self._restriction['start'].split(':')]
+                window = [(hour * ONE_HOUR) + (minutes * 60), self._restriction['length']]
+
+                # a configured lan zone quota gets the window applied to it
+                for quota in quotas:
+                    if (quota[:2] == [2, LAN_IN]):
+                        quota[2:4] = window
+                        break
+                else:
+                    quotas.append([2, LAN_IN, *window, 0, 0, 0])
+
+                # hosts without their own quota are exempted. cfirewall keeps the first quota for a host.
+                quotas.extend([[1, iptoi(ip), 0, 0, 0, 0, 0] for ip in self._ip_whitelist])
+
+            log_settings: ConfigChain = load_configuration('logging_client', cfg_type='global')
+
+            utc_offset = int(f'{log_settings["time_offset->direction"]}{log_settings["time_offset->amount"]}') * ONE_HOUR
+
+            error = self.cfirewall.update_quotas(quotas, utc_offset)
+            if (error):
+                Log.error('Quota update failure in CFirewall.')
+            else:
+                Log.notice(f'Quotas updated successfully. ({len(quotas)})')
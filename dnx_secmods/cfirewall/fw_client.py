@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+
+from __future__ import annotations
+
+import json
+
+from socket import socket, AF_UNIX, SOCK_DGRAM, SOL_SOCKET, SCM_CREDENTIALS
+from struct import Struct
+from threading import Lock
+
+from dnx_gentools.def_typing import *
+from dnx_gentools.def_constants import CFIREWALL_SOCKET, DNX_AUTHENTICATION
+
+__all__ = (
+    'FirewallAPI',
+)
+
+# control api (see cfirewall fw_api)
+API_INFORM: int = 1
+API_SET:    int = 2
+API_UNSET:  int = 3
+
+API_ATTACKER:   int = 2
+API_RULE_STATS: int = 3
+API_QUOTAS:     int = 4
+
+API_TIMEOUT:    float = .5
+API_REPLY_SIZE: int = 1048576
+
+QUOTA_FIELDS: tuple[str, ...] = (
+    'type', 'key', 'window_start', 'window_len', 'max_bytes', 'max_conns', 'period',
+    'bytes', 'conns', 'drops', 'restricted'
+)
+
+_api_header: Callable[[int, int], bytes] = Struct('>2B').pack
+_api_host: Callable[[int], bytes] = Struct('>L').pack
+_api_block: Callable[[int, int, int], bytes] = Struct('>3L').pack
+
+
+class FirewallAPI:
+    '''client side of the cfirewall control socket.
+
+    set and unset messages are fire and forget over a shared socket. inform messages are sent from a short-lived
+    autobound socket so cfirewall has an address to reply to.
+    '''
+    _send_sock: Optional[socket] = None
+    _send_lock: Lock = Lock()
+
+    @classmethod
+    def block_host(cls, host: int, timestamp: int, duration: int) -> bool:
+        '''add host to the cfirewall attacker blocklist.
+
+        packets sourced from the host will be dropped before rule inspection until timestamp + duration.
+        '''
+        return cls._send(_api_header(API_SET, API_ATTACKER) + _api_block(host, timestamp, duration))
+
+    @classmethod
+    def unblock_host(cls, host: int) -> bool:
+        '''remove host from the cfirewall attacker blocklist.
+        '''
+        return cls._send(_api_header(API_UNSET, API_ATTACKER) + _api_host(host))
+
+    @classmethod
+    def blocked_hosts(cls) -> tuple[list[tuple[int, int, int]], int]:
+        '''returns the hosts in the attacker blocklist as (host, blocked, expire) and the total blocklist drops.
+
+        empty results are returned if cfirewall is not reachable.
+        '''
+        reply = cls._request(_api_header(API_INFORM, API_ATTACKER))
+        if (not reply):
+            return [], 0
+
+        return [tuple(host) for host in reply['hosts']], reply['drops']
+
+    @classmethod
+    def rule_stats(cls, section_idx: int) -> tuple[dict[str, tuple[int, int]], list[int]]:
+        '''returns the hit and byte counters of the active ruleset by rule name and the inspection latency histogram.
+
+        empty results are returned if cfirewall is not reachable.
+        '''
+        reply = cls._request(_api_header(API_INFORM, API_RULE_STATS) + bytes([section_idx]))
+        if (not reply):
+            return {}, []
+
+        return {name: (hits, nbytes) for name, hits, nbytes in reply['rules']}, reply['latency']
+
+    @classmethod
+    def quotas(cls) -> list[dict[str, Any]]:
+        '''returns the configuration and current counters of each quota enforced by cfirewall.
+
+        counters are for the current period. an empty list is returned if cfirewall is not reachable.
+        '''
+        reply = cls._request(_api_header(API_INFORM, API_QUOTAS))
+        if (not reply):
+            return []
+
+        return [
+            dict(zip(QUOTA_FIELDS, quota)) for quota in reply['quotas']
+        ]
+
+    @classmethod
+    def _send(cls, msg: bytes) -> bool:
+        with cls._send_lock:
+            try:
+                if (not cls._send_sock):
+                    cls._send_sock = socket(AF_UNIX, SOCK_DGRAM)
+
+                cls._send_sock.sendmsg([msg], [(SOL_SOCKET, SCM_CREDENTIALS, DNX_AUTHENTICATION)], 0, CFIREWALL_SOCKET)
+
+            except OSError:
+                return False
+
+        return True
+
+    @staticmethod
+    def _request(msg: bytes) -> dict:
+        try:
+            with socket(AF_UNIX, SOCK_DGRAM) as api_sock:
+                # autobind gives the socket an address so cfirewall can reply
+                api_sock.bind('')
+                api_sock.settimeout(API_TIMEOUT)
+
+                api_sock.sendmsg([msg], [(SOL_SOCKET, SCM_CREDENTIALS, DNX_AUTHENTICATION)], 0, CFIREWALL_SOCKET)
+
+                return json.loads(api_sock.recv(API_REPLY_SIZE))
+
+        except (OSError, ValueError):
+            return {}
@@ -14,6 +14,8 @@ from dnx_routines.logging.log_client import Log
 
 from dnx_webui.source.object_manager import FWObjectManager
 
+from dnx_secmods.cfirewall.fw_client import FirewallAPI
+
 
 DEFAULT_VERSION: str = 'pending'
 DEFAULT_PATH:    str = 'dnx_profile/iptables'
@@ -144,6 +146,15 @@ class FirewallControl:
         except:
             return 0
 
+    @classmethod
+    def rule_stats(cls, section: str = 'MAIN') -> tuple[dict[str, tuple[int, int]], list[int]]:
+        '''returns the hit and byte counters of the active ruleset by rule name and the inspection latency histogram.
+
+        counters are reset when the section is pushed. bucket n of the histogram counts inspections taking
+        [2^n, 2^(n+1)) nanoseconds. empty results are returned if cfirewall is not reachable.
+        '''
+        return FirewallAPI.rule_stats(cls.sections.index(section) + 1)
+
     @staticmethod
     def is_pending_changes():
         active = calculate_file_hash('active_copy.firewall', folder='iptables/usr')
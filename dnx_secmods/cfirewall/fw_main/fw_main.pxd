@@ -1,6 +1,6 @@
 #!/usr/bin/env Cython
 
-from libc.stdint cimport uint8_t, uint16_t, uint32_t, uint64_t
+from libc.stdint cimport uint8_t, uint16_t, uint32_t, uint64_t, int32_t
 from posix.types cimport pid_t
 
 # LIBMNL && LIBNETFILTER_QUEUE SOURCE FILES
@@ -192,6 +192,7 @@ cdef extern from "rules.h" nogil:
         uintf8_t    len
         uintf8_t    objects[FIELD_MAX_ZONES]
 
+    # NOTE: the network list pointer is set through netobject_set_list and is intentionally not declared here.
     struct NetObject:
         uintf8_t    type
         uintf32_t   netid
@@ -261,11 +262,10 @@ cdef extern from "rules.h" nogil:
 
 cdef extern from "cfirewall.h" nogil:
     enum: FW_MAX_ZONES # define
+    enum: FW_MAX_WORKERS
+    enum: NL_SOCKET_COUNT
 
-    mnl_socket     *nl[2]
-
-    uint32_t        MSB, LSB
-    int             HTR_IDX
+    mnl_socket     *nl[NL_SOCKET_COUNT]
 
     # cli args
     bool            VERBOSE
@@ -279,16 +279,86 @@ cdef extern from "cfirewall.h" nogil:
     struct cfdata:
         uintf8_t    idx
         uint32_t    queue
+        intf16_t    cpu
 
         mnl_cb_t    queue_cb
 
+    int cfirewall_set_cpu(intf16_t cpu)
+
+cdef extern from "traffic_log.h" nogil:
+    enum: FW_LOG_IDX
+    enum: LOG_OVERFLOW_DROP
+    enum: LOG_OVERFLOW_BLOCK
+
+    void log_set_overflow(uintf8_t policy)
+    void log_stats(int logger_idx, uint64_t *written, uint64_t *discarded)
+
+cdef extern from "dnx_nfq.h" nogil:
+    enum: VERDICT_BATCH_MAX
+
+    int     dnx_verdict_batch_init(cfdata *cfd, uintf16_t limit)
+    ssize_t dnx_queue_recv(cfdata *cfd, void *buf, size_t len)
+    double  dnx_verdict_bench(uintf16_t limit, uint32_t pkt_count, uint64_t *sends, uint64_t *errors)
+
+cdef extern from "blocklist.h" nogil:
+    enum: BLOCKLIST_MAX
+
+    struct BlockedHost:
+        uint32_t    host
+        uint32_t    blocked
+        uint32_t    expire
+
+    int  blocklist_add(uint32_t host, uint32_t blocked, uint32_t expire)
+    int  blocklist_remove(uint32_t host)
+    uintf16_t blocklist_hosts(BlockedHost *hosts, uintf16_t max)
+    uint64_t  blocklist_drops()
+
+cdef extern from "match.h" nogil:
+    int  netobject_set_list(NetObject *net, uint32_t *starts, uint32_t *ends, uintf32_t len)
+
+cdef extern from "quota.h" nogil:
+    enum: QUOTA_MAX
+
+    struct QuotaConfig:
+        uint8_t     type
+        uint32_t    key
+        uint32_t    window_start
+        uint32_t    window_len
+        uint64_t    max_bytes
+        uint32_t    max_conns
+        uint32_t    period
+
+    struct QuotaState:
+        QuotaConfig cfg
+        uint64_t    bytes
+        uint32_t    conns
+        uint64_t    drops
+        bool        restricted
+
 cdef extern from "firewall.h" nogil:
+    enum: FW_TABLE_COUNT
+    enum: HTR_NONE
+    enum: FW_LATENCY_BUCKETS
+
+    struct FWrulecount:
+        char        name[33]
+        uint64_t    hits
+        uint64_t    bytes
+
+    const uintf16_t FW_MAX_RULE_COUNTS[FW_TABLE_COUNT]
+
     void firewall_init()
     int  firewall_stage_count(uintf8_t table, uintf16_t rule_count)
     int  firewall_stage_rule(uintf8_t table, uintf16_t idx, FWrule *rule)
     int  firewall_push_rules(uintf8_t table_idx)
     int  firewall_recv(const nlmsghdr *nlh, void *data)
     int  firewall_push_zones(ZoneMap *zone_map)
+    double firewall_bench(uintf8_t workers, uint32_t pkt_count)
+    uintf16_t firewall_stats(uintf8_t cntrl_list, FWrulecount *counts, uintf16_t max)
+    void firewall_latency(uint64_t *buckets)
+    int  firewall_push_quotas(QuotaConfig *cfgs, uintf16_t len, int32_t utc_offset)
+    uintf16_t firewall_quotas(QuotaState *states, uintf16_t max)
+    int  firewall_push_geolocation(int htr_idx, int *old_idx)
 
 # cdef extern from "nat.h" nogil:
 #     void nat_init()
@@ -309,20 +379,28 @@ cdef class CFirewall:
 
         uint8_t queue_idx
 
-# HTR_List > HTR_L1 > HTR_L2
-cdef public struct HTR_L1:
-    size_t      len
-    HTR_L2     *multi_val
-
-cdef public struct HTR_L2:
-    uint32_t    key
-    uint32_t    netid
-    uint32_t    bcast
-    uint8_t     country
-
+# HTR_Slot > leaf pushed prefix trie with 16-8-8 strides. the root resolves the first 16 bits of the host and each chunk
+# the next 8. an entry is either the country or HTR_NODE | the index of the next chunk.
 cdef public struct HTR_Slot:
-    size_t      len
-    HTR_L1     *keys
+    uint32_t   *root
+    uint32_t   *chunks
+    uint32_t    chunk_count
+    void       *map_base
+    size_t      map_len
+
+# precompiled image header (see dnx_iptools/hash_trie/hash_trie.pxd)
+cdef struct HTR_ImageHeader:
+    char        magic[8]
+    uint16_t    version
+    uint16_t    trie_type
+    uint32_t    entry_size
+    uint64_t    hash_k0
+    uint64_t    hash_k1
+    uint64_t    source_id
+    uint32_t    max_width
+    uint32_t    entry_count
+    uint64_t    buckets_offset
+    uint64_t    entries_offset
 
 # TODO/NOTE: the function cname alias is required due to a Cython bug (fixed in Cython 3.0.0 alpha 12)
-cdef public uint8_t htr_search "htr_search"(int trie_idx, uint32_t trie_key, uint32_t host_id) nogil
+cdef public uint8_t htr_search "htr_search"(int trie_idx, uint32_t host) nogil
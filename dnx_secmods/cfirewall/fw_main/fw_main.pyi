@@ -1,16 +1,24 @@
 from array import array
 
-def initialize_geolocation(hash_trie: list, msb: int, lsb: int) -> int: ...
+def initialize_geolocation(image_path: str) -> int: ...
 
 
 class CFirewall:
 
     def set_options(self, verbose: int, verbose2: int, fw: int, nat: int) -> None: ...
+    def set_log_overflow(self, policy: str) -> None: ...
+    def get_log_stats(self) -> tuple[int, int]: ...
+    def api_set(self, sock_path: str) -> int: ...
+    def api_run(self) -> None: ...
     def nf_run(self) -> None: ...
-    def nf_set(self, queue_num: int, queue_type: int) -> int: ...
+    def nf_set(self, queue_idx: int, queue_num: int, cpu: int = -1) -> int: ...
     def nl_open(self) -> int: ...
     def nl_bind(self) -> int: ...
     def nl_break(self) -> int: ...
     def update_rules(s, table_type: int, table_idx: int, ruleset: list) -> int: ...
     def update_zones(self, zone_map: list) -> int: ...
-    def remove_blockedlist(self, host_ip: int) -> int: ...
+    def update_quotas(self, quotas: list[list[int]], utc_offset: int) -> int: ...
+    @staticmethod
+    def benchmark(workers: int, pkt_count: int) -> list[tuple[int, float]]: ...
+    @staticmethod
+    def verdict_benchmark(pkt_count: int) -> list[tuple[int, int, int, float]]: ...
@@ -1,11 +1,14 @@
  #!/usr/bin/env Cython
 
 from libc.string cimport memset, strncpy
+from libc.stdlib cimport malloc, free
 from libc.stdio cimport printf, perror
 
 from libc.stdint cimport uint8_t, uint16_t, uint32_t
 
-# from fw_api cimport api_open, process_api
+from fw_api cimport api_open, process_api, dnxfwmsg
+
+import json
 
 # ===============================
 # VERBOSE T-SHOOT ASSISTANCE
@@ -14,8 +17,6 @@ from pprint import PrettyPrinter
 ppt = PrettyPrinter(sort_dicts=False).pprint
 # ===============================
 
-DEF FW_MAX_ATTACKERS  = 250
-
 # function return values
 DEF OK  = 0
 DEF ERR = -1
@@ -31,16 +32,8 @@ DEF SVC_RANGE = 2
 DEF SVC_LIST  = 3
 DEF SVC_ICMP  = 4
 
-# Blocked list access lock
-# ----------------------------------
-# cdef pthread_mutex_t FWblocklistlock
-
-# pthread_mutex_init(&FWblocklistlock, NULL)
-
-# stores the active attackers set/controlled by IPS/IDS
-# cdef uint32_t *ATTACKER_BLOCKLIST = <uint32_t*>calloc(FW_MAX_ATTACKERS, sizeof(uint32_t))
-
-# cdef uint32_t BLOCKLIST_CUR_SIZE = 0 # if we decide to track size for appends
+# network object types (list only).
+DEF IP_NET_LIST = 4
 
 # MNL_SOCKET_BUFFER_SIZE ~= 8192
 DEF DNX_BUF_SIZE = 2048  # (will only handle packets of standard 1500 MTU)
@@ -49,6 +42,15 @@ DEF MNL_BUF_SIZE = 6144  # DNX_BUF_SIZE + (8192 / 2)
 DEF QFIREWALL = 0
 DEF QNAT      = 1
 
+# control api (see fw_api)
+DEF API_INFORM     = 1
+DEF API_SET        = 2
+DEF API_UNSET      = 3
+
+DEF API_ATTACKER   = 2
+DEF API_RULE_STATS = 3
+DEF API_QUOTAS     = 4
+
 # ===================================
 # Netfilter Communication Pipeline
 # ===================================
@@ -83,10 +85,15 @@ cdef int process_traffic(cfdata *cfd) nogil:
 
         uint32_t    portid = mnl_socket_get_portid(nl[cfd.idx])
 
-    printf("<ready to process traffic for Queue(%u)(%u)>\n", portid, cfd.queue)
+    # each queue worker runs on its own cpu. the kernel fans packets out to the queues by cpu (queue-cpu-fanout).
+    if (cfd.cpu >= 0 and cfirewall_set_cpu(cfd.cpu) == ERR):
+        printf("<failed to set cpu affinity for Queue(%u)(%u)>\n", portid, cfd.queue)
+
+    printf("<ready to process traffic for Queue(%u)(%u) on cpu(%d)>\n", portid, cfd.queue, cfd.cpu)
 
     while True:
-        dlen = mnl_socket_recvfrom(nl[cfd.idx], <void*>packet_buf, MNL_BUF_SIZE)
+        # pending verdicts are flushed here once the socket has no more packets waiting
+        dlen = dnx_queue_recv(cfd, <void*>packet_buf, MNL_BUF_SIZE)
         if (dlen == -1):
             return ERR
 
@@ -94,13 +101,138 @@ cdef int process_traffic(cfdata *cfd) nogil:
         if (ret < 0):
             return ERR
 
+# =====================================
+# CONTROL API
+# =====================================
+cdef object api_handler(dnxfwmsg *dfm):
+    '''returns the reply for a control api request or None if the request is not supported.
+    '''
+    if (dfm.control == API_INFORM and dfm.id == API_RULE_STATS):
+
+        # data -> [control list idx]
+        if (dfm.len < 1 or dfm.data[0] >= FW_TABLE_COUNT):
+            return None
+
+        return rule_stats(dfm.data[0])
+
+    elif (dfm.id == API_ATTACKER):
+        return attacker_control(dfm)
+
+    elif (dfm.control == API_INFORM and dfm.id == API_QUOTAS):
+        return quota_stats()
+
+    return None
+
+cdef bytes attacker_control(dnxfwmsg *dfm):
+    '''add, remove, or list hosts in the attacker blocklist.
+
+    SET data -> host (4) | blocked timestamp (4) | duration (4), all network order.
+    UNSET data -> host (4)
+    INFORM replies with the blocked hosts as json.
+    '''
+    cdef:
+        uint32_t        host, blocked
+        uintf16_t       i, count
+        BlockedHost    *hosts
+
+        list            host_list = []
+
+    if (dfm.control == API_SET and dfm.len >= 12):
+        host    = ntohl((<uint32_t*>dfm.data)[0])
+        blocked = ntohl((<uint32_t*>dfm.data)[1])
+
+        if (blocklist_add(host, blocked, blocked + ntohl((<uint32_t*>dfm.data)[2])) == ERR):
+            print(f'<attacker blocklist full. {host} not blocked>')
+
+    elif (dfm.control == API_UNSET and dfm.len >= 4):
+        blocklist_remove(ntohl((<uint32_t*>dfm.data)[0]))
+
+    elif (dfm.control == API_INFORM):
+        hosts = <BlockedHost*>malloc(BLOCKLIST_MAX * sizeof(BlockedHost))
+        if (hosts == NULL):
+            return None
+
+        count = blocklist_hosts(hosts, BLOCKLIST_MAX)
+        for i in range(count):
+            host_list.append([hosts[i].host, hosts[i].blocked, hosts[i].expire])
+
+        free(hosts)
+
+        return json.dumps({'hosts': host_list, 'drops': blocklist_drops()}).encode('utf-8')
+
+    return None
+
+cdef bytes rule_stats(uintf8_t cntrl_list):
+    '''json encoded hit/byte counters of each rule in the control list, summed across all workers, followed by the
+    inspection latency histogram.
+
+    rules are identified by name and only rules with hits are included. latency bucket n counts inspections taking
+    [2^n, 2^(n+1)) nanoseconds.
+    '''
+    cdef:
+        uintf16_t       i, count
+        FWrulecount    *counts
+        uint64_t        buckets[FW_LATENCY_BUCKETS]
+
+        list            rules = []
+
+    counts = <FWrulecount*>malloc(FW_MAX_RULE_COUNTS[cntrl_list] * sizeof(FWrulecount))
+    if (counts == NULL):
+        return None
+
+    with nogil:
+        count = firewall_stats(cntrl_list, counts, FW_MAX_RULE_COUNTS[cntrl_list])
+        firewall_latency(buckets)
+
+    for i in range(count):
+        if (counts[i].hits):
+            rules.append([(<bytes>counts[i].name).decode('utf-8', 'replace'), counts[i].hits, counts[i].bytes])
+
+    free(counts)
+
+    return json.dumps({
+        'rules': rules, 'latency': [buckets[i] for i in range(FW_LATENCY_BUCKETS)]
+    }).encode('utf-8')
+
+cdef bytes quota_stats():
+    '''json encoded configuration and current counters of each quota in the active quota table.
+
+    quota -> [type, key, window start, window length, max bytes, max conns, period, bytes, conns, drops, restricted]
+    '''
+    cdef:
+        uintf16_t       i, count
+        QuotaState     *states
+
+        list            quotas = []
+
+    states = <QuotaState*>malloc(QUOTA_MAX * sizeof(QuotaState))
+    if (states == NULL):
+        return None
+
+    with nogil:
+        count = firewall_quotas(states, QUOTA_MAX)
+
+    for i in range(count):
+        quotas.append([
+            states[i].cfg.type, states[i].cfg.key, states[i].cfg.window_start, states[i].cfg.window_len,
+            states[i].cfg.max_bytes, states[i].cfg.max_conns, states[i].cfg.period,
+            states[i].bytes, states[i].conns, states[i].drops, <bint>states[i].restricted
+        ])
+
+    free(states)
+
+    return json.dumps({'quotas': quotas}).encode('utf-8')
+
 # =====================================
 # CALLBACK STRUCTURES + TABLE INIT
 # =====================================
-cdef cfdata cfds[2]
+cdef cfdata cfds[NL_SOCKET_COUNT]
+
+# firewall workers occupy idx 0 through FW_MAX_WORKERS - 1
+for _idx in range(FW_MAX_WORKERS):
+    cfds[_idx].queue_cb = firewall_recv
 
-cfds[0].queue_cb = firewall_recv
-# cfds[1].queue_cb = nat_recv
+# cfds[NL_NAT_IDX].queue_cb = nat_recv
 
 firewall_init()
 # nat_init()
@@ -135,19 +267,39 @@ cdef class CFirewall:
         if (nat):
             print('<nat verbose console logging enabled>')
 
-    # def api_set(s, unicode sock_path):
-    #
-    #     cdef:
-    #         bytes   _sock_path = sock_path.encode('utf-8')
-    #
-    #     s.sock_path = <char*>_sock_path
-    #     s.api_fd = api_open(s.sock_path)
+    def set_log_overflow(s, unicode policy):
+        '''sets the action taken when a worker's traffic log ring is full.
+
+        drop: the record is discarded and counted (default). block: the worker waits for the log writer.
+        '''
+        log_set_overflow(LOG_OVERFLOW_BLOCK if policy == 'block' else LOG_OVERFLOW_DROP)
+
+    def get_log_stats(s):
+        '''returns (written, discarded) traffic log record counts summed across all workers.
+        '''
+        cdef uint64_t written, discarded
+
+        log_stats(FW_LOG_IDX, &written, &discarded)
+
+        return written, discarded
+
+    def api_set(s, unicode sock_path):
+        '''opens the control api unix socket. callers must authenticate as the dnx user.
+        '''
+        cdef:
+            bytes   _sock_path = sock_path.encode('utf-8')
+
+        s.api_fd = api_open(<char*>_sock_path)
+
+        return Py_OK if s.api_fd != ERR else Py_ERR
 
-    # def api_run(s):
-    #     print('<releasing GIL>')
-    #     # release gil and never look back.
-    #     #with nogil:
-    #     process_api(s.api_fd)
+    def api_run(s):
+        '''processes control api requests. this call will run forever.
+
+        the GIL is released while waiting for a request and reacquired to build the reply.
+        '''
+        print('<ready to process control api requests>')
+        process_api(s.api_fd, api_handler)
 
     def nf_run(s):
         '''calls internal C run method to engage nfqueue processes.
@@ -166,16 +318,26 @@ cdef class CFirewall:
         if (ret == ERR):
             perror(msg.encode('utf-8'))
 
-    def nf_set(s, uint8_t queue_idx, uint16_t queue_num):
+    def nf_set(s, uint8_t queue_idx, uint16_t queue_num, intf16_t cpu=-1):
+        '''binds the instance to an nfqueue. each firewall worker must use a unique queue_idx < FW_MAX_WORKERS.
+
+        if cpu is set, the worker thread will be pinned to that cpu when nf_run is called.
+        '''
+        if (queue_idx >= NL_SOCKET_COUNT):
+            return Py_ERR
 
         s.queue_idx = queue_idx
         cfds[queue_idx].idx = queue_idx
         cfds[queue_idx].queue = queue_num
+        cfds[queue_idx].cpu = cpu
 
         # initializing nl socket for communication
         nl_open(&nl[queue_idx])
         nl_bind(nl[queue_idx])
 
+        if (dnx_verdict_batch_init(&cfds[queue_idx], VERDICT_BATCH_MAX) == ERR):
+            return Py_ERR
+
         cdef:
             char        mnl_buf[MNL_BUF_SIZE]
             nlmsghdr   *nlh
@@ -245,28 +407,118 @@ cdef class CFirewall:
         return Py_ERR
 
     def _update_firewall_rules(s, uintf8_t cntrl_list_idx, list rulelist):
-        '''acquires FWrule lock then rewrites the corresponding section ruleset.
+        '''stages the corresponding section ruleset then publishes it as a new rule generation.
 
-        the current length var will also be update while the lock is held. 
+        packet inspection is not blocked during the push. the previous generation is reclaimed once in-flight packets
+        have completed inspection.
         the GIL will be explicitly acquired before any code execution to ensure calls from C are safe.
         '''
         cdef:
             uintf16_t   rule_idx, rule_count = len(rulelist)
             dict        fw_rule
+            int         ret
+
+        # updating rule count in global tracker.
+        # this is important to establish iter bounds during inspection.
+        # the count is checked against the table capacity before any rules are staged.
+        if (firewall_stage_count(cntrl_list_idx, rule_count) == ERR):
+            return Py_ERR
 
         for rule_idx in range(rule_count):
             fw_rule = rulelist[rule_idx]
 
             set_FWrule(cntrl_list_idx, rule_idx, fw_rule)
 
-        # updating rule count in global tracker.
-        # this is important to establish iter bounds during inspection.
-        firewall_stage_count(cntrl_list_idx, rule_count)
+        # the classifier for the table is compiled from the staged rules during the push.
 
         with nogil:
-            firewall_push_rules(cntrl_list_idx)
+            ret = firewall_push_rules(cntrl_list_idx)
 
-        return Py_OK
+        return Py_OK if ret == OK else Py_ERR
+
+    def update_quotas(s, list quotas, int32_t utc_offset):
+        '''builds and publishes the quota table. counters of quotas that remain configured are carried over.
+
+        quota -> [type, key, window start, window length, max bytes, max conns, period]
+        the GIL will be explicitly acquired before any code execution to ensure calls from C are safe.
+        '''
+        cdef:
+            uintf16_t       i, quota_count = len(quotas)
+            QuotaConfig    *cfgs
+            list            quota
+            int             ret
+
+        if (quota_count > QUOTA_MAX):
+            return Py_ERR
+
+        # +1 so an empty quota list still has a valid allocation
+        cfgs = <QuotaConfig*>malloc((quota_count + 1) * sizeof(QuotaConfig))
+        if (cfgs == NULL):
+            return Py_ERR
+
+        for i in range(quota_count):
+            quota = quotas[i]
+
+            cfgs[i].type = quota[0]
+            cfgs[i].key  = quota[1]
+            cfgs[i].window_start = quota[2]
+            cfgs[i].window_len   = quota[3]
+            cfgs[i].max_bytes = quota[4]
+            cfgs[i].max_conns = quota[5]
+            cfgs[i].period    = quota[6]
+
+        with nogil:
+            ret = firewall_push_quotas(cfgs, quota_count, utc_offset)
+
+        free(cfgs)
+
+        return Py_OK if ret == OK else Py_ERR
+
+    @staticmethod
+    def benchmark(uintf8_t workers, uint32_t pkt_count):
+        '''inspects pkt_count synthetic packets on each of 1 through "workers" pinned threads against the active rules.
+
+        returns a list of (worker count, packets per second). the queue workers must not be running.
+        '''
+        cdef:
+            uintf8_t    worker_count
+            double      pps
+            list        results = []
+
+        for worker_count in range(1, min(workers, FW_MAX_WORKERS) + 1):
+
+            with nogil:
+                pps = firewall_bench(worker_count, pkt_count)
+
+            results.append((worker_count, pps))
+
+        return results
+
+    @staticmethod
+    def verdict_benchmark(uint32_t pkt_count):
+        '''sends pkt_count verdicts to the bench queue for a range of batch sizes. a batch size of 1 is the unbatched
+        per packet send.
+
+        the queue is bound, but has no packets, so the kernel answers each verdict message with an error ack once it
+        fails to find the packet id. the acks are read outside the timed section and counted.
+
+        returns a list of (batch size, sendto calls, error acks, verdicts per second).
+        '''
+        cdef:
+            uintf16_t   batch_size
+            uint64_t    sends
+            uint64_t    errors
+            double      vps
+            list        results = []
+
+        for batch_size in [1, 8, 32, VERDICT_BATCH_MAX]:
+
+            with nogil:
+                vps = dnx_verdict_bench(batch_size, pkt_count, &sends, &errors)
+
+            results.append((batch_size, sends, errors, vps))
+
+        return results
 
     # def _update_nat_rules(s, uintf8_t clist_idx, list rulelist):
     #     '''acquires FWrule lock then rewrites the corresponding section ruleset.
@@ -293,6 +545,41 @@ cdef class CFirewall:
     #     return Py_OK
 
 
+cdef void set_network(NetObject *net, list net_object):
+    '''convert a network object into the rule struct format.
+
+    list objects are [type, [[start, end], ...], 0]. all other objects are [type, netid, netmask].
+    '''
+    cdef:
+        uintf32_t   i, list_len
+        uint32_t   *starts
+        uint32_t   *ends
+
+    net.type = <uintf8_t>net_object[0]
+    if (net.type != IP_NET_LIST):
+        net.netid   = <uintf32_t>net_object[1]
+        net.netmask = <uintf32_t>net_object[2]
+
+        return
+
+    list_len = <uintf32_t>len(net_object[1])
+
+    # +1 so an empty list still has a valid allocation
+    starts = <uint32_t*>malloc((list_len + 1) * sizeof(uint32_t))
+    ends   = <uint32_t*>malloc((list_len + 1) * sizeof(uint32_t))
+
+    if (starts != NULL and ends != NULL):
+        for i in range(list_len):
+            starts[i] = <uint32_t>net_object[1][i][0]
+            ends[i]   = <uint32_t>net_object[1][i][1]
+
+    # an object without a list can not be searched so it is disabled instead.
+    if (starts == NULL or ends == NULL or netobject_set_list(net, starts, ends, list_len) == ERR):
+        net.type = 0
+
+    free(starts)
+    free(ends)
+
 cdef void set_FWrule(size_t cntrl_list_idx, size_t rule_idx, dict rule):
 
     cdef:
@@ -315,9 +602,7 @@ cdef void set_FWrule(size_t cntrl_list_idx, size_t rule_idx, dict rule):
 
     fw_rule.s_networks.len = <uintf8_t>len(rule['src_network'])
     for i in range(fw_rule.s_networks.len):
-        fw_rule.s_networks.objects[i].type    = <uintf8_t> rule['src_network'][i][0]
-        fw_rule.s_networks.objects[i].netid   = <uintf32_t>rule['src_network'][i][1]
-        fw_rule.s_networks.objects[i].netmask = <uintf32_t>rule['src_network'][i][2]
+        set_network(&fw_rule.s_networks.objects[i], rule['src_network'][i])
 
     # -----------------------
     # SOURCE SERVICE OBJECTS
@@ -357,9 +642,7 @@ cdef void set_FWrule(size_t cntrl_list_idx, size_t rule_idx, dict rule):
 
     fw_rule.d_networks.len = <uintf8_t>len(rule['dst_network'])
     for i in range(fw_rule.d_networks.len):
-        fw_rule.d_networks.objects[i].type    = <uintf8_t> rule['dst_network'][i][0]
-        fw_rule.d_networks.objects[i].netid   = <uintf32_t>rule['dst_network'][i][1]
-        fw_rule.d_networks.objects[i].netmask = <uintf32_t>rule['dst_network'][i][2]
+        set_network(&fw_rule.d_networks.objects[i], rule['dst_network'][i])
 
     # -----------------------
     # DST SERVICE OBJECTS
@@ -519,17 +802,30 @@ cdef void set_FWrule(size_t cntrl_list_idx, size_t rule_idx, dict rule):
 #     nat_stage_rule(cntrl_list_idx, rule_idx, &nat_rule)
 
 # ===================================
-# HASHING TRIE (Range Type)
+# PREFIX TRIE (Range Type)
 # ===================================
-from libc.stdlib cimport malloc, calloc, realloc
+from libc.string cimport memcmp
+from posix.fcntl cimport open as c_open, O_RDONLY
+from posix.unistd cimport close
+from posix.stat cimport struct_stat, fstat
+from posix.mman cimport mmap, munmap, PROT_READ, MAP_SHARED, MAP_FAILED
 
-DEF EMPTY_CONTAINER = 0
 DEF NO_MATCH = 0
-# data structure supporting ip to geolocation lookup
-DEF HTR_MAX_WIDTH_MULTIPLIER = 2
 # 4 slots to allow for concurrent use of structures if needed
 DEF HTR_MAX_SLOTS = 4
 
+# precompiled prefix image (see dnx_iptools/hash_trie). must match the version written by the signature compiler.
+DEF HTR_IMAGE_VERSION = 1
+DEF HTR_IMAGE_PREFIX = 3
+
+# chunk flag and index masks. an enum so they are C constants in the nogil lookup, DEF values past the int range are not.
+cdef enum:
+    HTR_NODE  = 0x80000000
+    HTR_INDEX = 0x7fffffff
+
+DEF HTR_ROOT_LEN  = 65536
+DEF HTR_CHUNK_LEN = 256
+
 # GLOBAL CONTAINER FOR HTRs. likely only 1 will ever be needed
 cdef public HTR_Slot HTR_SLOTS[HTR_MAX_SLOTS]
 memset(HTR_SLOTS, 0, sizeof(HTR_Slot) * HTR_MAX_SLOTS)
@@ -537,129 +833,134 @@ memset(HTR_SLOTS, 0, sizeof(HTR_Slot) * HTR_MAX_SLOTS)
 # -----------------------------------
 # python accessible API
 # -----------------------------------
-def initialize_geolocation(list hash_trie, uint32_t msb, uint32_t lsb):
-    '''initializes HashTrie data structure for use by CFirewall.
+def initialize_geolocation(str image_path):
+    '''initializes the prefix trie data structure for use by CFirewall.
 
-    py_trie is passed through as a data source.
-    MSB, LSB, and HTR_IDX definitions are globally assigned.
+    the precompiled geolocation image is mapped read-only as the data source. if a trie is already active it is
+    replaced without interrupting inspection and unmapped once no worker can be using it.
     '''
-    global MSB, LSB, HTR_IDX
-
     cdef:
-        size_t trie_len = len(hash_trie)
-        int htr_idx = htr_generate_structure(hash_trie, trie_len)
+        bytes   fpath = image_path.encode('utf-8')
+        int     htr_idx = htr_load_image(fpath)
+        int     old_idx, error
+
+    if (htr_idx == ERR):
+        return Py_ERR
+
+    with nogil:
+        error = firewall_push_geolocation(htr_idx, &old_idx)
 
-    MSB = msb
-    LSB = lsb
-    HTR_IDX = htr_idx
+    if (error):
+        htr_free(htr_idx)
+
+        return Py_ERR
+
+    if (old_idx != HTR_NONE):
+        htr_free(old_idx)
 
     return Py_OK
 
-cdef int htr_generate_structure(list py_trie, size_t py_trie_len):
-    '''generate hash trie range structure and return container index.
+cdef int htr_load_image(const char *image_path):
+    '''map a precompiled prefix image and return container index.
 
     resulting structure must be access through c function calls and container index.
 
         note: this function IS NOT thread safe.
     '''
-    # ====================================
-    # MAP OBJECT ALLOCATION AND PLACEMENT
-    # ====================================
     cdef:
-        int         trie_idx
-        HTR_Slot   *htr_slot
+        int             trie_idx, fd
+        HTR_Slot       *htr_slot
+        struct_stat     st
+        void           *base
+
+        HTR_ImageHeader *header
+        uint32_t       *entries
+        size_t          i
 
     # 1. dynamically check next available index
     for trie_idx in range(HTR_MAX_SLOTS):
 
         htr_slot = &HTR_SLOTS[trie_idx]
-
-        # 2. allocate memory at current index for TrieMap
-        if (htr_slot.len == 0):
-            # TODO: test the multiplier for max_width (current is 2, try 1.3)
-            htr_slot.len = <size_t> py_trie_len * HTR_MAX_WIDTH_MULTIPLIER
-            htr_slot.keys = <HTR_L1*> calloc(htr_slot.len, sizeof(HTR_L1))
-
+        if (htr_slot.map_base == NULL):
             break
 
     # reached max container allocation (this should NEVER happen)
-    else: return -1
+    else: return ERR
 
-    # ======================================
-    # RANGE OBJECT ALLOCATION AND PLACEMENT
-    # ======================================
-    cdef:
-        size_t      i, xi
-
-        HTR_L1  *htr_key
-        HTR_L2  *htr_multi_val
+    # 2. map the image. the mapping is shared with any other process using the same image.
+    fd = c_open(image_path, O_RDONLY)
+    if (fd < 0):
+        return ERR
 
-        uint32_t    trie_key
-        uint32_t    trie_key_hash
-        list        trie_vals
-        size_t      num_values
+    if (fstat(fd, &st) < 0 or <size_t>st.st_size < sizeof(HTR_ImageHeader)):
+        close(fd)
+        return ERR
 
-    # 3. populate TrieMap structure with TrieRange structs
-    for i in range(py_trie_len):
+    base = mmap(NULL, st.st_size, PROT_READ, MAP_SHARED, fd, 0)
+    close(fd)
 
-        trie_key = <uint32_t> py_trie[i][0]
-        trie_key_hash = trie_key % (htr_slot.len - 1)
+    if (base == MAP_FAILED):
+        return ERR
 
-        trie_vals = py_trie[i][1]
-        num_values = <size_t> len(trie_vals)
+    # 3. validate the layout. lookups trust the chunk indexes so they are only checked here.
+    header = <HTR_ImageHeader*>base
+    if (memcmp(header.magic, b'DNXTRIE', 8) != 0
+            or header.version != HTR_IMAGE_VERSION or header.trie_type != HTR_IMAGE_PREFIX
+            or header.entry_size != sizeof(uint32_t) or header.max_width >= HTR_NODE
+            or header.entry_count != HTR_ROOT_LEN + <uint64_t>header.max_width * HTR_CHUNK_LEN
+            or header.entries_offset % 8
+            or header.entries_offset + <uint64_t>header.entry_count * sizeof(uint32_t) > <uint64_t>st.st_size):
+        munmap(base, st.st_size)
+        return ERR
 
-        htr_key = &htr_slot.keys[trie_key_hash]
+    entries = <uint32_t*>(<char*>base + header.entries_offset)
+    for i in range(header.entry_count):
+        if (entries[i] & HTR_NODE and entries[i] & HTR_INDEX >= header.max_width):
+            munmap(base, st.st_size)
+            return ERR
 
-        # first time on index so allocating memory for the number of current multi-vals this iteration
-        if (htr_key.len == 0):
-            htr_key.multi_val = <HTR_L2*> malloc(sizeof(HTR_L2) * num_values)
+    htr_slot.root   = entries
+    htr_slot.chunks = entries + HTR_ROOT_LEN
 
-        # at least 1 multi-val is present, so reallocating memory to include new multi-vals
-        else:
-            htr_key.multi_val = <HTR_L2*> realloc(
-                htr_key.multi_val, sizeof(HTR_L2) * (htr_key.len + num_values)
-            )
+    htr_slot.chunk_count = header.max_width
+    htr_slot.map_base    = base
+    htr_slot.map_len     = st.st_size
 
-        # define struct members for each range in py_l2
-        for xi in range(num_values):
-            htr_l2 = &htr_key.multi_val[htr_key.len + xi]  # skipping to next empty idx
+    # 4. returning slot the structure was placed in (for subsequent access)
+    return trie_idx
 
-            htr_l2.key = trie_key
-            htr_l2.netid = <uint32_t> py_trie[i][1][xi][0]
-            htr_l2.bcast = <uint32_t> py_trie[i][1][xi][1]
-            htr_l2.country = <uint8_t> py_trie[i][1][xi][2]
+cdef void htr_free(int trie_idx):
+    '''unmap the trie in the slot and release the slot.
 
-        htr_key.len += num_values
+    the trie must not be reachable from the active firewall generation.
+    '''
+    cdef HTR_Slot *htr_slot = &HTR_SLOTS[trie_idx]
 
-    # 4. returning slot the structure was placed in (for subsequent access)
-    return trie_idx
+    munmap(htr_slot.map_base, htr_slot.map_len)
+    memset(htr_slot, 0, sizeof(HTR_Slot))
 
 # -----------------------------------
 # C accessible API
 # -----------------------------------
-cdef public uint8_t htr_search(int trie_idx, uint32_t trie_key, uint32_t host_id) nogil:
+# lookups are at most 3 dependent reads regardless of how many ranges are loaded.
+cdef public uint8_t htr_search(int trie_idx, uint32_t host) nogil:
 
         cdef :
-            HTR_Slot   *htr_slot = &HTR_SLOTS[trie_idx]
+            HTR_Slot   *htr_slot
+            uint32_t    entry
 
-            uint32_t    trie_key_hash = trie_key % (htr_slot.len - 1)
-
-            HTR_L1     *htr_key = &htr_slot.keys[trie_key_hash]
-
-        # no l1 match
-        if (htr_key.len == EMPTY_CONTAINER):
+        # not initialized
+        if (trie_idx == HTR_NONE):
             return NO_MATCH
 
-        cdef size_t i
-        for i in range(htr_key.len):
+        htr_slot = &HTR_SLOTS[trie_idx]
+
+        entry = htr_slot.root[host >> 16]
+        if (entry & HTR_NODE):
 
-            # this is needed because collisions are possible by design.
-            # matching the original key will guarantee the correct range is being evaluated.
-            if (htr_key.multi_val[i].key != trie_key):
-                continue
+            entry = htr_slot.chunks[(entry & HTR_INDEX) * HTR_CHUNK_LEN + (host >> 8 & 255)]
+            if (entry & HTR_NODE):
 
-            if (htr_key.multi_val[i].netid <= host_id <= htr_key.multi_val[i].bcast):
-                return htr_key.multi_val[i].country
+                entry = htr_slot.chunks[(entry & HTR_INDEX) * HTR_CHUNK_LEN + (host & 255)]
 
-        # iteration completed with no l2 match
-        return NO_MATCH
+        return <uint8_t>entry
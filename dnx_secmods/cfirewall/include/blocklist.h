@@ -0,0 +1,27 @@
+#ifndef BLOCKLIST_H
+#define BLOCKLIST_H
+
+// ================================== //
+// ATTACKER BLOCKLIST
+// ================================== //
+// hosts blocked by the security modules. packets from a blocked host are dropped before rule inspection.
+// open addressing with linear probing. each slot is a single 64 bit word (expire << 32 | host) so packet threads can
+// search the table without locking and always read a consistent entry. host 0 marks an empty slot.
+#define BLOCKLIST_SIZE  32768 // must be a power of 2
+#define BLOCKLIST_MASK  (BLOCKLIST_SIZE - 1)
+#define BLOCKLIST_MAX   (BLOCKLIST_SIZE / 2) // load factor is kept at or below .5 to keep probe sequences short
+
+struct BlockedHost {
+    uint32_t    host;
+    uint32_t    blocked; // time the host was blocked (unix)
+    uint32_t    expire;  // unix
+};
+
+extern void blocklist_init(void);
+extern bool blocklist_match(uintf8_t worker_idx, uint32_t host);
+extern int  blocklist_add(uint32_t host, uint32_t blocked, uint32_t expire);
+extern int  blocklist_remove(uint32_t host);
+extern uintf16_t blocklist_hosts(struct BlockedHost *hosts, uintf16_t max);
+extern uint64_t  blocklist_drops(void);
+
+#endif
@@ -25,13 +25,17 @@ struct IPhdr;
 struct Protohdr;
 struct geolocation;
 struct dnx_pktb;
+struct FWtable;
 
 // dnxfirewall extensions
 #include "fw_main.h"    // primary cython file, needed for geolocation lookup
 #include "rules.h"      // firewall and nat rule structs/ defs
 #include "match.h"      // zone, network, service matching helpers
+#include "classifier.h" // compiled rule lookup (control list > bitsets)
 #include "dnx_nfq.h"    // packet verdict, mangle, etc.
 #include "traffic_log.h"
+#include "blocklist.h"  // attacker blocklist (security modules)
+#include "quota.h"      // host and zone quotas
 
 #define OUTBOUND 1
 #define INBOUND  2
@@ -40,6 +44,11 @@ struct dnx_pktb;
 
 #define FW_MAX_ZONES  16
 
+// firewall queues are bound to nl socket/cfdata idx 0 through (FW_MAX_WORKERS - 1). nat is placed after them.
+#define FW_MAX_WORKERS  16
+#define NL_NAT_IDX      FW_MAX_WORKERS
+#define NL_SOCKET_COUNT (FW_MAX_WORKERS + 1)
+
 // network object types.
 #define IP_ADDRESS 1
 #define IP_NETWORK 2
@@ -56,10 +65,6 @@ struct dnx_pktb;
 #define SVC_LIST  3
 #define SVC_ICMP  4
 
-// geolocation vars
-extern uint32_t MSB, LSB;
-extern int      HTR_IDX;
-
 // cli args
 extern bool     VERBOSE;
 extern bool     VERBOSE2;
@@ -67,7 +72,7 @@ extern bool     VERBOSE2;
 extern bool     FW_V;
 extern bool     NAT_V;
 
-extern struct mnl_socket *nl[2];
+extern struct mnl_socket *nl[NL_SOCKET_COUNT];
 
 //extern uint8_t dnx_pkt_id;
 //extern struct dnx_pktb *dnx_pkt_tracker[UINT8_MAX];
@@ -87,10 +92,14 @@ typedef struct nfqnl_msg_packet_timestamp      nl_pkt_ts;
 struct cfdata {
     uintf8_t    idx;
     uint32_t    queue;
+    intf16_t    cpu;    // -1 if the worker is not pinned
 
     mnl_cb_t    queue_cb;
+    struct VerdictBatch *verdicts;
 };
 
+extern int cfirewall_set_cpu(intf16_t cpu);
+
 struct clist_range {
   uintf8_t      start;
   uintf8_t      end;
@@ -149,6 +158,7 @@ struct dnx_pktb {
     struct Nat          nat;            // not used by FW. copied over from nat rule on match
     bool                mangled;
     uintf16_t           rule_clist;     // CONTROL LIST. recent change from fw_table to be module agnostic
+    uintf16_t           rule_idx;       // index within the control list. only valid if rule_clist is set
     char*               rule_name;
     uint8_t             log;
     struct geolocation  geo;
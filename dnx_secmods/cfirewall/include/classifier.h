@@ -0,0 +1,73 @@
+#ifndef CLASSIFIER_H
+#define CLASSIFIER_H
+
+// one bit per rule in a control list. rule index maps to (word, bit) in the rule bitsets.
+typedef uint64_t    clword_t;
+
+#define CL_WORD_BITS  64
+#define CL_FIELD_VALS 256 // zone ids, country codes, and ip protocols are all 8 bit values
+
+#define CL_NO_MATCH  -1
+
+// ================================== //
+// INTERVAL TABLE
+// ================================== //
+// sorted, non overlapping intervals covering the full key space. each interval has a bitset of the rules that match
+// any value within it. the interval for a key is found with a binary search on the start values.
+struct ClassIntervals {
+    uintf32_t   len;
+    uint32_t   *starts;
+    clword_t   *sets;   // len * words
+};
+
+// protocol -> port interval table. protocols not referenced by any rule map to idx 0, which only contains the service
+// objects defined with ANY_PROTOCOL.
+struct ClassServices {
+    uint8_t     proto_map[CL_FIELD_VALS];
+    uintf16_t   len;
+    struct ClassIntervals  *tables;
+};
+
+// ================================== //
+// FIREWALL CLASSIFIER
+// ================================== //
+// compiled form of a single control list. every field is reduced to a per value bitset of matching rules so a packet
+// lookup is a handful of binary searches followed by an AND across the field bitsets. the lowest set bit is the first
+// rule in list order that matches all fields.
+struct FWclassifier {
+    uintf16_t   rule_count;
+    uintf16_t   words;
+
+    clword_t   *enabled;
+
+    // SOURCE
+    clword_t   *s_zones;   // CL_FIELD_VALS * words
+    clword_t   *s_geo;     // CL_FIELD_VALS * words
+    struct ClassIntervals  s_ips;
+    struct ClassServices   s_svcs;
+
+    // DESTINATION
+    clword_t   *d_zones;
+    clword_t   *d_geo;
+    struct ClassIntervals  d_ips;
+    struct ClassServices   d_svcs;
+};
+
+// normalized packet fields used for the lookup. ips/ports are host order.
+struct ClassKey {
+    uint8_t     in_zone;
+    uint8_t     out_zone;
+    uint32_t    src_ip;
+    uint32_t    dst_ip;
+    uint8_t     src_country;
+    uint8_t     dst_country;
+    uint8_t     protocol;
+    uint16_t    sport;
+    uint16_t    dport;
+};
+
+extern struct FWclassifier *classifier_build(struct FWtable *table);
+extern void classifier_free(struct FWclassifier *fwc);
+extern intf32_t classifier_search(struct FWclassifier *fwc, struct ClassKey *key, intf32_t after);
+
+#endif
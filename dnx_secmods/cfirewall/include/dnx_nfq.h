@@ -8,10 +8,50 @@ typedef struct nfqnl_msg_packet_hdr nl_pkt_hdr;
 //struct dnx_pktb;
 //struct cfdata;
 
+// ==================================
+// VERDICT BATCHING
+// ==================================
+// verdicts are coalesced into a single multi message send. the batch is flushed when it reaches VERDICT_BATCH_MAX, when
+// the oldest verdict has been held for VERDICT_BATCH_USEC, or when the queue socket has no more packets waiting.
+#define VERDICT_BATCH_MAX    64
+#define VERDICT_BATCH_USEC   250
+#define VERDICT_BATCH_LIMIT  4096 // bytes. ~48 bytes per verdict msg so the count bound is normally hit first.
+
+#define VERDICT_BENCH_QUEUE  UINT16_MAX // bound by the verdict benchmark. no rules send packets to it.
+
+// the linux/netlink.h bundled with libmnl predates the option (kernel 4.3).
+#ifndef NETLINK_CAP_ACK
+#define NETLINK_CAP_ACK 10
+#endif
+
+struct VerdictBatch {
+    struct mnl_socket      *sock;
+    struct mnl_nlmsg_batch *batch;
+
+    uintf16_t   limit;      // max verdicts per send
+    uintf16_t   count;
+    uint32_t    last_id;
+    bool        uniform;    // all pending verdicts are a plain drop. (sent as a single NFQNL_MSG_VERDICT_BATCH)
+    uint64_t    started;    // usec timestamp of the oldest pending verdict
+
+    // stats
+    uint64_t    verdicts;
+    uint64_t    sends;
+
+    // libmnl requires double the batch limit so a message that overflows the batch can be built before sending.
+    char        buf[VERDICT_BATCH_LIMIT * 2];
+};
+
 void dnx_parse_nl_headers(nl_msg_hdr *nlmsgh, nl_pkt_hdr **nl_pkth, struct nlattr **netlink_attrs, struct dnx_pktb *pkt);
 void dnx_parse_pkt_headers(struct dnx_pktb *pkt);
+
+int  dnx_verdict_batch_init(struct cfdata *cfd, uintf16_t limit);
 void dnx_send_verdict(struct cfdata *cfd, uint32_t pktid, uint32_t verdict);
 void dnx_send_deferred_verdict(struct cfdata *cfd, uint32_t pktid, uint32_t mark, uint32_t verdict);
+void dnx_send_metered_verdict(struct cfdata *cfd, uint32_t pktid, uint32_t mark, uint32_t verdict);
+int  dnx_flush_verdicts(struct cfdata *cfd);
+ssize_t dnx_queue_recv(struct cfdata *cfd, void *buf, size_t len);
+double  dnx_verdict_bench(uintf16_t limit, uint32_t pkt_count, uint64_t *sends, uint64_t *errors);
 //int  dnx_send_deferred_verdict_with_mangle(struct cfdata *cfd, uint32_t pktid, struct dnx_pktb *pkt);
 //bool dnx_mangle_pkt(struct dnx_pktb *pkt);
 
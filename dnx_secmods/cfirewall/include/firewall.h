@@ -3,6 +3,9 @@
 
 #define FW_TABLE_COUNT 4
 
+// max concurrent packet threads (read sections). indexed by the cfdata idx of the queue.
+#define FW_MAX_READERS FW_MAX_WORKERS
+
 // extended protocol definitions
 #define UDPPROTO_DNS 53
 
@@ -13,10 +16,47 @@
 //struct dnx_pktb;
 //struct clist_range;
 
+// inspection latency histogram buckets. bucket n counts inspections taking [2^n, 2^(n+1)) nanoseconds.
+#define FW_LATENCY_BUCKETS 32
+
+// per rule counters. every worker has its own row so a counter only ever has a single writer.
+struct FWrulestats {
+    _Atomic uint64_t    hits;
+    _Atomic uint64_t    bytes;
+};
+
+// summed counters returned to the control api
+struct FWrulecount {
+    char        name[33];
+    uint64_t    hits;
+    uint64_t    bytes;
+};
+
 // contains pointers to arrays of pointers to FWrule
 struct FWtable {
     uintf16_t       len;
     struct FWrule  *rules;
+
+    // compiled from rules on push. NULL will fall back to a linear scan of rules.
+    struct FWclassifier *classifier;
+
+    // FW_MAX_WORKERS rows of stats_stride counters. rows are padded to a cache line. counters start at 0 on each push.
+    struct FWrulestats  *stats;
+    uintf16_t            stats_stride;
+};
+
+// no geolocation trie has been published. lookups will not match.
+#define HTR_NONE -1
+
+// immutable snapshot of all control lists. a rule push publishes a new generation which shares unchanged tables.
+// the quota table is shared the same way, so quota counters are not affected by a rule push.
+// the geolocation trie slot is swapped the same way so a signature reload never frees a trie in use.
+struct FWgeneration {
+    uint64_t        id;
+    struct FWtable *tables[FW_TABLE_COUNT];
+
+    struct QuotaTable  *quotas;
+    int                 htr_idx;
 };
 
 enum fw_tables {
@@ -26,6 +66,8 @@ enum fw_tables {
     FW_AFTER_RULES
 };
 
+extern const uintf16_t FW_MAX_RULE_COUNTS[FW_TABLE_COUNT];
+
 extern void firewall_init(void);
 extern int  firewall_stage_count(uintf8_t cntrl_list, uintf16_t rule_count);
 extern int  firewall_stage_rule(uintf8_t cntrl_list, uintf16_t rule_idx, struct FWrule *rule);
@@ -34,7 +76,20 @@ extern int  firewall_stage_rule(uintf8_t cntrl_list, uintf16_t rule_idx, struct
 extern int  firewall_push_zones(struct ZoneMap *zone_map);
 
 int  firewall_recv(const struct nlmsghdr *nlh, void *data);
-void firewall_inspect(struct clist_range *fw_clist, struct dnx_pktb *pkt);
+void firewall_inspect(struct FWgeneration *fwg, struct clist_range *fw_clist, struct dnx_pktb *pkt);
+
+struct FWgeneration *firewall_read_enter(uintf8_t reader);
+void firewall_read_exit(uintf8_t reader);
+
+extern double firewall_bench(uintf8_t workers, uint32_t pkt_count);
+
+extern uintf16_t firewall_stats(uintf8_t cntrl_list, struct FWrulecount *counts, uintf16_t max);
+extern void firewall_latency(uint64_t *buckets);
+
+extern int  firewall_push_quotas(struct QuotaConfig *cfgs, uintf16_t len, int32_t utc_offset);
+extern uintf16_t firewall_quotas(struct QuotaState *states, uintf16_t max);
+
+extern int  firewall_push_geolocation(int htr_idx, int *old_idx);
 
 void firewall_lock(void);
 void firewall_unlock(void);
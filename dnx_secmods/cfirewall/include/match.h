@@ -11,4 +11,10 @@ extern int zone_match(struct ZoneArray *zone_array, uint8_t pkt_zone);
 extern int network_match(struct NetArray *net_array, uint32_t iph_ip, uint8_t country);
 extern int service_match(struct SvcArray *svc_array, uint8_t pkt_protocol, uint16_t pkt_svc);
 
+extern int netlist_search(struct NetList *list, uint32_t iph_ip);
+extern struct NetList *netlist_create(uint32_t *starts, uint32_t *ends, uintf32_t len);
+extern int netobject_set_list(struct NetObject *net, uint32_t *starts, uint32_t *ends, uintf32_t len);
+extern struct NetList *netlist_copy(struct NetList *list);
+extern void netlist_free(struct NetList *list);
+
 #endif
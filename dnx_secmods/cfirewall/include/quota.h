@@ -0,0 +1,77 @@
+#ifndef QUOTA_H
+#define QUOTA_H
+
+// ================================== //
+// HOST AND ZONE QUOTAS
+// ================================== //
+// time windows and byte/connection limits for forwarded traffic. a packet is checked against the quota of its source
+// host, destination host, in zone, then out zone, and the first configured one applies. zone quotas share a single set
+// of counters for every host in the zone. a host quota with no window or limits exempts the host from its zone quota.
+#define QUOTA_MAX    1024
+#define QUOTA_ZONES  256
+#define QUOTA_DAY    86400
+
+enum quota_types {
+    QUOTA_HOST = 1,
+    QUOTA_ZONE
+};
+
+// configured values. a limit of 0 is unlimited.
+struct QuotaConfig {
+    uint8_t     type;
+    uint32_t    key;            // host (host order) or zone id
+    uint32_t    window_start;   // seconds after local midnight. traffic is dropped while inside the window.
+    uint32_t    window_len;     // 0 = no time window
+    uint64_t    max_bytes;
+    uint32_t    max_conns;
+    uint32_t    period;         // counters reset every period seconds, aligned to local midnight. 0 = QUOTA_DAY
+};
+
+// counters are shared by all workers. connections of a metered quota are not offloaded to the kernel so every packet
+// is counted and an active window or exhausted quota also cuts off established connections. bytes of quotas that are
+// not metered only include the first packet of each connection.
+struct Quota {
+    struct QuotaConfig  cfg;
+    bool                metered;
+
+    _Atomic uint64_t    bytes;
+    _Atomic uint32_t    conns;
+    _Atomic uint32_t    period_idx;
+    _Atomic uint64_t    drops;
+};
+
+// open addressing with linear probing. idx is the quota index + 1 so 0 marks an empty slot.
+struct QuotaHost {
+    uint32_t    host;
+    uint32_t    idx;
+};
+
+// immutable once published, other than the quota counters. owned by the firewall generation.
+struct QuotaTable {
+    uintf16_t           len;
+    int32_t             utc_offset; // seconds. local time is used for windows and period alignment.
+    struct Quota       *quotas;
+
+    uint16_t            zones[QUOTA_ZONES]; // zone id -> quota idx + 1
+    uint32_t            host_mask;
+    struct QuotaHost   *hosts;
+};
+
+// summed state returned to the control api
+struct QuotaState {
+    struct QuotaConfig  cfg;
+    uint64_t    bytes;
+    uint32_t    conns;
+    uint64_t    drops;
+    bool        restricted; // inside the time window
+};
+
+extern struct QuotaTable *quota_table_build(struct QuotaConfig *cfgs, uintf16_t len, int32_t utc_offset);
+extern void quota_table_free(struct QuotaTable *qt);
+extern void quota_table_carry(struct QuotaTable *new_qt, struct QuotaTable *old_qt);
+
+extern struct Quota *quota_lookup(struct QuotaTable *qt, uint32_t src, uint32_t dst, uint8_t in_zone, uint8_t out_zone);
+extern bool quota_update(struct QuotaTable *qt, struct Quota *quota, bool new_conn, uint16_t bytes);
+extern uintf16_t quota_states(struct QuotaTable *qt, struct QuotaState *states, uintf16_t max);
+
+#endif
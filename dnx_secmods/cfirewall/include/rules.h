@@ -51,11 +51,21 @@ typedef struct ZoneArray {
     uintf8_t    objects[FIELD_MAX_ZONES];
 } ZoneArray;
 
-// STANDARD NETWORK OBJECT (HOST, NETWORK, RANGE, GEO)
+// IP NETWORK LIST - sorted, merged, inclusive ranges. lookups are a binary search on the start values.
+typedef struct NetList {
+    uintf32_t   len;
+    uint32_t   *starts;
+    uint32_t   *ends;
+} NetList;
+
+// STANDARD NETWORK OBJECT (HOST, NETWORK, RANGE, LIST, GEO)
+// RANGE -> netid is the first address and netmask is the last address (inclusive)
+// LIST  -> list is owned by the table containing the rule. netid and netmask are unused.
 typedef struct NetObject {
     uintf8_t    type;
     uintf32_t   netid;
     uintf32_t   netmask;
+    NetList    *list;
 } NetObject;
 
 // MAIN NETWORK ARRAY
@@ -98,7 +108,7 @@ typedef struct SvcArray {
     SvcObject   objects[FIELD_MAX_SERVICES];
 } SvcArray;
 
-// COMPLETE RULE STRUCTS - NO POINTERS
+// COMPLETE RULE STRUCTS - NO POINTERS (EXCEPT NETWORK LISTS, WHICH ARE DEEP COPIED WITH THE TABLE)
 struct FWrule {
     char        name[33]; // 32 character max
     bool        enabled;
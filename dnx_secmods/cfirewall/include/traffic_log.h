@@ -4,7 +4,10 @@
 #define DNX_USER "dnx"
 
 #define DATABASE_SERVICE "/home/dnx/dnxfirewall/dnx_routines/database/ddb.sock" // 52
-#define DB_LOG_FORMAT "{\"method\": \"geolocation\", \"timestamp\": 0, \"log\": [%u, %u, %u]}" // 61
+// geolocation counts are flushed as one or more datagrams, each holding a list of [country, direction, allowed, blocked]
+#define DB_GEO_HEADER  "{\"method\": \"geolocation\", \"timestamp\": 0, \"logs\": ["
+#define DB_GEO_ENTRY   "[%u, %u, %u, %u]"
+#define DB_GEO_MSG_MAX 2048 // database service recv size
 
 #define TRAFFIC_LOG_DIR  "/home/dnx/dnxfirewall/dnx_profile/log/traffic/" // 46
 // 20220628 // 8
@@ -14,23 +17,80 @@
     "in_intf=\"%u\" src_zone=\"%s\" src_country=\"%u\" src_ip=\"%s\" src_port=\"%u\" "\
     "out_intf=\"%u\" dst_zone=\"%s\" dst_country=\"%u\" dst_ip=\"%s\" dst_port=\"%u\"\n"
 
-#define LOG_BUFFER_LIMIT 8
-
 #define FW_LOG_IDX  0
 #define NAT_LOG_IDX 1
+#define LOG_HANDLE_COUNT 2
+
+// ================================== //
+// LOG RING
+// ================================== //
+// each queue worker writes log records into its own single producer/ single consumer ring. a dedicated writer thread
+// drains the rings and does all formatting, file rotation, and flushing so disk stalls never reach the packet path.
+#define LOG_RING_SIZE 1024 // must be a power of 2
+#define LOG_RING_MASK (LOG_RING_SIZE - 1)
+
+#define LOG_WRITER_IDLE_NSEC 5000000 // 5ms sleep when all rings are empty
+#define GEO_FLUSH_INTERVAL   30      // seconds between geolocation count flushes to the database service
+
+// action taken when a worker's ring is full
+enum log_overflow {
+    LOG_OVERFLOW_DROP,  // discard the new record and count it
+    LOG_OVERFLOW_BLOCK  // wait for the writer to free a slot. no records are lost, but disk stalls delay packets.
+};
+
+// everything needed to format the entry, copied out of the packet so the writer does not reference packet memory.
+struct LogRecord {
+    struct timeval  ts;
+    char        rule_name[33];
+    char        in_zone[17];
+    char        out_zone[17];
+    uint8_t     action;
+    uint8_t     dir;
+    uint8_t     protocol;
+    uint8_t     iif;
+    uint8_t     oif;
+    uint8_t     src_country;
+    uint8_t     dst_country;
+    uint32_t    saddr;
+    uint32_t    daddr;
+    uint16_t    sport;
+    uint16_t    dport;
+};
+
+struct LogRing {
+    _Atomic uint32_t    head __attribute__((aligned(64)));  // written by the worker
+    _Atomic uint32_t    tail __attribute__((aligned(64)));  // written by the log writer
+    _Atomic uint64_t    discarded;
+
+    struct LogRecord    records[LOG_RING_SIZE];
+};
 
 // ================================== //
 // LOG HANDLE STRUCT
 // ================================== //
-// this holds the file object, id (date), and write counters
+// this holds the file object, id (date), and write counters. only accessed by the log writer thread after init.
 struct LogHandle {
     char    label[16]; // subdir of traffic, eg. firewall, nat (also used to name file properly)
     char    id[9]; // date in YYYYMMDD format
     FILE   *buf;
     time_t  rotate;
     int     cnt;
+
+    struct LogRing     *rings; // FW_MAX_WORKERS
+    _Atomic uint64_t    written;
 };
 
+// ================================== //
+// GEOLOCATION COUNTERS
+// ================================== //
+// per worker connection counts by remote country, direction (outbound, inbound), and action (blocked, allowed).
+// workers only touch their own counters. the log writer swaps them to zero when flushing.
+#define GEO_COUNTRY_COUNT 256
+
+struct GeoCounters {
+    _Atomic uint32_t    counts[GEO_COUNTRY_COUNT][2][2];
+} __attribute__((aligned(64)));
+
 // ================================== //
 // DNX DATABASE SERVICE STRUCT
 // ================================== //
@@ -43,7 +103,9 @@ struct dnx_db_service {
 };
 
 extern void log_init(int logger_idx, char *label);
-extern void log_write_firewall(int logger_idx, struct dnx_pktb *pkt);
+extern void log_set_overflow(uintf8_t policy);
+extern void log_stats(int logger_idx, uint64_t *written, uint64_t *discarded);
+extern void log_write_firewall(int logger_idx, uintf8_t ring_idx, struct dnx_pktb *pkt);
 //extern void log_write_nat(struct LogHandle *logger, struct dnx_pktb *pkt);
 
 void log_enter(struct LogHandle *logger, struct timeval *ts);
@@ -52,6 +114,7 @@ int  log_rotate(struct LogHandle *logger, struct timeval *ts);
 
 extern void log_db_init(void);
 extern int  log_db_connect(void);
-extern void log_db_geolocation(struct geolocation *geo, uint8_t pkt_action);
+extern void log_db_geolocation(uintf8_t worker_idx, struct geolocation *geo, uint8_t pkt_action);
+extern void log_db_flush_geolocation(void);
 
 #endif
@@ -0,0 +1,232 @@
+#include "config.h"
+#include "cfirewall.h"
+#include "blocklist.h"
+
+#include <stdatomic.h>
+#include <time.h>
+
+#define BLOCKLIST_ENTRY(host, expire) (((uint64_t) (expire) << 32) | (host))
+#define BLOCKLIST_HOST(entry)   ((uint32_t) (entry))
+#define BLOCKLIST_EXPIRE(entry) ((uint32_t) ((entry) >> 32))
+
+// ==================================
+// BLOCKLIST TABLE
+// ==================================
+// packet threads only read the slots. all modifications are made by the control api thread, which is the only writer,
+// so writes do not need to be serialized. moving an entry during removal can cause a reader to miss a host that is
+// still blocked, in which case the packet is inspected normally. a reader can never match a host that is not blocked.
+static _Atomic uint64_t  blocklist[BLOCKLIST_SIZE];
+
+// only accessed by the writer
+static uint32_t     blocklist_times[BLOCKLIST_SIZE];
+static uintf16_t    blocklist_count;
+
+// one counter per worker to keep a ddos from bouncing a shared cache line between the packet threads
+struct blocklist_drops {
+    _Atomic uint64_t    count;
+} __attribute__((aligned(64)));
+
+static struct blocklist_drops drops[FW_MAX_WORKERS];
+
+static void blocklist_expire(uint32_t now);
+static void blocklist_delete(uint32_t idx);
+
+static inline uint32_t
+blocklist_hash(uint32_t host)
+{
+    // fibonacci hashing. the top bits are the best mixed.
+    return (host * 2654435761u) >> (32 - __builtin_ctz(BLOCKLIST_SIZE));
+}
+
+void
+blocklist_init(void)
+{
+    FOR_LOOP(0, BLOCKLIST_SIZE, 1, idx) {
+        atomic_store_explicit(&blocklist[idx], 0, memory_order_relaxed);
+    }
+    blocklist_count = 0;
+}
+
+// ==================================
+// PACKET PATH
+// ==================================
+// returns true if the host is blocked and not expired. the drop is counted for the worker.
+bool
+blocklist_match(uintf8_t worker_idx, uint32_t host)
+{
+    uint32_t    idx = blocklist_hash(host);
+    uint64_t    entry;
+
+    // the load factor guarantees an empty slot will end the probe.
+    for (uint32_t probe = 0; probe < BLOCKLIST_SIZE; probe++) {
+
+        entry = atomic_load_explicit(&blocklist[idx], memory_order_acquire);
+        if (!entry) {
+            return false;
+        }
+
+        if (BLOCKLIST_HOST(entry) == host) {
+
+            // the clock is only read on a host match, so the cost for all other traffic is the probe.
+            if (BLOCKLIST_EXPIRE(entry) <= (uint32_t) time(NULL)) {
+                return false;
+            }
+
+            atomic_store_explicit(&drops[worker_idx].count,
+                atomic_load_explicit(&drops[worker_idx].count, memory_order_relaxed) + 1, memory_order_relaxed);
+
+            return true;
+        }
+        idx = (idx + 1) & BLOCKLIST_MASK;
+    }
+    return false;
+}
+
+// ==================================
+// CONTROL API (WRITER)
+// ==================================
+/*
+blocks the host until expire. a host that is already blocked has its times updated.
+expired hosts are removed if the table is full. returns ERR if the table is still full afterwards.
+*/
+int
+blocklist_add(uint32_t host, uint32_t blocked, uint32_t expire)
+{
+    uint32_t    idx;
+    uint64_t    entry;
+
+    if (!host)
+        return ERR;
+
+    if (blocklist_count >= BLOCKLIST_MAX) {
+        blocklist_expire((uint32_t) time(NULL));
+
+        if (blocklist_count >= BLOCKLIST_MAX)
+            return ERR;
+    }
+
+    idx = blocklist_hash(host);
+    while (true) {
+        entry = atomic_load_explicit(&blocklist[idx], memory_order_relaxed);
+
+        if (!entry) {
+            blocklist_count++;
+            break;
+        }
+        if (BLOCKLIST_HOST(entry) == host) {
+            break;
+        }
+        idx = (idx + 1) & BLOCKLIST_MASK;
+    }
+
+    blocklist_times[idx] = blocked;
+    atomic_store_explicit(&blocklist[idx], BLOCKLIST_ENTRY(host, expire), memory_order_release);
+
+    dprint(FW_V & VERBOSE, "< [!] BLOCKLIST ADD %u until %u [!] >\n", host, expire);
+
+    return OK;
+}
+
+// returns ERR if the host is not in the blocklist.
+int
+blocklist_remove(uint32_t host)
+{
+    uint32_t    idx = blocklist_hash(host);
+    uint64_t    entry;
+
+    while ((entry = atomic_load_explicit(&blocklist[idx], memory_order_relaxed))) {
+
+        if (BLOCKLIST_HOST(entry) == host) {
+            blocklist_delete(idx);
+
+            return OK;
+        }
+        idx = (idx + 1) & BLOCKLIST_MASK;
+    }
+    return ERR;
+}
+
+/*
+copies up to max unexpired hosts into hosts and returns the number copied.
+expired hosts are removed first, so this also serves as the periodic cleanup of the table.
+*/
+uintf16_t
+blocklist_hosts(struct BlockedHost *hosts, uintf16_t max)
+{
+    uintf16_t   count = 0;
+    uint64_t    entry;
+
+    blocklist_expire((uint32_t) time(NULL));
+
+    for (uint32_t idx = 0; idx < BLOCKLIST_SIZE && count < max; idx++) {
+
+        entry = atomic_load_explicit(&blocklist[idx], memory_order_relaxed);
+        if (!entry) continue;
+
+        hosts[count].host    = BLOCKLIST_HOST(entry);
+        hosts[count].blocked = blocklist_times[idx];
+        hosts[count].expire  = BLOCKLIST_EXPIRE(entry);
+        count++;
+    }
+    return count;
+}
+
+uint64_t
+blocklist_drops(void)
+{
+    uint64_t    total = 0;
+
+    FOR_LOOP(0, FW_MAX_WORKERS, 1, worker) {
+        total += atomic_load_explicit(&drops[worker].count, memory_order_relaxed);
+    }
+    return total;
+}
+
+static void
+blocklist_expire(uint32_t now)
+{
+    uint64_t    entry;
+
+    for (uint32_t idx = 0; idx < BLOCKLIST_SIZE; idx++) {
+
+        entry = atomic_load_explicit(&blocklist[idx], memory_order_relaxed);
+
+        // deleting shifts the following entries back, so the same slot is checked again until it holds a live host.
+        while (entry && BLOCKLIST_EXPIRE(entry) <= now) {
+            blocklist_delete(idx);
+
+            entry = atomic_load_explicit(&blocklist[idx], memory_order_relaxed);
+        }
+    }
+}
+
+/*
+removes the entry at idx, then moves back any following entry in the probe sequence that would no longer be reachable.
+this keeps every probe sequence free of gaps without tombstones, so lookups for missing hosts stay short.
+*/
+static void
+blocklist_delete(uint32_t idx)
+{
+    uint32_t    next = idx, home;
+    uint64_t    entry;
+
+    while (true) {
+        next  = (next + 1) & BLOCKLIST_MASK;
+        entry = atomic_load_explicit(&blocklist[next], memory_order_relaxed);
+        if (!entry) break;
+
+        home = blocklist_hash(BLOCKLIST_HOST(entry));
+
+        // the entry can fill the gap only if its home slot is not cyclically within (idx, next]
+        if ((next > idx && (home <= idx || home > next)) || (next < idx && (home <= idx && home > next))) {
+
+            blocklist_times[idx] = blocklist_times[next];
+            atomic_store_explicit(&blocklist[idx], entry, memory_order_release);
+
+            idx = next;
+        }
+    }
+    atomic_store_explicit(&blocklist[idx], 0, memory_order_release);
+
+    blocklist_count--;
+}
@@ -1,10 +1,9 @@
 #include "config.h"
 #include "cfirewall.h"
 
+#include <sched.h>
+#include <unistd.h>
 
-// geolocation vars
-uint32_t MSB, LSB;
-int HTR_IDX;
 
 // cli args
 bool VERBOSE;
@@ -13,7 +12,7 @@ bool VERBOSE2;
 bool FW_V;
 bool NAT_V;
 
-struct mnl_socket *nl[2];
+struct mnl_socket *nl[NL_SOCKET_COUNT];
 
 // stores zone(integer value) at index, which is mapped to if_nametoindex() (value returned from get_in/outdev)
 // memset will be performed in Cython prior to changing the values.
@@ -22,3 +21,19 @@ ZoneMap INTF_ZONE_MAP[FW_MAX_ZONES]; // = <uintf16_t*>calloc(FW_MAX_ZONE_COUNT,
 // the packet id tracks revolving 1-255, which will be used tracked with connmark through nat process
 //uint8_t dnx_pkt_id = 0;
 //struct dnx_pktb dnx_pkt_tracker[UINT8_MAX];
+
+// pins the calling thread to a cpu. the cpu is wrapped to the online cpu count so a worker index can be passed directly.
+int
+cfirewall_set_cpu(intf16_t cpu)
+{
+    cpu_set_t   cpu_set;
+    long        cpu_count = sysconf(_SC_NPROCESSORS_ONLN);
+
+    if (cpu < 0 || cpu_count < 1)
+        return ERR;
+
+    CPU_ZERO(&cpu_set);
+    CPU_SET(cpu % cpu_count, &cpu_set);
+
+    return pthread_setaffinity_np(pthread_self(), sizeof(cpu_set_t), &cpu_set) == 0 ? OK : ERR;
+}
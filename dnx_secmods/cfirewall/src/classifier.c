@@ -0,0 +1,527 @@
+#include "config.h"
+#include "cfirewall.h"
+#include "firewall.h"
+#include "classifier.h"
+
+#define IP_ADDRESS  1
+#define IP_NETWORK  2
+#define IP_RANGE    3
+#define IP_NET_LIST 4
+#define IP_GEO      6
+#define INV_IP_ADDRESS  11
+#define INV_IP_NETWORK  12
+#define INV_IP_GEO      16
+
+#define CL_KEY_MAX   UINT32_MAX
+#define CL_PORT_MAX  UINT16_MAX
+
+#define CL_WORD_IDX(rule_idx)  ((rule_idx) / CL_WORD_BITS)
+#define CL_WORD_BIT(rule_idx)  ((clword_t) 1 << ((rule_idx) % CL_WORD_BITS))
+
+#define CL_SET_BIT(set, rule_idx) (set)[CL_WORD_IDX(rule_idx)] |= CL_WORD_BIT(rule_idx)
+
+// ================================== //
+// BUILD ENTRIES
+// ================================== //
+// flat list of (protocol, range, rule) collected from the rule fields before being compiled into interval tables.
+struct ClassEntry {
+    uint32_t    lo;
+    uint32_t    hi;
+    uint16_t    rule;
+    uint16_t    proto;
+};
+
+struct ClassEntries {
+    size_t      len;
+    size_t      cap;
+    bool        error;
+    struct ClassEntry  *entries;
+};
+
+static int  entries_add(struct ClassEntries *ents, uint16_t proto, uint32_t lo, uint32_t hi, uintf16_t rule_idx);
+static void entries_add_network(struct ClassEntries *ents, clword_t *geo, uintf16_t words, NetArray *net_array, uintf16_t rule_idx);
+static void entries_add_service(struct ClassEntries *ents, SvcArray *svc_array, uintf16_t rule_idx);
+static void entries_add_inverse(struct ClassEntries *ents, uint32_t lo, uint32_t hi, uintf16_t rule_idx);
+static void entries_add_netlist(struct ClassEntries *ents, NetList *list, uintf16_t rule_idx);
+
+static int  intervals_build(struct ClassIntervals *ci, struct ClassEntries *ents, int proto, uintf16_t words);
+static void intervals_free(struct ClassIntervals *ci);
+static clword_t *intervals_lookup(struct ClassIntervals *ci, uint32_t key, uintf16_t words);
+
+static int  services_build(struct ClassServices *cs, struct ClassEntries *ents, uintf16_t words);
+static void services_free(struct ClassServices *cs);
+
+static void zones_set(clword_t *zones, uintf16_t words, ZoneArray *zone_array, uintf16_t rule_idx);
+static int  cmp_u32(const void *a, const void *b);
+
+/*
+compiles a control list into a classifier. this is called by the manager thread during a rule push and never from the
+packet path, so the cost of building is traded for a lookup that does not scale with the number of rules.
+
+returns NULL on allocation failure. the caller is expected to fall back to a linear scan of the table in that case.
+*/
+struct FWclassifier*
+classifier_build(struct FWtable *table)
+{
+    struct FWclassifier    *fwc;
+    struct FWrule          *rule;
+    struct ClassEntries     s_nets = {}, d_nets = {}, s_svcs = {}, d_svcs = {};
+
+    fwc = calloc(1, sizeof(struct FWclassifier));
+    if (!fwc)
+        return NULL;
+
+    fwc->rule_count = table->len;
+    fwc->words = (table->len / CL_WORD_BITS) + 1;
+
+    fwc->enabled = calloc(fwc->words, sizeof(clword_t));
+    fwc->s_zones = calloc(CL_FIELD_VALS * fwc->words, sizeof(clword_t));
+    fwc->d_zones = calloc(CL_FIELD_VALS * fwc->words, sizeof(clword_t));
+    fwc->s_geo   = calloc(CL_FIELD_VALS * fwc->words, sizeof(clword_t));
+    fwc->d_geo   = calloc(CL_FIELD_VALS * fwc->words, sizeof(clword_t));
+
+    if (!fwc->enabled || !fwc->s_zones || !fwc->d_zones || !fwc->s_geo || !fwc->d_geo)
+        goto error;
+
+    FOR_LOOP(0, table->len, 1, rule_idx) {
+
+        rule = &table->rules[rule_idx];
+
+        // disabled rules still get compiled so the bitsets stay aligned with the table. the enabled set masks them.
+        if (rule->enabled) {
+            CL_SET_BIT(fwc->enabled, rule_idx);
+        }
+
+        zones_set(fwc->s_zones, fwc->words, &rule->s_zones, rule_idx);
+        zones_set(fwc->d_zones, fwc->words, &rule->d_zones, rule_idx);
+
+        entries_add_network(&s_nets, fwc->s_geo, fwc->words, &rule->s_networks, rule_idx);
+        entries_add_network(&d_nets, fwc->d_geo, fwc->words, &rule->d_networks, rule_idx);
+
+        entries_add_service(&s_svcs, &rule->s_services, rule_idx);
+        entries_add_service(&d_svcs, &rule->d_services, rule_idx);
+    }
+
+    if (s_nets.error || d_nets.error || s_svcs.error || d_svcs.error) goto error;
+
+    if (intervals_build(&fwc->s_ips, &s_nets, ANY_PROTOCOL, fwc->words) != OK) goto error;
+    if (intervals_build(&fwc->d_ips, &d_nets, ANY_PROTOCOL, fwc->words) != OK) goto error;
+
+    if (services_build(&fwc->s_svcs, &s_svcs, fwc->words) != OK) goto error;
+    if (services_build(&fwc->d_svcs, &d_svcs, fwc->words) != OK) goto error;
+
+    free(s_nets.entries);
+    free(d_nets.entries);
+    free(s_svcs.entries);
+    free(d_svcs.entries);
+
+    dprint(FW_V & VERBOSE, "< [!] FW CLASSIFIER BUILT rules=%u, s_ips=%u, d_ips=%u [!] >\n",
+        (uint16_t) fwc->rule_count, (uint32_t) fwc->s_ips.len, (uint32_t) fwc->d_ips.len);
+
+    return fwc;
+
+error:
+    free(s_nets.entries);
+    free(d_nets.entries);
+    free(s_svcs.entries);
+    free(d_svcs.entries);
+
+    classifier_free(fwc);
+
+    return NULL;
+}
+
+void
+classifier_free(struct FWclassifier *fwc)
+{
+    if (!fwc)
+        return;
+
+    free(fwc->enabled);
+    free(fwc->s_zones);
+    free(fwc->d_zones);
+    free(fwc->s_geo);
+    free(fwc->d_geo);
+
+    intervals_free(&fwc->s_ips);
+    intervals_free(&fwc->d_ips);
+
+    services_free(&fwc->s_svcs);
+    services_free(&fwc->d_svcs);
+
+    free(fwc);
+}
+
+/*
+returns the index of the first rule after "after" that matches every field of the key or CL_NO_MATCH.
+pass CL_NO_MATCH as "after" to start from the beginning of the control list.
+*/
+intf32_t
+classifier_search(struct FWclassifier *fwc, struct ClassKey *key, intf32_t after)
+{
+    uintf16_t   words = fwc->words;
+    uintf16_t   start = CL_WORD_IDX(after + 1);
+
+    clword_t   *s_zone = &fwc->s_zones[key->in_zone * words];
+    clword_t   *d_zone = &fwc->d_zones[key->out_zone * words];
+    clword_t   *s_geo  = &fwc->s_geo[key->src_country * words];
+    clword_t   *d_geo  = &fwc->d_geo[key->dst_country * words];
+
+    clword_t   *s_ip   = intervals_lookup(&fwc->s_ips, key->src_ip, words);
+    clword_t   *d_ip   = intervals_lookup(&fwc->d_ips, key->dst_ip, words);
+
+    clword_t   *s_svc  = intervals_lookup(
+        &fwc->s_svcs.tables[fwc->s_svcs.proto_map[key->protocol]], key->sport, words);
+
+    // icmp is checked in source only.
+    clword_t   *d_svc  = key->protocol == IPPROTO_ICMP ? NULL : intervals_lookup(
+        &fwc->d_svcs.tables[fwc->d_svcs.proto_map[key->protocol]], key->dport, words);
+
+    clword_t    bits;
+
+    FOR_LOOP(start, words, 1, word) {
+        bits = fwc->enabled[word] & s_zone[word] & d_zone[word];
+
+        // network match is satisfied by either an ip object or a geolocation object
+        bits &= (s_ip[word] | s_geo[word]) & (d_ip[word] | d_geo[word]);
+        bits &= s_svc[word];
+
+        if (d_svc) {
+            bits &= d_svc[word];
+        }
+
+        // masking off the rules at or before the previous candidate
+        if (word == start) {
+            bits &= ~(CL_WORD_BIT(after + 1) - 1);
+        }
+
+        if (bits) {
+            return (intf32_t) (word * CL_WORD_BITS) + __builtin_ctzll(bits);
+        }
+    }
+
+    return CL_NO_MATCH;
+}
+
+// ==================================
+// FIELD COMPILERS
+// ==================================
+static void
+zones_set(clword_t *zones, uintf16_t words, ZoneArray *zone_array, uintf16_t rule_idx)
+{
+    // any zone def is a guaranteed match
+    if (zone_array->objects[0] == ANY_ZONE) {
+        FOR_LOOP(0, CL_FIELD_VALS, 1, zone) {
+            CL_SET_BIT(&zones[zone * words], rule_idx);
+        }
+        return;
+    }
+
+    FOR_LOOP(0, zone_array->len, 1, idx) {
+        CL_SET_BIT(&zones[(uint8_t) zone_array->objects[idx] * words], rule_idx);
+    }
+}
+
+/*
+network objects are converted to the host ranges they match. inverse objects become the (up to 2) ranges on either
+side of the object. netmasks that do not represent a prefix cannot be expressed as a range, so the full range is used.
+this can only widen the candidates and the exact rule check done by the caller will filter them.
+*/
+static void
+entries_add_network(struct ClassEntries *ents, clword_t *geo, uintf16_t words, NetArray *net_array, uintf16_t rule_idx)
+{
+    NetObject   net;
+    uint32_t    mask, lo, hi;
+    bool        prefix, aligned;
+
+    FOR_LOOP(0, net_array->len, 1, idx) {
+
+        net = net_array->objects[idx];
+
+        mask    = (uint32_t) net.netmask;
+        prefix  = ((~mask & (~mask + 1)) == 0);
+        aligned = (net.netid <= CL_KEY_MAX && (net.netid & ~mask) == 0);
+
+        switch (net.type) {
+            case IP_ADDRESS:
+                if (net.netid <= CL_KEY_MAX) {
+                    entries_add(ents, ANY_PROTOCOL, net.netid, net.netid, rule_idx);
+                }
+                break;
+            case IP_NETWORK:
+                if (!prefix) {
+                    entries_add(ents, ANY_PROTOCOL, 0, CL_KEY_MAX, rule_idx);
+                }
+                else if (aligned) {
+                    entries_add(ents, ANY_PROTOCOL, net.netid, net.netid | ~mask, rule_idx);
+                }
+                break;
+            case IP_RANGE:
+                if (net.netid <= net.netmask && net.netid <= CL_KEY_MAX) {
+                    hi = (net.netmask > CL_KEY_MAX) ? CL_KEY_MAX : (uint32_t) net.netmask;
+                    entries_add(ents, ANY_PROTOCOL, net.netid, hi, rule_idx);
+                }
+                break;
+            case IP_NET_LIST:
+                entries_add_netlist(ents, net.list, rule_idx);
+                break;
+            case IP_GEO:
+                if (net.netid < CL_FIELD_VALS) {
+                    CL_SET_BIT(&geo[net.netid * words], rule_idx);
+                }
+                break;
+            case INV_IP_ADDRESS:
+                if (net.netid > CL_KEY_MAX) {
+                    entries_add(ents, ANY_PROTOCOL, 0, CL_KEY_MAX, rule_idx);
+                    break;
+                }
+                if (net.netid > 0) {
+                    entries_add(ents, ANY_PROTOCOL, 0, net.netid - 1, rule_idx);
+                }
+                if (net.netid < CL_KEY_MAX) {
+                    entries_add(ents, ANY_PROTOCOL, net.netid + 1, CL_KEY_MAX, rule_idx);
+                }
+                break;
+            case INV_IP_NETWORK:
+                if (!prefix || !aligned) {
+                    entries_add(ents, ANY_PROTOCOL, 0, CL_KEY_MAX, rule_idx);
+                    break;
+                }
+                lo = (uint32_t) net.netid;
+                hi = lo | ~mask;
+                entries_add_inverse(ents, lo, hi, rule_idx);
+                break;
+            case INV_IP_GEO:
+                FOR_LOOP(0, CL_FIELD_VALS, 1, country) {
+                    if (country != net.netid) {
+                        CL_SET_BIT(&geo[country * words], rule_idx);
+                    }
+                }
+        }
+    }
+}
+
+// adds the key space outside of [lo, hi]
+static void
+entries_add_inverse(struct ClassEntries *ents, uint32_t lo, uint32_t hi, uintf16_t rule_idx)
+{
+    if (lo > 0) {
+        entries_add(ents, ANY_PROTOCOL, 0, lo - 1, rule_idx);
+    }
+    if (hi < CL_KEY_MAX) {
+        entries_add(ents, ANY_PROTOCOL, hi + 1, CL_KEY_MAX, rule_idx);
+    }
+}
+
+// adds every range of the list. a missing list matches nothing, which mirrors network_match.
+static void
+entries_add_netlist(struct ClassEntries *ents, NetList *list, uintf16_t rule_idx)
+{
+    uintf32_t   idx;
+
+    if (!list) { return; }
+
+    for (idx = 0; idx < list->len; idx++) {
+        entries_add(ents, ANY_PROTOCOL, list->starts[idx], list->ends[idx], rule_idx);
+    }
+}
+
+static void
+entries_add_service(struct ClassEntries *ents, SvcArray *svc_array, uintf16_t rule_idx)
+{
+    SvcObject   svc_object;
+    struct S2   svc;
+
+    FOR_LOOP(0, svc_array->len, 1, idx) {
+
+        svc_object = svc_array->objects[idx];
+        switch (svc_object.type) {
+            case SVC_SOLO:
+                svc_object.svc.end_port = svc_object.svc.start_port;
+                // fall through
+            case SVC_RANGE:
+                svc = svc_object.svc;
+                if (svc.protocol >= CL_FIELD_VALS || svc.start_port > CL_PORT_MAX) { break; }
+                if (svc.start_port > svc.end_port) { break; }
+
+                entries_add(ents, svc.protocol, svc.start_port,
+                    svc.end_port > CL_PORT_MAX ? CL_PORT_MAX : svc.end_port, rule_idx);
+                break;
+            case SVC_LIST:
+                FOR_LOOP(0, svc_object.svc_list.len, 1, ix) {
+                    svc = svc_object.svc_list.services[ix];
+                    if (svc.protocol >= CL_FIELD_VALS || svc.start_port > CL_PORT_MAX) { continue; }
+                    if (svc.start_port > svc.end_port) { continue; }
+
+                    entries_add(ents, svc.protocol, svc.start_port,
+                        svc.end_port > CL_PORT_MAX ? CL_PORT_MAX : svc.end_port, rule_idx);
+                }
+                break;
+            case SVC_ICMP:
+                // icmp type/code is carried in the source port position
+                entries_add(ents, IPPROTO_ICMP, (svc_object.icmp.type << 8) | svc_object.icmp.code,
+                    (svc_object.icmp.type << 8) | svc_object.icmp.code, rule_idx);
+        }
+    }
+}
+
+static int
+entries_add(struct ClassEntries *ents, uint16_t proto, uint32_t lo, uint32_t hi, uintf16_t rule_idx)
+{
+    struct ClassEntry  *entries;
+
+    if (ents->len == ents->cap) {
+        ents->cap = ents->cap ? ents->cap * 2 : 64;
+
+        entries = realloc(ents->entries, ents->cap * sizeof(struct ClassEntry));
+        if (!entries) {
+            // flagged so the build is failed instead of silently compiling with missing entries
+            ents->error = true;
+
+            return ERR;
+        }
+
+        ents->entries = entries;
+    }
+
+    ents->entries[ents->len++] = (struct ClassEntry) { .lo = lo, .hi = hi, .rule = rule_idx, .proto = proto };
+
+    return OK;
+}
+
+// ==================================
+// INTERVAL TABLES
+// ==================================
+/*
+splits the key space at every entry boundary then sets the rule bit for each interval an entry covers.
+only entries with a matching protocol or ANY_PROTOCOL are included.
+*/
+static int
+intervals_build(struct ClassIntervals *ci, struct ClassEntries *ents, int proto, uintf16_t words)
+{
+    struct ClassEntry  *ent;
+    uint32_t           *bounds;
+    size_t              bcnt = 0;
+    uintf32_t           idx;
+
+    bounds = malloc((ents->len * 2 + 1) * sizeof(uint32_t));
+    if (!bounds)
+        return ERR;
+
+    // the first interval always starts at 0 so every key has an interval
+    bounds[bcnt++] = 0;
+
+    FOR_LOOP(0, ents->len, 1, i) {
+        ent = &ents->entries[i];
+        if (ent->proto != proto && ent->proto != ANY_PROTOCOL) { continue; }
+
+        bounds[bcnt++] = ent->lo;
+        if (ent->hi != CL_KEY_MAX) {
+            bounds[bcnt++] = ent->hi + 1;
+        }
+    }
+
+    qsort(bounds, bcnt, sizeof(uint32_t), cmp_u32);
+
+    // dedup in place
+    ci->len = 1;
+    FOR_LOOP(1, bcnt, 1, i) {
+        if (bounds[i] != bounds[ci->len - 1]) {
+            bounds[ci->len++] = bounds[i];
+        }
+    }
+
+    ci->starts = bounds;
+    ci->sets = calloc(ci->len * words, sizeof(clword_t));
+    if (!ci->sets)
+        return ERR;
+
+    FOR_LOOP(0, ents->len, 1, i) {
+        ent = &ents->entries[i];
+        if (ent->proto != proto && ent->proto != ANY_PROTOCOL) { continue; }
+
+        // entry lo is always an interval start so this will land on the first covered interval
+        idx = (intervals_lookup(ci, ent->lo, words) - ci->sets) / words;
+
+        for (; idx < ci->len && ci->starts[idx] <= ent->hi; idx++) {
+            CL_SET_BIT(&ci->sets[idx * words], ent->rule);
+        }
+    }
+
+    return OK;
+}
+
+static void
+intervals_free(struct ClassIntervals *ci)
+{
+    free(ci->starts);
+    free(ci->sets);
+}
+
+// binary search for the last interval starting at or before key
+static inline clword_t*
+intervals_lookup(struct ClassIntervals *ci, uint32_t key, uintf16_t words)
+{
+    uintf32_t   lo = 0, hi = ci->len, mid;
+
+    while (hi - lo > 1) {
+        mid = lo + ((hi - lo) / 2);
+
+        if (ci->starts[mid] <= key)
+            lo = mid;
+        else
+            hi = mid;
+    }
+
+    return &ci->sets[lo * words];
+}
+
+static int
+services_build(struct ClassServices *cs, struct ClassEntries *ents, uintf16_t words)
+{
+    uint16_t    protos[CL_FIELD_VALS];
+
+    // idx 0 is the table for protocols not explicitly referenced
+    cs->len = 1;
+    protos[0] = ANY_PROTOCOL;
+
+    FOR_LOOP(0, ents->len, 1, i) {
+        if (ents->entries[i].proto == ANY_PROTOCOL || cs->proto_map[ents->entries[i].proto]) { continue; }
+
+        cs->proto_map[ents->entries[i].proto] = cs->len;
+        protos[cs->len++] = ents->entries[i].proto;
+    }
+
+    cs->tables = calloc(cs->len, sizeof(struct ClassIntervals));
+    if (!cs->tables)
+        return ERR;
+
+    FOR_LOOP(0, cs->len, 1, idx) {
+        if (intervals_build(&cs->tables[idx], ents, protos[idx], words) != OK)
+            return ERR;
+    }
+
+    return OK;
+}
+
+static void
+services_free(struct ClassServices *cs)
+{
+    if (!cs->tables)
+        return;
+
+    FOR_LOOP(0, cs->len, 1, idx) {
+        intervals_free(&cs->tables[idx]);
+    }
+
+    free(cs->tables);
+}
+
+static int
+cmp_u32(const void *a, const void *b)
+{
+    uint32_t    x = *(const uint32_t*) a;
+    uint32_t    y = *(const uint32_t*) b;
+
+    return (x > y) - (x < y);
+}
@@ -2,6 +2,9 @@
 #include "cfirewall.h"
 #include "dnx_nfq.h"
 
+#include <errno.h>
+#include <time.h>
+
 static void mangle_src_addr(struct dnx_pktb *pkt);
 static void mangle_src_port(struct dnx_pktb *pkt);
 static void mangle_dst_addr(struct dnx_pktb *pkt);
@@ -48,25 +51,126 @@ dnx_parse_pkt_headers(struct dnx_pktb *pkt)
     pkt->protohdr = (struct Protohdr*) (pkt->iphdr + 1);
 }
 
-// DIRECT ACTION (does NOT forward to another nfqueue)
-inline void
-dnx_send_verdict(struct cfdata *cfd, uint32_t pktid, uint32_t verdict)
+// ==================================
+// VERDICT BATCHING
+// ==================================
+static inline uint64_t
+monotonic_usec(void)
 {
-    char                buf[MNL_SOCKET_BUFFER_SIZE];
-    struct nlmsghdr    *nlh;
-    struct nlattr      *nest;
+    struct timespec     ts;
+
+    clock_gettime(CLOCK_MONOTONIC, &ts);
+
+    return (uint64_t) ts.tv_sec * 1000000 + ts.tv_nsec / 1000;
+}
+
+static inline void
+verdict_batch_reset(struct VerdictBatch *vb)
+{
+    mnl_nlmsg_batch_reset(vb->batch);
+
+    vb->count   = 0;
+    vb->uniform = true;
+}
+
+int
+dnx_verdict_batch_init(struct cfdata *cfd, uintf16_t limit)
+{
+    struct VerdictBatch *vb = calloc(1, sizeof(struct VerdictBatch));
+
+    if (!vb) { return ERR; }
+
+    vb->sock  = nl[cfd->idx];
+    vb->batch = mnl_nlmsg_batch_start(vb->buf, VERDICT_BATCH_LIMIT);
+    vb->limit = (limit && limit <= VERDICT_BATCH_MAX) ? limit : VERDICT_BATCH_MAX;
+
+    if (!vb->batch) {
+        free(vb);
+
+        return ERR;
+    }
+
+    verdict_batch_reset(vb);
+    cfd->verdicts = vb;
+
+    return OK;
+}
+
+/* sends all pending verdicts with a single syscall. if every pending verdict is a plain drop, the kernel batch verdict is
+used which applies to all outstanding packet ids up to and including the last one. this is only safe because a queue
+worker issues verdicts in the same order it receives packets, so no earlier packet can still be awaiting inspection.
+*/
+int
+dnx_flush_verdicts(struct cfdata *cfd)
+{
+    struct VerdictBatch *vb = cfd->verdicts;
+    struct nlmsghdr     *nlh;
+    char                 buf[MNL_NLMSG_HDRLEN + MNL_ALIGN(sizeof(struct nfgenmsg)) + 64];
+    ssize_t              ret;
+
+    if (!vb->count) { return OK; }
 
-    nlh = nfq_nlmsg_put(buf, NFQNL_MSG_VERDICT, cfd->queue);
+    if (vb->count > 1 && vb->uniform) {
+        nlh = nfq_nlmsg_put(buf, NFQNL_MSG_VERDICT_BATCH, cfd->queue);
+        nfq_nlmsg_verdict_put(nlh, vb->last_id, NF_DROP);
+
+        ret = mnl_socket_sendto(vb->sock, nlh, nlh->nlmsg_len);
+    }
+    else {
+        ret = mnl_socket_sendto(vb->sock, mnl_nlmsg_batch_head(vb->batch), mnl_nlmsg_batch_size(vb->batch));
+    }
+
+    vb->sends++;
+    verdict_batch_reset(vb);
+
+    return ret < 0 ? ERR : OK;
+}
+
+static void
+verdict_enqueue(struct cfdata *cfd, uint32_t pktid, uint32_t mark, uint32_t verdict, uint32_t ctmark)
+{
+    struct VerdictBatch *vb = cfd->verdicts;
+    struct nlmsghdr     *nlh;
+    struct nlattr       *nest;
+
+    nlh = nfq_nlmsg_put(mnl_nlmsg_batch_current(vb->batch), NFQNL_MSG_VERDICT, cfd->queue);
 
     nfq_nlmsg_verdict_put(nlh, pktid, verdict);
+    if (mark) {
+        nfq_nlmsg_verdict_put_mark(nlh, mark);
+    }
 
     // connection offloaded to kernel if connmark is set. all connections will be offloaded until stateless actions are
-    // implemented in cfirewall and configurable in the webui.
+    // implemented in cfirewall and configurable in the webui. metered (quota) connections are the exception.
     nest = mnl_attr_nest_start(nlh, NFQA_CT);
-    mnl_attr_put_u32(nlh, CTA_MARK, htonl(1));
+    mnl_attr_put_u32(nlh, CTA_MARK, htonl(ctmark));
     mnl_attr_nest_end(nlh, nest);
 
-    mnl_socket_sendto(nl[cfd->idx], nlh, nlh->nlmsg_len);
+    // the message did not fit. everything before it is sent and it becomes the head of the next batch.
+    if (!mnl_nlmsg_batch_next(vb->batch)) {
+        vb->uniform = false;
+        dnx_flush_verdicts(cfd);
+    }
+
+    if (!vb->count) {
+        vb->started = monotonic_usec();
+    }
+
+    vb->count++;
+    vb->verdicts++;
+    vb->last_id  = pktid;
+    vb->uniform &= (verdict == NF_DROP && !mark);
+
+    if (vb->count >= vb->limit || monotonic_usec() - vb->started >= VERDICT_BATCH_USEC) {
+        dnx_flush_verdicts(cfd);
+    }
+}
+
+// DIRECT ACTION (does NOT forward to another nfqueue)
+inline void
+dnx_send_verdict(struct cfdata *cfd, uint32_t pktid, uint32_t verdict)
+{
+    verdict_enqueue(cfd, pktid, 0, verdict, 1);
 }
 
 /*
@@ -77,25 +181,148 @@ reduced pointer dereference.
 */
 inline void
 dnx_send_deferred_verdict(struct cfdata *cfd, uint32_t pktid, uint32_t mark, uint32_t verdict)
+{
+    verdict_enqueue(cfd, pktid, mark, verdict, 1);
+}
+
+/*
+METERED ACTION (connection is NOT offloaded to the kernel)
+sets verdict and mark, if set. every packet of the connection will continue to be queued to cfirewall.
+*/
+inline void
+dnx_send_metered_verdict(struct cfdata *cfd, uint32_t pktid, uint32_t mark, uint32_t verdict)
+{
+    verdict_enqueue(cfd, pktid, mark, verdict, 0);
+}
+
+/* returns the next message from the queue socket. while verdicts are pending the socket is read without blocking and the
+batch is flushed once no more packets are waiting, so a verdict is never held while the worker is idle.
+*/
+ssize_t
+dnx_queue_recv(struct cfdata *cfd, void *buf, size_t len)
+{
+    ssize_t     dlen;
+
+    if (cfd->verdicts->count) {
+        dlen = recv(mnl_socket_get_fd(nl[cfd->idx]), buf, len, MSG_DONTWAIT);
+        if (dlen >= 0 || (errno != EAGAIN && errno != EWOULDBLOCK)) {
+            return dlen;
+        }
+
+        dnx_flush_verdicts(cfd);
+    }
+
+    return mnl_socket_recvfrom(nl[cfd->idx], buf, len);
+}
+
+// ==================================
+// VERDICT BENCHMARK
+// ==================================
+// reads the acks waiting on the bench socket without blocking and returns the number that carry an error.
+static uint64_t
+verdict_bench_drain(struct mnl_socket *sock)
 {
     char                buf[MNL_SOCKET_BUFFER_SIZE];
     struct nlmsghdr    *nlh;
-    struct nlattr      *nest;
+    struct nlmsgerr    *err;
+    int                 len;
+    uint64_t            errors = 0;
 
-    nlh = nfq_nlmsg_put(buf, NFQNL_MSG_VERDICT, cfd->queue);
+    while ((len = recv(mnl_socket_get_fd(sock), buf, sizeof(buf), MSG_DONTWAIT)) > 0) {
 
-    nfq_nlmsg_verdict_put(nlh, pktid, verdict);
-    if (mark) {
-        nfq_nlmsg_verdict_put_mark(nlh, mark);
+        for (nlh = (struct nlmsghdr*) buf; mnl_nlmsg_ok(nlh, len); nlh = mnl_nlmsg_next(nlh, &len)) {
+
+            if (nlh->nlmsg_type != NLMSG_ERROR) { continue; }
+
+            err = mnl_nlmsg_get_payload(nlh);
+            if (err->error) { errors++; }
+        }
     }
 
-    // connection offloaded to kernel if connmark is set. all connections will be offloaded until stateless actions are
-    // implemented in cfirewall and configurable in the webui.
-    nest = mnl_attr_nest_start(nlh, NFQA_CT);
-    mnl_attr_put_u32(nlh, CTA_MARK, htonl(1));
-    mnl_attr_nest_end(nlh, nest);
+    return errors;
+}
+
+/* measures verdict transmission cost for a given batch limit.
+
+the bench socket binds VERDICT_BENCH_QUEUE, which has no rule sending packets to it, so verdicts go through the same
+kernel path as live ones up to the packet id lookup. no packet is queued under the ids sent, so the lookup fails and
+the kernel answers every verdict message with an -ENOENT ack (capped to the header with NETLINK_CAP_ACK).
+
+the acks are read after each send, outside of the timed section, and counted through "errors". errors matching the
+number of verdict messages confirms each one reached the queue lookup, fewer means messages were dropped or rejected
+before it. the returned rate covers building the batch, the sendmsg call and kernel processing up to the lookup.
+it does not include reinjecting the packet, which is the same per verdict regardless of the batch limit. the number of
+sends performed is returned through "sends".
+*/
+double
+dnx_verdict_bench(uintf16_t limit, uint32_t pkt_count, uint64_t *sends, uint64_t *errors)
+{
+    struct cfdata       cfd = { .idx = 0, .queue = VERDICT_BENCH_QUEUE, .cpu = -1 };
+    struct mnl_socket  *sock;
+    struct nlmsghdr    *nlh;
+    struct timespec     start, end, drain_start, drain_end;
+    char                buf[MNL_SOCKET_BUFFER_SIZE];
+    int                 cap_ack = 1;
+    uint64_t            sent = 0;
+    double              elapsed, drained = 0;
+
+    *sends  = 0;
+    *errors = 0;
+
+    sock = mnl_socket_open(NETLINK_NETFILTER);
+    if (!sock) { return ERR; }
+
+    if (mnl_socket_bind(sock, 0, MNL_SOCKET_AUTOPID) < 0) {
+        mnl_socket_close(sock);
+
+        return ERR;
+    }
+    mnl_socket_setsockopt(sock, NETLINK_CAP_ACK, &cap_ack, sizeof(int));
+
+    // the bind is acked so a failure (queue in use or missing CAP_NET_ADMIN) is caught before any verdicts are sent.
+    nlh = nfq_nlmsg_put(buf, NFQNL_MSG_CONFIG, VERDICT_BENCH_QUEUE);
+    nfq_nlmsg_cfg_put_cmd(nlh, AF_INET, NFQNL_CFG_CMD_BIND);
+    nlh->nlmsg_flags |= NLM_F_ACK;
+
+    if (mnl_socket_sendto(sock, nlh, nlh->nlmsg_len) < 0 || verdict_bench_drain(sock)
+            || dnx_verdict_batch_init(&cfd, limit) == ERR) {
+        mnl_socket_close(sock);
+
+        return ERR;
+    }
+    cfd.verdicts->sock = sock;
+
+    clock_gettime(CLOCK_MONOTONIC, &start);
+
+    for (uint32_t i = 1; i <= pkt_count; i++) {
+        dnx_send_verdict(&cfd, i, NF_ACCEPT);
+
+        // netlink processes the messages within the send call, so the acks are waiting once it returns. reading them
+        // per send keeps the receive buffer from overflowing and dropping acks.
+        if (cfd.verdicts->sends != sent) {
+            clock_gettime(CLOCK_MONOTONIC, &drain_start);
+
+            *errors += verdict_bench_drain(sock);
+            sent = cfd.verdicts->sends;
+
+            clock_gettime(CLOCK_MONOTONIC, &drain_end);
+
+            drained += (drain_end.tv_sec - drain_start.tv_sec) + (drain_end.tv_nsec - drain_start.tv_nsec) / 1e9;
+        }
+    }
+    dnx_flush_verdicts(&cfd);
+
+    clock_gettime(CLOCK_MONOTONIC, &end);
+
+    *errors += verdict_bench_drain(sock);
+    *sends   = cfd.verdicts->sends;
+    elapsed  = (end.tv_sec - start.tv_sec) + (end.tv_nsec - start.tv_nsec) / 1e9 - drained;
+
+    // closing the socket also unbinds the queue.
+    free(cfd.verdicts);
+    mnl_socket_close(sock);
 
-    mnl_socket_sendto(nl[cfd->idx], nlh, nlh->nlmsg_len);
+    return elapsed > 0 ? pkt_count / elapsed : 0;
 }
 
 /*
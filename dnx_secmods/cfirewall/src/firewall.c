@@ -2,9 +2,13 @@
 #include "cfirewall.h"
 #include "firewall.h"
 
+#include <stdatomic.h>
+#include <sched.h>
+#include <time.h>
+
 #define FW_SYSTEM_MAX_RULE_COUNT  50
 #define FW_BEFORE_MAX_RULE_COUNT 100
-#define FW_MAIN_MAX_RULE_COUNT   500
+#define FW_MAIN_MAX_RULE_COUNT  2500
 #define FW_AFTER_MAX_RULE_COUNT  100
 
 #define FW_MAX_ATTACKERS  250
@@ -19,26 +23,61 @@
 #define DNS_PROXY_MASK 240
 #define IPS_IDS_MASK   3840
 
+// rule counters per worker row, rounded up to a full cache line so workers never write to the same line.
+#define FW_STATS_PER_LINE  (64 / sizeof(struct FWrulestats))
+#define firewall_stats_stride(len) ((((len) / FW_STATS_PER_LINE) + 1) * FW_STATS_PER_LINE)
+
 #define PACKET_ACTION_MASK  3 // first 2 bits
 #define PACKET_DIR_MASK    12 // 2nd 2 bits
 
-#define SEND_TO_IP_PROXY  (IP_PROXY  << TWO_BYTES) | NF_QUEUE)
-#define SEND_TO_IPS_IDS   (IPS_IDS   << TWO_BYTES) | NF_QUEUE)
-#define SEND_TO_DNS_PROXY (DNS_PROXY << TWO_BYTES) | NF_QUEUE)
+#define SEND_TO_IP_PROXY  ((IP_PROXY  << TWO_BYTES) | NF_QUEUE)
+#define SEND_TO_IPS_IDS   ((IPS_IDS   << TWO_BYTES) | NF_QUEUE)
+#define SEND_TO_DNS_PROXY ((DNS_PROXY << TWO_BYTES) | NF_QUEUE)
+
+static struct FWtable *firewall_table_copy(struct FWtable *swap);
+static void firewall_table_free(struct FWtable *table);
+static int  firewall_rule_lists_copy(struct FWrule *rule);
+static void firewall_rule_lists_free(struct FWrule *rule);
+static void firewall_synchronize(void);
+static intf32_t firewall_lookup(struct FWtable *control_list, struct ClassKey *key);
+static int firewall_match_rule(struct FWrule *rule, struct ClassKey *key);
+static void firewall_account(uintf8_t worker, struct FWgeneration *fwg, struct dnx_pktb *pkt, uint64_t nsec);
 
 // ==================================
-// Firewall tables access lock
+// Firewall tables write lock
 // ==================================
-// Must be held to read from or make
-// changes to "*firewall_tables[]"
+// serializes rule and zone pushes from the manager threads. this is never taken in the packet path.
 pthread_mutex_t     FWtableslock;
 pthread_mutex_t    *FWlock_ptr = &FWtableslock;
 
 // ==================================
-// FIREWALL TABLES
+// FIREWALL TABLES (ACTIVE GENERATION)
+// ==================================
+// the active generation is immutable once published. packet threads load the pointer without locking and a push
+// publishes a replacement, then waits for a grace period before reclaiming the old one.
+static struct FWgeneration *_Atomic fw_generation;
+
+// ==================================
+// READER EPOCHS
+// ==================================
+// each packet thread records the global epoch it entered on, or 0 when outside of inspection. a grace period has
+// elapsed once every reader is idle or has entered on an epoch newer than the publish.
+struct fw_reader {
+    _Atomic uint64_t    epoch;
+} __attribute__((aligned(64))); // one reader per cache line to prevent false sharing between packet threads
+
+static _Atomic uint64_t  fw_epoch = 1;
+static struct fw_reader  fw_readers[FW_MAX_READERS];
+
+// ==================================
+// INSPECTION LATENCY
 // ==================================
-// contains pointers to arrays of pointers to FWrule and its length
-struct FWtable firewall_tables[FW_TABLE_COUNT];
+// one histogram per worker. only the owning worker writes to it, the control api sums them on request.
+struct fw_latency {
+    _Atomic uint64_t    buckets[FW_LATENCY_BUCKETS];
+} __attribute__((aligned(64)));
+
+static struct fw_latency fw_latency[FW_MAX_WORKERS];
 
 // ==================================
 // FIREWALL RULES SWAP STORAGE
@@ -49,15 +88,16 @@ struct FWtable firewall_tables[FW_TABLE_COUNT];
 // firewall or nat rule locks.
 struct FWtable fw_tables_swap[FW_TABLE_COUNT];
 
+// rule capacity of each control list, used to bounds check rules staged from Python.
+const uintf16_t FW_MAX_RULE_COUNTS[FW_TABLE_COUNT] = {
+    FW_SYSTEM_MAX_RULE_COUNT, FW_BEFORE_MAX_RULE_COUNT, FW_MAIN_MAX_RULE_COUNT, FW_AFTER_MAX_RULE_COUNT
+};
+
 void
 firewall_init(void) {
-    pthread_mutex_init(FWlock_ptr, NULL);
+    struct FWgeneration    *fwg;
 
-    // arrays of pointers to FWrules
-    firewall_tables[FW_SYSTEM_RULES].rules = calloc(FW_SYSTEM_MAX_RULE_COUNT, sizeof(struct FWrule));
-    firewall_tables[FW_BEFORE_RULES].rules = calloc(FW_BEFORE_MAX_RULE_COUNT, sizeof(struct FWrule));
-    firewall_tables[FW_MAIN_RULES].rules   = calloc(FW_MAIN_MAX_RULE_COUNT, sizeof(struct FWrule));
-    firewall_tables[FW_AFTER_RULES].rules  = calloc(FW_AFTER_MAX_RULE_COUNT, sizeof(struct FWrule));
+    pthread_mutex_init(FWlock_ptr, NULL);
 
     // SWAP STORAGE
     fw_tables_swap[FW_SYSTEM_RULES].rules = calloc(FW_SYSTEM_MAX_RULE_COUNT, sizeof(struct FWrule));
@@ -65,6 +105,19 @@ firewall_init(void) {
     fw_tables_swap[FW_MAIN_RULES].rules   = calloc(FW_MAIN_MAX_RULE_COUNT, sizeof(struct FWrule));
     fw_tables_swap[FW_AFTER_RULES].rules  = calloc(FW_AFTER_MAX_RULE_COUNT, sizeof(struct FWrule));
 
+    // initial generation with empty tables so readers never see a NULL generation
+    fwg = calloc(1, sizeof(struct FWgeneration));
+
+    FOR_LOOP(0, FW_TABLE_COUNT, 1, cntrl_list) {
+        fwg->tables[cntrl_list] = firewall_table_copy(&fw_tables_swap[cntrl_list]);
+    }
+    fwg->quotas  = quota_table_build(NULL, 0, 0);
+    fwg->htr_idx = HTR_NONE;
+
+    atomic_store(&fw_generation, fwg);
+
+    blocklist_init();
+
     log_init(FW_LOG_IDX, "firewall");
 
     log_db_init();
@@ -81,6 +134,8 @@ firewall_recv(nl_msg_hdr *nl_msgh, void *data)
     nl_pkt_hdr         *nl_pkth = NULL;
 
     struct dnx_pktb     pkt = {};
+    struct FWgeneration    *fwg;
+    struct Quota           *quota = NULL;
 
     dnx_parse_nl_headers(nl_msgh, &nl_pkth, netlink_attrs, &pkt);
 
@@ -91,6 +146,16 @@ firewall_recv(nl_msg_hdr *nl_msgh, void *data)
 
         return OK;
     }
+    /* ===================================
+       ATTACKER BLOCKLIST
+    =================================== */
+    // hosts blocked by the security modules are dropped before inspection. the ip header is not parsed yet.
+    if (blocklist_match(cfd->idx, ntohl(((struct IPhdr*) pkt.data)->saddr))) {
+        dnx_send_verdict(cfd, ntohl(nl_pkth->packet_id), NF_DROP);
+        dprint(FW_V & VERBOSE, "BLOCKLIST - PACKET DISCARDED\n");
+
+        return OK;
+    }
     /* ===================================
        FIREWALL INSPECTION
     =================================== */
@@ -98,10 +163,54 @@ firewall_recv(nl_msg_hdr *nl_msgh, void *data)
     if (nl_pkth->hook == NF_IP_FORWARD)
         fw_clist.start = FW_RULE_RANGE_START;
 
-    // the lock prevents the manager thread from updating firewall rules during packet inspection.
-    firewall_lock();
-    firewall_inspect(&fw_clist, &pkt);
-    firewall_unlock();
+    // the generation cannot be reclaimed by the manager thread until this packet exits the read section. the rule name
+    // referenced by the traffic logger is owned by the generation so the section is held until logging is complete.
+    struct timespec     start, end;
+
+    fwg = firewall_read_enter(cfd->idx);
+
+    /* ===================================
+       QUOTAS - ESTABLISHED
+    =================================== */
+    // system traffic is never restricted. connections of metered quotas are not offloaded, so any packet past the
+    // first of a connection was already accepted by inspection and is only counted against the quota.
+    if (fw_clist.start == FW_RULE_RANGE_START) {
+        quota = quota_lookup(fwg->quotas,
+            ntohl(((struct IPhdr*) pkt.data)->saddr), ntohl(((struct IPhdr*) pkt.data)->daddr),
+            pkt.hw.in_zone.id, pkt.hw.out_zone.id);
+
+        if (quota && ntohl(mnl_attr_get_u32(netlink_attrs[NFQA_CT_INFO])) != IP_CT_NEW) {
+            dnx_send_metered_verdict(cfd, ntohl(nl_pkth->packet_id), 0,
+                quota_update(fwg->quotas, quota, false, pkt.tlen) ? NF_ACCEPT : NF_DROP);
+
+            firewall_read_exit(cfd->idx);
+
+            dprint(FW_V & VERBOSE, "QUOTA - PACKET METERED\n");
+
+            return OK;
+        }
+    }
+
+    clock_gettime(CLOCK_MONOTONIC, &start);
+    firewall_inspect(fwg, &fw_clist, &pkt);
+    clock_gettime(CLOCK_MONOTONIC, &end);
+
+    firewall_account(cfd->idx, fwg, &pkt,
+        ((end.tv_sec - start.tv_sec) * 1000000000ULL) + end.tv_nsec - start.tv_nsec);
+
+    /* ===================================
+       QUOTAS - NEW CONNECTIONS
+    =================================== */
+    // a connection accepted by the rules is dropped if the quota is restricted or exhausted. the drop is direct so
+    // the packet is not forwarded to the security modules.
+    bool    quota_drop = false;
+
+    if (quota && pkt.action == DNX_ACCEPT && !quota_update(fwg->quotas, quota, true, pkt.tlen)) {
+        pkt.action = DNX_DROP;
+        quota_drop = true;
+
+        dprint(FW_V & VERBOSE, "QUOTA - CONNECTION DISCARDED ");
+    }
 
     dprint(FW_V & VERBOSE, "action->%u, log->%u, ipp->%u, dns->%u, ips->%u ", pkt.action, pkt.log,
         pkt.sec_profiles & IP_PROXY_MASK, (pkt.sec_profiles & DNS_PROXY_MASK) >> 4, (pkt.sec_profiles & IPS_IDS_MASK) >> 4);
@@ -112,19 +221,26 @@ firewall_recv(nl_msg_hdr *nl_msgh, void *data)
     // PACKET MARK -> X (16b, reserved) | X (4b) | geo loc (8b) | direction (2b) | action (2b)
     uint16_t pkt_mark = (pkt.geo.remote << FOUR_BITS) | (pkt.geo.dir << TWO_BITS) | pkt.action;
 
+    uint32_t    verdict = pkt.action;
+    uint32_t    verdict_mark = 0;
+
+    // QUOTA DROP - criteria: accepted by rule, quota restricted or exhausted
+    if (quota_drop) {
+        verdict = NF_DROP;
+    }
     // SEND TO IP PROXY - criteria: accepted, inbound or outbound
-    if ( pkt.action == DNX_ACCEPT // primary match
+    else if ( pkt.action == DNX_ACCEPT // primary match
             && pkt.sec_profiles & IP_PROXY_MASK ) {
 
-        dnx_send_deferred_verdict(cfd, ntohl(nl_pkth->packet_id),
-            (pkt.sec_profiles << TWO_BYTES) | pkt_mark, SEND_TO_IP_PROXY;
+        verdict_mark = (pkt.sec_profiles << TWO_BYTES) | pkt_mark;
+        verdict = SEND_TO_IP_PROXY;
     }
     // SEND TO IPS/IDS - criteria: accepted or dropped, inbound
     else if ( pkt.geo.dir == INBOUND // primary match
             && pkt.sec_profiles & IPS_IDS_MASK ) {
 
-        dnx_send_deferred_verdict(cfd, ntohl(nl_pkth->packet_id),
-            (pkt.sec_profiles << TWO_BYTES) | pkt_mark, SEND_TO_IPS_IDS;
+        verdict_mark = (pkt.sec_profiles << TWO_BYTES) | pkt_mark;
+        verdict = SEND_TO_IPS_IDS;
     }
     // SEND TO DNS PROXY - criteria: accepted, outbound, udp/53
     else if ( pkt.action == DNX_ACCEPT // primary match
@@ -133,12 +249,20 @@ firewall_recv(nl_msg_hdr *nl_msgh, void *data)
             && pkt.iphdr->protocol == IPPROTO_UDP
             && pkt.protohdr->dport == htons(UDPPROTO_DNS) ) {
 
-        dnx_send_deferred_verdict(cfd, ntohl(nl_pkth->packet_id),
-            (pkt.sec_profiles << TWO_BYTES) | pkt_mark, SEND_TO_DNS_PROXY;
+        verdict_mark = (pkt.sec_profiles << TWO_BYTES) | pkt_mark;
+        verdict = SEND_TO_DNS_PROXY;
     }
     // default: accept w/o sec policy, system rules, drop action w/o ips
+
+    // metered connections stay in the queue so the quota sees every packet
+    if (quota && quota->metered) {
+        dnx_send_metered_verdict(cfd, ntohl(nl_pkth->packet_id), verdict_mark, verdict);
+    }
+    else if (verdict_mark) {
+        dnx_send_deferred_verdict(cfd, ntohl(nl_pkth->packet_id), verdict_mark, verdict);
+    }
     else {
-        dnx_send_verdict(cfd, ntohl(nl_pkth->packet_id), pkt.action);
+        dnx_send_verdict(cfd, ntohl(nl_pkth->packet_id), verdict);
     }
 
     dprint(FW_V & VERBOSE, "(verdict)");
@@ -151,7 +275,7 @@ firewall_recv(nl_msg_hdr *nl_msgh, void *data)
     //  - figure out a filter that would include wan drops
     //  - this type of logic might work as a fast path for inbound wan interface inspection
     if (fw_clist.start != FW_SYSTEM_RANGE_START) {
-        log_db_geolocation(&pkt.geo, pkt.action);
+        log_db_geolocation(cfd->idx, &pkt.geo, pkt.action);
 
         dprint(FW_V & VERBOSE, "[geo]");
     }
@@ -159,13 +283,13 @@ firewall_recv(nl_msg_hdr *nl_msgh, void *data)
     /* ===================================
        TRAFFIC LOGGING
     =================================== */
-    // logs entry for packet on disk
-    // todo: see about running a threaded logger queue so packet processing can continue immediately.
-    //   - this might be more pain than whats its worth since we use stack allocation for pktb struct.
+    // copies the log fields into the worker's log ring. the log writer thread formats and writes them to disk.
     if (pkt.log) {
-        log_write_firewall(FW_LOG_IDX, &pkt);
+        log_write_firewall(FW_LOG_IDX, cfd->idx, &pkt);
     }
 
+    firewall_read_exit(cfd->idx);
+
     dprint(FW_V & VERBOSE, "\n");
 
     // return hierarchy -> libnfnetlink.c >> libnetfiler_queue >> process_traffic.
@@ -174,25 +298,38 @@ firewall_recv(nl_msg_hdr *nl_msgh, void *data)
 }
 
 void
-firewall_inspect(struct clist_range *fw_clist, struct dnx_pktb *pkt)
+firewall_inspect(struct FWgeneration *fwg, struct clist_range *fw_clist, struct dnx_pktb *pkt)
 {
     dnx_parse_pkt_headers(pkt);
 
     struct FWtable          *control_list;
     struct FWrule           *rule;
+    intf32_t                 rule_idx;
 
     // normalizing src/dst ip in header to host order
     uint32_t    iph_src_ip = ntohl(pkt->iphdr->saddr);
     uint32_t    iph_dst_ip = ntohl(pkt->iphdr->daddr);
 
     // ip address to country code
-    uint8_t     src_country = htr_search(HTR_IDX, iph_src_ip & MSB, iph_src_ip & LSB);
-    uint8_t     dst_country = htr_search(HTR_IDX, iph_dst_ip & MSB, iph_dst_ip & LSB);
+    uint8_t     src_country = htr_search(fwg->htr_idx, iph_src_ip);
+    uint8_t     dst_country = htr_search(fwg->htr_idx, iph_dst_ip);
 
     // general direction of the packet and ip addr normalized to always be the external host/ip
     uint8_t     direction   = pkt->hw.in_zone.id != WAN_IN ? OUTBOUND : INBOUND;
     uint16_t    tracked_geo = direction == INBOUND ? src_country : dst_country;
 
+    struct ClassKey  key = {
+        .in_zone  = pkt->hw.in_zone.id,
+        .out_zone = pkt->hw.out_zone.id,
+        .src_ip   = iph_src_ip,
+        .dst_ip   = iph_dst_ip,
+        .src_country = src_country,
+        .dst_country = dst_country,
+        .protocol = pkt->iphdr->protocol,
+        .sport    = ntohs(pkt->protohdr->sport),
+        .dport    = ntohs(pkt->protohdr->dport)
+    };
+
     dprint(FW_V & VERBOSE, "<PACKET> src->[%u]%u(%u):%u, dst->[%u]%u(%u):%u, direction->%u, tracked->%u\n",
         pkt->hw.in_zone.id, iph_src_ip, src_country, ntohs(pkt->protohdr->sport),
         pkt->hw.out_zone.id, iph_dst_ip, dst_country, ntohs(pkt->protohdr->dport),
@@ -201,51 +338,25 @@ firewall_inspect(struct clist_range *fw_clist, struct dnx_pktb *pkt)
     // iterating over specified control lists
     FOR_LOOP(fw_clist->start, fw_clist->end, 1, clist_idx) {
 
-        control_list = &firewall_tables[clist_idx];
+        control_list = fwg->tables[clist_idx];
 
-        // iterating over each rule in the list
-        FOR_LOOP(0, control_list->len, 1, rule_idx) {
-
-            rule = &control_list->rules[rule_idx];
-
-            if (!rule->enabled) continue;
-
-            // inspection order: src > dst | zone, ip_addr, protocol, port
-            // ------------------------------------------------------------------
-            // ZONE MATCHING
-            // ------------------------------------------------------------------
-            // currently tied to interface and designated LAN, WAN, DMZ
-            if (zone_match(&rule->s_zones, pkt->hw.in_zone.id)  != MATCH) continue;
-            if (zone_match(&rule->d_zones, pkt->hw.out_zone.id) != MATCH) continue;
-
-            // ------------------------------------------------------------------
-            // GEOLOCATION or IP/NETMASK
-            // ------------------------------------------------------------------
-            if (network_match(&rule->s_networks, iph_src_ip, src_country) != MATCH) continue;
-            if (network_match(&rule->d_networks, iph_dst_ip, dst_country) != MATCH) continue;
-
-            // ------------------------------------------------------------------
-            // PROTOCOL / PORT
-            // ------------------------------------------------------------------
-            if (service_match(&rule->s_services, pkt->iphdr->protocol, ntohs(pkt->protohdr->sport)) != MATCH) continue;
-
-            // icmp checked in source only.
-            if (pkt->iphdr->protocol != IPPROTO_ICMP) {
-                if (service_match(&rule->d_services, pkt->iphdr->protocol, ntohs(pkt->protohdr->dport)) != MATCH) continue;
-            }
-            // ------------------------------------------------------------------
-            // MATCH ACTION | return rule options
-            // ------------------------------------------------------------------
-            pkt->rule_clist = clist_idx;
-            pkt->rule_name  = rule->name;
-            pkt->action     = rule->action; // required to allow for default action
-            pkt->log        = rule->log;
-
-            FOR_LOOP(0, SECURITY_PROFILE_COUNT, 1, idx) {
-                pkt->sec_profiles |= rule->sec_profiles[idx] << ((idx * 4));
-            }
-            goto geolocation;
+        rule_idx = firewall_lookup(control_list, &key);
+        if (rule_idx == CL_NO_MATCH) continue;
+
+        rule = &control_list->rules[rule_idx];
+        // ------------------------------------------------------------------
+        // MATCH ACTION | return rule options
+        // ------------------------------------------------------------------
+        pkt->rule_clist = clist_idx;
+        pkt->rule_idx   = (uintf16_t) rule_idx;
+        pkt->rule_name  = rule->name;
+        pkt->action     = rule->action; // required to allow for default action
+        pkt->log        = rule->log;
+
+        FOR_LOOP(0, SECURITY_PROFILE_COUNT, 1, idx) {
+            pkt->sec_profiles |= rule->sec_profiles[idx] << ((idx * 4));
         }
+        goto geolocation;
     }
     // ------------------------------------------------------------------
     // DEFAULT ACTION
@@ -261,6 +372,148 @@ geolocation:
     pkt->geo.remote = tracked_geo;
 }
 
+/*
+updates the matched rule counters and the latency histogram of the worker. counters have a single writer so a relaxed
+load and store is used instead of an atomic add. the stats are owned by the generation, which is still held by the
+caller, so they cannot be reclaimed here.
+*/
+static inline void
+firewall_account(uintf8_t worker, struct FWgeneration *fwg, struct dnx_pktb *pkt, uint64_t nsec)
+{
+    struct FWtable         *table;
+    struct FWrulestats     *stats;
+    _Atomic uint64_t       *bucket;
+
+    uintf8_t    bucket_idx = nsec ? 63 - __builtin_clzll(nsec) : 0;
+
+    bucket = &fw_latency[worker].buckets[bucket_idx < FW_LATENCY_BUCKETS ? bucket_idx : FW_LATENCY_BUCKETS - 1];
+    atomic_store_explicit(bucket, atomic_load_explicit(bucket, memory_order_relaxed) + 1, memory_order_relaxed);
+
+    if (pkt->rule_clist == NO_SECTION)
+        return;
+
+    table = fwg->tables[pkt->rule_clist];
+    if (!table->stats)
+        return;
+
+    stats = &table->stats[(worker * table->stats_stride) + pkt->rule_idx];
+
+    atomic_store_explicit(&stats->hits,
+        atomic_load_explicit(&stats->hits, memory_order_relaxed) + 1, memory_order_relaxed);
+    atomic_store_explicit(&stats->bytes,
+        atomic_load_explicit(&stats->bytes, memory_order_relaxed) + pkt->tlen, memory_order_relaxed);
+}
+
+/*
+returns the index of the first rule in the control list that matches the packet or CL_NO_MATCH.
+
+the compiled classifier is used to find candidates. each candidate is confirmed with the standard match functions so
+the result is always identical to a linear scan, which is used directly if the classifier is not available.
+*/
+static intf32_t
+firewall_lookup(struct FWtable *control_list, struct ClassKey *key)
+{
+    intf32_t    rule_idx = CL_NO_MATCH;
+
+    if (!control_list->classifier) {
+        // iterating over each rule in the list
+        FOR_LOOP(0, control_list->len, 1, idx) {
+
+            if (firewall_match_rule(&control_list->rules[idx], key) == MATCH) {
+                return (intf32_t) idx;
+            }
+        }
+        return CL_NO_MATCH;
+    }
+
+    while (true) {
+        rule_idx = classifier_search(control_list->classifier, key, rule_idx);
+        if (rule_idx == CL_NO_MATCH) {
+            return CL_NO_MATCH;
+        }
+
+        if (firewall_match_rule(&control_list->rules[rule_idx], key) == MATCH) {
+            return rule_idx;
+        }
+
+        dprint(FW_V & VERBOSE, "< [!] FW CLASSIFIER CANDIDATE (%d) REJECTED [!] >\n", (int) rule_idx);
+    }
+}
+
+static inline int
+firewall_match_rule(struct FWrule *rule, struct ClassKey *key)
+{
+    if (!rule->enabled) return NO_MATCH;
+
+    // inspection order: src > dst | zone, ip_addr, protocol, port
+    // ------------------------------------------------------------------
+    // ZONE MATCHING
+    // ------------------------------------------------------------------
+    // currently tied to interface and designated LAN, WAN, DMZ
+    if (zone_match(&rule->s_zones, key->in_zone)  != MATCH) return NO_MATCH;
+    if (zone_match(&rule->d_zones, key->out_zone) != MATCH) return NO_MATCH;
+
+    // ------------------------------------------------------------------
+    // GEOLOCATION or IP/NETMASK
+    // ------------------------------------------------------------------
+    if (network_match(&rule->s_networks, key->src_ip, key->src_country) != MATCH) return NO_MATCH;
+    if (network_match(&rule->d_networks, key->dst_ip, key->dst_country) != MATCH) return NO_MATCH;
+
+    // ------------------------------------------------------------------
+    // PROTOCOL / PORT
+    // ------------------------------------------------------------------
+    if (service_match(&rule->s_services, key->protocol, key->sport) != MATCH) return NO_MATCH;
+
+    // icmp checked in source only.
+    if (key->protocol != IPPROTO_ICMP) {
+        if (service_match(&rule->d_services, key->protocol, key->dport) != MATCH) return NO_MATCH;
+    }
+
+    return MATCH;
+}
+
+// ==================================
+// GENERATION READ SECTION
+// ==================================
+inline struct FWgeneration*
+firewall_read_enter(uintf8_t reader)
+{
+    // the epoch must be visible before the generation is loaded (seq_cst) or the writer could miss this reader.
+    atomic_store(&fw_readers[reader].epoch, atomic_load(&fw_epoch));
+
+    return atomic_load(&fw_generation);
+}
+
+inline void
+firewall_read_exit(uintf8_t reader)
+{
+    atomic_store_explicit(&fw_readers[reader].epoch, 0, memory_order_release);
+}
+
+/*
+blocks until every reader that could have loaded the previous generation has exited its read section.
+must be called by a writer after publishing a new generation and before freeing the old one.
+*/
+static void
+firewall_synchronize(void)
+{
+    uint64_t    grace_epoch = atomic_fetch_add(&fw_epoch, 1) + 1;
+    uint64_t    reader_epoch;
+
+    FOR_LOOP(0, FW_MAX_READERS, 1, reader) {
+        while (true) {
+            reader_epoch = atomic_load(&fw_readers[reader].epoch);
+            if (reader_epoch == 0 || reader_epoch >= grace_epoch) break;
+
+            sched_yield();
+        }
+    }
+    dprint(FW_V & VERBOSE, "< [!] FW GRACE PERIOD (%lu) COMPLETE [!] >\n", grace_epoch);
+}
+
+// ==================================
+// GENERATION WRITERS
+// ==================================
 inline void
 firewall_lock(void)
 {
@@ -277,9 +530,117 @@ firewall_unlock(void)
     dprint(FW_V & VERBOSE, "< [!] FW LOCK RELEASED [!] >\n");
 }
 
+// allocates an active table sized to the staged rule count and compiles its classifier.
+static struct FWtable*
+firewall_table_copy(struct FWtable *swap)
+{
+    struct FWtable     *table = calloc(1, sizeof(struct FWtable));
+    if (!table)
+        return NULL;
+
+    // +1 so an empty table still has a valid allocation
+    table->rules = malloc((swap->len + 1) * sizeof(struct FWrule));
+    if (!table->rules) {
+        free(table);
+
+        return NULL;
+    }
+    // alignment is already set as they are identical structures.
+    memcpy(table->rules, swap->rules, swap->len * sizeof(struct FWrule));
+
+    table->len = swap->len;
+
+    // network lists are still referenced by the swap rules. the table gets its own copy so the swap can be restaged
+    // while this table is active.
+    bool    error = false;
+    FOR_LOOP(0, table->len, 1, rule_idx) {
+        if (firewall_rule_lists_copy(&table->rules[rule_idx]) != OK) {
+            error = true;
+        }
+    }
+    if (error) {
+        firewall_table_free(table);
+
+        return NULL;
+    }
+
+    // a failed build leaves the table without a classifier, which will fall back to linear inspection.
+    table->classifier = classifier_build(table);
+
+    // a failed allocation only disables the rule counters for this table.
+    table->stats_stride = firewall_stats_stride(table->len);
+    table->stats = aligned_alloc(64, FW_MAX_WORKERS * table->stats_stride * sizeof(struct FWrulestats));
+    if (table->stats) {
+        memset(table->stats, 0, FW_MAX_WORKERS * table->stats_stride * sizeof(struct FWrulestats));
+    }
+
+    return table;
+}
+
+static void
+firewall_table_free(struct FWtable *table)
+{
+    classifier_free(table->classifier);
+    free(table->stats);
+
+    FOR_LOOP(0, table->len, 1, rule_idx) {
+        firewall_rule_lists_free(&table->rules[rule_idx]);
+    }
+
+    free(table->rules);
+    free(table);
+}
+
+// replaces each network list reference with a copy. on failure, the reference is cleared so the rule can still be
+// passed to firewall_rule_lists_free without releasing the original.
+static int
+firewall_rule_lists_copy(struct FWrule *rule)
+{
+    NetArray   *net_arrays[2] = { &rule->s_networks, &rule->d_networks };
+    NetObject  *net;
+    int         ret = OK;
+
+    FOR_LOOP(0, 2, 1, i) {
+        FOR_LOOP(0, net_arrays[i]->len, 1, idx) {
+
+            net = &net_arrays[i]->objects[idx];
+            if (!net->list) { continue; }
+
+            net->list = netlist_copy(net->list);
+            if (!net->list) {
+                ret = ERR;
+            }
+        }
+    }
+    return ret;
+}
+
+static void
+firewall_rule_lists_free(struct FWrule *rule)
+{
+    NetArray   *net_arrays[2] = { &rule->s_networks, &rule->d_networks };
+
+    FOR_LOOP(0, 2, 1, i) {
+        FOR_LOOP(0, net_arrays[i]->len, 1, idx) {
+            netlist_free(net_arrays[i]->objects[idx].list);
+
+            net_arrays[i]->objects[idx].list = NULL;
+        }
+    }
+}
+
 int
 firewall_stage_count(uintf8_t cntrl_list, uintf16_t rule_count)
 {
+    if (rule_count > FW_MAX_RULE_COUNTS[cntrl_list])
+        return ERR;
+
+    // the network lists of the previous staging are released here since the swap rules are the only reference to them.
+    // the references are cleared so an aborted staging cannot leave stale pointers in the unused rule slots.
+    FOR_LOOP(0, fw_tables_swap[cntrl_list].len, 1, rule_idx) {
+        firewall_rule_lists_free(&fw_tables_swap[cntrl_list].rules[rule_idx]);
+    }
+
     fw_tables_swap[cntrl_list].len = rule_count;
 
     dprint(FW_V & VERBOSE, "< [!] FW TABLE (%u) COUNT STAGED [!] >\n", cntrl_list);
@@ -290,6 +651,12 @@ firewall_stage_count(uintf8_t cntrl_list, uintf16_t rule_count)
 int
 firewall_stage_rule(uintf8_t cntrl_list, uintf16_t rule_idx, struct FWrule *rule)
 {
+    if (rule_idx >= FW_MAX_RULE_COUNTS[cntrl_list])
+        return ERR;
+
+    // ownership of the network lists moves to the swap table. a slot staged twice releases the lists it replaces.
+    firewall_rule_lists_free(&fw_tables_swap[cntrl_list].rules[rule_idx]);
+
     fw_tables_swap[cntrl_list].rules[rule_idx] = *rule;
 
     return OK;
@@ -298,21 +665,200 @@ firewall_stage_rule(uintf8_t cntrl_list, uintf16_t rule_idx, struct FWrule *rule
 int
 firewall_push_rules(uintf8_t cntrl_list)
 {
+    struct FWgeneration    *old_fwg, *new_fwg;
+    struct FWtable         *new_table;
+
+    // built before acquiring the lock since the swap tables are only accessed by the manager thread.
+    new_table = firewall_table_copy(&fw_tables_swap[cntrl_list]);
+    if (!new_table)
+        return ERR;
+
     firewall_lock();
-    // iterating over each rule in FW table
-    FOR_LOOP(0, fw_tables_swap[cntrl_list].len, 1, rule_idx) {
-        // copy swap structure to active structure. alignment is already set as they are identical structures.
-        firewall_tables[cntrl_list].rules[rule_idx] = fw_tables_swap[cntrl_list].rules[rule_idx];
+
+    old_fwg = atomic_load(&fw_generation);
+
+    new_fwg = malloc(sizeof(struct FWgeneration));
+    if (!new_fwg) {
+        firewall_unlock();
+        firewall_table_free(new_table);
+
+        return ERR;
     }
-    firewall_tables[cntrl_list].len = fw_tables_swap[cntrl_list].len;
+    // unchanged tables are shared with the previous generation
+    *new_fwg = *old_fwg;
+    new_fwg->id++;
+    new_fwg->tables[cntrl_list] = new_table;
+
+    atomic_store(&fw_generation, new_fwg);
 
     dprint(FW_V & VERBOSE, "< [!] FW TABLE (%u) RULES UPDATED [!] >\n", cntrl_list);
 
+    // packet threads are never blocked here. only the manager thread waits for in-flight packets to complete.
+    firewall_synchronize();
+
+    firewall_table_free(old_fwg->tables[cntrl_list]);
+    free(old_fwg);
+
+    firewall_unlock();
+
+    return OK;
+}
+
+// ==================================
+// RULE STATS
+// ==================================
+/*
+sums the per worker counters of each rule in the active control list. at most max rules are copied into counts.
+returns the number of rules copied.
+*/
+uintf16_t
+firewall_stats(uintf8_t cntrl_list, struct FWrulecount *counts, uintf16_t max)
+{
+    struct FWtable     *table;
+    uintf16_t           count;
+
+    // generations are only reclaimed while holding the write lock
+    firewall_lock();
+
+    table = atomic_load(&fw_generation)->tables[cntrl_list];
+    count = table->len < max ? table->len : max;
+
+    FOR_LOOP(0, count, 1, rule_idx) {
+
+        strncpy(counts[rule_idx].name, table->rules[rule_idx].name, sizeof(counts[rule_idx].name));
+
+        counts[rule_idx].hits  = 0;
+        counts[rule_idx].bytes = 0;
+
+        if (!table->stats) continue;
+
+        FOR_LOOP(0, FW_MAX_WORKERS, 1, worker) {
+            counts[rule_idx].hits  += atomic_load_explicit(
+                &table->stats[(worker * table->stats_stride) + rule_idx].hits, memory_order_relaxed);
+            counts[rule_idx].bytes += atomic_load_explicit(
+                &table->stats[(worker * table->stats_stride) + rule_idx].bytes, memory_order_relaxed);
+        }
+    }
+
+    firewall_unlock();
+
+    return count;
+}
+
+// ==================================
+// QUOTAS
+// ==================================
+/*
+publishes a quota table built from cfgs as a new generation. the rule tables are shared with the previous generation.
+counters of quotas that are still configured are carried over once the previous table is no longer in use.
+*/
+int
+firewall_push_quotas(struct QuotaConfig *cfgs, uintf16_t len, int32_t utc_offset)
+{
+    struct FWgeneration    *old_fwg, *new_fwg;
+    struct QuotaTable      *new_qt;
+
+    new_qt = quota_table_build(cfgs, len, utc_offset);
+    if (!new_qt)
+        return ERR;
+
+    firewall_lock();
+
+    old_fwg = atomic_load(&fw_generation);
+
+    new_fwg = malloc(sizeof(struct FWgeneration));
+    if (!new_fwg) {
+        firewall_unlock();
+        quota_table_free(new_qt);
+
+        return ERR;
+    }
+    *new_fwg = *old_fwg;
+    new_fwg->id++;
+    new_fwg->quotas = new_qt;
+
+    atomic_store(&fw_generation, new_fwg);
+
+    dprint(FW_V & VERBOSE, "< [!] FW QUOTAS (%u) UPDATED [!] >\n", (unsigned) new_qt->len);
+
+    firewall_synchronize();
+
+    quota_table_carry(new_qt, old_fwg->quotas);
+
+    quota_table_free(old_fwg->quotas);
+    free(old_fwg);
+
     firewall_unlock();
 
     return OK;
 }
 
+/*
+publishes the geolocation trie in slot htr_idx as a new generation. old_idx is set to the slot of the previous trie
+(HTR_NONE if there was none), which is no longer in use once this returns.
+*/
+int
+firewall_push_geolocation(int htr_idx, int *old_idx)
+{
+    struct FWgeneration    *old_fwg, *new_fwg;
+
+    firewall_lock();
+
+    old_fwg = atomic_load(&fw_generation);
+
+    new_fwg = malloc(sizeof(struct FWgeneration));
+    if (!new_fwg) {
+        firewall_unlock();
+
+        return ERR;
+    }
+    *new_fwg = *old_fwg;
+    new_fwg->id++;
+    new_fwg->htr_idx = htr_idx;
+
+    atomic_store(&fw_generation, new_fwg);
+
+    dprint(FW_V & VERBOSE, "< [!] FW GEOLOCATION (%d) UPDATED [!] >\n", htr_idx);
+
+    firewall_synchronize();
+
+    *old_idx = old_fwg->htr_idx;
+    free(old_fwg);
+
+    firewall_unlock();
+
+    return OK;
+}
+
+// copies the state of at most max quotas of the active table into states. returns the number of quotas copied.
+uintf16_t
+firewall_quotas(struct QuotaState *states, uintf16_t max)
+{
+    uintf16_t   count;
+
+    // generations are only reclaimed while holding the write lock
+    firewall_lock();
+
+    count = quota_states(atomic_load(&fw_generation)->quotas, states, max);
+
+    firewall_unlock();
+
+    return count;
+}
+
+// sums the inspection latency histograms of all workers into buckets (FW_LATENCY_BUCKETS).
+void
+firewall_latency(uint64_t *buckets)
+{
+    FOR_LOOP(0, FW_LATENCY_BUCKETS, 1, idx) {
+        buckets[idx] = 0;
+
+        FOR_LOOP(0, FW_MAX_WORKERS, 1, worker) {
+            buckets[idx] += atomic_load_explicit(&fw_latency[worker].buckets[idx], memory_order_relaxed);
+        }
+    }
+}
+
 int
 firewall_push_zones(ZoneMap *zone_map)
 {
@@ -327,11 +873,106 @@ firewall_push_zones(ZoneMap *zone_map)
     return OK;
 }
 
+// ==================================
+// BENCHMARK
+// ==================================
+struct fw_bench {
+    uintf8_t    reader;
+    uint32_t    pkt_count;
+};
+
+// inspects synthetic packets against the active generation. verdicts, geolocation reporting, and logging are skipped
+// so the result reflects inspection throughput only.
+static void*
+firewall_bench_worker(void *data)
+{
+    struct fw_bench        *fwb = (struct fw_bench*) data;
+    struct FWgeneration    *fwg;
+
+    struct clist_range      fw_clist = { .start = FW_RULE_RANGE_START, .end = FW_RULE_RANGE_END };
+    struct dnx_pktb         pkt;
+
+    uint8_t             pkt_data[40] = { 0x45 };
+    struct IPhdr       *iphdr    = (struct IPhdr*) pkt_data;
+    struct Protohdr    *protohdr = (struct Protohdr*) (iphdr + 1);
+
+    uint32_t            seed = fwb->reader + 1;
+
+    // same placement as the queue workers
+    cfirewall_set_cpu(fwb->reader);
+
+    FOR_LOOP(0, fwb->pkt_count, 1, i) {
+        // xorshift32
+        seed ^= seed << 13;
+        seed ^= seed >> 17;
+        seed ^= seed << 5;
+
+        iphdr->protocol = (seed & 1) ? IPPROTO_TCP : IPPROTO_UDP;
+        iphdr->saddr    = seed;
+        iphdr->daddr    = seed * 2654435761u;
+        protohdr->sport = (uint16_t) (seed >> 16);
+        protohdr->dport = htons(seed & 1023);
+
+        memset(&pkt, 0, sizeof(struct dnx_pktb));
+
+        pkt.data = pkt_data;
+        pkt.tlen = sizeof(pkt_data);
+        pkt.hw.in_zone  = INTF_ZONE_MAP[seed % FW_MAX_ZONES];
+        pkt.hw.out_zone = INTF_ZONE_MAP[(seed >> 8) % FW_MAX_ZONES];
+
+        fwg = firewall_read_enter(fwb->reader);
+        firewall_inspect(fwg, &fw_clist, &pkt);
+        firewall_read_exit(fwb->reader);
+    }
+
+    return NULL;
+}
+
+/*
+returns the aggregate packets per second of "workers" threads each inspecting "pkt_count" packets or ERR.
+must not be called while the queue workers are running since the reader slots are shared.
+*/
+double
+firewall_bench(uintf8_t workers, uint32_t pkt_count)
+{
+    pthread_t           threads[FW_MAX_READERS];
+    struct fw_bench     args[FW_MAX_READERS];
+    struct timespec     start, end;
+    double              elapsed;
+
+    if (workers == 0 || workers > FW_MAX_READERS)
+        return ERR;
+
+    clock_gettime(CLOCK_MONOTONIC, &start);
+
+    FOR_LOOP(0, workers, 1, reader) {
+        args[reader].reader    = reader;
+        args[reader].pkt_count = pkt_count;
+
+        pthread_create(&threads[reader], NULL, firewall_bench_worker, &args[reader]);
+    }
+
+    FOR_LOOP(0, workers, 1, reader) {
+        pthread_join(threads[reader], NULL);
+    }
+
+    clock_gettime(CLOCK_MONOTONIC, &end);
+
+    elapsed = (end.tv_sec - start.tv_sec) + ((end.tv_nsec - start.tv_nsec) / 1e9);
+
+    return ((double) workers * pkt_count) / elapsed;
+}
+
 // casting to clamp uintfast to set unsigned ints to shut the warnings up.
 void
 firewall_print_rule(uintf8_t ctrl_list, uintf16_t rule_idx)
 {
-    struct FWrule  rule = firewall_tables[ctrl_list].rules[rule_idx];
+    struct FWrule  rule;
+
+    // generations are only reclaimed while holding the write lock. the copy still points into the generation's
+    // network and service lists, so the lock is held until printing is done.
+    firewall_lock();
+    rule = atomic_load(&fw_generation)->tables[ctrl_list]->rules[rule_idx];
 
     printf("<<FIREWALL RULE [%u][%u]>>\n", (uint8_t) ctrl_list, (uint16_t) rule_idx);
     printf("enabled->%d\n", (uint8_t) rule.enabled);
@@ -346,6 +987,12 @@ firewall_print_rule(uintf8_t ctrl_list, uintf16_t rule_idx)
     // SRC NETWORKS
     printf("src_networks->[ ");
     FOR_LOOP(0, rule.s_networks.len, 1, i) {
+        if (rule.s_networks.objects[i].list) {
+            printf("(%u, list[%u]) ",
+                (uint8_t) rule.s_networks.objects[i].type,
+                (uint32_t) rule.s_networks.objects[i].list->len);
+            continue;
+        }
         printf("(%u, %u, %u) ",
             (uint8_t) rule.s_networks.objects[i].type,
             (uint32_t) rule.s_networks.objects[i].netid,
@@ -395,6 +1042,12 @@ firewall_print_rule(uintf8_t ctrl_list, uintf16_t rule_idx)
     // DST NETWORK
     printf("dst_networks->[ ");
     FOR_LOOP(0, rule.d_networks.len, 1, i) {
+        if (rule.d_networks.objects[i].list) {
+            printf("(%u, list[%u]) ",
+                (uint8_t) rule.d_networks.objects[i].type,
+                (uint32_t) rule.d_networks.objects[i].list->len);
+            continue;
+        }
         printf("(%u, %u, %u) ",
             (uint8_t) rule.d_networks.objects[i].type,
             (uint32_t) rule.d_networks.objects[i].netid,
@@ -439,6 +1092,8 @@ firewall_print_rule(uintf8_t ctrl_list, uintf16_t rule_idx)
         (uint8_t) rule.sec_profiles[0],
         (uint8_t) rule.sec_profiles[1],
         (uint8_t) rule.sec_profiles[2]);
+
+    firewall_unlock();
 }
 
 int
@@ -26,6 +26,8 @@
 #define MATCH    1
 #define END_OF_ARRAY 0
 
+static int cmp_netlist(const void *a, const void *b);
+
 
 //generic function for src/dst zone matching
 inline int
@@ -69,6 +71,18 @@ network_match(NetArray *net_array, uint32_t iph_ip, uint8_t country)
                 if ((iph_ip & net.netmask) == net.netid) { return MATCH; }
                 break;
             // --------------------
+            // TYPE -> RANGE (3)
+            // --------------------
+            case IP_RANGE:
+                if (iph_ip >= net.netid && iph_ip <= net.netmask) { return MATCH; }
+                break;
+            // --------------------
+            // TYPE -> LIST (4)
+            // --------------------
+            case IP_NET_LIST:
+                if (netlist_search(net.list, iph_ip)) { return MATCH; }
+                break;
+            // --------------------
             // TYPE -> GEO (6)
             // --------------------
             case IP_GEO:
@@ -98,6 +112,130 @@ network_match(NetArray *net_array, uint32_t iph_ip, uint8_t country)
     return NO_MATCH;
 }
 
+// ==================================
+// IP NETWORK LISTS
+// ==================================
+// returns MATCH if the ip is within any range of the list. a NULL list never matches.
+inline int
+netlist_search(NetList *list, uint32_t iph_ip)
+{
+    uintf32_t   lo = 0, hi, mid;
+
+    if (!list || !list->len) { return NO_MATCH; }
+
+    hi = list->len;
+
+    // finding the last range starting at or below the ip. ranges are merged so only that range can contain it.
+    while (lo < hi) {
+        mid = lo + ((hi - lo) / 2);
+
+        if (list->starts[mid] <= iph_ip) {
+            lo = mid + 1;
+        }
+        else {
+            hi = mid;
+        }
+    }
+    if (lo == 0) { return NO_MATCH; }
+
+    return (iph_ip <= list->ends[lo - 1]) ? MATCH : NO_MATCH;
+}
+
+/*
+builds a list from unordered, possibly overlapping, inclusive ranges. ranges are sorted by their start value then merged
+with any range they overlap or are adjacent to, so each ip is covered by at most one range in the list.
+
+the source arrays are not modified or referenced after return. returns NULL on allocation failure.
+*/
+NetList*
+netlist_create(uint32_t *starts, uint32_t *ends, uintf32_t len)
+{
+    NetList    *list;
+    uint32_t   *ranges;
+    uintf32_t   idx, count = 0;
+
+    list = calloc(1, sizeof(NetList));
+    if (!list)
+        return NULL;
+
+    // +1 so an empty list still has a valid allocation
+    ranges = malloc((len + 1) * 2 * sizeof(uint32_t));
+    list->starts = malloc((len + 1) * sizeof(uint32_t));
+    list->ends   = malloc((len + 1) * sizeof(uint32_t));
+
+    if (!ranges || !list->starts || !list->ends) {
+        free(ranges);
+        netlist_free(list);
+
+        return NULL;
+    }
+
+    for (idx = 0; idx < len; idx++) {
+        // reversed ranges are normalized instead of being dropped
+        ranges[idx * 2]     = (starts[idx] <= ends[idx]) ? starts[idx] : ends[idx];
+        ranges[idx * 2 + 1] = (starts[idx] <= ends[idx]) ? ends[idx] : starts[idx];
+    }
+    qsort(ranges, len, sizeof(uint32_t) * 2, cmp_netlist);
+
+    for (idx = 0; idx < len; idx++) {
+
+        // the end check guards the +1 against wrapping when the previous range ends at 255.255.255.255
+        if (count && (list->ends[count - 1] == UINT32_MAX || ranges[idx * 2] <= list->ends[count - 1] + 1)) {
+
+            if (ranges[idx * 2 + 1] > list->ends[count - 1]) {
+                list->ends[count - 1] = ranges[idx * 2 + 1];
+            }
+            continue;
+        }
+        list->starts[count] = ranges[idx * 2];
+        list->ends[count]   = ranges[idx * 2 + 1];
+        count++;
+    }
+    list->len = count;
+
+    free(ranges);
+
+    return list;
+}
+
+/*
+creates the list for a network object. this is used by the Python side during rule staging, which does not have the list
+member declared so the rule structs stay convertible for verbose output.
+*/
+int
+netobject_set_list(NetObject *net, uint32_t *starts, uint32_t *ends, uintf32_t len)
+{
+    net->list = netlist_create(starts, ends, len);
+
+    return net->list ? OK : ERR;
+}
+
+NetList*
+netlist_copy(NetList *list)
+{
+    return netlist_create(list->starts, list->ends, list->len);
+}
+
+void
+netlist_free(NetList *list)
+{
+    if (!list)
+        return;
+
+    free(list->starts);
+    free(list->ends);
+    free(list);
+}
+
+static int
+cmp_netlist(const void *a, const void *b)
+{
+    uint32_t    x = *(const uint32_t*) a;
+    uint32_t    y = *(const uint32_t*) b;
+
+    return (x > y) - (x < y);
+}
+
 // generic function that can handle source OR destination proto/port matching
 inline int
 service_match(SvcArray *svc_array, uint8_t pkt_protocol, uint16_t pkt_svc)
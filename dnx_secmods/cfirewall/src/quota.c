@@ -0,0 +1,259 @@
+#include "config.h"
+#include "cfirewall.h"
+#include "quota.h"
+
+#include <stdatomic.h>
+#include <time.h>
+
+static struct Quota *quota_find(struct QuotaTable *qt, uint8_t type, uint32_t key);
+
+static inline uint32_t
+quota_hash(uint32_t host, uint32_t mask)
+{
+    // fibonacci hashing. the mask is applied to the top bits so small tables still use the best mixed bits.
+    return (host * 2654435761u) >> (32 - __builtin_popcount(mask));
+}
+
+// ==================================
+// QUOTA TABLE
+// ==================================
+/*
+builds a table from the configured quotas. duplicate keys keep the first entry. all counters start at 0, see
+quota_table_carry to move them over from the active table.
+*/
+struct QuotaTable*
+quota_table_build(struct QuotaConfig *cfgs, uintf16_t len, int32_t utc_offset)
+{
+    struct QuotaTable  *qt;
+    struct Quota       *quota;
+    uint32_t            host_size = 16;
+    uint32_t            slot;
+
+    if (len > QUOTA_MAX)
+        return NULL;
+
+    qt = calloc(1, sizeof(struct QuotaTable));
+    if (!qt)
+        return NULL;
+
+    qt->utc_offset = utc_offset;
+
+    // load factor is kept at or below .5
+    while (host_size < len * 2) { host_size <<= 1; }
+
+    qt->host_mask = host_size - 1;
+    qt->hosts  = calloc(host_size, sizeof(struct QuotaHost));
+    // +1 so an empty table still has a valid allocation
+    qt->quotas = calloc(len + 1, sizeof(struct Quota));
+    if (!qt->hosts || !qt->quotas) {
+        quota_table_free(qt);
+
+        return NULL;
+    }
+
+    FOR_LOOP(0, len, 1, idx) {
+
+        if (quota_find(qt, cfgs[idx].type, cfgs[idx].key)) continue;
+
+        quota = &qt->quotas[qt->len];
+        quota->cfg = cfgs[idx];
+        quota->metered = quota->cfg.max_bytes || quota->cfg.window_len;
+
+        if (!quota->cfg.period) {
+            quota->cfg.period = QUOTA_DAY;
+        }
+
+        if (quota->cfg.type == QUOTA_ZONE && quota->cfg.key < QUOTA_ZONES) {
+            qt->zones[quota->cfg.key] = qt->len + 1;
+        }
+        else if (quota->cfg.type == QUOTA_HOST && quota->cfg.key) {
+
+            slot = quota_hash(quota->cfg.key, qt->host_mask);
+            while (qt->hosts[slot].idx) {
+                slot = (slot + 1) & qt->host_mask;
+            }
+            qt->hosts[slot].host = quota->cfg.key;
+            qt->hosts[slot].idx  = qt->len + 1;
+        }
+        else {
+            continue;
+        }
+        qt->len++;
+    }
+
+    return qt;
+}
+
+void
+quota_table_free(struct QuotaTable *qt)
+{
+    if (!qt)
+        return;
+
+    free(qt->quotas);
+    free(qt->hosts);
+    free(qt);
+}
+
+static struct Quota*
+quota_find(struct QuotaTable *qt, uint8_t type, uint32_t key)
+{
+    uint32_t    slot;
+
+    if (type == QUOTA_ZONE) {
+        return key < QUOTA_ZONES && qt->zones[key] ? &qt->quotas[qt->zones[key] - 1] : NULL;
+    }
+
+    if (!key)
+        return NULL;
+
+    slot = quota_hash(key, qt->host_mask);
+    while (qt->hosts[slot].idx) {
+
+        if (qt->hosts[slot].host == key) {
+            return &qt->quotas[qt->hosts[slot].idx - 1];
+        }
+        slot = (slot + 1) & qt->host_mask;
+    }
+
+    return NULL;
+}
+
+static inline uint32_t
+quota_local_time(struct QuotaTable *qt)
+{
+    return (uint32_t) ((int64_t) time(NULL) + qt->utc_offset);
+}
+
+// resets the counters if the quota has entered a new period. the worker that wins the exchange does the reset.
+static inline void
+quota_period_sync(struct Quota *quota, uint32_t local)
+{
+    uint32_t    period_idx = local / quota->cfg.period;
+    uint32_t    current = atomic_load_explicit(&quota->period_idx, memory_order_relaxed);
+
+    if (current == period_idx)
+        return;
+
+    if (atomic_compare_exchange_strong(&quota->period_idx, &current, period_idx)) {
+        atomic_store_explicit(&quota->bytes, 0, memory_order_relaxed);
+        atomic_store_explicit(&quota->conns, 0, memory_order_relaxed);
+    }
+}
+
+static inline bool
+quota_restricted(struct Quota *quota, uint32_t local)
+{
+    if (!quota->cfg.window_len)
+        return false;
+
+    return (((local % QUOTA_DAY) + QUOTA_DAY - quota->cfg.window_start) % QUOTA_DAY) < quota->cfg.window_len;
+}
+
+/*
+moves the counters of the active table into the replacement. must be called after the replacement is published and
+the grace period has completed so the old counters are final. counters from a previous period are not carried over.
+*/
+void
+quota_table_carry(struct QuotaTable *new_qt, struct QuotaTable *old_qt)
+{
+    struct Quota   *new_quota, *old_quota;
+    uint32_t        local = quota_local_time(new_qt);
+
+    FOR_LOOP(0, new_qt->len, 1, idx) {
+        new_quota = &new_qt->quotas[idx];
+
+        old_quota = quota_find(old_qt, new_quota->cfg.type, new_quota->cfg.key);
+        if (!old_quota) continue;
+
+        atomic_fetch_add(&new_quota->drops, atomic_load(&old_quota->drops));
+
+        quota_period_sync(new_quota, local);
+        if (atomic_load(&old_quota->period_idx) != atomic_load(&new_quota->period_idx)) continue;
+
+        atomic_fetch_add(&new_quota->bytes, atomic_load(&old_quota->bytes));
+        atomic_fetch_add(&new_quota->conns, atomic_load(&old_quota->conns));
+    }
+}
+
+// ==================================
+// PACKET PATH
+// ==================================
+// returns the quota that applies to the packet or NULL. the cost for traffic without a quota is a host probe each.
+inline struct Quota*
+quota_lookup(struct QuotaTable *qt, uint32_t src, uint32_t dst, uint8_t in_zone, uint8_t out_zone)
+{
+    struct Quota   *quota;
+
+    if (!qt->len)
+        return NULL;
+
+    if ((quota = quota_find(qt, QUOTA_HOST, src))) { return quota; }
+    if ((quota = quota_find(qt, QUOTA_HOST, dst))) { return quota; }
+
+    if (qt->zones[in_zone])  { return &qt->quotas[qt->zones[in_zone] - 1]; }
+    if (qt->zones[out_zone]) { return &qt->quotas[qt->zones[out_zone] - 1]; }
+
+    return NULL;
+}
+
+/*
+counts the packet against the quota. returns false if the packet must be dropped because the quota is inside its time
+window or a limit has been reached.
+*/
+bool
+quota_update(struct QuotaTable *qt, struct Quota *quota, bool new_conn, uint16_t bytes)
+{
+    uint32_t    local = quota_local_time(qt);
+
+    quota_period_sync(quota, local);
+
+    if (quota_restricted(quota, local))
+        goto drop;
+
+    if (quota->cfg.max_bytes
+            && atomic_load_explicit(&quota->bytes, memory_order_relaxed) >= quota->cfg.max_bytes)
+        goto drop;
+
+    if (new_conn) {
+        if (quota->cfg.max_conns
+                && atomic_load_explicit(&quota->conns, memory_order_relaxed) >= quota->cfg.max_conns)
+            goto drop;
+
+        atomic_fetch_add_explicit(&quota->conns, 1, memory_order_relaxed);
+    }
+    atomic_fetch_add_explicit(&quota->bytes, bytes, memory_order_relaxed);
+
+    return true;
+
+    drop:
+    atomic_fetch_add_explicit(&quota->drops, 1, memory_order_relaxed);
+
+    return false;
+}
+
+// ==================================
+// QUOTA STATE
+// ==================================
+// copies the current state of at most max quotas into states. returns the number of quotas copied.
+uintf16_t
+quota_states(struct QuotaTable *qt, struct QuotaState *states, uintf16_t max)
+{
+    struct Quota   *quota;
+    uint32_t        local = quota_local_time(qt);
+    uintf16_t       count = qt->len < max ? qt->len : max;
+
+    FOR_LOOP(0, count, 1, idx) {
+        quota = &qt->quotas[idx];
+
+        quota_period_sync(quota, local);
+
+        states[idx].cfg   = quota->cfg;
+        states[idx].bytes = atomic_load_explicit(&quota->bytes, memory_order_relaxed);
+        states[idx].conns = atomic_load_explicit(&quota->conns, memory_order_relaxed);
+        states[idx].drops = atomic_load_explicit(&quota->drops, memory_order_relaxed);
+        states[idx].restricted = quota_restricted(quota, local);
+    }
+
+    return count;
+}
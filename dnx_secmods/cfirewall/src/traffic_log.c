@@ -2,12 +2,22 @@
 #include "cfirewall.h"
 #include "traffic_log.h"
 
-struct LogHandle Log[2];
+#include <sched.h>
+#include <stdatomic.h>
+#include <time.h>
+
+struct LogHandle Log[LOG_HANDLE_COUNT];
 struct dnx_db_service db_service;
 
 char*   action_map[3] = {"deny", "accept", "reject"};
 char*   dir_map[2]    = {"inbound", "outbound"};
 
+static uintf8_t     log_overflow = LOG_OVERFLOW_DROP;
+static pthread_t    log_writer_thread;
+static bool         log_writer_running = false;
+
+static void *log_writer(void *args);
+
 void
 log_init(int logger_idx, char *label)
 {
@@ -19,60 +29,212 @@ log_init(int logger_idx, char *label)
     logger->buf    = fopen("/dev/null", "a");
     logger->rotate = 0;
     logger->cnt    = 0;
+
+    logger->rings = aligned_alloc(64, sizeof(struct LogRing) * FW_MAX_WORKERS);
+    if (!logger->rings) {
+        fprintf(stderr, "<! failed to allocate %s log rings !>\n", label);
+
+        return;
+    }
+    memset(logger->rings, 0, sizeof(struct LogRing) * FW_MAX_WORKERS);
+
+    // a single writer serves every log handle
+    if (!log_writer_running) {
+        log_writer_running = pthread_create(&log_writer_thread, NULL, log_writer, NULL) == 0;
+    }
+}
+
+void
+log_set_overflow(uintf8_t policy)
+{
+    log_overflow = policy == LOG_OVERFLOW_BLOCK ? LOG_OVERFLOW_BLOCK : LOG_OVERFLOW_DROP;
+}
+
+void
+log_stats(int logger_idx, uint64_t *written, uint64_t *discarded)
+{
+    struct LogHandle *logger = &Log[logger_idx];
+
+    *written   = atomic_load_explicit(&logger->written, memory_order_relaxed);
+    *discarded = 0;
+
+    if (!logger->rings) { return; }
+
+    FOR_LOOP(0, FW_MAX_WORKERS, 1, i) {
+        *discarded += atomic_load_explicit(&logger->rings[i].discarded, memory_order_relaxed);
+    }
 }
 
 inline void
 log_enter(struct LogHandle *logger, struct timeval *ts)
 {
-    dprint(VERBOSE, "<-log enter\n");
     // open a new file if the day has changed. this might be changes to 8 hour blocks or something in the future
     if (ts->tv_sec >= logger->rotate) {
         log_rotate(logger, ts);
     }
 }
 
+// ==================================
+// PRODUCER (QUEUE WORKERS)
+// ==================================
+// reserves the next slot in the worker ring. returns NULL if the ring is full and the record was discarded.
+static inline struct LogRecord*
+log_ring_reserve(struct LogRing *ring, uint32_t *head)
+{
+    *head = atomic_load_explicit(&ring->head, memory_order_relaxed);
+
+    while (*head - atomic_load_explicit(&ring->tail, memory_order_acquire) >= LOG_RING_SIZE) {
+
+        if (log_overflow == LOG_OVERFLOW_DROP) {
+            atomic_fetch_add_explicit(&ring->discarded, 1, memory_order_relaxed);
+
+            return NULL;
+        }
+        sched_yield();
+    }
+
+    return &ring->records[*head & LOG_RING_MASK];
+}
+
 void
-log_write_firewall(int logger_idx, struct dnx_pktb *pkt)
+log_write_firewall(int logger_idx, uintf8_t ring_idx, struct dnx_pktb *pkt)
 {
-    struct LogHandle *logger = &Log[logger_idx];
+    struct LogHandle   *logger = &Log[logger_idx];
+    struct LogRing     *ring;
+    struct LogRecord   *rec;
+    uint32_t            head;
 
-    struct timeval  timestamp;
+    if (!logger->rings) { return; }
 
-    char    saddr[18];
-    char    daddr[18];
+    ring = &logger->rings[ring_idx];
+    rec  = log_ring_reserve(ring, &head);
+    if (!rec) {
+        dprint(FW_V & VERBOSE, "|log discarded|");
 
-    gettimeofday(&timestamp, NULL);
+        return;
+    }
 
-    log_enter(logger, &timestamp);
+    gettimeofday(&rec->ts, NULL);
 
-    // converting ip as integer to a dot notation string eg. 192.168.1.1
-    itoip(pkt->iphdr->saddr, saddr);
-    itoip(pkt->iphdr->daddr, daddr);
+    strncpy(rec->rule_name, pkt->rule_name, sizeof(rec->rule_name) - 1);
+    rec->rule_name[sizeof(rec->rule_name) - 1] = '\0';
+    memcpy(rec->in_zone, pkt->hw.in_zone.name, sizeof(rec->in_zone));
+    memcpy(rec->out_zone, pkt->hw.out_zone.name, sizeof(rec->out_zone));
 
-    fprintf(logger->buf, FW_LOG_FORMAT, timestamp.tv_sec, timestamp.tv_usec,
-        pkt->rule_name, action_map[pkt->action], dir_map[pkt->geo.dir], pkt->iphdr->protocol,
-        pkt->hw.iif, pkt->hw.in_zone.name, pkt->geo.src, saddr, ntohs(pkt->protohdr->sport),
-        pkt->hw.oif, pkt->hw.out_zone.name, pkt->geo.dst, daddr, ntohs(pkt->protohdr->dport)
-    );
-    logger->cnt++;
+    rec->action      = pkt->action;
+    rec->dir         = pkt->geo.dir;
+    rec->protocol    = pkt->iphdr->protocol;
+    rec->iif         = pkt->hw.iif;
+    rec->oif         = pkt->hw.oif;
+    rec->src_country = pkt->geo.src;
+    rec->dst_country = pkt->geo.dst;
+    rec->saddr       = pkt->iphdr->saddr;
+    rec->daddr       = pkt->iphdr->daddr;
+    rec->sport       = ntohs(pkt->protohdr->sport);
+    rec->dport       = ntohs(pkt->protohdr->dport);
 
-    dprint(FW_V & VERBOSE, "|logged|");
+    // publishing the record to the writer
+    atomic_store_explicit(&ring->head, head + 1, memory_order_release);
 
-    log_exit(logger);
+    dprint(FW_V & VERBOSE, "|logged|");
 }
 
 //void
 //log_write_nat(struct LogHandle *logger, struct dnx_pktb *pkt) //, uint8_t direction, uint8_t src_country, uint8_t dst_country)
 //{};
 
+// ==================================
+// CONSUMER (LOG WRITER THREAD)
+// ==================================
+static void
+log_format_firewall(struct LogHandle *logger, struct LogRecord *rec)
+{
+    char    saddr[18];
+    char    daddr[18];
+
+    // converting ip as integer to a dot notation string eg. 192.168.1.1
+    itoip(rec->saddr, saddr);
+    itoip(rec->daddr, daddr);
+
+    log_enter(logger, &rec->ts);
+
+    fprintf(logger->buf, FW_LOG_FORMAT, rec->ts.tv_sec, rec->ts.tv_usec,
+        rec->rule_name, action_map[rec->action], dir_map[rec->dir], rec->protocol,
+        rec->iif, rec->in_zone, rec->src_country, saddr, rec->sport,
+        rec->oif, rec->out_zone, rec->dst_country, daddr, rec->dport
+    );
+    logger->cnt++;
+}
+
+// drains every ring of the handle. returns the number of records written.
+static uintf32_t
+log_drain(struct LogHandle *logger)
+{
+    struct LogRing     *ring;
+    uint32_t            head, tail;
+    uintf32_t           total = 0;
+
+    FOR_LOOP(0, FW_MAX_WORKERS, 1, i) {
+        ring = &logger->rings[i];
+
+        tail = atomic_load_explicit(&ring->tail, memory_order_relaxed);
+        head = atomic_load_explicit(&ring->head, memory_order_acquire);
+
+        for (; tail != head; tail++) {
+            log_format_firewall(logger, &ring->records[tail & LOG_RING_MASK]);
+
+            // releasing the slot back to the worker
+            atomic_store_explicit(&ring->tail, tail + 1, memory_order_release);
+            total++;
+        }
+    }
+
+    return total;
+}
+
+static void*
+log_writer(void *args)
+{
+    struct timespec     idle = { .tv_sec = 0, .tv_nsec = LOG_WRITER_IDLE_NSEC };
+    uintf32_t           written;
+    time_t              geo_flush = time(NULL) + GEO_FLUSH_INTERVAL;
+
+    for (;;) {
+        written = 0;
+
+        if (time(NULL) >= geo_flush) {
+            log_db_flush_geolocation();
+
+            geo_flush = time(NULL) + GEO_FLUSH_INTERVAL;
+        }
+
+        FOR_LOOP(0, LOG_HANDLE_COUNT, 1, idx) {
+            if (!Log[idx].rings) { continue; }
+
+            written += log_drain(&Log[idx]);
+
+            log_exit(&Log[idx]);
+        }
+
+        if (!written) {
+            nanosleep(&idle, NULL);
+        }
+    }
+
+    return NULL;
+}
+
+// flushes anything written during the last drain pass. every pass ends here so records are on disk shortly after the
+// rings catch up rather than after a fixed count.
 inline void
 log_exit(struct LogHandle *logger)
 {
-    if (logger->cnt == LOG_BUFFER_LIMIT) {
+    if (logger->cnt) {
         fflush(logger->buf);
+
+        atomic_fetch_add_explicit(&logger->written, logger->cnt, memory_order_relaxed);
         logger->cnt = 0;
     }
-    dprint(VERBOSE, "log exit-->\n");
 }
 
 int
@@ -155,8 +317,9 @@ log_db_connect(void)
     return ret;
 }
 
-void
-log_db_geolocation(struct geolocation *geo, uint8_t pkt_action)
+// sends a single message with the dnx user credentials attached
+static void
+log_db_send(char *log_data, size_t len)
 {
     if (!db_service.connected) {
         // returns if unable to reconnect so we dont waste cycles
@@ -165,11 +328,10 @@ log_db_geolocation(struct geolocation *geo, uint8_t pkt_action)
     /* ===========================================
     DEFINING LOG MESSAGE DATA
     =========================================== */
-    char log_data[68];
     struct iovec log_msg;
 
     log_msg.iov_base = log_data;
-    log_msg.iov_len  = snprintf(log_data, sizeof(log_data), DB_LOG_FORMAT, geo->remote, geo->dir, pkt_action);
+    log_msg.iov_len  = len;
     /* ===========================================
     BUILDING SOCKET MESSAGE HEADER
     includes: packet/log data, ancillary data
@@ -208,3 +370,62 @@ log_db_geolocation(struct geolocation *geo, uint8_t pkt_action)
     // blindly sending since it is a local socket and we do not expect a confirmation of receipt.
     sendmsg(db_service.fd, &db_message, 0);
 }
+
+// ==================================
+// GEOLOCATION ACCOUNTING
+// ==================================
+static struct GeoCounters geo_counters[FW_MAX_WORKERS];
+
+// counted in memory by the worker. the log writer sends the totals to the database service every GEO_FLUSH_INTERVAL.
+void
+log_db_geolocation(uintf8_t worker_idx, struct geolocation *geo, uint8_t pkt_action)
+{
+    if (geo->dir != OUTBOUND && geo->dir != INBOUND) { return; }
+
+    atomic_fetch_add_explicit(
+        &geo_counters[worker_idx].counts[geo->remote][geo->dir - 1][pkt_action == DNX_ACCEPT], 1, memory_order_relaxed
+    );
+}
+
+/* sums and resets the counters of every worker then sends the non zero totals. entries are packed into as few datagrams
+as the database service recv size allows.
+*/
+void
+log_db_flush_geolocation(void)
+{
+    char        log_data[DB_GEO_MSG_MAX];
+    size_t      hdr_len = strlen(DB_GEO_HEADER);
+    size_t      len = hdr_len;
+    uint32_t    counts[2];
+
+    memcpy(log_data, DB_GEO_HEADER, hdr_len);
+
+    FOR_LOOP(0, GEO_COUNTRY_COUNT, 1, country) {
+        FOR_LOOP(0, 2, 1, dir) {
+            counts[0] = counts[1] = 0;
+
+            FOR_LOOP(0, FW_MAX_WORKERS, 1, idx) {
+                counts[0] += atomic_exchange_explicit(&geo_counters[idx].counts[country][dir][0], 0, memory_order_relaxed);
+                counts[1] += atomic_exchange_explicit(&geo_counters[idx].counts[country][dir][1], 0, memory_order_relaxed);
+            }
+
+            if (!counts[0] && !counts[1]) { continue; }
+
+            // leaving room for the closing brackets and the entry separator
+            if (len + 48 > sizeof(log_data)) {
+                len += snprintf(log_data + len - 2, sizeof(log_data) - len, "]}") - 2;
+                log_db_send(log_data, len);
+
+                len = hdr_len;
+            }
+
+            len += snprintf(log_data + len, sizeof(log_data) - len, DB_GEO_ENTRY ", ",
+                (unsigned) country, (unsigned) dir + 1, counts[1], counts[0]);
+        }
+    }
+
+    if (len > hdr_len) {
+        len += snprintf(log_data + len - 2, sizeof(log_data) - len, "]}") - 2;
+        log_db_send(log_data, len);
+    }
+}
@@ -10,10 +10,13 @@ from dnx_gentools.def_constants import INITIALIZE_MODULE
 if INITIALIZE_MODULE('dns-proxy'):
     __all__ = ('run',)
 
+    import os
+    import signal
     import threading
 
     from dnx_gentools.def_enums import Queue
-    from dnx_gentools.signature_operations import generate_domain
+    from dnx_gentools.file_operations import load_configuration
+    from dnx_gentools.signature_operations import compile_domain
 
     from dnx_iptools.hash_trie import HashTrie_Value
 
@@ -21,14 +24,9 @@ if INITIALIZE_MODULE('dns-proxy'):
 
     Log.run(name='dns_proxy')
 
-    dns_cat_signatures = generate_domain(Log)
-
+    # the precompiled image is mapped read-only. signature lists are only parsed if the image is out of date.
     _category_trie = HashTrie_Value()
-    _category_trie.generate_structure(dns_cat_signatures, len(dns_cat_signatures))
-
-    # memory allocation was done manually within the C extension for its structures.
-    # python structures are no longer needed at this point so freeing memory.
-    del dns_cat_signatures
+    _category_trie.load_image(compile_domain(Log))
 
     # =================
     # DEFERRED IMPORTS
@@ -36,18 +34,60 @@ if INITIALIZE_MODULE('dns-proxy'):
     # must be imported after logger is initialized
     import dns_proxy
     import dns_proxy_server
+    import dns_proxy_packets
+    import dns_proxy_automate
+
+    # setting top of file variable for proxy direct access to search method.
+    # every label suffix of a query is searched with a single call.
+    dns_proxy.CAT_LOOKUP = _category_trie.py_search_batch
 
-    # setting top of file variable for proxy direct access to search method
-    dns_proxy.CAT_LOOKUP = _category_trie.py_search
+    # query names and dns white/blacklist rules must be hashed with the key the signatures were compiled with
+    dns_proxy_packets.DOMAIN_KEY = _category_trie.hash_key
+    dns_proxy_automate.DOMAIN_HASH = _category_trie.py_hash
+
+    # signature updates are swapped into the trie while running
+    dns_proxy_automate.CATEGORY_TRIE = _category_trie
 
 def run():
+    # the dns cache is written to disk when the service is stopped, so the next start is warm. the main thread waits in
+    # the nfqueue loop without the gil, so a python handler would not run until the next packet. the handler only wakes
+    # the shutdown thread through the signal wakeup fd, which is written from the c level handler in any thread.
+    wakeup_r, wakeup_w = os.pipe()
+    os.set_blocking(wakeup_w, False)
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: None)
+    signal.set_wakeup_fd(wakeup_w)
+
+    threading.Thread(target=_shutdown, args=(wakeup_r,), daemon=True).start()
+
+    # the event loop server core is opt in. both cores share the cache, pending query table, and configuration.
+    server_settings = load_configuration('dns_server', cfg_type='global')
+    if (server_settings.get('server->asyncio', False)):
+        dns_server = dns_proxy_server.AsyncDNSServer
+    else:
+        dns_server = dns_proxy_server.DNSServer
+
     # server running in thread because run method is a blocking call
     threading.Thread(
-        target=dns_proxy_server.DNSServer.run, args=(Log,), kwargs={'threaded': False, 'always_on': True}
+        target=dns_server.run, args=(Log,), kwargs={'threaded': False, 'always_on': True}
     ).start()
 
     dns_proxy.DNSProxy.run(Log, q_num=Queue.DNS_PROXY)
 
+def _shutdown(wakeup_r: int) -> None:
+    # the wakeup fd receives the number of every signal with a python handler, e.g. SIGINT
+    while signal.SIGTERM not in os.read(wakeup_r, 64):
+        continue
+
+    try:
+        record_count = dns_proxy_server.DNS_CACHE.write_snapshot()
+    except OSError as E:
+        Log.error(f'dns cache snapshot write failed. {E}')
+    else:
+        Log.notice(f'{record_count} records written to dns cache snapshot.')
+
+    os._exit(0)
+
 
 # ================
 # TYPING IMPORTS
@@ -58,10 +98,10 @@ if (TYPE_CHECKING):
     from typing import TypeAlias
 
     __all__ = (
-        'DNSProxy', 'DNSServer',
+        'DNSProxy', 'DNSServer', 'AsyncDNSServer',
         'ClientQuery', 'DNSPacket',
 
-        'DNSCache', 'RequestTracker',
+        'DNSCache', 'RequestTracker', 'PendingQueries',
 
         # TYPES
         'DNSProxy_T', 'DNSServer_T', 'DNSPacket_T'
@@ -69,13 +109,17 @@ if (TYPE_CHECKING):
 
     # referencing some objects through proxy import references
     from dns_proxy import DNSProxy
-    from dns_proxy_server import DNSServer
+    from dns_proxy_server import DNSServer, AsyncDNSServer
     from dns_proxy_packets import ClientQuery, DNSPacket
 
     from dns_proxy_cache import dns_cache as _dns_cache, request_tracker as _request_tracker
+    from dns_proxy_cache import pending_queries as _pending_queries
 
-    DNSCache = _dns_cache(dns_packet=Callable[[str], ClientQuery], request_handler=Callable[[ClientQuery], None])
+    DNSCache = _dns_cache(
+        dns_packet=Callable[[str, int], ClientQuery], request_handler=Callable[[int, ClientQuery], None]
+    )
     RequestTracker = _request_tracker()
+    PendingQueries = _pending_queries(timeout=int)
 
     # ======
     # TYPES
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+'''top domain counting benchmark with many concurrent dns server threads.
+
+    locked: a Counter behind a shared lock with a substring scan of the top domain filter for every query, as previously
+        used by the dns cache.
+    sharded: the lock free top counter of the dns cache with the filter compiled to a KeywordTrie.
+
+query names are drawn from the domain signature lists with a zipf distribution, so a small set of domains make up most
+of the queries like real client traffic.
+
+    python3 -m dnx_secmods.dns_proxy.benchmark [thread count] [query count] [domain count]
+'''
+
+from __future__ import annotations
+
+import os
+import sys
+import random
+import threading
+
+from collections import Counter
+from time import perf_counter_ns
+
+from dnx_gentools.def_typing import *
+from dnx_gentools.def_constants import TOP_DOMAIN_COUNT, console_log
+from dnx_gentools.file_operations import load_top_domains_filter
+from dnx_gentools.signature_operations import SIGNATURE_DIR
+from dnx_gentools.standard_tools import top_counter
+
+from dnx_iptools.hash_trie import KeywordTrie
+
+THREAD_COUNT: int = 16
+QUERY_COUNT: int = 1000000
+DOMAIN_COUNT: int = 50000
+
+ZIPF_EXPONENT: float = 1.1
+
+def sample_queries(query_count: int, domain_count: int) -> list[str]:
+    domain_dir = f'{SIGNATURE_DIR}/domain_lists'
+
+    domains: list = []
+    for file_name in sorted(os.listdir(domain_dir)):
+
+        if (not file_name.endswith('.domains')):
+            continue
+
+        with open(f'{domain_dir}/{file_name}', 'r') as file:
+            domains.extend([x.split()[0] for x in file.read().splitlines() if x and '#' not in x])
+
+    domains = random.sample(domains, min(domain_count, len(domains)))
+    weights = [1 / rank ** ZIPF_EXPONENT for rank in range(1, len(domains) + 1)]
+
+    return random.choices(domains, weights, k=query_count)
+
+def run_threads(count: Callable[[str], None], queries: list[str], thread_count: int) -> float:
+    '''count the queries split across the threads and return the ns per query.
+    '''
+    start_barrier = threading.Barrier(thread_count + 1)
+
+    def worker(thread_queries: list[str]) -> None:
+        start_barrier.wait()
+
+        for query in thread_queries:
+            count(query)
+
+    threads = [
+        threading.Thread(target=worker, args=(queries[i::thread_count],)) for i in range(thread_count)
+    ]
+    for thread in threads:
+        thread.start()
+
+    start_barrier.wait()
+    start = perf_counter_ns()
+
+    for thread in threads:
+        thread.join()
+
+    return (perf_counter_ns() - start) / len(queries)
+
+def run(thread_count: int = THREAD_COUNT, query_count: int = QUERY_COUNT, domain_count: int = DOMAIN_COUNT) -> None:
+    queries = sample_queries(query_count, domain_count)
+
+    filters = load_top_domains_filter()
+
+    # ==============
+    # LOCKED
+    # ==============
+    filter_tuple = tuple(filters)
+    counter_lock = threading.Lock()
+    domain_counter = Counter()
+
+    def locked_count(domain: str) -> None:
+        with counter_lock:
+            if (domain and not [fltr for fltr in filter_tuple if fltr in domain]):
+                domain_counter[domain] += 1
+
+    locked_ns = run_threads(locked_count, queries, thread_count)
+    locked_top = [domain for domain, count in domain_counter.most_common(TOP_DOMAIN_COUNT)]
+
+    # ==============
+    # SHARDED
+    # ==============
+    filter_trie = KeywordTrie()
+    filter_trie.generate_structure([(fltr, True) for fltr in filters], len(filters))
+
+    sharded_counter = top_counter(
+        capacity=TOP_DOMAIN_COUNT * 4, ignore=lambda domain: not domain or filter_trie.py_search(domain) is not None
+    )
+
+    sharded_ns = run_threads(sharded_counter.count, queries, thread_count)
+    sharded_top = [domain for domain, count in sharded_counter.most_common(TOP_DOMAIN_COUNT)]
+
+    console_log(f'threads={thread_count} queries={query_count} domains={domain_count} filters={len(filters)}')
+    console_log(f'locked   {locked_ns:8.2f} ns/query  {1e3 / locked_ns:8.3f} M queries/s')
+    console_log(f'sharded  {sharded_ns:8.2f} ns/query  {1e3 / sharded_ns:8.3f} M queries/s')
+    console_log(f'top {TOP_DOMAIN_COUNT} overlap={len(set(locked_top) & set(sharded_top))}')
+
+
+if __name__ == '__main__':
+    run(*[int(arg) for arg in sys.argv[1:]])
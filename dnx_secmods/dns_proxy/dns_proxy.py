@@ -2,8 +2,10 @@
 
 from __future__ import annotations
 
+from array import array
+
 from dnx_gentools.def_typing import *
-from dnx_gentools.def_enums import DNS, DNS_CAT, TLD_CAT, CONN
+from dnx_gentools.def_enums import DNS_CAT, TLD_CAT, CONN
 from dnx_gentools.def_namedtuples import DNS_REQUEST_RESULTS
 
 from dnx_iptools.packet_classes import NFQueue
@@ -18,7 +20,7 @@ __all__ = (
 )
 
 
-CAT_LOOKUP: Callable[[int], int] = NotImplemented  # will be assigned by __init__ prior to running
+CAT_LOOKUP: Callable[[array], array] = NotImplemented  # will be assigned by __init__ prior to running
 LOCAL_RECORD: Callable[[str], ...] = DNSServer.dns_records.get
 PREPARE_AND_SEND = ProxyResponse.prepare_and_send
 
@@ -42,23 +44,16 @@ class DNSProxy(ProxyConfiguration, NFQueue):
 
         ProxyResponse.setup(Log)
 
-    # pre-check will filter out invalid packets, ipv6 records, and local dns records
+    # pre-check will filter out invalid packets and local dns records. all record types are inspected the same.
     def _pre_inspect(self, packet: DNSPacket) -> bool:
 
         # local records will continue directly to the dns server
         if LOCAL_RECORD(packet.qname):
             packet.nfqueue.accept()
 
-        elif (packet.qtype in [DNS.A, DNS.NS]):
-            return True
-
-        # refusing ipv6 dns record types as policy
-        elif (packet.qtype == DNS.AAAA):
-            PREPARE_AND_SEND(packet)
-
-            packet.nfqueue.drop()
+            return False
 
-        return False
+        return True
 
 
 # =================
@@ -71,7 +66,7 @@ _enabled_categories = DNSProxy.signatures.en_dns
 
 _dns_whitelist = DNSProxy.whitelist.dns
 _dns_blacklist = DNSProxy.blacklist.dns
-_dns_keywords  = DNSProxy.signatures.keyword
+_keyword_search = DNSProxy.keyword_trie.py_search
 
 # called via an instance, so we need to handle the implicit arg
 def inspect(_, packet: DNSPacket):
@@ -106,7 +101,7 @@ def _inspect(packet: DNSPacket) -> DNS_REQUEST_RESULTS:
 
     category: DNS_CAT
     # signature/ blacklist check.
-    for enum_request in packet.requests:
+    for enum_request, category_id in zip(packet.requests, CAT_LOOKUP(packet.requests)):
 
         # NOTE: allowing malicious category overrides (for false positives)
         if (enum_request in _dns_whitelist):
@@ -119,7 +114,7 @@ def _inspect(packet: DNSPacket) -> DNS_REQUEST_RESULTS:
             return DNS_REQUEST_RESULTS(True, 'blacklist', DNS_CAT.time_based)
 
         # determining the domain category
-        category = DNS_CAT(CAT_LOOKUP(enum_request))
+        category = DNS_CAT(category_id)
         if (category is not DNS_CAT.NONE) and _block_query(category, whitelisted):
 
             return DNS_REQUEST_RESULTS(True, 'category', category)
@@ -128,10 +123,9 @@ def _inspect(packet: DNSPacket) -> DNS_REQUEST_RESULTS:
         enum_categories.append(category)
 
     # Keyword search within query name will block if match
-    req = packet.qname
-    keyword_match = [(kwd, cat) for kwd, cat in _dns_keywords if kwd in req]
-    if (keyword_match):
-        return DNS_REQUEST_RESULTS(True, 'keyword', keyword_match[0][1])
+    keyword_category = _keyword_search(packet.qname)
+    if (keyword_category is not None):
+        return DNS_REQUEST_RESULTS(True, 'keyword', keyword_category)
 
     # pulling the most specific category that is not none otherwise returned value will be DNS_CAT.NONE.
     for category in enum_categories:
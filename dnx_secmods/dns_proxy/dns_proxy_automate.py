@@ -14,9 +14,11 @@ from dnx_gentools.def_namedtuples import DNS_SERVERS, DNS_SIGNATURES, DNS_WHITEL
 from dnx_gentools.def_enums import PROTO, CFG, DNS_CAT
 from dnx_gentools.file_operations import *
 from dnx_gentools.standard_tools import looper, ConfigurationMixinBase
+from dnx_gentools.signature_operations import compile_domain, reload_signatures
 
 from dnx_iptools.cprotocol_tools import iptoi
-from dnx_iptools.protocol_tools import create_dns_query_header, strtobit
+from dnx_iptools.hash_trie import KeywordTrie
+from dnx_iptools.protocol_tools import create_dns_query_header
 
 from dns_proxy_log import Log
 
@@ -26,11 +28,16 @@ from dns_proxy_log import Log
 if (TYPE_CHECKING):
     from dnx_routines.logging import LogHandler_T
 
+    from dnx_iptools.hash_trie import HashTrie_Value
+
 
 __all__ = (
     'ProxyConfiguration', 'ServerConfiguration',
 )
 
+DOMAIN_HASH: Callable[[str], int] = NotImplemented  # will be assigned by __init__ prior to running
+CATEGORY_TRIE: HashTrie_Value = NotImplemented
+
 ConfigurationManager.set_log_reference(Log)
 
 
@@ -50,6 +57,9 @@ class ProxyConfiguration(ConfigurationMixinBase):
         {DNS_CAT.doh}, {}, []
     )
 
+    # compiled from signatures.keyword, so the query name is scanned once regardless of the keyword count.
+    keyword_trie: ClassVar[KeywordTrie] = KeywordTrie()
+
     _keywords: ClassVar[list[tuple[str, DNS_CAT]]] = []
 
     def _configure(self) -> tuple[LogHandler_T, tuple, int]:
@@ -63,6 +73,7 @@ class ProxyConfiguration(ConfigurationMixinBase):
 
         threads = (
             (self._get_proxy_settings, ()),
+            (self._reload_signatures, ()),
             # (self._get_list, ('whitelist',)),
             # (self._get_list, ('blacklist',))
         )
@@ -109,12 +120,23 @@ class ProxyConfiguration(ConfigurationMixinBase):
             if (cat in enabled_keywords and signature not in signatures.keyword):
                 signatures.keyword.append((signature, cat))
 
+        # the keyword trie is swapped in without blocking lookups, so it is only rebuilt when the keyword set changes.
+        if (signatures.keyword != mem_keywords):
+            self.__class__.keyword_trie.generate_structure(signatures.keyword, len(signatures.keyword))
+
         # TLD SETTINGS | generator
         for tld, setting in load_tlds():
             signatures.tld[tld] = setting
 
         self._initialize.done()
 
+    @looper(ONE_MIN)
+    # recompiles the domain signature image if its sources have changed and swaps it into the live category trie.
+    # the hash key is kept across compiles so hashed white/blacklist rules remain valid.
+    def _reload_signatures(self) -> None:
+        if reload_signatures(CATEGORY_TRIE, compile_domain(Log)):
+            Log.notice('[reload] domain signatures updated.')
+
     @cfg_write_poller
     # handles updating user defined signatures in memory/propagated changes to disk.
     def _get_list(self, lname: str, cfg_file: str, last_modified_time: int) -> float:
@@ -161,7 +183,7 @@ class ProxyConfiguration(ConfigurationMixinBase):
 
             # iterating over rules/signatures pulled from file
             for rule, settings in loaded_list.get_items('time_based'):
-                trie_key = strtobit(rule)
+                trie_key = DOMAIN_HASH(rule)
 
                 # adding rule/signature to memory if not present
                 if (trie_key not in memory_list):
@@ -173,7 +195,7 @@ class ProxyConfiguration(ConfigurationMixinBase):
             # iterating over rules/signature in memory
             for rule, settings in memory_list.copy().items():
 
-                trie_key = strtobit(rule)
+                trie_key = DOMAIN_HASH(rule)
 
                 # if the rule is not present in the config file, it will be removed from memory
                 if (settings['key'] not in loaded_list):
@@ -2,15 +2,23 @@
 
 from __future__ import annotations
 
+import os
+import random
 import threading
 
-from collections import Counter, deque
+from collections import Counter, OrderedDict, deque
+from heapq import heapify, heappop, heappush
+from struct import Struct, error as StructError
+from time import monotonic
 
 from dnx_gentools.def_typing import *
 from dnx_gentools.def_constants import *
-from dnx_gentools.def_namedtuples import QNAME_RECORD, QNAME_RECORD_UPDATE
+from dnx_gentools.def_enums import DNS
+from dnx_gentools.def_namedtuples import QNAME_RECORD, QNAME_RECORD_UPDATE, RESOURCE_RECORD
 from dnx_gentools.file_operations import *
-from dnx_gentools.standard_tools import looper
+from dnx_gentools.standard_tools import looper, top_counter
+
+from dnx_iptools.hash_trie import KeywordTrie
 
 from dns_proxy_log import Log
 
@@ -18,12 +26,13 @@ from dns_proxy_log import Log
 # TYPING IMPORTS
 # ===============
 if (TYPE_CHECKING):
-    from dnx_secmods.dns_proxy import DNSCache, RequestTracker
+    from dnx_gentools import TopCounter
+    from dnx_secmods.dns_proxy import DNSCache, RequestTracker, PendingQueries
 
     from dns_proxy_packets import ClientQuery
 
 __all__ = (
-    'dns_cache', 'request_tracker',
+    'dns_cache', 'request_tracker', 'pending_queries',
     
     'NO_QNAME_RECORD', 'QNAME_NOT_FOUND'
 )
@@ -31,23 +40,48 @@ __all__ = (
 NO_QNAME_RECORD = QNAME_RECORD(-1, -1, [])
 QNAME_NOT_FOUND = QNAME_RECORD_UPDATE(-1, [])
 
-def dns_cache(*, dns_packet: Callable[[str], ClientQuery], request_handler: Callable[[int, ClientQuery], None]) -> DNSCache:
+# approximate cost in bytes of the containers holding a record. counted against the cache byte budget.
+RECORD_OVERHEAD: int = 256
+# maximum expired records removed per lock acquisition
+EXPIRE_BATCH: int = 32
+
+# cache snapshot format. header > entries > entry records.
+#   header: magic, version, entry count
+#   entry:  qname len, qtype, expire, ttl, rcode, negative, hits, record count | qname
+#   record: name len, data len | name, qtype, qclass, ttl, data
+SNAPSHOT_MAGIC: bytes = b'DNXCACHE'
+SNAPSHOT_VERSION: int = 1
+
+_snapshot_header: Struct = Struct('!8sHI')
+_snapshot_entry:  Struct = Struct('!HHQIBBIH')
+_snapshot_record: Struct = Struct('!HH')
 
-    _top_domains: list = load_configuration('dns_server', ext='cache', cfg_type='global').get('top_domains')
+def dns_cache(*, dns_packet: Callable[[str, int], ClientQuery], request_handler: Callable[[int, ClientQuery], None]) -> DNSCache:
 
-    domain_counter: Counter[str, int] = Counter({dom: cnt for cnt, dom in enumerate(reversed(_top_domains))})
-    counter_lock: Lock = threading.Lock()
+    _cache_settings: ConfigChain = load_configuration('dns_server', ext='cache', cfg_type='global')
 
-    top_domain_filter = tuple(load_top_domains_filter())
+    # the filter strings are matched anywhere in the domain, so they are compiled to scan the domain once.
+    top_domain_filters: list[tuple[str, bool]] = [(fltr, True) for fltr in load_top_domains_filter()]
 
-    # not needed once loaded into Counter
-    del _top_domains
+    top_domain_filter = KeywordTrie()
+    top_domain_filter.generate_structure(top_domain_filters, len(top_domain_filters))
 
-    dict_get = dict.__getitem__
+    # queries are counted by each server thread without locking. the extra candidates absorb the error of the sketch.
+    top_domain_counter: TopCounter = top_counter(
+        capacity=TOP_DOMAIN_COUNT * 4,
+        ignore=lambda domain: not domain or top_domain_filter.py_search(domain) is not None
+    )
+
+    # the stored top domains are counted by rank (the last stored counted once), so they are kept until outranked.
+    for rank, domain in enumerate(reversed(_cache_settings.get('top_domains'))):
+        for _ in range(rank + 1):
+            top_domain_counter.count(domain)
 
     @cfg_read_poller('dns_server', ext='cache', cfg_type='global')
     def manual_clear(cache: DNSCache, cache_settings: ConfigChain) -> None:
 
+        cache.configure(cache_settings)
+
         clear_dns_cache:   bool = cache_settings['clear->standard']
         clear_top_domains: bool = cache_settings['clear->top_domains']
 
@@ -63,9 +97,8 @@ def dns_cache(*, dns_packet: Callable[[str], ClientQuery], request_handler: Call
 
             Log.notice('dns cache has been cleared.')
 
-        # if clearing top domains, we do not need to check for expired records since they will have been cleared already
         if (clear_top_domains):
-            domain_counter.clear()
+            top_domain_counter.clear()
             clear_top_domains = False
 
             Log.notice('top domains cache has been cleared.')
@@ -79,115 +112,455 @@ def dns_cache(*, dns_packet: Callable[[str], ClientQuery], request_handler: Call
             dnx.write_configuration(cache_settings.expanded_user_data)
 
     @looper(THREE_MIN)
-    # automated process to flush the cache if expire time has been reached.
+    # automated process to remove records past their stale period and report the most queried domains.
     def auto_clear(cache: DNSCache) -> None:
 
-        Log.debug('record cache clear or renew started.')
+        Log.debug('record cache clear started.')
 
         # =============
         # STANDARD
         # =============
-        # locking in starting time since per loop accuracy is not necessary
-        now: int = fast_time()
-        expired: list[str] = [domain for domain, record in cache.items() if now > record.expire]
+        # records are expired incrementally as they are added. this catches up with anything left over in a cache
+        # that has not seen much activity.
+        expired: int = cache.expire_records()
 
-        for domain in expired:
-            del cache[domain]
+        # the snapshot is kept recent in case the proxy is not stopped cleanly
+        try:
+            cache.write_snapshot()
+        except OSError as E:
+            Log.warning(f'dns cache snapshot write failed. {E}')
 
         # =============
         # TOP 20
         # =============
-        # keep the top XX queried domains permanently in cache.
-        top_domains: list[str] = [
-            domain for domain, ct in domain_counter.most_common(TOP_DOMAIN_COUNT)
-        ]
+        # popular records are kept fresh by prefetching, so the top domains are informational only.
+        top_domains: list[str] = [domain for domain, count in top_domain_counter.most_common(TOP_DOMAIN_COUNT)]
 
-        # updating persistent file first then sending requests
+        # the webui dns settings page displays the top domains and cache stats from the cache file
         with ConfigurationManager('dns_server', ext='cache', cfg_type='global') as dnx:
             cache_storage: ConfigChain = dnx.load_configuration()
 
             cache_storage['top_domains'] = top_domains
 
+            for stat, count in cache.stats().items():
+                cache_storage[f'stats->{stat}'] = count
+
             dnx.write_configuration(cache_storage.expanded_user_data)
 
-        # response will be identified by "None" for client address
-        for domain in top_domains:
-            request_handler(1, dns_packet(domain))
-            fast_sleep(.1)
+        Log.debug(f'{expired} expired records cleared from cache')
+
+    class _CacheEntry:
+
+        __slots__ = (
+            'record', 'size', 'remove_at',
+
+            'hits', 'refresh_at'
+        )
 
-        Log.debug('expired records cleared from cache and top domains refreshed')
+        def __init__(self, record: QNAME_RECORD, size: int, remove_at: int, hits: int):
 
-    class _DNSCache(dict):
-        '''subclass of dict to provide a custom data structure for dealing with the local caching of dns records.
+            self.record: QNAME_RECORD = record
+            self.size: int = size
+            # expire time plus the stale period
+            self.remove_at: int = remove_at
+
+            # hits are carried over when the record is refreshed
+            self.hits: int = hits
+            # earliest time another refresh can be requested
+            self.refresh_at: int = 0
+
+    class _DNSCache:
+        '''bounded cache for the local caching of dns records.
 
         containers handled by class:
-            general dict - standard cache storage
-            private dict - top domains cache storage
-            private Counter - tracking number of times a domain is queried
+            OrderedDict - standard cache storage in least recently used order
+            heap - (remove time, (qname, qtype)) of each record added, ordered by remove time
 
-        initialization is the same as a dict, with the addition of two required arguments for callback references
-        to the dns server.
+        when the entry or byte budget is exceeded, the least recently used records are evicted. expired records are
+        removed in small batches as records are added and by the auto clear poller, so the full cache is never scanned
+        while the lock is held.
 
-            packet (*reference to packet class*)
-            request_handler (*reference to dns server request handler function*)
+        negative responses (nxdomain, nodata, servfail) are cached per rfc 2308 with their ttl capped by the configured
+        negative and servfail ttl. a ttl of 0 disables caching of the response type.
 
-        if the above callbacks are not set, the top domain's caching system will NOT actively update records, but the
-        counts will still be accurate/usable.
+        expired records are kept for the stale max age and returned with the stale ttl while a refresh is requested in
+        the background (rfc 8767, with a client response timer of 0). records that have been hit the prefetch amount of
+        times are refreshed before expiring once the remaining ttl is below the prefetch percent of the original ttl.
+
+        hit, miss, eviction, expiry, stale, and prefetch counts are returned by stats() and written to the cache file
+        with the top domains.
         '''
-        __slots__ = ()
+        __slots__ = (
+            'max_entries', 'max_bytes', 'negative_ttl', 'servfail_ttl',
+            'stale_ttl', 'stale_max_age', 'prefetch_percent', 'prefetch_hits',
+
+            '_records', '_expire_heap', '_lock', '_size',
+            '_hits', '_misses', '_evictions', '_expired',
+            '_negative_hits', '_negative_added',
+            '_stale_hits', '_prefetches'
+        )
+
+        def __init__(self):
+
+            self.max_entries:  int = DNS_CACHE_MAX_ENTRIES
+            self.max_bytes:    int = DNS_CACHE_MAX_BYTES
+            self.negative_ttl: int = NEGATIVE_TTL
+            self.servfail_ttl: int = SERVFAIL_TTL
+
+            self.stale_ttl:     int = STALE_TTL
+            self.stale_max_age: int = STALE_MAX_AGE
+            self.prefetch_percent: int = PREFETCH_PERCENT
+            self.prefetch_hits:    int = PREFETCH_HITS
+
+            self._records: OrderedDict[tuple[str, int], _CacheEntry] = OrderedDict()
+            self._expire_heap: list[tuple[int, tuple[str, int]]] = []
+            self._lock: Lock = threading.Lock()
+            self._size: int = 0
 
-        # searching key directly will return calculated ttl and associated records
-        def __getitem__(self, key: str) -> QNAME_RECORD_UPDATE:
-            record: QNAME_RECORD = dict_get(self, key)
-            # not present or root lookup
-            if (record is NO_QNAME_RECORD):
-                return QNAME_NOT_FOUND
+            self._hits: int = 0
+            self._misses: int = 0
+            self._evictions: int = 0
+            self._expired: int = 0
 
-            calcd_ttl = record.expire - int(fast_time())
-            if (calcd_ttl > DEFAULT_TTL):
-                return QNAME_RECORD_UPDATE(DEFAULT_TTL, record.records)
+            # each negative hit is a request that would have been relayed to the upstream server
+            self._negative_hits: int = 0
+            self._negative_added: int = 0
 
-            elif (calcd_ttl > 0):
-                return QNAME_RECORD_UPDATE(calcd_ttl, record.records)
+            self._stale_hits: int = 0
+            self._prefetches: int = 0
 
-            # expired
-            else:
-                return QNAME_NOT_FOUND
+        def __len__(self) -> int:
+            return len(self._records)
 
-        def __missing__(self, key: str) -> QNAME_RECORD:
-            return NO_QNAME_RECORD
+        # searching (qname, qtype) directly will return calculated ttl and associated records
+        def __getitem__(self, key: tuple[str, int]) -> QNAME_RECORD_UPDATE:
+            with self._lock:
+                entry: Optional[_CacheEntry] = self._records.get(key)
+                # not present or root lookup
+                if (entry is None):
+                    self._misses += 1
 
-        def add(self, request: str, data_to_cache: QNAME_RECORD):
-            '''add the query to cache after calculating expiration time.
+                    return QNAME_NOT_FOUND
+
+                record: QNAME_RECORD = entry.record
+
+                now: int = fast_time()
+                calcd_ttl: int = record.expire - now
+                # expired and past the stale period, or negative (never served stale)
+                if (calcd_ttl <= 0 and (record.negative or now >= entry.remove_at)):
+                    self._remove(key, entry)
+                    self._expired += 1
+                    self._misses += 1
+
+                    return QNAME_NOT_FOUND
+
+                self._records.move_to_end(key)
+                self._hits += 1
+
+                entry.hits += 1
+
+                if (record.negative):
+                    self._negative_hits += 1
+
+                    return QNAME_RECORD_UPDATE(calcd_ttl, record.records, record.rcode, True)
+
+                # stale records are always refreshed. fresh records are prefetched if popular and close to expiring.
+                refresh: bool = entry.refresh_at <= now and (
+                    calcd_ttl <= 0 or entry.hits >= self.prefetch_hits
+                    and calcd_ttl * 100 <= record.ttl * self.prefetch_percent
+                )
+                if (refresh):
+                    entry.refresh_at = now + REFRESH_WAIT
+
+                    if (calcd_ttl > 0):
+                        self._prefetches += 1
+
+                if (calcd_ttl <= 0):
+                    self._stale_hits += 1
+
+            # response will be identified by "None" for client address
+            if (refresh):
+                request_handler(1, dns_packet(*key))
+
+            if (calcd_ttl <= 0):
+                return QNAME_RECORD_UPDATE(self.stale_ttl, record.records, stale=True)
+
+            # the answer ttls are clamped per record type when the response is built. (see dns_proxy_packets._clamp_ttl)
+            return QNAME_RECORD_UPDATE(calcd_ttl, record.records, elapsed=record.ttl - calcd_ttl)
+
+        def add(self, request: tuple[str, int], data_to_cache: QNAME_RECORD):
+            '''add the (qname, qtype) records to cache, evicting the least recently used records if over the entry or
+            byte budget.
             '''
-            self[request] = data_to_cache
+            remove_at: int = data_to_cache.expire + self.stale_max_age
+
+            if (data_to_cache.negative):
+                max_ttl: int = self.servfail_ttl if data_to_cache.rcode == DNS.SERVFAIL else self.negative_ttl
+                if (max_ttl <= 0 or data_to_cache.ttl <= 0):
+                    return
+
+                if (data_to_cache.ttl > max_ttl):
+                    data_to_cache = data_to_cache._replace(
+                        expire=data_to_cache.expire - data_to_cache.ttl + max_ttl, ttl=max_ttl
+                    )
+
+                remove_at = data_to_cache.expire
+
+            record_size: int = _record_size(request, data_to_cache)
+            if (record_size > self.max_bytes):
+                return
+
+            with self._lock:
+                records = self._records
+
+                replaced: Optional[_CacheEntry] = records.pop(request, None)
+                if (replaced is not None):
+
+                    # rfc 8767. a server failure while refreshing does not replace the stale records.
+                    if (data_to_cache.rcode == DNS.SERVFAIL and not replaced.record.negative):
+                        records[request] = replaced
+
+                        return
+
+                    self._size -= replaced.size
+
+                records[request] = _CacheEntry(
+                    data_to_cache, record_size, remove_at, replaced.hits if replaced is not None else 0
+                )
+                self._size += record_size
+
+                if (data_to_cache.negative):
+                    self._negative_added += 1
+
+                heappush(self._expire_heap, (remove_at, request))
+
+                self._expire(fast_time(), EXPIRE_BATCH)
+
+                while (len(records) > self.max_entries or self._size > self.max_bytes):
+                    self._size -= records.popitem(last=False)[1].size
+                    self._evictions += 1
+
+                # stale heap entries from replaced or evicted records are dropped once they outnumber the records.
+                if (len(self._expire_heap) > 2 * len(records) + EXPIRE_BATCH):
+                    self._expire_heap = [(entry.remove_at, key) for key, entry in records.items()]
+                    heapify(self._expire_heap)
 
             Log.debug(f'[{request}:{data_to_cache.ttl}] Added to standard cache. ')
 
-        def search(self, query_name: str) -> QNAME_RECORD_UPDATE:
+        def search(self, query_name: str, qtype: int) -> QNAME_RECORD_UPDATE:
             '''return namedtuple of time left on ttl and the dns record if the client requested domain is cached.
 
             the top domain count will be incremented automatically if it passes the filter.
             '''
-            if (query_name):
+            top_domain_counter.count(query_name)
+
+            return self[(query_name, qtype)]
+
+        def expire_records(self) -> int:
+            '''remove all records past their stale period and return the amount removed.
+
+            the lock is released between each batch so queries are not held up by a large expiration.
+            '''
+            now: int = fast_time()
+
+            expired: int = 0
+            while True:
+                with self._lock:
+                    removed: int = self._expire(now, EXPIRE_BATCH)
+
+                expired += removed
+                if (removed < EXPIRE_BATCH):
+                    return expired
+
+        def configure(self, cache_settings: ConfigChain) -> None:
+            '''set the entry/byte budget, negative ttls, serve stale, and prefetch settings of the cache.
+
+            lowered budgets will apply on the next add. stale max age changes apply to records added after the change.
+            '''
+            self.max_entries = cache_settings.get('limits->entries', DNS_CACHE_MAX_ENTRIES)
+            self.max_bytes = cache_settings.get('limits->bytes', DNS_CACHE_MAX_BYTES)
+
+            self.negative_ttl = cache_settings.get('negative->ttl', NEGATIVE_TTL)
+            self.servfail_ttl = cache_settings.get('negative->servfail_ttl', SERVFAIL_TTL)
+
+            self.stale_ttl = cache_settings.get('stale->ttl', STALE_TTL)
+            self.stale_max_age = cache_settings.get('stale->max_age', STALE_MAX_AGE)
+
+            self.prefetch_percent = cache_settings.get('prefetch->percent', PREFETCH_PERCENT)
+            self.prefetch_hits = cache_settings.get('prefetch->hits', PREFETCH_HITS)
+
+        def write_snapshot(self, path: str = DNS_CACHE_SNAPSHOT) -> int:
+            '''write the unexpired records to the snapshot file and return the amount written.
+
+            expire times are absolute, so records restored after a restart keep their remaining ttl. records are written
+            in least recently used order, so the order is kept when restored.
+            '''
+            with self._lock:
+                entries: list = [(key, entry.record, entry.hits) for key, entry in self._records.items()]
+
+            now: int = fast_time()
+
+            snapshot = bytearray()
+            entry_count: int = 0
+            for (qname, qtype), record, hits in entries:
+
+                if (record.expire <= now):
+                    continue
+
+                qname_bytes: bytes = qname.encode()
+
+                snapshot += _snapshot_entry.pack(
+                    len(qname_bytes), qtype, record.expire, record.ttl, record.rcode, record.negative,
+                    min(hits, UINT32_MAX), len(record.records)
+                )
+                snapshot += qname_bytes
 
-                filter_matches: list[str] = [fltr for fltr in top_domain_filter if fltr in query_name]
-                if (not filter_matches):
+                for rr in record.records:
+                    snapshot += _snapshot_record.pack(len(rr.name), len(rr.data))
+                    snapshot += byte_join(rr)
 
-                    with counter_lock:
-                        domain_counter[query_name] += 1
+                entry_count += 1
 
-            return self[query_name]
+            # written to a temporary file first so a partial snapshot never replaces the last complete one
+            with open(f'{path}.tmp', 'wb') as snapshot_file:
+                snapshot_file.write(_snapshot_header.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, entry_count))
+                snapshot_file.write(snapshot)
+
+            os.replace(f'{path}.tmp', path)
+
+            return entry_count
+
+        def load_snapshot(self, path: str = DNS_CACHE_SNAPSHOT) -> int:
+            '''add the records of the snapshot file to cache and return the amount added.
+
+            records that expired since the snapshot are skipped. returns 0 if there is no snapshot. raises ValueError
+            if the file is not a valid snapshot.
+            '''
+            try:
+                with open(path, 'rb') as snapshot_file:
+                    snapshot: bytes = snapshot_file.read()
+            except FileNotFoundError:
+                return 0
+
+            try:
+                magic, version, entry_count = _snapshot_header.unpack_from(snapshot)
+            except StructError:
+                raise ValueError('snapshot header is truncated.')
+
+            if (magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION):
+                raise ValueError('snapshot magic or version mismatch.')
+
+            now: int = fast_time()
+
+            offset: int = _snapshot_header.size
+            loaded: int = 0
+            try:
+                for _ in range(entry_count):
+                    qname_len, qtype, expire, ttl, rcode, negative, hits, record_count = _snapshot_entry.unpack_from(
+                        snapshot, offset
+                    )
+                    offset += _snapshot_entry.size
+
+                    qname: str = snapshot[offset:offset + qname_len].decode()
+                    offset += qname_len
+
+                    records: list[RESOURCE_RECORD] = []
+                    for _ in range(record_count):
+                        name_len, data_len = _snapshot_record.unpack_from(snapshot, offset)
+                        offset += _snapshot_record.size
+
+                        rr: bytes = snapshot[offset:offset + name_len + 8 + data_len]
+                        offset += name_len + 8 + data_len
+
+                        records.append(RESOURCE_RECORD(
+                            rr[:name_len], rr[name_len:name_len + 2], rr[name_len + 2:name_len + 4],
+                            rr[name_len + 4:name_len + 8], rr[name_len + 8:]
+                        ))
+
+                    # slices past the end of the snapshot are cut short instead of failing to unpack
+                    if (offset > len(snapshot)):
+                        raise ValueError(f'snapshot is truncated after {loaded} records.')
+
+                    # expired while the proxy was not running
+                    if (expire <= now):
+                        continue
+
+                    self.add((qname, qtype), QNAME_RECORD(expire, ttl, records, rcode, bool(negative)))
+
+                    entry: Optional[_CacheEntry] = self._records.get((qname, qtype))
+                    if (entry is not None):
+                        entry.hits = hits
+
+                    loaded += 1
+
+            except (StructError, UnicodeDecodeError):
+                raise ValueError(f'snapshot is truncated or corrupt after {loaded} records.')
+
+            return loaded
+
+        def clear(self) -> None:
+            with self._lock:
+                self._records.clear()
+                self._expire_heap.clear()
+                self._size = 0
+
+        def stats(self) -> dict[str, int]:
+            return {
+                'entries': len(self._records), 'bytes': self._size,
+                'hits': self._hits, 'misses': self._misses, 'evictions': self._evictions, 'expired': self._expired,
+                'negative_hits': self._negative_hits, 'negative_added': self._negative_added,
+                'stale_hits': self._stale_hits, 'prefetches': self._prefetches
+            }
 
         def start_pollers(self):
 
             threading.Thread(target=auto_clear, args=(self,)).start()
             threading.Thread(target=manual_clear, args=(self,)).start()
 
+        # lock must be held by caller
+        def _expire(self, now: int, limit: int) -> int:
+            heap, records = self._expire_heap, self._records
+
+            expired: int = 0
+            while (heap and heap[0][0] <= now and expired < limit):
+                remove_at, key = heappop(heap)
+
+                # the record has since been replaced, evicted, or removed.
+                entry: Optional[_CacheEntry] = records.get(key)
+                if (entry is None or entry.remove_at != remove_at):
+                    continue
+
+                self._remove(key, entry)
+                expired += 1
+
+            self._expired += expired
+
+            return expired
+
+        # lock must be held by caller
+        def _remove(self, key: tuple[str, int], entry: _CacheEntry) -> None:
+            del self._records[key]
+
+            self._size -= entry.size
+
     if (TYPE_CHECKING):
         return _DNSCache
 
-    return _DNSCache()
+    cache: _DNSCache = _DNSCache()
+    cache.configure(_cache_settings)
+
+    # warming the cache with the records of the last run
+    try:
+        restored: int = cache.load_snapshot()
+    except (OSError, ValueError) as E:
+        Log.warning(f'dns cache snapshot could not be loaded. {E}')
+    else:
+        Log.notice(f'{restored} records restored from dns cache snapshot.')
+
+    return cache
+
+def _record_size(key: tuple[str, int], record: QNAME_RECORD) -> int:
+    return len(key[0]) + sum([len(rr) for rr in record.records]) + RECORD_OVERHEAD
 
 
 def request_tracker() -> RequestTracker:
@@ -239,3 +612,138 @@ def request_tracker() -> RequestTracker:
         return _RequestTracker
 
     return _RequestTracker()
+
+
+def pending_queries(*, timeout: int) -> PendingQueries:
+    '''fixed capacity table of the queries relayed to the public resolvers, indexed by the dns id of the relayed query.
+
+    ids are allocated from a randomly ordered free list covering the full 16-bit id space, so allocation and release
+    are O(1) and a released id is not reused until every other free id has been. each query is placed in a timing
+    wheel bucket by its expire time and is passed to the expire handler with its dns id if a response is not received
+    in time.
+    '''
+    wheel_size: int = timeout + 1
+
+    # 0 is not used and the keepalive id is reserved
+    dns_ids: list[int] = [i for i in range(1, UINT16_MAX + 1) if i != DNS.KEEPALIVE]
+    random.shuffle(dns_ids)
+
+    free_ids: deque[int] = deque(dns_ids)
+    allocate_id = free_ids.popleft
+    release_id = free_ids.append
+
+    queries: list[Optional[ClientQuery]] = [None] * (UINT16_MAX + 1)
+    # wheel bucket of each id in use
+    query_bucket: bytearray = bytearray(UINT16_MAX + 1)
+
+    # the wheel is driven by the monotonic clock, so wall clock steps do not stall or flood expiration
+    wheel: list[set[int]] = [set() for _ in range(wheel_size)]
+    wheel_tick: int = int(monotonic())
+
+    table_lock: Lock = threading.Lock()
+
+    counters: Counter[str, int] = Counter()
+
+    @looper(ONE_SEC)
+    # advances the wheel to the current time, expiring the queries in each bucket passed.
+    def expire_queries(expire_handler: Callable[[int, ClientQuery], None]) -> None:
+        nonlocal wheel_tick
+
+        now: int = int(monotonic())
+
+        expired: list[tuple[int, ClientQuery]] = []
+        with table_lock:
+            # every bucket is passed once when the poller fell behind by more than a full turn of the wheel
+            wheel_tick = max(wheel_tick, now - wheel_size)
+
+            while (wheel_tick < now):
+                wheel_tick += 1
+
+                bucket: set[int] = wheel[wheel_tick % wheel_size]
+                for dns_id in bucket:
+                    expired.append((dns_id, queries[dns_id]))
+
+                    queries[dns_id] = None
+                    release_id(dns_id)
+
+                counters['expired'] += len(bucket)
+
+                bucket.clear()
+
+        # the handler is called outside the lock since it may insert the query again
+        for dns_id, client_query in expired:
+            expire_handler(dns_id, client_query)
+
+        if (expired):
+            Log.debug(f'[pending] {len(expired)} queries expired. {_PendingQueries.stats()}')
+
+    class _PendingQueries:
+
+        @staticmethod
+        def insert(client_query: ClientQuery) -> int:
+            '''store the query and return its newly allocated dns id.
+
+            returns 0 if every id is in use.
+            '''
+            with table_lock:
+                if (not free_ids):
+                    counters['exhausted'] += 1
+
+                    return 0
+
+                dns_id: int = allocate_id()
+
+                queries[dns_id] = client_query
+
+                bucket: int = (wheel_tick + timeout) % wheel_size
+
+                query_bucket[dns_id] = bucket
+                wheel[bucket].add(dns_id)
+
+                counters['inserted'] += 1
+
+                in_flight: int = UINT16_MAX - 1 - len(free_ids)
+                if (in_flight > counters['high_water']):
+                    counters['high_water'] = in_flight
+
+            return dns_id
+
+        @staticmethod
+        def get(dns_id: int) -> Optional[ClientQuery]:
+            '''return the query of the dns id or None if it is not in the table (expired or unknown).
+            '''
+            return queries[dns_id]
+
+        @staticmethod
+        def pop(dns_id: int) -> Optional[ClientQuery]:
+            '''remove and return the query of the dns id or None if it is not in the table (expired or unknown).
+            '''
+            with table_lock:
+                client_query: Optional[ClientQuery] = queries[dns_id]
+                if (client_query is None):
+                    return None
+
+                queries[dns_id] = None
+                wheel[query_bucket[dns_id]].discard(dns_id)
+
+                release_id(dns_id)
+
+            return client_query
+
+        @staticmethod
+        def stats() -> dict[str, int]:
+            return {
+                'capacity': UINT16_MAX - 1, 'in_flight': UINT16_MAX - 1 - len(free_ids),
+                'high_water': counters['high_water'], 'inserted': counters['inserted'],
+                'expired': counters['expired'], 'exhausted': counters['exhausted']
+            }
+
+        @staticmethod
+        def start_pollers(expire_handler: Callable[[int, ClientQuery], None]) -> None:
+
+            threading.Thread(target=expire_queries, args=(expire_handler,)).start()
+
+    if (TYPE_CHECKING):
+        return _PendingQueries
+
+    return _PendingQueries()
@@ -12,6 +12,7 @@ from dnx_iptools.def_structs import *
 from dnx_iptools.def_structures import *
 from dnx_iptools.protocol_tools import *
 from dnx_iptools.cprotocol_tools import itoip, iptoi, calc_checksum
+from dnx_iptools.cprotocol_tools import dns_name_end, parse_dns_question, parse_dns_record
 from dnx_iptools.interface_ops import load_interfaces
 from dnx_iptools.packet_classes import NFPacket, RawResponse
 
@@ -24,6 +25,8 @@ __all__ = (
     'ttl_rewrite'
 )
 
+DOMAIN_KEY: tuple[int, int] = NotImplemented  # will be assigned by __init__ prior to running
+
 
 class ClientQuery:
     qtype:  int
@@ -41,7 +44,7 @@ class ClientQuery:
         'client_ip', 'client_port',
         'local_domain', 'top_domain',
         'keepalive', 'fallback',
-        'send_data', 'sendto',
+        'send_data', 'sendto', 'retries',
 
         'qr', 'op', 'aa', 'tc', 'rd',
         'ra', 'zz', 'ad', 'cd', 'rc',
@@ -64,6 +67,8 @@ class ClientQuery:
         self.top_domain:   bool = address is NULL_ADDR
         self.keepalive: bool = False
         self.fallback:  bool = False
+        # number of times the query was resent after the response timed out
+        self.retries: int = 0
 
         self.dns_id: int = 1
         # self.qname:  str = ''
@@ -96,11 +101,10 @@ class ClientQuery:
         self.rc: int = dns_header[1] & DNS_MASK.RC
 
         # www.micro.com or micro.com || sd.micro.com
-        offset, self.qname, self.local_domain = parse_query_name(dns_query)
+        offset, self.qname, self.local_domain, self.qtype, self.qclass, _ = parse_dns_question(dns_query)
 
-        self.qtype, self.qclass = double_short_unpack(dns_query[offset:])
-        self.question_record    = dns_query[:offset + 4]
-        self.additional_records = dns_query[offset + 4:]
+        self.question_record    = dns_query[:offset]
+        self.additional_records = dns_query[offset:]
 
         self.request_identifier = (self.client_ip, self.client_port, dns_header[0])  # dns_id
 
@@ -119,16 +123,41 @@ class ClientQuery:
 
         return send_data
 
+    def generate_servfail_response(self) -> bytearray:
+        '''builds a server failure response for queries that could not be resolved by the public resolvers.
+        '''
+        send_data = bytearray(dns_header_pack(self.dns_id, 32896 | self.rd | self.cd | DNS.SERVFAIL, 1, 0, 0, 0))
+        send_data += self.question_record
+
+        return send_data
+
     def generate_cached_response(self, cached_dom: QNAME_RECORD_UPDATE) -> bytearray:
 
-        send_data = bytearray(
-            dns_header_pack(self.dns_id, 32896 | self.rd | self.cd, 1, len(cached_dom.records), 0, 0)
-        )
+        # negative responses carry the cached soa record in the authority section
+        if (cached_dom.negative):
+            dns_header = dns_header_pack(
+                self.dns_id, 32896 | self.rd | self.cd | cached_dom.rcode, 1, 0, len(cached_dom.records), 0
+            )
+
+        else:
+            dns_header = dns_header_pack(self.dns_id, 32896 | self.rd | self.cd, 1, len(cached_dom.records), 0, 0)
+
+        send_data = bytearray(dns_header)
         send_data += self.question_record
 
+        # the soa ttl of a negative response is the remaining negative ttl and stale records use the stale ttl. answer
+        # records keep their upstream ttl in cache and are decremented by the time spent in cache, then clamped the
+        # same as when relayed. cached records are shared, so they are not modified.
         for record in cached_dom.records:
-            record.ttl = long_pack(cached_dom.ttl)
-            send_data += byte_join(record)
+
+            if (cached_dom.negative or cached_dom.stale):
+                record_ttl: int = cached_dom.ttl
+            else:
+                record_ttl: int = _clamp_ttl(
+                    short_unpack(record.qtype)[0], long_unpack(record.ttl)[0] - cached_dom.elapsed
+                )
+
+            send_data += byte_join([record.name, record.qtype, record.qclass, long_pack(record_ttl), record.data])
 
         return send_data
 
@@ -153,17 +182,16 @@ class ClientQuery:
         return send_data
 
     @classmethod
-    def init_local_query(cls, qname: str, keepalive: bool = False) -> Union[bytearray, ClientQuery]:
-        '''alternate constructor for creating locally generated queries (top domain or keepalive requests).
+    def init_local_query(cls, qname: str, qtype: int = DNS.A, keepalive: bool = False) -> Union[bytearray, ClientQuery]:
+        '''alternate constructor for creating locally generated queries (cache refresh or keepalive requests).
 
         if keepalive is set, a bytearray of send data is returned.
         If not keepalive, an instance of ClientQuery will be returned, which requires subsequent call to a send_data
         generation method.
         '''
         self = cls(NULL_ADDR, None)
-        # hardcoded qtype can change if needed.
         self.qname = qname
-        self.qtype = 1
+        self.qtype = qtype
 
         self.rd = DNS_MASK.RD
         self.ad = DNS_MASK.AD
@@ -229,37 +257,25 @@ class DNSPacket(NFPacket):
         # ============================
         # QUESTION RECORD (index 12+)
         # ============================
-        dns_query: bytearray = self.udp_payload[12:]  # 13+ is query data
+        dns_query: memoryview = memoryview(self.udp_payload)[12:]  # 13+ is query data
 
         # parsing dns name queried and byte offset due to variable length | ex www.micro.com or micro.com
+        # the name is hashed enumerating any subdomains (signature matching) in the same pass. the hashes are ordered
+        # tld > fqdn and stored as array('I') so the category trie can search all of them in one call.
         offset: int
-        query_info: tuple[str, bool]
-        offset, self.qname, self.local_domain = parse_query_name(dns_query)
+        offset, self.qname, self.local_domain, self.qtype, self.qclass, self.requests = parse_dns_question(
+            dns_query, DOMAIN_KEY
+        )
 
         # defining question record
-        self.question_record: bytearray = dns_query[:offset + 4]
+        self.question_record: memoryview = dns_query[:offset]
 
-        # defining questions record fields
-        self.qtype, self.qclass = double_short_unpack(dns_query[offset:])
+        # adjusting for local record as needed
+        self.tld = '' if self.local_domain else self.qname.rpartition('.')[2]
 
-        # hashing queried name enumerating any subdomains (signature matching)
         # defining unique tuple for informing dns server of inspection results
-        self.requests, self.tld = _enumerate_request(self.qname, self.local_domain)
         self.request_identifier = (self.src_ip, self.src_port, self.dns_id)
 
-def _enumerate_request(request: str, local_domain: bool) -> tuple[list[int], str]:
-    rs: list[str] = request.split('.')
-
-    # tld > fqdn
-    requests: list[int] = [
-        hash(dot_join(rs[i:])) & UINT32_MAX for i in range(-2, -len(rs)-1, -1)
-    ]
-
-    # adjusting for local record as needed
-    tld: str = '' if local_domain else rs[-1]
-
-    return requests, tld
-
 
 # ================
 # SERVER RESPONSE
@@ -267,6 +283,14 @@ def _enumerate_request(request: str, local_domain: bool) -> tuple[list[int], str
 _MINIMUM_TTL: bytes = long_pack(MINIMUM_TTL)
 _DEFAULT_TTL: bytes = long_pack(DEFAULT_TTL)
 
+def _clamp_ttl(record_type: int, ttl: int) -> int:
+    # A/CNAME ttls are clamped between a min and max value. CNAME ttl can differ, but will get clamped with A so will
+    # likely end up the same as A records. other record types are not clamped.
+    if (record_type in [DNS.A, DNS.CNAME]):
+        return max(MINIMUM_TTL, min(ttl, DEFAULT_TTL))
+
+    return ttl
+
 def ttl_rewrite(data: bytes, dns_id: int, len=len, min=min, max=max) -> tuple[bytearray, QNAME_RECORD]:
 
     mem_data = memoryview(data)
@@ -281,6 +305,9 @@ def ttl_rewrite(data: bytes, dns_id: int, len=len, min=min, max=max) -> tuple[by
     # ================
     _dns_header: tuple = dns_header_unpack(dns_header)
 
+    rcode: int = _dns_header[1] & DNS_MASK.RC
+    truncated: int = _dns_header[1] & DNS_MASK.TC
+
     resource_count:  int = _dns_header[3]
     authority_count: int = _dns_header[4]
     # additional_count = _dns_header[5]
@@ -291,75 +318,90 @@ def ttl_rewrite(data: bytes, dns_id: int, len=len, min=min, max=max) -> tuple[by
     # QUESTION RECORD
     # ================
     # www.micro.com or micro.com || sd.micro.com
-    offset: int = parse_query_name(dns_payload, quick=True) + 4
+    offset: int = dns_name_end(dns_payload) + 4
+    question_end: int = offset
 
     send_data += dns_payload[:offset]
 
     # ================
     # RESOURCE RECORD
     # ================
-    # resource_records = dns_payload[offset + 4:]
-
-    original_ttl = 0
     record_cache = []
 
+    negative_ttl = 0
+    soa_record = None
+
     # parsing standard and authority records
-    for record_count in [resource_count, authority_count]:
+    for answer_section, record_count in [(True, resource_count), (False, authority_count)]:
 
         # iterating once for every record based on provided record count. if this number is forged/tampered with it
         # will cause the parsing to fail. NOTE: ensure this isn't fatal.
         for _ in range(record_count):
-            record_type, record, offset = _parse_record(dns_payload, offset)
+            record_type, name_end, record_end = parse_dns_record(dns_payload, offset)
 
-            # TTL rewrite done on A/CNAME records which functionally clamp TTLs between a min and max value.
-            # CNAME ttl can differ, but will get clamped with A so wil; likely end up the same as A records.
-            # NOTE: only caching A/CNAME records
+            # TTL rewrite done on A/CNAME records. (see _clamp_ttl)
             if (record_type in [DNS.A, DNS.CNAME]):
-                original_ttl = long_unpack(record.ttl)[0]
-                record.ttl = long_pack(
-                    max(MINIMUM_TTL, min(original_ttl, DEFAULT_TTL))
-                )
+                original_ttl = long_unpack(dns_payload[name_end + 4:name_end + 8])[0]
 
-                send_data += record
-
-                # limits A record caching, so we aren't caching excessive amount of records with the same qname
-                if (len(record_cache) < MAX_A_RECORD_COUNT or record_type != DNS.A):
-                    record_cache.append(record)
+                send_data += dns_payload[offset:name_end + 4]
+                send_data += long_pack(_clamp_ttl(record_type, original_ttl))
+                send_data += dns_payload[name_end + 8:record_end]
 
             # dns system level, ns, mx, and txt records don't need to be clamped and will be relayed as is
             else:
-                send_data += record
+                send_data += dns_payload[offset:record_end]
+
+                # the soa of a negative response is only cached if it directly follows the question. any compression
+                # pointers within it can only reference the question, which is the same in the cached response.
+                if (record_type == DNS.SOA and offset == question_end and not resource_count):
+                    soa_record = _resource_record(dns_payload, offset, name_end, record_end)
+
+                    # rfc 2308. the negative ttl is the lesser of the soa ttl and the soa minimum field.
+                    negative_ttl = min(long_unpack(soa_record.ttl)[0], long_unpack(soa_record.data[-4:])[0])
+
+            # the full answer section is cached in order, so compression pointers within it stay valid in cached
+            # responses. the upstream ttl is kept to allow each record to be decremented individually.
+            if (answer_section):
+                record_cache.append(_resource_record(dns_payload, offset, name_end, record_end))
+
+            offset = record_end
 
     # keeping any additional records intact
     # TODO: see if modifying/ manipulating additional records would be beneficial or even useful in any way
     send_data += dns_payload[offset:]
 
-    if (record_cache):
-        return send_data, QNAME_RECORD(fast_time() + original_ttl, original_ttl, record_cache)
+    # the client is expected to retry over tcp
+    if (truncated):
+        return send_data, NO_QNAME_RECORD
 
-    return send_data, NO_QNAME_RECORD
+    if (record_cache and rcode == DNS.NO_ERROR):
+        # the record set expires with its shortest lived record
+        record_ttl: int = min([long_unpack(record.ttl)[0] for record in record_cache])
+        if (record_ttl):
+            return send_data, QNAME_RECORD(fast_time() + record_ttl, record_ttl, record_cache)
 
-def _parse_record(dns_payload: memoryview, cur_offset: int) -> tuple[int, RESOURCE_RECORD, int]:
-    new_offset: int = parse_query_name(dns_payload, cur_offset, quick=True)
-
-    record_name = bytes(dns_payload[cur_offset:new_offset])
-    record_values = bytes(dns_payload[new_offset:])
-    # resource record data len, usually 4 for ip address, but can vary.
-    # calculating first, so we can single shot creation of the byte container.
-    dt_len = btoia(record_values[8:10])
-
-    resource_record =  RESOURCE_RECORD(
-        record_name,
-        record_values[:2],
-        record_values[2:4],
-        record_values[4:8],
-        record_values[8:10 + dt_len]
-    )
+    # nxdomain or nodata. responses without an soa record are not cached.
+    elif (soa_record and rcode in [DNS.NO_ERROR, DNS.NXDOMAIN]):
+        return send_data, QNAME_RECORD(fast_time() + negative_ttl, negative_ttl, [soa_record], rcode, True)
+
+    # rfc 2308 7.1. server failures must not be cached for more than 5 minutes.
+    elif (rcode == DNS.SERVFAIL):
+        return send_data, QNAME_RECORD(fast_time() + FIVE_MIN, FIVE_MIN, [], rcode, True)
 
-    # name len + 8 bytes(type, class, ttl) + 2 bytes(length field) + data len
-    new_offset += 10 + dt_len
+    return send_data, NO_QNAME_RECORD
 
-    return btoia(resource_record.qtype), resource_record, new_offset
+def _resource_record(dns_payload: memoryview, offset: int, name_end: int, record_end: int) -> RESOURCE_RECORD:
+    # the record is copied once since it is kept in the cache after the response buffer is released.
+    record: bytes = bytes(dns_payload[offset:record_end])
+    name_len: int = name_end - offset
+
+    return RESOURCE_RECORD(
+        record[:name_len],
+        record[name_len:name_len + 2],
+        record[name_len + 2:name_len + 4],
+        record[name_len + 4:name_len + 8],
+        record[name_len + 8:]
+    )
 
 # ===============
 # PROXY RESPONSE
@@ -370,9 +412,9 @@ class ProxyResponse(RawResponse):
     @staticmethod
     def _prepare_packet(packet: ProxyPackets, dnx_src_ip: int) -> bytearray:
         # DNS HEADER + PAYLOAD
-        # AAAA record set r code to "domain name does not exist" without record response ac=0, rc=3
+        # non A/NS record types set r code to "domain name does not exist" without record response ac=0, rc=3
         udp_payload = bytearray()
-        if (packet.qtype == DNS.AAAA):
+        if (packet.qtype not in [DNS.A, DNS.NS]):
             udp_payload += dns_header_pack(packet.dns_id, 32899 | packet.rd | packet.ad | packet.cd, 1, 0, 0, 0)
             udp_payload += packet.question_record
 
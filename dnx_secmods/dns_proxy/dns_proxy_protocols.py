@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import asyncio
 import threading
 import ssl
 
@@ -9,7 +10,7 @@ from socket import socket, AF_INET, SOCK_DGRAM, SOCK_STREAM
 
 from dnx_gentools.def_typing import *
 from dnx_gentools.def_constants import *
-from dnx_gentools.def_enums import PROTO
+from dnx_gentools.def_enums import PROTO, DNS
 from dnx_gentools.def_namedtuples import RELAY_CONN, DNS_SEND
 from dnx_gentools.standard_tools import dnx_queue
 
@@ -19,15 +20,27 @@ from dnx_iptools.packet_classes import ProtoRelay
 from dns_proxy_packets import ClientQuery
 from dns_proxy_log import Log
 
+# ===============
+# TYPING IMPORTS
+# ===============
+if (TYPE_CHECKING):
+    from asyncio import AbstractEventLoop, Transport
+
+    from dnx_secmods.dns_proxy import DNSServer_T
+
 
 __all__ = (
-    'UDPRelay', 'TLSRelay',
+    'UDPRelay', 'TLSRelay', 'TLSConnection',
+    'AsyncUDPRelay', 'AsyncTLSRelay'
 )
 
 # dummy socket
 _sock = socket()
 NULL_SOCK = RELAY_CONN('', _sock, _sock.send, _sock.recv, '')
 
+# maximum responses read from the udp relay socket per event loop callback
+RECV_BATCH: int = 32
+
 
 class UDPRelay(ProtoRelay):
     _protocol: ClassVar[PROTO] = PROTO.UDP
@@ -36,6 +49,12 @@ class UDPRelay(ProtoRelay):
         '_relay_conn',
     )
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # the first send fails on the dummy socket, which opens the socket to the active server
+        self._relay_conn = NULL_SOCK
+
     @dnx_queue(Log, name='UDPRelay')
     def relay(self, request: DNS_SEND):
         attempt = self._send_query(request)
@@ -55,6 +74,8 @@ class UDPRelay(ProtoRelay):
 
             self._relay_conn = self._connect_udp(dns_server['ip_address'])
 
+            threading.Thread(target=self._recv_handler, args=(self._relay_conn,)).start()
+
             return True
 
         Log.critical(f'[{self._protocol}] No DNS servers available.')
@@ -62,8 +83,8 @@ class UDPRelay(ProtoRelay):
         return False
 
     # receive data from server. if dns response will call parse method else will close the socket.
-    def _recv_handler(self) -> None:
-        conn_recv = self._relay_conn.recv
+    def _recv_handler(self, relay_conn: RELAY_CONN) -> None:
+        conn_recv = relay_conn.recv
         responder_add = self._dns_server.responder.add
 
         for _ in RUN_FOREVER:
@@ -82,7 +103,8 @@ class UDPRelay(ProtoRelay):
             self._last_rcvd  = fast_time()
             self._send_count = 0
 
-        self._relay_conn.sock.close()
+        # the next send on the closed socket will open a new one
+        relay_conn.sock.close()
 
     def _connect_udp(self, server_ip: str) -> RELAY_CONN:
 
@@ -100,11 +122,47 @@ class UDPRelay(ProtoRelay):
 # ============================
 # TLS sender/receiver
 # ============================
+class TLSConnection:
+    '''pooled dns over tls connection.
+
+    outstanding maps the dns id of each query sent on the connection to the request, allowing the queries to be resent
+    if the connection is lost before a response is received. ids are removed when the response is received or the
+    pending query table expires the query.
+    '''
+    __slots__ = (
+        'remote_ip', 'sock', 'send', 'version',
+
+        'outstanding', 'last_active'
+    )
+
+    def __init__(self, remote_ip: str, sock: ssl.SSLSocket):
+
+        self.remote_ip: str = remote_ip
+        self.sock: ssl.SSLSocket = sock
+        self.send: Callable[[bytearray], None] = sock.sendall
+        self.version: str = sock.version()
+
+        self.outstanding: dict[int, DNS_SEND] = {}
+        self.last_active: int = fast_time()
+
+    def close(self) -> None:
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
 class TLSRelay(ProtoRelay):
+    '''dns over tls relay using a pool of persistent connections to the active resolver.
+
+    queries are pipelined without waiting for responses and sent on the connection with the fewest outstanding queries,
+    so a slow response only holds up the queries behind it on the same connection. responses are matched to their
+    query by dns id and any queries outstanding on a lost connection are resent on the remaining pool.
+    '''
     _protocol: ClassVar[PROTO] = PROTO.DNS_TLS
 
     __slots__ = (
-        '_tls_context', '_keepalive_status',
+        '_tls_context', '_pool', '_pool_lock', '_last_fill',
 
         '_relay_conn',
     )
@@ -114,13 +172,16 @@ class TLSRelay(ProtoRelay):
 
         self._relay_conn = NULL_SOCK
 
+        self._pool: list[TLSConnection] = []
+        self._pool_lock: Lock = threading.Lock()
+        self._last_fill: int = 0
+
         # create tls context
         self._tls_context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
         self._tls_context.verify_mode = ssl.CERT_REQUIRED
         self._tls_context.load_verify_locations(CERTIFICATE_STORE)
 
         # tls connection keepalive. hard set to 8 seconds, but can be enabled/disabled
-        self._keepalive_status: Event = threading.Event()
         threading.Thread(target=self._keepalive_run).start()
 
     @dnx_queue(Log, name='TLSRelay')
@@ -128,6 +189,12 @@ class TLSRelay(ProtoRelay):
         # if servers are down and a fallback is configured, it will be forwarded to that relay queue, otherwise
         # the request will be silently dropped.
         if (not self.fail_condition):
+
+            if (btoia(request.data[2:4]) == DNS.KEEPALIVE):
+                self._send_keepalive(request)
+
+                return
+
             attempt = self._send_query(request)
             if (attempt >= 0):
                 Log.informational(
@@ -141,27 +208,96 @@ class TLSRelay(ProtoRelay):
 
         # slicing out length field which is tcp only.
         elif (self._fallback_relay):
-            self._fallback_relay_add(DNS_SEND(request.qname[2:], request.data))
+            self._fallback_relay_add(DNS_SEND(request.qname, request.data[2:]))
 
     @property
     def fail_condition(self) -> bool:
         return self._dns_server.tls_down and self._dns_server.udp_fallback
 
-    # iterating over dns server list and calling to create a connection to the first available server.
-    # this will only happen if a socket connection isn't already established when attempting to send query.
+    def _send_query(self, request: DNS_SEND) -> int:
+        dns_id: int = btoia(request.data[2:4])
+
+        for attempt in ATTEMPTS:
+
+            # opening connections up to the pool size on first use or after connections were lost. a partially filled
+            # pool is topped up at most once per fill interval, so a failing server does not stall every send.
+            if (not self._pool or len(self._pool) < TLS_POOL_SIZE and fast_time() - self._last_fill >= FIVE_SEC):
+                self._register_new_socket()
+
+            with self._pool_lock:
+                if (not self._pool):
+                    break
+
+                conn: TLSConnection = min(self._pool, key=_outstanding_count)
+
+            # registering the query before sending so a fast response cannot arrive before it is tracked
+            conn.outstanding[dns_id] = request
+            try:
+                conn.send(request.data)
+            except OSError:
+                conn.outstanding.pop(dns_id, None)
+
+                # the receive handler will release the connection and resend anything else outstanding
+                conn.close()
+
+                continue
+
+            self._relay_conn = conn
+            self._send_count += 1
+
+            return attempt
+
+        # COMPLETE SEND FAIL
+        return -1
+
+    def release(self, dns_id: int) -> None:
+        '''stop tracking the query of the dns id on the pool connections.
+
+        called when the pending query table expires the query, so an unanswered query does not count against its
+        connection or get resent under an id that may be reused.
+        '''
+        with self._pool_lock:
+            for conn in self._pool:
+                conn.outstanding.pop(dns_id, None)
+
+    # keepalives are only sent on connections that have been idle for the keepalive interval
+    def _send_keepalive(self, request: DNS_SEND) -> None:
+        idle_time: int = fast_time() - self._dns_server.keepalive_interval
+
+        with self._pool_lock:
+            idle_conns: list[TLSConnection] = [conn for conn in self._pool if conn.last_active <= idle_time]
+
+        for conn in idle_conns:
+            try:
+                conn.send(request.data)
+            except OSError:
+                conn.close()
+
+    # iterating over dns server list and calling to create connections to the first available server.
+    # this will only happen if the pool is not full when attempting to send a query.
     def _register_new_socket(self) -> bool:
+        self._last_fill = fast_time()
+
         for tls_server in self._dns_server.public_resolvers:
 
             # skipping over known down server.
             if (not tls_server[PROTO.DNS_TLS]):
                 continue
 
-            # attempting to connect via tls.
-            # if successful will return True, otherwise mark server as down and try the next server.
-            self._relay_conn = self._connect_tls(tls_server['ip_address'])
-            if (self._relay_conn is not NULL_SOCK):
-                threading.Thread(target=self._recv_handler).start()
+            # attempting to connect via tls until the pool is full.
+            # if the first connection fails, mark the server as down and try the next server.
+            while (len(self._pool) < TLS_POOL_SIZE):
+
+                conn: Optional[TLSConnection] = self._connect_tls(tls_server['ip_address'])
+                if (not conn):
+                    break
+
+                with self._pool_lock:
+                    self._pool.append(conn)
 
+                threading.Thread(target=self._recv_handler, args=(conn,)).start()
+
+            if (self._pool):
                 return True
 
             self.mark_server_down(remote_server=tls_server['ip_address'])
@@ -173,29 +309,22 @@ class TLSRelay(ProtoRelay):
         return False
 
     # receive data from server and call parse method when a valid message is recvd, else will close the socket.
-    def _recv_handler(self) -> None:
-        Log.debug(f'[{self._relay_conn.remote_ip}/{self._protocol.name}] Response handler opened.')
+    def _recv_handler(self, conn: TLSConnection) -> None:
+        Log.debug(f'[{conn.remote_ip}/{self._protocol.name}] Response handler opened.')
 
-        conn_recv = self._relay_conn.recv
-        keepalive_reset = self._keepalive_status.set
+        conn_recv = conn.sock.recv_into
+        outstanding_pop = conn.outstanding.pop
 
         responder_add = self._dns_server.responder.add
 
-        recv_buf = bytearray(2048)
-        recv_buffer = memoryview(recv_buf)
+        recv_buffer = memoryview(bytearray(TLS_RECV_SIZE))
 
-        # allocating 4096 bytes of memory as bytearray, then building memory view.
-        # access to memory via the byte array will not be needed.
-        # 4096 gives space for 8 max length sized udp dns messages (not sure if dot mirrors).
-        processing_buffer = memoryview(bytearray(4096))
-        b_ct = 0
+        # responses are length prefixed (rfc 7858) and can be split over or share a tls record.
+        # complete responses are sliced from the front of the buffer and any partial response is kept.
+        processing_buffer = bytearray()
 
         for _ in RUN_FOREVER:
             try:
-                # recv_into | no need to specify the amount to return and mtu covers max len.
-                # not inplace adding byte count to protect against cases where a public resolver sends a single
-                # response over multiple packets and connection is closed in between (this is highly unlikely since
-                # most cases it would be via timeout, but I have seen worse).
                 nbytes: int = conn_recv(recv_buffer)
             except OSError:
                 break
@@ -205,58 +334,54 @@ class TLSRelay(ProtoRelay):
                 break
 
             # resetting fail detection
-            self._last_rcvd  = fast_time()
+            self._last_rcvd  = conn.last_active = fast_time()
             self._send_count = 0
 
-            # breaking keepalive timer from blocking, which will effectively reset the timer.
-            keepalive_reset()
-
-            # transferring data from single packet buffer to general processing buffer, memoryview()
-            processing_buffer[b_ct:b_ct + nbytes] = recv_buffer[:nbytes]
-
-            # incrementing the amount of filled bytes in processing buffer accounting for 2 byte len field
-            b_ct += nbytes
+            processing_buffer += recv_buffer[:nbytes]
 
             # =========================
             # PROCESSING BUFFER LOGIC
             # =========================
-            # loop is needed to cover cases where dns responses are split over multiple packets or multiple responses
-            # are contained within a single packet.
-            for _ in RUN_FOREVER:
+            b_ct: int = len(processing_buffer)
+            offset: int = 0
+            while (b_ct - offset >= 2):
 
-                data_len, data = btoia(processing_buffer[:2]), processing_buffer[2:]
+                response_end: int = offset + 2 + btoia(processing_buffer[offset:offset + 2])
+                if (response_end > b_ct):
+                    break
 
-                request_len = data_len + 2  # adding 2 byte len field
+                response: bytes = bytes(processing_buffer[offset + 2:response_end])
 
-                # normal case - exactly 1 complete dns response in buffer
-                if (b_ct == request_len):
+                outstanding_pop(btoia(response[:2]), None)
+                responder_add(response)
 
-                    # using memoryview(), so need to copy response data, otherwise it will corrupt the original data
-                    # which is running concurrent to the receiving processor.
-                    responder_add(bytes(data[:data_len]))
+                offset = response_end
 
-                    b_ct = 0
+            del processing_buffer[:offset]
 
-                    break
+        # cleanup after the main loop exits
+        conn.close()
 
-                # if expected data length is greater than local buffer, multiple records were returned in a batch so
-                # appending leftover bytes after removing the current records' data from buffer.
-                elif (b_ct > request_len):
-                    extra_bytes = processing_buffer[request_len:b_ct]
+        with self._pool_lock:
+            self._pool.remove(conn)
 
-                    b_ct -= request_len
+        # queries that were pipelined on this connection and are still waiting on a response are resent on the
+        # remaining pool
+        query_pending = self._dns_server.query_pending
 
-                    processing_buffer[:b_ct] = extra_bytes
+        resend: list[DNS_SEND] = [
+            request for dns_id, request in list(conn.outstanding.items()) if query_pending(dns_id)
+        ]
+        if (resend):
+            Log.notice(f'[{conn.remote_ip}/{self._protocol.name}] Resending {len(resend)} queries.')
 
-                # more data is needed for a complete response. NOTE: this scenario is kind of dumb
-                # and shouldn't happen unless the server sends length of record and record separately.
-                # elif (b_ct < data_len): break
-                else: break
+            relay_add = self.relay.add
+            for request in resend:
+                relay_add(request)
 
-        # cleanup after the main loop exits
-        self._relay_conn.sock.close()
+        Log.debug(f'[{conn.remote_ip}/{self._protocol.name}] Response handler closed.')
 
-    def _connect_tls(self, tls_server: str) -> RELAY_CONN:
+    def _connect_tls(self, tls_server: str) -> Optional[TLSConnection]:
 
         Log.informational(f'[{tls_server}/{self._protocol.name}] Opening secure socket.')
 
@@ -272,17 +397,21 @@ class TLSRelay(ProtoRelay):
         else:
             dot_sock.settimeout(RELAY_TIMEOUT)
 
-            return RELAY_CONN(
-                tls_server, dot_sock, dot_sock.send, dot_sock.recv_into, dot_sock.version()
-            )
+            return TLSConnection(tls_server, dot_sock)
+
+        return None
 
-        return NULL_SOCK
+    def mark_server_down(self, *, remote_server: str = None):
+        super().mark_server_down(remote_server=remote_server)
+
+        # the receive handlers will release the connections and resend outstanding queries to the next server
+        with self._pool_lock:
+            for conn in self._pool:
+                conn.close()
 
     # settings will take effect on the next iteration
     def _keepalive_run(self):
         keepalive_interval = self._dns_server.keepalive_interval
-        keepalive_timer = self._keepalive_status.wait
-        keepalive_continue = self._keepalive_status.clear
 
         relay_add = self.relay.add
 
@@ -297,14 +426,458 @@ class TLSRelay(ProtoRelay):
 
                 continue
 
-            # returns True if reset which means we do not need to send a keep alive. If timeout is reached will return
-            # False notifying that a keepalive should be sent
-            if keepalive_timer(keepalive_interval):
-                keepalive_continue()
+            # the relay will only send the keepalive on idle connections.
+            fast_sleep(keepalive_interval)
 
-            else:
-                relay_add(
-                    DNS_SEND(KEEP_ALIVE_DOMAIN, keepalive_data)
-                )
+            relay_add(
+                DNS_SEND(KEEP_ALIVE_DOMAIN, keepalive_data)
+            )
+
+            Log.debug(f'[keepalive][{keepalive_interval}] Added to relay queue')
+
+
+def _outstanding_count(conn: TLSConnection) -> int:
+    return len(conn.outstanding)
+
+
+# ============================
+# EVENT LOOP RELAYS
+# ============================
+class AsyncRelay:
+    '''parent class for the udp and tls relays of the event loop dns server.
+
+    relay() is called on the loop and writes the query to the resolver transport without a queue or thread handoff.
+    queries relayed while no transport is available are held until the connection attempt completes. responses are
+    passed to the server response handler on the loop as they are received.
+    '''
+    _protocol: ClassVar[PROTO] = PROTO.NOT_SET
+
+    __slots__ = (
+        '_dns_server', '_loop', '_responder',
+
+        '_waiting', '_connecting', '_remote_ip',
+        '_send_count', '_last_rcvd'
+    )
+
+    def __init__(self, dns_server: DNSServer_T, loop: AbstractEventLoop, responder: Callable[[bytes], None]):
+
+        self._dns_server: DNSServer_T = dns_server
+        self._loop: AbstractEventLoop = loop
+        self._responder: Callable[[bytes], None] = responder
+
+        self._waiting: list[DNS_SEND] = []
+        self._connecting: bool = False
+        self._remote_ip: str = ''
+
+        self._send_count: int = 0
+        self._last_rcvd:  int = 0
+
+    def start(self) -> None:
+        '''schedule the fail detection on the loop.
+
+        May be expanded.
+        '''
+        self._loop.call_later(FIVE_SEC, self._fail_detection)
+
+    def relay(self, request: DNS_SEND) -> None:
+        if (self._send(request)):
+            return
+
+        self._waiting.append(request)
+        if (not self._connecting):
+            self._connecting = True
+
+            self._loop.create_task(self._connect_waiting())
+
+    @property
+    def is_enabled(self) -> bool:
+        return self._dns_server.protocol is self._protocol
+
+    async def _connect_waiting(self) -> None:
+        try:
+            await self._connect()
+        finally:
+            self._connecting = False
+
+        waiting, self._waiting = self._waiting, []
+
+        # queries that still could not be sent are left to expire in the pending query table, which will resend them
+        # or respond with a server failure.
+        for request in waiting:
+            self._send(request)
+
+    def _received(self, data: bytes) -> None:
+        # resetting fail detection
+        self._last_rcvd  = fast_time()
+        self._send_count = 0
+
+        self._responder(data)
+
+    def _fail_detection(self) -> None:
+        if (fast_time() - self._last_rcvd >= FIVE_SEC and self._send_count >= HEARTBEAT_FAIL_LIMIT):
+            self.mark_server_down(remote_server=self._remote_ip)
+
+        self._loop.call_later(FIVE_SEC, self._fail_detection)
+
+    # the reachability checks of the server configuration will mark the server as up again.
+    def mark_server_down(self, *, remote_server: str) -> None:
+        primary = self._dns_server.public_resolvers.primary
+
+        server = primary if primary['ip_address'] == remote_server else self._dns_server.public_resolvers.secondary
+        server[self._protocol] = False
+
+        self._send_count = 0
+
+        self._close()
+
+    def _send(self, request: DNS_SEND) -> bool:
+        '''write the query to the resolver transport. return False if no transport is available.
+
+        Must be overridden.
+        '''
+        raise NotImplementedError('_send must be implemented in the subclass.')
+
+    async def _connect(self) -> None:
+        '''open the resolver transport to the first available server.
+
+        Must be overridden.
+        '''
+        raise NotImplementedError('_connect must be implemented in the subclass.')
+
+    def _close(self) -> None:
+        '''close the resolver transports.
+
+        Must be overridden.
+        '''
+        raise NotImplementedError('_close must be implemented in the subclass.')
+
+
+class AsyncUDPRelay(AsyncRelay):
+    '''event loop udp relay.
+
+    the connected udp socket is added to the loop with a reader callback. responses queued on the socket are read in
+    batches of up to RECV_BATCH per callback, the same as the interface listeners of the server.
+    '''
+    _protocol: ClassVar[PROTO] = PROTO.UDP
+
+    __slots__ = (
+        '_sock',
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self._sock: Optional[Socket] = None
+
+    def _send(self, request: DNS_SEND) -> bool:
+        if (self._sock is None):
+            return False
+
+        # a full send buffer or icmp error is left to the pending query table and fail detection
+        try:
+            self._sock.send(request.data)
+        except OSError:
+            pass
+
+        self._send_count += 1
+
+        Log.informational(f'[{self._remote_ip}/UDP][0] Sent {request.qname}')
+
+        return True
+
+    async def _connect(self) -> None:
+        for dns_server in self._dns_server.public_resolvers:
+
+            # skip downed servers
+            if (not dns_server[PROTO.UDP]):
+                continue
+
+            server_ip: str = dns_server['ip_address']
+
+            Log.informational(f'[{server_ip}/UDP] Opening socket.')
+
+            dns_sock: Socket = socket(AF_INET, SOCK_DGRAM)
+            dns_sock.setblocking(False)
+
+            # udp connect allows 'send' method to be used, but does not actually have an underlying connection
+            try:
+                dns_sock.connect((server_ip, PROTO.DNS))
+            except OSError:
+                dns_sock.close()
+
+                continue
+
+            self._loop.add_reader(dns_sock.fileno(), self._read_ready, dns_sock)
+
+            self._sock = dns_sock
+            self._remote_ip = server_ip
+
+            return
+
+        Log.critical(f'[{self._protocol}] No DNS servers available.')
+
+    def _close(self) -> None:
+        if (self._sock is not None):
+            self._loop.remove_reader(self._sock.fileno())
+            self._sock.close()
+
+            self._sock = None
+
+    def _read_ready(self, dns_sock: Socket) -> None:
+        recv = dns_sock.recv
+
+        for _ in range(RECV_BATCH):
+            try:
+                data_from_server: bytes = recv(2048)
+            except BlockingIOError:
+                return
+
+            # icmp errors are reported here on connected udp sockets. the fail detection will handle an unreachable
+            # server.
+            except OSError:
+                continue
+
+            # passing over empty udp payloads.
+            if (data_from_server):
+                self._received(data_from_server)
+
+
+class _TLSStream(asyncio.Protocol):
+    '''pooled dns over tls connection of the event loop tls relay.
+
+    outstanding maps the dns id of each query sent on the connection to the request, allowing the queries to be resent
+    if the connection is lost before a response is received. ids are removed when the response is received or the
+    pending query table expires the query.
+    '''
+    __slots__ = (
+        'remote_ip', 'transport', 'version',
+
+        'outstanding', 'last_active',
+        '_relay', '_buffer', '_send_buffer'
+    )
+
+    def __init__(self, relay: AsyncTLSRelay, remote_ip: str):
+
+        self.remote_ip: str = remote_ip
+        self.transport: Optional[Transport] = None
+        self.version: str = 'TLS'
+
+        self.outstanding: dict[int, DNS_SEND] = {}
+        self.last_active: int = fast_time()
+
+        self._relay: AsyncTLSRelay = relay
+        self._buffer: bytearray = bytearray()
+        self._send_buffer: bytearray = bytearray()
+
+    def send(self, data: bytearray) -> None:
+        '''queue the data to be written with any other data sent during the current loop iteration.
+
+        each write to the tls transport is encrypted and sent separately, so queries relayed together are coalesced into
+        a single write.
+        '''
+        if (not self._send_buffer):
+            self._relay._loop.call_soon(self._flush)
+
+        self._send_buffer += data
+
+    def _flush(self) -> None:
+        if (not self.transport.is_closing()):
+            self.transport.write(self._send_buffer)
+
+        self._send_buffer = bytearray()
+
+    def connection_made(self, transport: Transport) -> None:
+        self.transport = transport
+        self.version = transport.get_extra_info('ssl_object').version()
+
+        self._relay._add_connection(self)
+
+    def data_received(self, data: bytes) -> None:
+        self.last_active = fast_time()
+
+        processing_buffer = self._buffer
+        processing_buffer += data
+
+        # responses are length prefixed (rfc 7858) and can be split over or share a tls record.
+        # complete responses are sliced from the front of the buffer and any partial response is kept.
+        b_ct: int = len(processing_buffer)
+        offset: int = 0
+        while (b_ct - offset >= 2):
+
+            response_end: int = offset + 2 + btoia(processing_buffer[offset:offset + 2])
+            if (response_end > b_ct):
+                break
+
+            response: bytes = bytes(processing_buffer[offset + 2:response_end])
+
+            self.outstanding.pop(btoia(response[:2]), None)
+            self._relay._received(response)
+
+            offset = response_end
+
+        del processing_buffer[:offset]
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self._relay._remove_connection(self)
+
+
+class AsyncTLSRelay(AsyncRelay):
+    '''event loop dns over tls relay using a pool of persistent connections to the active resolver.
+
+    queries are pipelined on the connection with the fewest outstanding queries, the same as TLSRelay, and any queries
+    outstanding on a lost connection are resent on the remaining pool.
+    '''
+    _protocol: ClassVar[PROTO] = PROTO.DNS_TLS
+
+    __slots__ = (
+        '_tls_context', '_pool', '_last_fill',
+        '_fallback_relay', '_keepalive_data'
+    )
+
+    def __init__(self, *args, fallback_relay: Optional[AsyncRelay] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self._pool: list[_TLSStream] = []
+        self._last_fill: int = 0
+
+        self._fallback_relay: Optional[AsyncRelay] = fallback_relay
+
+        # create tls context
+        self._tls_context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        self._tls_context.verify_mode = ssl.CERT_REQUIRED
+        self._tls_context.load_verify_locations(CERTIFICATE_STORE)
+
+        # keepalive data only needs to be created once since it never changes.
+        self._keepalive_data: bytearray = ClientQuery.init_local_query(KEEP_ALIVE_DOMAIN, keepalive=True)
+
+    def start(self) -> None:
+        super().start()
+
+        self._loop.call_later(self._dns_server.keepalive_interval or TEN_SEC, self._keepalive)
+
+    def relay(self, request: DNS_SEND) -> None:
+        # if servers are down and a fallback is configured, it will be forwarded to that relay, otherwise the request
+        # will be silently dropped.
+        if (not self.fail_condition):
+            super().relay(request)
+
+        # slicing out length field which is tcp only.
+        elif (self._fallback_relay):
+            self._fallback_relay.relay(DNS_SEND(request.qname, request.data[2:]))
+
+    @property
+    def fail_condition(self) -> bool:
+        return self._dns_server.tls_down and self._dns_server.udp_fallback
+
+    def _send(self, request: DNS_SEND) -> bool:
+        if (not self._pool):
+            return False
+
+        # a partially filled pool is topped up at most once per fill interval, so a failing server does not stall
+        # every send.
+        if (len(self._pool) < TLS_POOL_SIZE and not self._connecting and fast_time() - self._last_fill >= FIVE_SEC):
+            self._connecting = True
+
+            self._loop.create_task(self._connect_waiting())
+
+        conn: _TLSStream = min(self._pool, key=_outstanding_count)
+
+        conn.outstanding[btoia(request.data[2:4])] = request
+        conn.send(request.data)
+
+        self._send_count += 1
+
+        Log.informational(f'[{conn.remote_ip}/{conn.version}][0] Sent {request.qname}')
+
+        return True
+
+    def release(self, dns_id: int) -> None:
+        '''stop tracking the query of the dns id on the pool connections.
+
+        called when the pending query table expires the query, so an unanswered query does not count against its
+        connection or get resent under an id that may be reused.
+        '''
+        for conn in self._pool:
+            conn.outstanding.pop(dns_id, None)
+
+    # iterating over dns server list and creating connections to the first available server until the pool is full.
+    async def _connect(self) -> None:
+        self._last_fill = fast_time()
+
+        for tls_server in self._dns_server.public_resolvers:
+
+            # skipping over known down server.
+            if (not tls_server[PROTO.DNS_TLS]):
+                continue
+
+            server_ip: str = tls_server['ip_address']
+
+            # if the first connection fails, mark the server as down and try the next server.
+            while (len(self._pool) < TLS_POOL_SIZE):
+
+                Log.informational(f'[{server_ip}/{self._protocol.name}] Opening secure socket.')
+
+                try:
+                    await asyncio.wait_for(self._loop.create_connection(
+                        lambda: _TLSStream(self, server_ip), server_ip, PROTO.DNS_TLS,
+                        ssl=self._tls_context, server_hostname=server_ip
+                    ), CONNECT_TIMEOUT)
+                except (OSError, asyncio.TimeoutError):
+                    Log.error(f'[{server_ip}/{self._protocol.name}] Failed to connect to {server_ip}.')
+
+                    break
+
+            if (self._pool):
+                self._remote_ip = server_ip
+
+                return
+
+            self.mark_server_down(remote_server=server_ip)
+
+        # failed to connect to both configured servers
+        self._dns_server.tls_down = True
+        Log.error(f'[{self._protocol}] No DNS servers available.')
+
+    # the lost connections will resend their outstanding queries to the next server
+    def _close(self) -> None:
+        pool, self._pool = self._pool, []
+
+        for conn in pool:
+            conn.transport.close()
+
+    def _add_connection(self, conn: _TLSStream) -> None:
+        self._pool.append(conn)
+
+        Log.debug(f'[{conn.remote_ip}/{self._protocol.name}] Connection opened.')
+
+    def _remove_connection(self, conn: _TLSStream) -> None:
+        if (conn in self._pool):
+            self._pool.remove(conn)
+
+        # queries that were pipelined on this connection and are still waiting on a response are resent on the
+        # remaining pool
+        query_pending = self._dns_server.query_pending
+
+        resend: list[DNS_SEND] = [request for dns_id, request in conn.outstanding.items() if query_pending(dns_id)]
+        if (resend):
+            Log.notice(f'[{conn.remote_ip}/{self._protocol.name}] Resending {len(resend)} queries.')
+
+            for request in resend:
+                self.relay(request)
+
+        Log.debug(f'[{conn.remote_ip}/{self._protocol.name}] Connection closed.')
+
+    # keepalives are only sent on connections that have been idle for the keepalive interval.
+    # settings will take effect on the next iteration.
+    def _keepalive(self) -> None:
+        keepalive_interval: int = self._dns_server.keepalive_interval
+
+        if (self.is_enabled and keepalive_interval):
+            idle_time: int = fast_time() - keepalive_interval
+
+            for conn in [conn for conn in self._pool if conn.last_active <= idle_time]:
+                conn.send(self._keepalive_data)
+
+            Log.debug(f'[keepalive][{keepalive_interval}] Sent on idle connections')
 
-                Log.debug(f'[keepalive][{keepalive_interval}] Added to relay queue and cleared')
+        self._loop.call_later(keepalive_interval or TEN_SEC, self._keepalive)
@@ -3,24 +3,26 @@
 from __future__ import annotations
 
 import socket
+import asyncio
 import threading
 
-from random import randint
+from functools import partial
 
 from dnx_gentools.def_typing import *
 from dnx_gentools.def_constants import *
-from dnx_gentools.def_namedtuples import DNS_SEND
+from dnx_gentools.def_namedtuples import DNS_SEND, L_SOCK
 from dnx_gentools.def_enums import PROTO, DNS
 from dnx_gentools.standard_tools import dnx_queue
 
-from dnx_iptools.cprotocol_tools import itoip
+from dnx_iptools.cprotocol_tools import itoip, parse_dns_question
 from dnx_iptools.protocol_tools import btoia
 from dnx_iptools.packet_classes import Listener
+from dnx_iptools.interface_ops import wait_for_interface, wait_for_ip
 
 from dns_proxy_automate import ServerConfiguration
-from dns_proxy_protocols import UDPRelay, TLSRelay
+from dns_proxy_protocols import UDPRelay, TLSRelay, AsyncUDPRelay, AsyncTLSRelay
 from dns_proxy_packets import ClientQuery, ttl_rewrite
-from dns_proxy_cache import dns_cache, request_tracker, QNAME_NOT_FOUND
+from dns_proxy_cache import dns_cache, request_tracker, pending_queries, NO_QNAME_RECORD, QNAME_NOT_FOUND
 from dns_proxy_log import Log
 
 # ===============
@@ -28,9 +30,12 @@ from dns_proxy_log import Log
 # ===============
 from dnx_gentools.def_namedtuples import QNAME_RECORD_UPDATE
 
+if (TYPE_CHECKING):
+    from dnx_routines.logging import LogHandler_T
+
 
 __all__ = (
-    'DNSServer',
+    'DNSServer', 'AsyncDNSServer'
 )
 
 # =======================
@@ -53,17 +58,26 @@ DNS_CACHE = dns_cache(
 DNS_CACHE_ADD = DNS_CACHE.add
 DNS_CACHE_SEARCH = DNS_CACHE.search
 
-# GENERAL DEFINITIONS
-INVALID_RESPONSE: tuple[None, None] = (None, None)
+# ======================
+# PENDING QUERY TABLE
+# ======================
+# queries relayed to the public resolvers, indexed by the relayed dns id.
+# .start_pollers() call is required for queries to expire.
+PENDING_QUERIES = pending_queries(timeout=QUERY_TIMEOUT)
 
+PENDING_INSERT = PENDING_QUERIES.insert
+PENDING_GET = PENDING_QUERIES.get
+PENDING_POP = PENDING_QUERIES.pop
+
+# maximum client queries read from a listener socket per event loop callback
+LISTENER_BATCH: int = 32
+
+# GENERAL DEFINITIONS
 RELAY_MAP: dict[PROTO, Callable[[DNS_SEND], None]] = {
     PROTO.UDP: UDPRelay.relay.add,
     PROTO.DNS_TLS: TLSRelay.relay.add
 }
 
-# acquired prior to randomly selected dns id
-dns_id_lock: Lock = threading.Lock()
-
 # ======================
 # MAIN DNS SERVER CLASS
 # ======================
@@ -72,13 +86,10 @@ dns_id_lock: Lock = threading.Lock()
 # ======================
 class DNSServer(ServerConfiguration, Listener):
 
-    _request_map: ClassVar[dict[int], tuple[bool, ClientQuery]] = {}
-    _id_lock: ClassVar[Lock] = threading.Lock()
-
     _listener_parser: ClassVar[ClientQuery] = ClientQuery
 
     __slots__ = (
-        '_request_map_pop', '_dns_records_get'
+        '_dns_records_get', '_relay_map', '_relay_releases'
     )
 
     def __init__(self):
@@ -86,25 +97,40 @@ class DNSServer(ServerConfiguration, Listener):
         super().__init__()
 
         # assigning object methods to prevent lookup
-        self._request_map_pop: Callable[[int, ...], ClientQuery] = self._request_map.pop
         self._dns_records_get: Callable[[str], int] = self.dns_records.get
 
+        self._relay_map: dict[PROTO, Callable[[DNS_SEND], None]] = RELAY_MAP
+
+        # relays tracking the queries sent on each connection are told when the id of a query is released
+        self._relay_releases: list[Callable[[int], None]] = []
+
     def handle_query(self, client_query: ClientQuery) -> None:
 
+        # returns new unique id after storing the query in the pending query table
+        dns_id: int = PENDING_INSERT(client_query)
+
+        # every id is in use by a query waiting on a response
+        if (not dns_id):
+            if (not client_query.top_domain):
+                send_to_client(client_query, client_query.generate_servfail_response())
+
+            return
+
         # generating dns query packet data
-        send_data = client_query.generate_dns_query(
-            # returns new unique id after storing {id: request info} in request map
-            get_unique_id(self._request_map, client_query), self.protocol
-        )
+        send_data = client_query.generate_dns_query(dns_id, self.protocol)
 
         # queue send_data to currently enabled protocol/relay for sending to external resolver.
         # request is sent for logging purposes and may be temporary.
-        RELAY_MAP[self.protocol](
+        self._relay_map[self.protocol](
             DNS_SEND(client_query.qname, send_data)
         )
 
     @dnx_queue(Log, name='DNSServer')
     def responder(self, received_data: bytes) -> None:
+        self._handle_response(received_data)
+
+    @staticmethod
+    def _handle_response(received_data: bytes) -> None:
         # dns id is the first 2 bytes in the dns header
         dns_id: int = btoia(received_data[:2])
 
@@ -112,10 +138,27 @@ class DNSServer(ServerConfiguration, Listener):
         if (dns_id == DNS.KEEPALIVE):
             return
 
-        client_query: ClientQuery = self._request_map_pop(dns_id, INVALID_RESPONSE)
+        client_query: Optional[ClientQuery] = PENDING_GET(dns_id)
         if (not client_query):
             return
 
+        # a late response to a query sent under a since reused id must not answer or be cached for the current query.
+        try:
+            _, qname, _, qtype, _, _ = parse_dns_question(memoryview(received_data)[12:])
+        except Exception as E:
+            Log.error(f'[parser/server response] {E}')
+
+            return
+
+        if (qtype != client_query.qtype or qname.lower() != client_query.qname.lower()):
+            Log.debug(f'[{dns_id}] Response question does not match {client_query.qname}. Dropped.')
+
+            return
+
+        # the query may have expired since it was looked up
+        if (PENDING_POP(dns_id) is not client_query):
+            return
+
         try:
             query_response, cache_data = ttl_rewrite(received_data, client_query.dns_id)
         except Exception as E:
@@ -124,8 +167,31 @@ class DNSServer(ServerConfiguration, Listener):
             if (not client_query.top_domain):
                 send_to_client(client_query, query_response)
 
-            if (cache_data.records):
-                DNS_CACHE_ADD(client_query.qname, cache_data)
+            if (cache_data is not NO_QNAME_RECORD):
+                DNS_CACHE_ADD((client_query.qname, client_query.qtype), cache_data)
+
+    @staticmethod
+    def query_pending(dns_id: int) -> bool:
+        '''return True if a query is waiting on a response for the dns id.
+        '''
+        return PENDING_GET(dns_id) is not None
+
+    # queries are resent once with a new id before the client is sent a server failure
+    def _query_expired(self, dns_id: int, client_query: ClientQuery) -> None:
+
+        # the expired id can be reused, so the query is no longer tracked or resent by the relay connections
+        for relay_release in self._relay_releases:
+            relay_release(dns_id)
+
+        if (client_query.retries < QUERY_RETRIES):
+            client_query.retries += 1
+
+            self.handle_query(client_query)
+
+        elif (not client_query.top_domain):
+            send_to_client(client_query, client_query.generate_servfail_response())
+
+            Log.informational(f'[{client_query.qname}] No response from public resolvers. Sent SERVFAIL.')
 
     def _setup(self) -> None:
 
@@ -145,11 +211,18 @@ class DNSServer(ServerConfiguration, Listener):
         # ==========================
         DNS_CACHE.start_pollers()
 
+        # ==========================
+        # PENDING QUERY EXPIRATION
+        # ==========================
+        PENDING_QUERIES.start_pollers(self._query_expired)
+
         # ==========================
         # PROTOCOL RELAY QUEUES
         # ==========================
         UDPRelay.run(self.__class__)
-        TLSRelay.run(self.__class__, fallback_relay=UDPRelay.relay)
+        tls_relay: TLSRelay = TLSRelay.run(self.__class__, fallback_relay=UDPRelay.relay)
+
+        self._relay_releases.append(tls_relay.release)
 
     # thread to handle all received requests from the listener.
     def _request_queue(self) -> NoReturn:
@@ -160,24 +233,27 @@ class DNSServer(ServerConfiguration, Listener):
             # generator that blocks until at least 1 request is in the queue.
             # if multiple requests are present, they will be yielded back until the queue is empty.
             for client_query in return_ready():
+                self._handle_request(client_query)
 
-                qname_cache = cache_available(client_query)
-                if (qname_cache is QNAME_NOT_FOUND):
-                    self.handle_query(client_query)
+    def _handle_request(self, client_query: ClientQuery) -> None:
 
-                else:
-                    send_to_client(client_query, client_query.generate_cached_response(qname_cache))
+        qname_cache = cache_available(client_query)
+        if (qname_cache is QNAME_NOT_FOUND):
+            self.handle_query(client_query)
+
+        else:
+            send_to_client(client_query, client_query.generate_cached_response(qname_cache))
 
-    # NOTE: A/NS records are supported only. consider expanding
     def _pre_inspect(self, client_query: ClientQuery) -> bool:
-        if (client_query.qr != DNS.QUERY or client_query.qtype not in [DNS.A, DNS.NS]):
+        if (client_query.qr != DNS.QUERY):
             return False
 
         record_ip: int = self._dns_records_get(client_query.qname)
 
         # generating server response and sending to client.
+        # local records are A records only, so other record types get a response without an answer (nodata).
         if (record_ip):
-            query_response = client_query.generate_record_response(record_ip)
+            query_response = client_query.generate_record_response(record_ip if client_query.qtype == DNS.A else 0)
             send_to_client(client_query, query_response)
 
             return False
@@ -199,37 +275,167 @@ class DNSServer(ServerConfiguration, Listener):
         return l_sock
 
 
-# ==================
-# GENERAL FUNCTIONS
-# ==================
-def get_unique_id(request_map: dict, client_query: ClientQuery) -> int:
-    '''DNS ID generation.
+# ============================
+# EVENT LOOP DNS SERVER CLASS
+# ============================
+class AsyncDNSServer(DNSServer):
+    '''event loop implementation of the dns server.
+
+    the listen > inspect > cache > relay > respond pipeline runs as callbacks on a single asyncio loop. queries are
+    handled from the reader callbacks of the interface sockets and resolver responses from the callbacks of the relay
+    transports, so a query is answered without passing through a thread queue.
 
-    this value is guaranteed unique for the life of the request.
+    local records, caching, the pending query table, and relay failover behave the same as DNSServer. queries are
+    filtered by the dns proxy before reaching the server, so filtering is unchanged.
     '''
-    with dns_id_lock:
+    __slots__ = (
+        '_loop',
+    )
+
+    @classmethod
+    def run(cls, log: LogHandler_T, **kwargs) -> None:
+        '''start the server and run the event loop forever.
+
+        the listener keyword arguments are accepted for compatibility. interfaces are always on.
+        '''
+        cls._log = log
+
+        log.informational(f'{cls.__name__} initialization started.')
+
+        self = cls()
+
+        asyncio.run(self._serve())
+
+    async def _serve(self) -> NoReturn:
+        self._loop = asyncio.get_running_loop()
+
+        self._setup()
+
+        Log.notice(f'{self.__class__.__name__} initialization complete.')
+
+        for intf in self._intfs:
+            self._loop.create_task(self._register(intf))
+
+        await self._loop.create_future()
+
+    def _setup(self) -> None:
+
+        # blocking until the server settings are loaded. nothing else is running on the loop yet.
+        self.configure()
+
+        udp_relay = AsyncUDPRelay(self.__class__, self._loop, self._handle_response)
+        tls_relay = AsyncTLSRelay(self.__class__, self._loop, self._handle_response, fallback_relay=udp_relay)
+
+        self._relay_map = {
+            PROTO.UDP: udp_relay.relay,
+            PROTO.DNS_TLS: tls_relay.relay
+        }
+
+        self._relay_releases.append(tls_relay.release)
+
+        udp_relay.start()
+        tls_relay.start()
+
+        # ==========================
+        # CACHE REFRESH QUEUE
+        # ==========================
+        # the cache requests refreshes through the request tracker. they are handed back to the loop.
+        threading.Thread(target=self._request_queue).start()
+
+        # ==========================
+        # TOP DOMAINS / CACHE CLEAR
+        # ==========================
+        DNS_CACHE.start_pollers()
+
+        # ==========================
+        # PENDING QUERY EXPIRATION
+        # ==========================
+        PENDING_QUERIES.start_pollers(partial(self._loop.call_soon_threadsafe, self._query_expired))
+
+    def _request_queue(self) -> NoReturn:
+        return_ready = REQ_TRACKER.return_ready
+        call_soon = self._loop.call_soon_threadsafe
+
         for _ in RUN_FOREVER:
+            for client_query in return_ready():
+                call_soon(self._handle_request, client_query)
+
+    async def _register(self, intf: tuple[int, int, str]) -> None:
+        '''add the listener socket of the interface to the loop once the interface is up with an ip address.
+        '''
+        intf_index, zone, _intf = intf
+
+        Log.debug(f'[{_intf}] {self.__class__.__name__} started interface registration.')
+
+        intf_ip: int = await self._loop.run_in_executor(None, _wait_for_interface_ip, _intf)
+
+        l_sock: Socket = self._listener_sock(_intf, intf_ip)
+
+        listener = _ClientListener(self, L_SOCK(_intf, intf_ip, l_sock, l_sock.send, l_sock.sendto, None))
+
+        self._loop.add_reader(l_sock.fileno(), listener.read_ready)
+
+        Log.informational(f'[{l_sock.fileno()}][{intf}] {self.__class__.__name__} interface registered.')
+
+
+class _ClientListener:
+    '''reader callback of an interface listener socket.
+
+    queued datagrams are read in batches of up to LISTENER_BATCH per callback, so the queries relayed together can share
+    writes to the resolver.
+    '''
+    __slots__ = (
+        '_sock_info', '_recvfrom', '_pre_inspect', '_handle_request'
+    )
+
+    def __init__(self, dns_server: AsyncDNSServer, sock_info: L_SOCK):
+
+        self._sock_info: L_SOCK = sock_info
+        self._recvfrom: Callable[[int], tuple[bytes, Address]] = sock_info.socket.recvfrom
+
+        self._pre_inspect: Callable[[ClientQuery], bool] = dns_server._pre_inspect
+        self._handle_request: Callable[[ClientQuery], None] = dns_server._handle_request
+
+    def read_ready(self) -> None:
+        for _ in range(LISTENER_BATCH):
+            try:
+                data, address = self._recvfrom(2048)
+            except OSError:
+                return
 
-            dns_id = randint(70, 32000)
-            if (dns_id not in request_map):
+            client_query = ClientQuery(address, self._sock_info)
+            try:
+                client_query.parse(memoryview(data))
+            except Exception as E:
+                Log.debug(f'[{address[0]}] Query parse failure. {E}')
 
-                request_map[dns_id] = client_query
+                continue
 
-                return dns_id
+            if self._pre_inspect(client_query):
+                self._handle_request(client_query)
 
+
+# ==================
+# GENERAL FUNCTIONS
+# ==================
 def cache_available(client_query: ClientQuery) -> QNAME_RECORD_UPDATE:
     '''searches cache for query name.
 
     if a cached record is found, a response will be generated and sent back to the client.
     '''
-    # only A/CNAME records are cached and CNAME records are always attached to an A record query responses.
-    if (client_query.qtype != DNS.A or client_query.top_domain):
+    # top domain queries are sent to refresh the cached records.
+    if (client_query.top_domain):
         return QNAME_NOT_FOUND
 
-    return DNS_CACHE_SEARCH(client_query.qname)
+    return DNS_CACHE_SEARCH(client_query.qname, client_query.qtype)
 
 def send_to_client(client_query: ClientQuery, query_response: bytearray) -> None:
     try:
         client_query.sendto(query_response, (itoip(client_query.client_ip), client_query.client_port))
     except OSError:
         pass
+
+def _wait_for_interface_ip(intf: str) -> int:
+    wait_for_interface(interface=intf)
+
+    return wait_for_ip(interface=intf)
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+
+'''local load generator for the dns server reporting the query rate and response latency.
+
+queries are sent over udp by concurrent senders, each waiting for the response or timeout before sending its next
+query. the popular share of queries repeat a small set of names, so both the cache and relay paths of the server are
+exercised. run it with the same arguments against the threaded and event loop server cores to compare them. pointing
+the server at the tls echo resolver keeps the public resolvers out of the measurement.
+
+    python3 load_generator.py server_ip [port] [concurrency] [duration] [popular percent] [domain]
+'''
+
+from __future__ import annotations
+
+import sys
+import random
+import string
+import asyncio
+
+from itertools import cycle
+from struct import Struct
+from time import perf_counter_ns
+
+SERVER_PORT: int = 53
+CONCURRENCY: int = 64
+DURATION: int = 10
+POPULAR_PERCENT: int = 50
+DOMAIN: str = 'example.com'
+
+POPULAR_COUNT: int = 100
+QUERY_TIMEOUT: float = 2
+
+_header_pack = Struct('!6H').pack
+_id_unpack = Struct('!H').unpack_from
+
+def build_query(dns_id: int, qname: str) -> bytes:
+    '''return an A record query for the name with recursion desired.
+    '''
+    labels = b''.join([len(label).to_bytes(1, 'big') + label.encode() for label in qname.split('.')])
+
+    return _header_pack(dns_id, 0x0100, 1, 0, 0, 0) + labels + b'\x00\x00\x01\x00\x01'
+
+def random_label(length: int) -> str:
+    return ''.join(random.choices(string.ascii_lowercase + string.digits, k=length))
+
+
+class ClientProtocol(asyncio.DatagramProtocol):
+
+    def __init__(self):
+        # dns id > (response future, send time)
+        self.pending: dict[int, tuple[asyncio.Future, int]] = {}
+
+    def datagram_received(self, data: bytes, address: tuple[str, int]) -> None:
+        if (len(data) < 12):
+            return
+
+        query = self.pending.pop(_id_unpack(data)[0], None)
+        if (query and not query[0].done()):
+            query[0].set_result(perf_counter_ns() - query[1])
+
+    def error_received(self, exc: Exception) -> None:
+        pass
+
+
+async def sender(
+        transport: asyncio.DatagramTransport, client: ClientProtocol, dns_ids: list[int], names: list[str],
+        popular_percent: int, domain: str, end_time: int, results: dict[str, list]) -> None:
+
+    loop = asyncio.get_running_loop()
+
+    for dns_id in cycle(dns_ids):
+
+        if (perf_counter_ns() >= end_time):
+            return
+
+        if (random.randrange(100) < popular_percent):
+            qname = random.choice(names)
+        else:
+            qname = f'{random_label(12)}.{domain}'
+
+        response = loop.create_future()
+        client.pending[dns_id] = (response, perf_counter_ns())
+
+        transport.sendto(build_query(dns_id, qname))
+        try:
+            results['latency'].append(await asyncio.wait_for(response, QUERY_TIMEOUT))
+        except asyncio.TimeoutError:
+            client.pending.pop(dns_id, None)
+
+            results['timeouts'].append(dns_id)
+
+async def run(
+        server_ip: str, port: int = SERVER_PORT, concurrency: int = CONCURRENCY, duration: int = DURATION,
+        popular_percent: int = POPULAR_PERCENT, domain: str = DOMAIN) -> None:
+
+    loop = asyncio.get_running_loop()
+
+    transport, client = await loop.create_datagram_endpoint(ClientProtocol, remote_addr=(server_ip, port))
+
+    names = [f'{random_label(8)}.{domain}' for _ in range(POPULAR_COUNT)]
+
+    # each sender uses its own share of the id space, so responses are matched without collisions
+    dns_ids = list(range(1, 65536))
+    random.shuffle(dns_ids)
+
+    results: dict[str, list] = {'latency': [], 'timeouts': []}
+
+    start = perf_counter_ns()
+    end_time = start + duration * 1_000_000_000
+
+    await asyncio.gather(*[
+        sender(transport, client, dns_ids[i::concurrency], names, popular_percent, domain, end_time, results)
+        for i in range(concurrency)
+    ])
+
+    elapsed = (perf_counter_ns() - start) / 1e9
+
+    transport.close()
+
+    latency = sorted(results['latency'])
+    if (not latency):
+        print(f'no responses received from {server_ip}:{port}. timeouts={len(results["timeouts"])}')
+
+        return
+
+    def percentile(percent: float) -> float:
+        return latency[min(len(latency) - 1, int(len(latency) * percent / 100))] / 1e6
+
+    print(f'server={server_ip}:{port} concurrency={concurrency} duration={elapsed:.2f}s popular={popular_percent}%')
+    print(f'responses={len(latency)} timeouts={len(results["timeouts"])} qps={len(latency) / elapsed:.0f}')
+    print(f'latency ms  p50={percentile(50):.3f}  p90={percentile(90):.3f}  p99={percentile(99):.3f}')
+
+
+if __name__ == '__main__':
+    if (len(sys.argv) < 2):
+        print('usage: load_generator.py server_ip [port] [concurrency] [duration] [popular percent] [domain]')
+
+        sys.exit(1)
+
+    asyncio.run(run(
+        sys.argv[1],
+        *[int(arg) for arg in sys.argv[2:6]],
+        *sys.argv[6:7]
+    ))
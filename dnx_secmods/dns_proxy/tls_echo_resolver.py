@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+
+'''local dns over tls resolver for testing the tls relay.
+
+every query is answered with an A record for the queried name pointing to the answer address. each response is sent
+from its own thread after a random delay, so responses on a connection are returned out of order like a pipelining
+resolver. names starting with "slow" are held for SLOW_DELAY to simulate a slow upstream response.
+
+the relay verifies the resolver certificate against the CERTIFICATE_STORE, so a certificate for the listening address
+must be created and trusted on the test system.
+
+    openssl req -x509 -newkey rsa:2048 -nodes -days 30 -subj '/CN=127.0.0.1' \
+        -addext 'subjectAltName=IP:127.0.0.1' -keyout key.pem -out cert.pem
+
+    python3 tls_echo_resolver.py cert.pem key.pem [listen ip] [port] [answer ip]
+'''
+
+from __future__ import annotations
+
+import sys
+import ssl
+import random
+import socket
+import threading
+
+from struct import Struct
+from time import sleep
+
+LISTEN_IP: str = '127.0.0.1'
+LISTEN_PORT: int = 853
+ANSWER_IP: str = '192.0.2.1'
+
+MAX_DELAY: float = .05
+SLOW_DELAY: float = 2
+
+_header_unpack = Struct('!6H').unpack_from
+_header_pack = Struct('!6H').pack
+_answer_pack = Struct('!3HLH4s').pack
+_len_pack = Struct('!H').pack
+
+def build_response(query: bytes, answer_ip: bytes) -> tuple[bytes, str]:
+    '''return the length prefixed response to the query and the queried name.
+    '''
+    dns_id, flags = _header_unpack(query)[:2]
+
+    # question name labels
+    offset, labels = 12, []
+    while (query[offset]):
+        labels.append(query[offset + 1:offset + 1 + query[offset]].decode())
+
+        offset += 1 + query[offset]
+
+    question: bytes = query[12:offset + 5]
+
+    # response, recursion desired (copied) and available. pointer to the question name.
+    response: bytes = (
+        _header_pack(dns_id, 0x8080 | flags & 0x0110, 1, 1, 0, 0)
+        + question
+        + _answer_pack(0xc00c, 1, 1, 300, 4, answer_ip)
+    )
+
+    return _len_pack(len(response)) + response, '.'.join(labels)
+
+def handle_connection(conn: ssl.SSLSocket, answer_ip: bytes) -> None:
+    send_lock = threading.Lock()
+
+    def respond(query: bytes) -> None:
+        response, qname = build_response(query, answer_ip)
+
+        sleep(SLOW_DELAY if qname.startswith('slow') else random.uniform(0, MAX_DELAY))
+
+        with send_lock:
+            try:
+                conn.sendall(response)
+            except OSError:
+                pass
+
+    buffer = bytearray()
+    while True:
+        try:
+            data = conn.recv(4096)
+        except OSError:
+            break
+
+        if (not data):
+            break
+
+        buffer += data
+        while (len(buffer) >= 2 and len(buffer) >= 2 + (buffer[0] << 8 | buffer[1])):
+            query_end = 2 + (buffer[0] << 8 | buffer[1])
+
+            threading.Thread(target=respond, args=(bytes(buffer[2:query_end]),)).start()
+
+            del buffer[:query_end]
+
+    conn.close()
+
+def run(cert_path: str, key_path: str, listen_ip: str, port: int, answer_ip: str) -> None:
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert_path, key_path)
+
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((listen_ip, port))
+    listener.listen(32)
+
+    print(f'tls echo resolver listening on {listen_ip}:{port}, answering {answer_ip}')
+
+    answer = socket.inet_aton(answer_ip)
+    while True:
+        sock, address = listener.accept()
+        try:
+            conn = context.wrap_socket(sock, server_side=True)
+        except (OSError, ssl.SSLError) as E:
+            print(f'[{address[0]}] handshake failed. {E}')
+
+            sock.close()
+
+            continue
+
+        threading.Thread(target=handle_connection, args=(conn, answer)).start()
+
+
+if __name__ == '__main__':
+    if (len(sys.argv) < 3):
+        print('usage: tls_echo_resolver.py cert.pem key.pem [listen ip] [port] [answer ip]')
+
+        sys.exit(1)
+
+    run(
+        sys.argv[1], sys.argv[2],
+        sys.argv[3] if len(sys.argv) > 3 else LISTEN_IP,
+        int(sys.argv[4]) if len(sys.argv) > 4 else LISTEN_PORT,
+        sys.argv[5] if len(sys.argv) > 5 else ANSWER_IP
+    )
@@ -11,9 +11,9 @@ from collections import defaultdict
 from dnx_gentools.def_constants import *
 from dnx_gentools.def_enums import *
 from dnx_gentools.def_namedtuples import IPS_SCAN_RESULTS, DDOS_TRACKERS, PSCAN_TRACKERS
-from dnx_iptools.iptables import IPTablesManager
-
 from dnx_iptools.packet_classes import NFQueue
+
+from dnx_secmods.cfirewall.fw_client import FirewallAPI
 from dnx_secmods.ids_ips.ids_ips_automate import IPSConfiguration
 from dnx_secmods.ids_ips.ids_ips_packets import IPSPacket, IPSResponse
 
@@ -233,7 +233,8 @@ def inspect_ddos(packet: IPSPacket) -> None:
         Log.log(packet, IPS.LOGGED, engine=IPS.DDOS)
 
     elif (IPS_IDS.ddos_enabled):
-        IPTablesManager.proxy_add_rule(packet.tracked_ip, packet.timestamp, table='raw', chain='IPS')
+        # cfirewall drops the host before rule inspection until the block expires
+        FirewallAPI.block_host(packet.tracked_ip, int(packet.timestamp), IPS_IDS.block_length)
 
         Log.log(packet, IPS.FILTERED, engine=IPS.DDOS)
 
@@ -5,13 +5,13 @@ from __future__ import annotations
 from dnx_gentools.def_typing import *
 from dnx_gentools.def_constants import *
 from dnx_gentools.def_enums import PROTO
-from dnx_gentools.system_info import System
 from dnx_gentools.standard_tools import looper, ConfigurationMixinBase
 from dnx_gentools.file_operations import cfg_read_poller, ConfigurationManager
 
 from dnx_iptools.cprotocol_tools import iptoi
 from dnx_iptools.iptables import IPTablesManager
 
+from dnx_secmods.cfirewall.fw_client import FirewallAPI
 from dnx_secmods.ids_ips.ids_ips_log import Log
 
 # ===============
@@ -51,12 +51,13 @@ class IPSConfiguration(ConfigurationMixinBase):
 
         return thread information to be run.
         '''
-        self.__class__.fw_rules = dict(System.ips_passively_blocked())
+        # hosts blocked by previous versions were iptables rules. cfirewall now owns the blocklist.
+        IPTablesManager.purge_proxy_rules(table='raw', chain='IPS')
 
         threads = (
             (self._get_settings, ()),
             (self._get_open_ports, ()),
-            (self._clear_ip_tables, ())
+            (self._sync_blocked_hosts, ())
         )
 
         return Log, threads, 2
@@ -131,16 +132,9 @@ class IPSConfiguration(ConfigurationMixinBase):
         self._initialize.done()
 
     @looper(FIVE_MIN)
-    # refactored function utilizing iptables + timestamp comment to identify rules to be expired.
-    # this should inherently make the passive blocking system persist service or system reboots.
-    def _clear_ip_tables(self) -> None:
-        expired_hosts = System.ips_passively_blocked(block_length=self.__class__.block_length)
-        if (not expired_hosts):
-            return
-
-        with IPTablesManager() as iptables:
-            for host, timestamp in expired_hosts:
-                iptables.remove_passive_block(host, timestamp)
-
-                # removing host from ips tracker/ suppression dictionary
-                self.__class__.fw_rules.pop(host, None)  # should never return None
+    # cfirewall expires blocked hosts on its own. the tracker/ suppression dictionary is replaced with the blocklist
+    # contents so expired hosts are dropped and hosts blocked before a service restart are picked back up.
+    def _sync_blocked_hosts(self) -> None:
+        blocked_hosts, _ = FirewallAPI.blocked_hosts()
+
+        self.__class__.fw_rules = {host: blocked for host, blocked, _ in blocked_hosts}
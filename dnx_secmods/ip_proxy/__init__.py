@@ -11,7 +11,7 @@ if INITIALIZE_MODULE('ip-proxy'):
     __all__ = ('run',)
 
     from dnx_gentools.def_enums import Queue
-    from dnx_gentools.signature_operations import generate_reputation
+    from dnx_gentools.signature_operations import compile_reputation
 
     from dnx_iptools.hash_trie import HashTrie_Value
 
@@ -19,26 +19,24 @@ if INITIALIZE_MODULE('ip-proxy'):
 
     Log.run(name='ip_proxy')
 
-    reputation_signatures = generate_reputation(Log)
-
-    # initializing the C/Cython extension, converting python structures to native C array/struct.
+    # initializing the C/Cython extension, mapping the precompiled image as the native C array/struct.
     # assigning direct reference to the search method [which calls underlying C without GIL]
     _reputation_trie = HashTrie_Value()
-    _reputation_trie.generate_structure(reputation_signatures, len(reputation_signatures))
-
-    # memory allocation was done manually within the C extension for its structures.
-    # python structures are no longer needed at this point so freeing memory.
-    del reputation_signatures
+    _reputation_trie.load_image(compile_reputation(Log))
 
     # =================
     # DEFERRED IMPORTS
     # =================
     # must be imported after logger is initialized
     import ip_proxy
+    import ip_proxy_automate
 
     # setting top of file variable for proxy direct access to search method
     ip_proxy.REP_LOOKUP = _reputation_trie.py_search
 
+    # signature updates are swapped into the trie while running
+    ip_proxy_automate.REPUTATION_TRIE = _reputation_trie
+
 
 def run():
     ip_proxy.IPProxy.run(Log, q_num=Queue.IP_PROXY)
@@ -10,7 +10,6 @@ from dnx_gentools.def_namedtuples import IPP_INSPECTION_RESULTS
 from dnx_iptools.packet_classes import NFQueue
 
 from ip_proxy_packets import IPPPacket, ProxyResponse
-from ip_proxy_restrict import LanRestrict
 from ip_proxy_automate import ProxyConfiguration
 from ip_proxy_log import Log
 
@@ -34,7 +33,6 @@ class IPProxy(ProxyConfiguration, NFQueue):
         self.configure()
 
         ProxyResponse.setup(Log, self.__class__.open_ports)
-        # LanRestrict.run(self.__class__)
 
     @staticmethod
     def forward_packet(packet: IPPPacket, direction: DIR, action: CONN) -> None:
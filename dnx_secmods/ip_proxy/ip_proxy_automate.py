@@ -3,11 +3,12 @@
 from __future__ import annotations
 
 from dnx_gentools.def_typing import *
-from dnx_gentools.def_constants import RFC1918
+from dnx_gentools.def_constants import RFC1918, ONE_MIN
 from dnx_gentools.def_namedtuples import Item
 from dnx_gentools.def_enums import PROTO, DIR, REP, GEO
-from dnx_gentools.standard_tools import ConfigurationMixinBase
+from dnx_gentools.standard_tools import looper, ConfigurationMixinBase
 from dnx_gentools.file_operations import load_configuration, cfg_read_poller
+from dnx_gentools.signature_operations import compile_reputation, reload_signatures
 
 from dnx_iptools.iptables import IPTablesManager
 
@@ -19,6 +20,10 @@ from ip_proxy_log import Log
 if (TYPE_CHECKING):
     from dnx_routines.logging import LogHandler_T
 
+    from dnx_iptools.hash_trie import HashTrie_Value
+
+REPUTATION_TRIE: HashTrie_Value = NotImplemented  # will be assigned by __init__ prior to running
+
 
 class ProxyConfiguration(ConfigurationMixinBase):
     ids_mode: ClassVar[bool] = False
@@ -46,7 +51,8 @@ class ProxyConfiguration(ConfigurationMixinBase):
         threads = (
             (self._get_settings, ()),
             (self._get_ip_whitelist, ()),
-            (self._get_open_ports, ())
+            (self._get_open_ports, ()),
+            (self._reload_signatures, ())
         )
 
         return Log, threads, 3
@@ -115,6 +121,12 @@ class ProxyConfiguration(ConfigurationMixinBase):
 
         self._initialize.done()
 
+    @looper(ONE_MIN)
+    # recompiles the reputation signature image if its sources have changed and swaps it into the live trie.
+    def _reload_signatures(self) -> None:
+        if reload_signatures(REPUTATION_TRIE, compile_reputation(Log)):
+            Log.notice('[reload] reputation signatures updated.')
+
     @staticmethod
     def _manage_ip_tables():
         IPTablesManager.clear_dns_over_https()
@@ -10,7 +10,8 @@ from dnx_gentools.file_operations import ConfigurationManager, load_configuratio
 from dnx_gentools.system_info import System
 
 from dnx_iptools.cprotocol_tools import iptoi, itoip
-from dnx_iptools.iptables import IPTablesManager
+
+from dnx_secmods.cfirewall.fw_client import FirewallAPI
 
 from source.web_interfaces import StandardWebPage
 
@@ -48,8 +49,8 @@ class WebPage(StandardWebPage):
 
         # converting standard timestamp to a frontend-readable string format
         passively_blocked_hosts = []
-        pbh = System.ips_passively_blocked()
-        for host, timestamp in pbh:
+        pbh, _ = FirewallAPI.blocked_hosts()
+        for host, timestamp, _ in pbh:
             passively_blocked_hosts.append((itoip(host), timestamp, System.offset_and_format(timestamp)))
 
         return {
@@ -287,13 +288,8 @@ def configure_dns_whitelist(settings: config, /) -> None:
 
 # error condition should never be met, but just for initial implementation and piece of mind
 def pbl_remove_notify(host: int, timestamp: int) -> None:
-    error = True
-    with IPTablesManager() as iptables:
-        iptables.remove_passive_block(host, timestamp)
-
-        error = False
-
-    if error: return
+    if not FirewallAPI.unblock_host(host):
+        return
 
     with ConfigurationManager('global', cfg_type='security/ids_ips') as dnx:
         ips_global_settings: ConfigChain = dnx.load_configuration()
@@ -215,7 +215,7 @@ def validate_geolocation(category: config, rtype: str = 'country') -> Optional[V
     else:
         return ValidationError(INVALID_FORM)
 
-# TODO: time restriction should probably be moved out of ip proxy. this will ultimately be merged with quotas.
+# NOTE: the time restriction is enforced by cfirewall as a time window on the lan zone quota.
 def validate_time_restriction(tr: config, /) -> Optional[ValidationError]:
 
     if (tr.hour not in range(1, 13) or tr.min not in [00, 15, 30, 45]):
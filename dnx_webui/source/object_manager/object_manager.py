@@ -104,6 +104,7 @@ class ADDR_OBJ(IntEnum):
     ADDRESS = 1
     NETWORK = 2
     RANGE   = 3
+    LIST    = 4
     GEO     = 6
     INV_ADDRESS = 11
     INV_NETWORK = 12
@@ -116,6 +117,23 @@ class SVC_OBJ(IntEnum):
     RANGE = 2
     LIST  = 3
 
+def address_bounds(value: str, /) -> list[int]:
+    '''return the first and last address (inclusive) of a host, network, or range string.
+
+        1.1.1.1, 10.0.0.0/8, 192.168.1.10-192.168.1.20
+    '''
+    if ('-' in value):
+        start, end = value.split('-')
+
+        return [iptoi(start), iptoi(end)]
+
+    ip, _, cidr = value.partition('/')
+    netmask: int = cidrtoi(cidr or 32)
+
+    netid: int = iptoi(ip) & netmask
+
+    return [netid, netid | (~netmask & 0xFFFFFFFF)]
+
 # TODO: this should be done one time/ precalculated
 def convert_object(obj: FW_OBJECT, /) -> Union[int, list[int], list[list]]:
     if (obj.type == 'address'):
@@ -125,6 +143,15 @@ def convert_object(obj: FW_OBJECT, /) -> Union[int, list[int], list[list]]:
             # type, int32 ip, int32 netmask
             return [obj.subtype, iptoi(ip), cidrtoi(netmask)]
 
+        # type, int32 start ip, int32 end ip
+        elif (obj.subtype == ADDR_OBJ.RANGE):
+            return [obj.subtype, *address_bounds(obj.value)]
+
+        # type, list[ list[ int32 start ip, int32 end ip ]], null
+        # the members are sorted and merged by cfirewall so they are passed through in the order defined.
+        elif (obj.subtype == ADDR_OBJ.LIST):
+            return [obj.subtype, [address_bounds(member) for member in obj.value.split(':')], 0]
+
         # type, int32 country code, null
         elif (obj.subtype == ADDR_OBJ.GEO):
             return [obj.subtype, GEO[obj.value.upper()].value, 0]
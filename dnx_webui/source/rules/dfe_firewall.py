@@ -7,6 +7,7 @@ import string
 
 from typing import NamedTuple as _NamedTuple
 from collections import defaultdict
+from ipaddress import IPv4Address
 
 from source.web_typing import *
 from source.web_validate import *
@@ -80,7 +81,9 @@ class WebPage(RulesWebPage):
 
         reference_counts.clear()
         # NOTE: this needs to be before the zone manager builds, so we can get reference counts
-        firewall_rules = get_and_format_rules(section)
+        rule_stats, latency = FirewallControl.rule_stats(section)
+
+        firewall_rules = get_and_format_rules(section, rule_stats)
 
         # TODO: this is now unoptimized.
         #  we should track ref counts in in FirewallControl class and inc/dec when rule is deleted or added.
@@ -116,6 +119,7 @@ class WebPage(RulesWebPage):
             'network_autofill': network_autofill,
             'service_autofill': service_autofill,
             'firewall_rules': firewall_rules,
+            'inspection_latency': latency_percentiles(latency),
             'pending_changes': FirewallControl.is_pending_changes()
         }
 
@@ -211,7 +215,7 @@ class WebPage(RulesWebPage):
 
         return True, {'error': 0, 'message': 'commit successful'}
 
-def get_and_format_rules(section: str) -> list[list]:
+def get_and_format_rules(section: str, rule_stats: dict[str, tuple[int, int]]) -> list[list]:
     firewall_rules = FirewallControl.cfirewall.view_ruleset(section)
 
     converted_rules: list = []
@@ -235,11 +239,37 @@ def get_and_format_rules(section: str) -> list[list]:
                 [lookup(x) for x in rule['dst_service']],
 
                 rule['action'], rule['log'],
-                rule['ipp_profile'], rule['dns_profile'], rule['ips_profile']
+                rule['ipp_profile'], rule['dns_profile'], rule['ips_profile'],
+
+                # hits, bytes. counters are for the active ruleset so pending rules will show 0.
+                rule_stats.get(rule['name'], (0, 0))
             ])
 
     return converted_rules
 
+def latency_percentiles(buckets: list[int]) -> dict[str, str]:
+    '''return the p50 and p99 inspection latency as the upper bound of the histogram bucket they fall in.
+
+    bucket n counts inspections taking [2^n, 2^(n+1)) nanoseconds.
+    '''
+    total = sum(buckets)
+    if (not total):
+        return {}
+
+    percentiles: dict[str, str] = {}
+    for name, target in [('p50', total * .50), ('p99', total * .99)]:
+
+        count = 0
+        for bucket, bucket_count in enumerate(buckets):
+            count += bucket_count
+            if (count >= target):
+                break
+
+        upper = 2 ** (bucket + 1)
+        percentiles[name] = f'{upper} ns' if upper < 1000 else f'{upper / 1000:.1f} us'
+
+    return percentiles
+
 def calculate_ref_counts(firewall_rules: list[list]) -> None:
 
     rule: list
@@ -375,6 +405,30 @@ def validate_firewall_rule(rule_num: int, fw_rule: rule_structure, /, check: Cal
 
 valid_types = ['address', 'service', 'geolocation']
 valid_service_chars = string.ascii_letters + string.digits + '/:-'
+
+def validate_address_member(member: str) -> Optional[ValidationError]:
+    '''validate a host, network, or range. ranges must be in ascending order.'''
+    try:
+        if ('-' in member):
+            try:
+                start, end = member.split('-')
+            except ValueError:
+                return ValidationError('IP range must be in the format start-end.')
+
+            ip_address(ip_iter=[start, end])
+            if (IPv4Address(start) > IPv4Address(end)):
+                return ValidationError('IP range start must not be greater than the end.')
+
+        # the validators raise with a message specific to the member type (address or network)
+        elif ('/' in member):
+            ip_network(member)
+
+        else:
+            ip_address(member)
+
+    except ValidationError as ve:
+        return ve
+
 def validate_object(obj: config) -> Optional[ValidationError]:
     # 'id', 'name', 'type', 'value', 'desc'
     if (obj.id and obj.id not in range(*USER_RANGE)):
@@ -390,8 +444,21 @@ def validate_object(obj: config) -> Optional[ValidationError]:
     object_value = obj.value
     if (obj.type == 'address'):
 
+        # ADDRESS TYPE 4 (LIST)
+        if (':' in object_value):
+            obj.subtype = 4
+            for member in object_value.split(':'):
+                if (error := validate_address_member(member)):
+                    return error
+
+        # ADDRESS TYPE 3 (RANGE)
+        elif ('-' in object_value):
+            obj.subtype = 3
+            if (error := validate_address_member(object_value)):
+                return error
+
         # ADDRESS TYPE 2 (NETWORK)
-        if ('/' in object_value):
+        elif ('/' in object_value):
             obj.subtype = 2
             try:
                 ip_network(object_value)
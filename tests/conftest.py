@@ -0,0 +1,11 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+
+HOME_DIR: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# modules are imported from the project root, as when run by the services. the dns proxy modules import each other
+# by name.
+sys.path.insert(0, HOME_DIR)
+sys.path.insert(0, f'{HOME_DIR}/dnx_secmods/dns_proxy')
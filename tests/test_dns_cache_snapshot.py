@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+'''dns cache snapshot tests simulating a proxy restart.
+
+records are added to a cache and written to a snapshot. the snapshot is then loaded into a new cache with the clock
+shifted forward by the downtime, as if the proxy had been stopped for that long.
+'''
+
+from __future__ import annotations
+
+import pytest
+
+from dnx_gentools.def_enums import DNS
+from dnx_gentools.def_namedtuples import QNAME_RECORD, RESOURCE_RECORD
+from dnx_gentools.file_operations import ConfigChain
+
+import dns_proxy_cache
+
+from dns_proxy_cache import dns_cache, QNAME_NOT_FOUND
+
+NOW: int = 1700000000
+
+# qname, qtype, ttl, rcode, negative
+RECORDS: list[tuple[str, int, int, int, bool]] = [
+    ('fresh.example.com', DNS.A, 240, DNS.NO_ERROR, False),
+    ('v6.example.com', DNS.AAAA, 120, DNS.NO_ERROR, False),
+    ('missing.example.com', DNS.A, 90, DNS.NXDOMAIN, True),
+    ('short.example.com', DNS.A, 30, DNS.NO_ERROR, False),
+]
+
+def resource_record(qname: str, qtype: int, ttl: int) -> RESOURCE_RECORD:
+    return RESOURCE_RECORD(
+        b''.join([len(label).to_bytes(1, 'big') + label.encode() for label in qname.split('.')]) + b'\x00',
+        qtype.to_bytes(2, 'big'), b'\x00\x01', ttl.to_bytes(4, 'big'), b'\xc0\x00\x02\x01'
+    )
+
+def new_cache():
+    return dns_cache(dns_packet=lambda qname, qtype: None, request_handler=lambda *args: None)
+
+def set_clock(monkeypatch, now: int) -> None:
+    monkeypatch.setattr(dns_proxy_cache, 'fast_time', lambda: now)
+
+@pytest.fixture
+def snapshot_path(tmp_path, monkeypatch) -> str:
+    '''caches are created with the default settings and a snapshot path of their own, so the configuration, top
+    domains, and snapshot of an installed proxy are not used.
+    '''
+    path = str(tmp_path / 'dns_cache.snapshot')
+
+    monkeypatch.setattr(dns_proxy_cache, 'DNS_CACHE_SNAPSHOT', path)
+    monkeypatch.setattr(
+        dns_proxy_cache, 'load_configuration', lambda *args, **kwargs: ConfigChain({'top_domains': []}, {})
+    )
+    monkeypatch.setattr(dns_proxy_cache, 'load_top_domains_filter', lambda: [])
+
+    set_clock(monkeypatch, NOW)
+
+    cache = new_cache()
+    for qname, qtype, ttl, rcode, negative in RECORDS:
+        records = [] if negative else [resource_record(qname, qtype, ttl)]
+
+        cache.add((qname, qtype), QNAME_RECORD(NOW + ttl, ttl, records, rcode, negative))
+
+    assert cache.write_snapshot() == len(RECORDS)
+
+    return path
+
+@pytest.mark.parametrize('downtime', [0, 50, 100])
+def test_restored_records_keep_remaining_ttl(snapshot_path, monkeypatch, downtime):
+    set_clock(monkeypatch, NOW + downtime)
+
+    # the snapshot is loaded when the cache is created
+    restarted = new_cache()
+
+    assert len(restarted) == len([record for record in RECORDS if record[2] > downtime])
+
+    for qname, qtype, ttl, rcode, negative in RECORDS:
+        if (ttl <= downtime):
+            continue
+
+        cached = restarted[(qname, qtype)]
+
+        assert cached.ttl == ttl - downtime, qname
+        assert (cached.rcode, cached.negative) == (rcode, negative), qname
+
+        if (not negative):
+            assert [tuple(record) for record in cached.records] == [tuple(resource_record(qname, qtype, ttl))], qname
+
+def test_records_expired_during_downtime_are_skipped(snapshot_path, monkeypatch):
+    set_clock(monkeypatch, NOW + 100)
+
+    restarted = new_cache()
+
+    for qname, qtype, ttl, rcode, negative in RECORDS:
+        if (ttl <= 100):
+            assert restarted[(qname, qtype)] is QNAME_NOT_FOUND, qname
+
+def test_truncated_snapshot_is_rejected(snapshot_path):
+    with open(snapshot_path, 'rb') as snapshot_file:
+        snapshot: bytes = snapshot_file.read()
+
+    with open(snapshot_path, 'wb') as snapshot_file:
+        snapshot_file.write(snapshot[:-3])
+
+    with pytest.raises(ValueError):
+        new_cache().load_snapshot(snapshot_path)